@@ -0,0 +1,108 @@
+"""Benchmark bytes-on-wire and time-to-last-byte of the newsletter listing.
+
+Runs a stub skills_development backend that returns N articles (full content,
+like /api/newsletter/articles) behind the gateway, then fetches the listing
+with identity, gzip and brotli Accept-Encoding for 20/100/500 articles.
+
+Usage:
+    python benchmark_compression.py [--requests 20]
+"""
+
+import argparse
+import os
+import random
+import statistics
+import sys
+import threading
+import time
+
+import httpx
+import uvicorn
+
+STUB_PORT = 8921
+GATEWAY_PORT = 8922
+WORDS = (
+    "language learning vocabulary grammar interpreter translation glossary "
+    "conference terminology fluency accuracy context register idiom practice"
+).split()
+
+
+def build_stub_app():
+    from fastapi import FastAPI
+
+    rng = random.Random(42)
+    articles = [
+        {
+            "article_id": f"article-{i}",
+            "title": f"Article {i}",
+            "content": " ".join(rng.choice(WORDS) for _ in range(600)),
+            "topic": rng.choice(["Interpreting", "Translation", "Terminology"]),
+            "created_at": "2026-01-01T00:00:00",
+            "quality_score": round(rng.uniform(70, 100), 1),
+            "evaluation_details": None,
+            "vocabulary": rng.sample(WORDS, 5),
+        }
+        for i in range(500)
+    ]
+
+    stub = FastAPI()
+
+    @stub.get("/api/newsletter/articles")
+    def get_articles(limit: int = 20):
+        return articles[:limit]
+
+    return stub
+
+
+def run_in_thread(app, port: int) -> uvicorn.Server:
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning"))
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.05)
+    return server
+
+
+def measure(client: httpx.Client, limit: int, encoding: str, count: int):
+    url = f"http://127.0.0.1:{GATEWAY_PORT}/skills_development/api/newsletter/articles"
+    wire_bytes, timings = 0, []
+    for _ in range(count):
+        started = time.perf_counter()
+        with client.stream("GET", url, params={"limit": limit}, headers={"Accept-Encoding": encoding}) as response:
+            response.raise_for_status()
+            wire_bytes = sum(len(chunk) for chunk in response.iter_raw())
+        timings.append((time.perf_counter() - started) * 1000)
+    return wire_bytes, statistics.median(timings)
+
+
+def main(args):
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    import main as gateway
+    from compression import brotli
+
+    gateway.MICROSERVICE_URLS.clear()
+    gateway.MICROSERVICE_URLS["skills_development"] = f"http://127.0.0.1:{STUB_PORT}"
+    # Measure the proxied path, not the response cache
+    gateway.CACHED_ROUTES.clear()
+
+    run_in_thread(build_stub_app(), STUB_PORT)
+    run_in_thread(gateway.app, GATEWAY_PORT)
+
+    encodings = ["identity", "gzip"]
+    if brotli is not None:
+        encodings.append("br")
+
+    print(f"{'articles':>8} {'encoding':<9} {'bytes on wire':>14} {'ratio':>7} {'TTLB p50 ms':>12}")
+    with httpx.Client(timeout=60.0) as client:
+        for limit in (20, 100, 500):
+            baseline = None
+            for encoding in encodings:
+                measure(client, limit, encoding, 2)  # warm-up
+                wire_bytes, ttlb = measure(client, limit, encoding, args.requests)
+                baseline = baseline or wire_bytes
+                print(f"{limit:>8} {encoding:<9} {wire_bytes:>14,} {wire_bytes / baseline:>7.2f} {ttlb:>12.2f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=20)
+    main(parser.parse_args())
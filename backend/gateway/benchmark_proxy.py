@@ -0,0 +1,194 @@
+"""Benchmark the gateway proxy against the previous per-request client proxy.
+
+Starts a local stub backend plus two proxies (the legacy buffered proxy and the
+pooled streaming one from main.py) as separate uvicorn processes, then reports
+p50/p99 latency and the proxy's peak RSS for small JSON and large multipart
+uploads.
+
+Usage:
+    python benchmark_proxy.py [--json-requests 300] [--upload-requests 5] [--upload-mb 50]
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+import httpx
+
+STUB_PORT = 8901
+PROXY_PORT = 8902
+
+
+# ======== Servers (run in subprocesses) ========
+
+def build_stub_app():
+    """Backend stand-in that drains the request body and answers with its size."""
+    from fastapi import FastAPI, Request
+
+    stub = FastAPI()
+
+    @stub.post("/echo")
+    async def echo(request: Request):
+        received = 0
+        async for chunk in request.stream():
+            received += len(chunk)
+        return {"received": received}
+
+    return stub
+
+
+def build_legacy_app(backend_url: str):
+    """The gateway proxy as it was: new client per call, fully buffered bodies."""
+    from fastapi import FastAPI, Request
+    from fastapi.responses import Response
+
+    legacy = FastAPI()
+
+    @legacy.api_route("/{service}/{path:path}", methods=["GET", "POST", "PUT", "DELETE"])
+    async def proxy(service: str, path: str, request: Request):
+        headers = {
+            key: value for key, value in request.headers.items()
+            if key.lower() not in ("host", "content-length")
+        }
+        async with httpx.AsyncClient(timeout=120.0) as client:
+            response = await client.request(
+                request.method,
+                f"{backend_url}/{path}",
+                headers=headers,
+                params=dict(request.query_params),
+                content=await request.body() if request.method != "GET" else None,
+            )
+        return Response(
+            content=response.content,
+            status_code=response.status_code,
+            headers=dict(response.headers),
+        )
+
+    return legacy
+
+
+def build_pooled_app(backend_url: str):
+    """The current gateway, pointed at the stub backend."""
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    import main
+
+    main.MICROSERVICE_URLS.clear()
+    main.MICROSERVICE_URLS["stub"] = backend_url
+    return main.app
+
+
+def serve(kind: str, port: int):
+    import uvicorn
+
+    backend_url = f"http://127.0.0.1:{STUB_PORT}"
+    if kind == "stub":
+        app = build_stub_app()
+    elif kind == "legacy":
+        app = build_legacy_app(backend_url)
+    else:
+        app = build_pooled_app(backend_url)
+    uvicorn.run(app, host="127.0.0.1", port=port, log_level="warning")
+
+
+# ======== Driver ========
+
+def start_server(kind: str, port: int) -> subprocess.Popen:
+    process = subprocess.Popen(
+        [sys.executable, os.path.abspath(__file__), "--serve", kind, "--port", str(port)]
+    )
+    deadline = time.time() + 15
+    while time.time() < deadline:
+        try:
+            httpx.get(f"http://127.0.0.1:{port}/", timeout=0.5)
+            return process
+        except httpx.TransportError:
+            time.sleep(0.1)
+    process.kill()
+    raise RuntimeError(f"{kind} server did not start on port {port}")
+
+
+def peak_rss_mb(pid: int) -> float:
+    """Peak resident set size (VmHWM) of a process, Linux only."""
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return float("nan")
+
+
+def percentile(samples, pct: float) -> float:
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+async def run_scenario(name: str, count: int, send) -> list:
+    url = f"http://127.0.0.1:{PROXY_PORT}/stub/echo"
+    latencies = []
+    async with httpx.AsyncClient(timeout=300.0) as client:
+        await send(client, url)  # warm-up
+        for _ in range(count):
+            started = time.perf_counter()
+            response = await send(client, url)
+            latencies.append((time.perf_counter() - started) * 1000)
+            response.raise_for_status()
+    return latencies
+
+
+def main(args):
+    json_payload = {"data": "x" * 1000}
+    upload = os.urandom(args.upload_mb * 1024 * 1024)
+
+    async def send_json(client, url):
+        return await client.post(url, json=json_payload)
+
+    async def send_upload(client, url):
+        return await client.post(url, files={"file": ("audio.ogg", upload, "audio/ogg")})
+
+    scenarios = [
+        ("1 KB JSON", args.json_requests, send_json),
+        (f"{args.upload_mb} MB multipart", args.upload_requests, send_upload),
+    ]
+
+    stub = start_server("stub", STUB_PORT)
+    try:
+        print(f"{'proxy':<8} {'scenario':<18} {'p50 ms':>9} {'p99 ms':>9} {'mean ms':>9} {'peak RSS MB':>12}")
+        for kind in ("legacy", "pooled"):
+            for name, count, send in scenarios:
+                # Fresh proxy process per scenario so peak RSS is not carried over
+                proxy = start_server(kind, PROXY_PORT)
+                try:
+                    latencies = asyncio.run(run_scenario(name, count, send))
+                    rss = peak_rss_mb(proxy.pid)
+                finally:
+                    proxy.terminate()
+                    proxy.wait()
+                print(
+                    f"{kind:<8} {name:<18} {percentile(latencies, 50):>9.2f} "
+                    f"{percentile(latencies, 99):>9.2f} {statistics.mean(latencies):>9.2f} {rss:>12.1f}"
+                )
+    finally:
+        stub.terminate()
+        stub.wait()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--serve", choices=["stub", "legacy", "pooled"], help=argparse.SUPPRESS)
+    parser.add_argument("--port", type=int, help=argparse.SUPPRESS)
+    parser.add_argument("--json-requests", type=int, default=300)
+    parser.add_argument("--upload-requests", type=int, default=5)
+    parser.add_argument("--upload-mb", type=int, default=50)
+    parsed = parser.parse_args()
+
+    if parsed.serve:
+        serve(parsed.serve, parsed.port)
+    else:
+        main(parsed)
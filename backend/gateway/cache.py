@@ -0,0 +1,186 @@
+# In-memory response cache for idempotent GET routes proxied by the gateway.
+# Entries are keyed on (service, path, sorted query params), expire after a TTL,
+# are evicted least-recently-used first, and may be served stale while a single
+# background refresh revalidates them. Concurrent misses for the same key share
+# one upstream request.
+
+import asyncio
+import logging
+import re
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+CacheKey = Tuple[str, str, Tuple[Tuple[str, str], ...]]
+
+
+@dataclass(frozen=True)
+class CacheRule:
+    """Caching behaviour for one opted-in route."""
+
+    ttl: float
+    stale_while_revalidate: float = 0.0
+
+
+@dataclass
+class CachedResponse:
+    status_code: int
+    headers: Dict[str, str]
+    body: bytes
+    expires_at: float = 0.0
+    stale_until: float = 0.0
+
+
+def make_key(service: str, path: str, query_items) -> CacheKey:
+    return (service, path.strip("/"), tuple(sorted(query_items)))
+
+
+def parse_cache_control(value: Optional[str]) -> Dict[str, Optional[str]]:
+    """Parse a Cache-Control header into {directive: argument-or-None}."""
+    directives: Dict[str, Optional[str]] = {}
+    for part in (value or "").split(","):
+        part = part.strip()
+        if not part:
+            continue
+        name, _, arg = part.partition("=")
+        directives[name.strip().lower()] = arg.strip().strip('"') or None
+    return directives
+
+
+def _seconds(value: Optional[str]) -> Optional[float]:
+    if value is None or not re.fullmatch(r"\d+", value):
+        return None
+    return float(value)
+
+
+class ResponseCache:
+    """TTL + LRU cache with stale-while-revalidate and request collapsing."""
+
+    def __init__(self, max_entries: int = 512, max_body_bytes: int = 2 * 1024 * 1024):
+        self.max_entries = max_entries
+        self.max_body_bytes = max_body_bytes
+        self._entries: "OrderedDict[CacheKey, CachedResponse]" = OrderedDict()
+        self._inflight: Dict[CacheKey, asyncio.Future] = {}
+        self._background: set = set()
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.revalidations = 0
+
+    async def get_or_fetch(
+        self,
+        key: CacheKey,
+        rule: CacheRule,
+        fetch: Callable[[], Awaitable[CachedResponse]],
+        bypass: bool = False,
+    ) -> Tuple[CachedResponse, str]:
+        """
+        Return (response, cache_status) where cache_status is HIT, STALE or MISS.
+
+        `bypass` skips the lookup (client sent Cache-Control: no-cache) but still
+        stores the fresh response.
+        """
+        now = time.monotonic()
+        entry = None if bypass else self._entries.get(key)
+
+        if entry is not None:
+            if now < entry.expires_at:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry, "HIT"
+            if now < entry.stale_until:
+                self._entries.move_to_end(key)
+                self.stale_hits += 1
+                if key not in self._inflight:
+                    self.revalidations += 1
+                    task = asyncio.ensure_future(self._refresh_quietly(key, rule, fetch))
+                    self._background.add(task)
+                    task.add_done_callback(self._background.discard)
+                return entry, "STALE"
+
+        self.misses += 1
+        return await self._refresh(key, rule, fetch), "MISS"
+
+    async def _refresh(self, key: CacheKey, rule: CacheRule, fetch) -> CachedResponse:
+        # Collapse concurrent refreshes of the same key into one upstream call
+        pending = self._inflight.get(key)
+        if pending is not None:
+            return await asyncio.shield(pending)
+
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            response = await fetch()
+            self._store(key, rule, response)
+            future.set_result(response)
+            return response
+        except Exception as exc:
+            future.set_exception(exc)
+            # Mark retrieved so an unawaited future does not log a warning
+            future.exception()
+            raise
+        except BaseException:
+            future.cancel()
+            raise
+        finally:
+            self._inflight.pop(key, None)
+
+    async def _refresh_quietly(self, key: CacheKey, rule: CacheRule, fetch) -> None:
+        try:
+            await self._refresh(key, rule, fetch)
+        except Exception as exc:
+            logger.warning(f"Background revalidation failed for {key}: {exc}")
+
+    def _store(self, key: CacheKey, rule: CacheRule, response: CachedResponse) -> None:
+        if response.status_code != 200 or len(response.body) > self.max_body_bytes:
+            return
+
+        directives = parse_cache_control(response.headers.get("cache-control"))
+        if {"no-store", "no-cache", "private"} & directives.keys():
+            self._entries.pop(key, None)
+            return
+
+        ttl = _seconds(directives.get("s-maxage"))
+        if ttl is None:
+            ttl = _seconds(directives.get("max-age"))
+        if ttl is None:
+            ttl = rule.ttl
+        stale = _seconds(directives.get("stale-while-revalidate"))
+        if stale is None:
+            stale = rule.stale_while_revalidate
+
+        now = time.monotonic()
+        response.expires_at = now + ttl
+        response.stale_until = response.expires_at + stale
+        self._entries[key] = response
+        self._entries.move_to_end(key)
+
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def purge(self, service: Optional[str] = None, path_prefix: str = "") -> int:
+        """Drop entries for a service (and optional path prefix); all entries if no service."""
+        path_prefix = path_prefix.strip("/")
+        doomed = [
+            key for key in self._entries
+            if (service is None or key[0] == service) and key[1].startswith(path_prefix)
+        ]
+        for key in doomed:
+            del self._entries[key]
+        return len(doomed)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "stale_hits": self.stale_hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "revalidations": self.revalidations,
+        }
@@ -2,20 +2,22 @@
 # This service proxies requests to backend microservices.
 # To add a new microservice, add its name and URL to MICROSERVICE_URLS.
 
+from contextlib import asynccontextmanager
+from typing import Optional
+
 from fastapi import FastAPI, Request
-from fastapi.responses import Response
+from fastapi.responses import JSONResponse, Response, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
 import httpx
 
-app = FastAPI()
-
-# CORS Configuration - Allow frontend to access gateway
-app.add_middleware(
-    CORSMiddleware,
-    allow_origins=["*"],  # In production, replace with specific frontend URL
-    allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
+from cache import CacheRule, CachedResponse, ResponseCache, make_key, parse_cache_control
+from compression import CompressionMiddleware
+from resilience import (
+    CircuitBreaker,
+    ConcurrencyLimiter,
+    QueueFullError,
+    QueueTimeoutError,
+    ServicePolicy,
 )
 
 MICROSERVICE_URLS = {
@@ -27,39 +29,315 @@ MICROSERVICE_URLS = {
     "shadowing": "http://shadowing:8000",
 }
 
+# Per-service timeouts, concurrency limits and circuit-breaker thresholds.
+# Services missing from this table use the ServicePolicy defaults.
+SERVICE_POLICIES = {
+    "whatsapp_agent": ServicePolicy(connect_timeout=2.0, read_timeout=30.0, max_in_flight=64, max_queue=128),
+    "ai_glossary": ServicePolicy(connect_timeout=2.0, read_timeout=60.0),
+    "ai_notekeeper": ServicePolicy(read_timeout=900.0, max_in_flight=4, max_queue=16, queue_timeout=60.0),
+    "automatic_translation": ServicePolicy(read_timeout=180.0, max_in_flight=16, max_queue=32),
+    "skills_development": ServicePolicy(read_timeout=300.0, max_in_flight=8, max_queue=16),
+    "shadowing": ServicePolicy(connect_timeout=2.0, read_timeout=60.0),
+}
+
+# Opt-in response caching for idempotent GET routes: (service, path) -> rule.
+# Only list routes whose answer does not depend on the caller's identity.
+CACHED_ROUTES = {
+    ("skills_development", "api/newsletter/articles"): CacheRule(ttl=30.0, stale_while_revalidate=120.0),
+    ("skills_development", "api/system/topics"): CacheRule(ttl=60.0, stale_while_revalidate=300.0),
+    ("skills_development", "api/system/stats"): CacheRule(ttl=15.0, stale_while_revalidate=60.0),
+    ("whatsapp_agent", "analytics"): CacheRule(ttl=5.0, stale_while_revalidate=30.0),
+}
+
+# Keep-alive pool limits applied to each microservice's client
+POOL_LIMITS = httpx.Limits(
+    max_connections=100,
+    max_keepalive_connections=20,
+    keepalive_expiry=30.0,
+)
+
+# Connection-level headers that must not be forwarded in either direction
+HOP_BY_HOP_HEADERS = {
+    "connection",
+    "keep-alive",
+    "proxy-authenticate",
+    "proxy-authorization",
+    "te",
+    "trailer",
+    "transfer-encoding",
+    "upgrade",
+}
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Open one keep-alive connection pool per microservice, close them on shutdown."""
+    app.state.clients = {}
+    app.state.limiters = {}
+    app.state.breakers = {}
+    app.state.cache = ResponseCache()
+    for service, url in MICROSERVICE_URLS.items():
+        policy = SERVICE_POLICIES.get(service, ServicePolicy())
+        app.state.clients[service] = httpx.AsyncClient(
+            base_url=url, timeout=policy.timeout(), limits=POOL_LIMITS, http2=policy.http2
+        )
+        app.state.limiters[service] = ConcurrencyLimiter(
+            policy.max_in_flight, policy.max_queue, policy.queue_timeout
+        )
+        app.state.breakers[service] = CircuitBreaker(
+            policy.failure_threshold, policy.reset_timeout
+        )
+    try:
+        yield
+    finally:
+        for client in app.state.clients.values():
+            await client.aclose()
+
+
+app = FastAPI(lifespan=lifespan)
+
+# CORS Configuration - Allow frontend to access gateway
+app.add_middleware(
+    CORSMiddleware,
+    allow_origins=["*"],  # In production, replace with specific frontend URL
+    allow_credentials=True,
+    allow_methods=["*"],
+    allow_headers=["*"],
+)
+
+# Negotiated brotli/gzip compression of responses larger than 1 KB
+app.add_middleware(CompressionMiddleware, minimum_size=1024)
+
+
+class UpstreamResponse(StreamingResponse):
+    """Streaming response that always runs `on_close`, even if the client disconnects."""
+
+    def __init__(self, *args, on_close, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.on_close = on_close
+
+    async def __call__(self, scope, receive, send):
+        try:
+            await super().__call__(scope, receive, send)
+        finally:
+            await self.on_close()
+
+
+class UpstreamError(Exception):
+    """Raised instead of calling upstream; carries the error response to return."""
+
+    def __init__(self, response: JSONResponse):
+        super().__init__(response.status_code)
+        self.response = response
+
+
+def service_unavailable(service: str, reason: str, retry_after: int = 1) -> JSONResponse:
+    return JSONResponse(
+        {"error": "Service unavailable", "service": service, "reason": reason},
+        status_code=503,
+        headers={"Retry-After": str(retry_after)},
+    )
+
+
+def end_to_end_headers(headers) -> dict:
+    """Drop hop-by-hop headers, including any extra ones named in Connection."""
+    connection_tokens = {
+        token.strip().lower()
+        for token in headers.get("connection", "").split(",")
+        if token.strip()
+    }
+    return {
+        key: value
+        for key, value in headers.items()
+        if key.lower() not in HOP_BY_HOP_HEADERS and key.lower() not in connection_tokens
+    }
+
+
+def forward_headers(request: Request) -> dict:
+    """Client headers to send upstream (Host is set by httpx; Content-Length is
+    kept so uploads are streamed with a known length instead of chunked encoding)."""
+    headers = end_to_end_headers(request.headers)
+    headers.pop("host", None)
+    return headers
+
+
+def upstream_headers(response: httpx.Response) -> dict:
+    return end_to_end_headers(response.headers)
+
+
+async def open_upstream(app: FastAPI, service: str, upstream_request: httpx.Request):
+    """
+    Send a request to a microservice through its breaker and concurrency limiter.
+
+    Returns (response, finish): the response body is still unread and `finish`
+    must be awaited once it has been consumed to close it and free the slot.
+    Raises UpstreamError when the request is rejected or the upstream fails.
+    """
+    client: httpx.AsyncClient = app.state.clients[service]
+    limiter: ConcurrencyLimiter = app.state.limiters[service]
+    breaker: CircuitBreaker = app.state.breakers[service]
+
+    if not breaker.allow_request():
+        raise UpstreamError(service_unavailable(service, "circuit open", breaker.retry_after()))
+
+    try:
+        await limiter.acquire()
+    except (QueueFullError, QueueTimeoutError) as exc:
+        breaker.cancel_trial()
+        reason = "queue full" if isinstance(exc, QueueFullError) else "queue timeout"
+        raise UpstreamError(service_unavailable(service, reason))
+
+    try:
+        response = await client.send(upstream_request, stream=True)
+    except httpx.TimeoutException:
+        breaker.record_failure()
+        limiter.release()
+        raise UpstreamError(
+            JSONResponse({"error": "Upstream timeout", "service": service}, status_code=504)
+        )
+    except httpx.TransportError:
+        breaker.record_failure()
+        limiter.release()
+        raise UpstreamError(
+            JSONResponse({"error": "Upstream unreachable", "service": service}, status_code=502)
+        )
+    except BaseException:
+        breaker.cancel_trial()
+        limiter.release()
+        raise
+
+    if response.status_code >= 500:
+        breaker.record_failure()
+    else:
+        breaker.record_success()
+
+    async def finish():
+        await response.aclose()
+        limiter.release()
+
+    return response, finish
+
+
+async def relay_body(response: httpx.Response, breaker: CircuitBreaker):
+    """Raw upstream body chunks; a failure while reading them counts against the breaker."""
+    try:
+        async for chunk in response.aiter_raw():
+            yield chunk
+    except httpx.HTTPError:
+        breaker.record_failure()
+        raise
+
+
+@app.get("/_metrics")
+def metrics(request: Request):
+    """Breaker state and backpressure (in-flight, queue depth) for each microservice."""
+    return {
+        "services": {
+            service: {
+                "breaker": request.app.state.breakers[service].stats(),
+                **request.app.state.limiters[service].stats(),
+            }
+            for service in MICROSERVICE_URLS
+        },
+        "cache": request.app.state.cache.stats(),
+    }
+
+
+@app.delete("/_cache")
+def purge_cache(request: Request, service: Optional[str] = None, path: str = ""):
+    """Purge cached responses, optionally only for one service and path prefix."""
+    purged = request.app.state.cache.purge(service, path)
+    return {"purged": purged}
+
+
+async def cached_proxy(service: str, path: str, rule: CacheRule, request: Request) -> Response:
+    """Serve an opted-in GET route from the response cache, fetching on a miss."""
+    client: httpx.AsyncClient = request.app.state.clients[service]
+    cache: ResponseCache = request.app.state.cache
+    request_directives = parse_cache_control(request.headers.get("cache-control"))
+
+    headers = forward_headers(request)
+    # Cached bodies are stored decoded, so ask upstream not to compress them
+    headers["accept-encoding"] = "identity"
+    params = request.query_params.multi_items()
+
+    async def fetch() -> CachedResponse:
+        upstream_request = client.build_request("GET", f"/{path}", headers=headers, params=params)
+        response, finish = await open_upstream(request.app, service, upstream_request)
+        try:
+            body = await response.aread()
+        except httpx.HTTPError:
+            # The breaker counted the response as a success when its headers arrived
+            request.app.state.breakers[service].record_failure()
+            raise
+        finally:
+            await finish()
+        stored_headers = {
+            key: value
+            for key, value in upstream_headers(response).items()
+            if key.lower() not in ("content-length", "content-encoding")
+        }
+        return CachedResponse(response.status_code, stored_headers, body)
+
+    try:
+        cached, cache_status = await cache.get_or_fetch(
+            make_key(service, path, params),
+            rule,
+            fetch,
+            bypass="no-cache" in request_directives,
+        )
+    except UpstreamError as exc:
+        return exc.response
+
+    return Response(
+        content=cached.body,
+        status_code=cached.status_code,
+        headers={**cached.headers, "x-cache": cache_status},
+    )
+
 
 @app.api_route("/{service}/{path:path}", methods=["GET", "POST", "PUT", "DELETE"])
 async def proxy(service: str, path: str, request: Request):
     """
     Proxies requests to the appropriate microservice.
     Example: /ai_glossary/some-endpoint -> http://ai_glossary:8000/some-endpoint
-    Handles form data and file uploads correctly.
+    Request and response bodies are streamed, so file uploads are never buffered.
+    Requests are bounded per service and rejected with 503 while the service's
+    queue is full or its circuit breaker is open. GET routes listed in
+    CACHED_ROUTES are answered from the response cache.
     """
     if service not in MICROSERVICE_URLS:
         return {"error": "Unknown service"}
-    
-    url = f"{MICROSERVICE_URLS[service]}/{path}"
-    
-    # Forward headers (excluding Host which should be set by httpx)
-    headers = {}
-    for key, value in request.headers.items():
-        if key.lower() not in ("host", "content-length"):
-            headers[key] = value
-    
-    async with httpx.AsyncClient(timeout=120.0) as client:
-        response = await client.request(
-            request.method, 
-            url,
-            headers=headers,
-            params=dict(request.query_params),
-            content=await request.body() if request.method != "GET" else None,
-        )
-    
-    # Forward the response from the microservice
-    return Response(
-        content=response.content,
+
+    rule = CACHED_ROUTES.get((service, path.strip("/")))
+    if (
+        rule is not None
+        and request.method == "GET"
+        and "no-store" not in parse_cache_control(request.headers.get("cache-control"))
+    ):
+        return await cached_proxy(service, path, rule, request)
+
+    client: httpx.AsyncClient = request.app.state.clients[service]
+    upstream_request = client.build_request(
+        request.method,
+        f"/{path}",
+        headers=forward_headers(request),
+        params=request.query_params.multi_items(),
+        content=request.stream() if request.method != "GET" else None,
+    )
+    try:
+        response, finish = await open_upstream(request.app, service, upstream_request)
+    except UpstreamError as exc:
+        return exc.response
+
+    # Forward the response from the microservice chunk by chunk; raw bytes are
+    # relayed untouched so upstream Content-Length/Content-Encoding stay valid
+    # (CompressionMiddleware only encodes responses upstream left uncompressed)
+    return UpstreamResponse(
+        relay_body(response, request.app.state.breakers[service]),
         status_code=response.status_code,
-        headers=dict(response.headers),
+        headers=upstream_headers(response),
+        on_close=finish,
     )
 
 
@@ -0,0 +1,143 @@
+# Backpressure helpers for the gateway.
+# Each microservice gets a ServicePolicy (timeouts + concurrency limits), a
+# ConcurrencyLimiter that bounds in-flight and queued requests, and a
+# CircuitBreaker that fails fast while the upstream keeps erroring.
+
+import asyncio
+import time
+from dataclasses import dataclass
+from typing import Any, Dict
+
+import httpx
+
+
+@dataclass(frozen=True)
+class ServicePolicy:
+    """Timeouts, limits and protocol options applied to one upstream microservice."""
+
+    connect_timeout: float = 5.0
+    read_timeout: float = 120.0
+    max_in_flight: int = 32
+    max_queue: int = 64
+    queue_timeout: float = 10.0
+    failure_threshold: int = 5
+    reset_timeout: float = 30.0
+    # Offer HTTP/2 via ALPN; only takes effect for https:// upstreams that support it
+    http2: bool = False
+
+    def timeout(self) -> httpx.Timeout:
+        return httpx.Timeout(self.read_timeout, connect=self.connect_timeout)
+
+
+class QueueFullError(Exception):
+    """Raised when a service already has max_queue requests waiting for a slot."""
+
+
+class QueueTimeoutError(Exception):
+    """Raised when a queued request does not get a slot within queue_timeout."""
+
+
+class ConcurrencyLimiter:
+    """Semaphore with a bounded wait queue and in-flight/queue-depth counters."""
+
+    def __init__(self, max_in_flight: int, max_queue: int, queue_timeout: float):
+        self.max_in_flight = max_in_flight
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self._semaphore = asyncio.Semaphore(max_in_flight)
+        self.in_flight = 0
+        self.queue_depth = 0
+        self.rejected = 0
+
+    async def acquire(self) -> None:
+        if self._semaphore.locked() and self.queue_depth >= self.max_queue:
+            self.rejected += 1
+            raise QueueFullError()
+
+        self.queue_depth += 1
+        try:
+            await asyncio.wait_for(self._semaphore.acquire(), self.queue_timeout)
+        except asyncio.TimeoutError:
+            self.rejected += 1
+            raise QueueTimeoutError()
+        finally:
+            self.queue_depth -= 1
+        self.in_flight += 1
+
+    def release(self) -> None:
+        self.in_flight -= 1
+        self._semaphore.release()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "in_flight": self.in_flight,
+            "max_in_flight": self.max_in_flight,
+            "queue_depth": self.queue_depth,
+            "max_queue": self.max_queue,
+            "rejected": self.rejected,
+        }
+
+
+class CircuitBreaker:
+    """
+    Classic closed -> open -> half-open breaker.
+
+    Opens after `failure_threshold` consecutive upstream failures and rejects
+    calls for `reset_timeout` seconds. After that a single trial request is let
+    through; success closes the breaker, failure opens it again.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, failure_threshold: int, reset_timeout: float):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self.consecutive_failures = 0
+        self.opened_at = 0.0
+        self.short_circuited = 0
+        self._trial_in_progress = False
+
+    def allow_request(self) -> bool:
+        if self.state == self.OPEN:
+            if time.monotonic() - self.opened_at < self.reset_timeout:
+                self.short_circuited += 1
+                return False
+            self.state = self.HALF_OPEN
+
+        if self.state == self.HALF_OPEN:
+            if self._trial_in_progress:
+                self.short_circuited += 1
+                return False
+            self._trial_in_progress = True
+
+        return True
+
+    def cancel_trial(self) -> None:
+        """Give the half-open trial slot back when the request never reached upstream."""
+        self._trial_in_progress = False
+
+    def retry_after(self) -> int:
+        remaining = self.reset_timeout - (time.monotonic() - self.opened_at)
+        return max(1, int(remaining + 0.5))
+
+    def record_success(self) -> None:
+        self.state = self.CLOSED
+        self.consecutive_failures = 0
+        self._trial_in_progress = False
+
+    def record_failure(self) -> None:
+        self.consecutive_failures += 1
+        self._trial_in_progress = False
+        if self.state == self.HALF_OPEN or self.consecutive_failures >= self.failure_threshold:
+            self.state = self.OPEN
+            self.opened_at = time.monotonic()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "state": self.state,
+            "consecutive_failures": self.consecutive_failures,
+            "short_circuited": self.short_circuited,
+        }
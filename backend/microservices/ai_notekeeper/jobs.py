@@ -0,0 +1,303 @@
+"""Background jobs for the NoteKeeper pipeline.
+
+A recording is processed in a pool of worker processes instead of on the
+event loop: POST /jobs stores the upload, records a queued job and returns its
+ID at once. Jobs live in an SQLite table (`NOTEKEEPER_JOBS_DB`) shared with the
+workers, which record each pipeline stage (asr, translation, tasks) and the
+result there, so `GET /jobs/{id}` and the SSE stream only read the table and
+jobs survive a restart (unfinished jobs are queued again).
+
+At most `NOTEKEEPER_WORKERS` jobs run at once, and at most
+`NOTEKEEPER_ASR_CONCURRENCY` of them transcribe at the same time (a semaphore
+shared by the workers): ASR decoding keeps a core busy per job, the other
+stages mostly wait on models and the LLM.
+
+Cancelling a queued job removes it from the queue; a running job stops at the
+next stage boundary (a stage in progress is not interrupted) and its result
+is discarded.
+"""
+
+from __future__ import annotations
+
+import os
+import json
+import time
+import uuid
+import asyncio
+import logging
+import sqlite3
+import threading
+import multiprocessing
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+logger = logging.getLogger(__name__)
+
+NOTEKEEPER_JOBS_DB = os.getenv("NOTEKEEPER_JOBS_DB", "notekeeper_jobs.db")
+# Pipelines run in parallel; each worker process loads its own models, so memory is the limit
+NOTEKEEPER_WORKERS = int(os.getenv("NOTEKEEPER_WORKERS", "2"))
+# Jobs transcribing at the same time; ASR decoding uses about one core per job
+NOTEKEEPER_ASR_CONCURRENCY = int(os.getenv("NOTEKEEPER_ASR_CONCURRENCY", "0")) or os.cpu_count() or 1
+
+QUEUED, RUNNING, SUCCEEDED, FAILED, CANCELLED = "queued", "running", "succeeded", "failed", "cancelled"
+FINISHED = (SUCCEEDED, FAILED, CANCELLED)
+
+
+class JobCancelled(Exception):
+    """The job was cancelled while it was running."""
+
+
+class JobStore:
+    """SQLite table of jobs, opened by the API process and by every worker."""
+
+    def __init__(self, path: str = NOTEKEEPER_JOBS_DB):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn: sqlite3.Connection | None = None
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is None:
+            conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None, timeout=30)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(
+                """CREATE TABLE IF NOT EXISTS jobs (
+                    id TEXT PRIMARY KEY,
+                    status TEXT NOT NULL,
+                    stage TEXT,
+                    filename TEXT,
+                    audio_path TEXT NOT NULL,
+                    result TEXT,
+                    error TEXT,
+                    created_at REAL NOT NULL,
+                    started_at REAL,
+                    finished_at REAL,
+                    updated_at REAL NOT NULL
+                )"""
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status)")
+            self._conn = conn
+        return self._conn
+
+    def _execute(self, sql: str, params: tuple = ()) -> sqlite3.Cursor:
+        with self._lock:
+            return self._connect().execute(sql, params)
+
+    def create(self, audio_path: str, filename: str | None) -> str:
+        job_id = uuid.uuid4().hex
+        now = time.time()
+        self._execute(
+            "INSERT INTO jobs (id, status, filename, audio_path, created_at, updated_at) VALUES (?, ?, ?, ?, ?, ?)",
+            (job_id, QUEUED, filename, audio_path, now, now),
+        )
+        return job_id
+
+    def get(self, job_id: str) -> dict | None:
+        row = self._execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return _job_dict(row) if row is not None else None
+
+    def audio_path(self, job_id: str) -> str | None:
+        row = self._execute("SELECT audio_path FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return row[0] if row is not None else None
+
+    def unfinished(self) -> list[dict]:
+        rows = self._execute(
+            "SELECT * FROM jobs WHERE status IN (?, ?) ORDER BY created_at", (QUEUED, RUNNING)
+        ).fetchall()
+        return [_job_dict(row) for row in rows]
+
+    def start(self, job_id: str) -> bool:
+        """Mark a queued job running; False if it was cancelled meanwhile."""
+        now = time.time()
+        cursor = self._execute(
+            "UPDATE jobs SET status = ?, stage = NULL, started_at = ?, updated_at = ? WHERE id = ? AND status = ?",
+            (RUNNING, now, now, job_id, QUEUED),
+        )
+        return cursor.rowcount == 1
+
+    def set_stage(self, job_id: str, stage: str) -> None:
+        """Record the stage a running job enters; raises JobCancelled if it was cancelled."""
+        cursor = self._execute(
+            "UPDATE jobs SET stage = ?, updated_at = ? WHERE id = ? AND status = ?",
+            (stage, time.time(), job_id, RUNNING),
+        )
+        if cursor.rowcount == 0:
+            raise JobCancelled(job_id)
+
+    def finish(self, job_id: str, status: str, result: dict | None = None, error: str | None = None) -> bool:
+        """Record the outcome of an unfinished job; False if it had already finished (cancelled)."""
+        now = time.time()
+        cursor = self._execute(
+            "UPDATE jobs SET status = ?, result = ?, error = ?, finished_at = ?, updated_at = ? "
+            "WHERE id = ? AND status IN (?, ?)",
+            (status, json.dumps(result, ensure_ascii=False) if result is not None else None, error,
+             now, now, job_id, QUEUED, RUNNING),
+        )
+        return cursor.rowcount == 1
+
+    def close(self) -> None:
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+    def requeue(self, job_id: str) -> None:
+        self._execute(
+            "UPDATE jobs SET status = ?, stage = NULL, started_at = NULL, updated_at = ? WHERE id = ?",
+            (QUEUED, time.time(), job_id),
+        )
+
+
+def _job_dict(row: sqlite3.Row) -> dict:
+    job = dict(row)
+    job.pop("audio_path")
+    job["result"] = json.loads(job["result"]) if job["result"] else None
+    return job
+
+
+# Set in each worker process: the semaphore shared by all workers
+_asr_slot = None
+
+
+def _init_worker(asr_slot) -> None:
+    global _asr_slot
+    _asr_slot = asr_slot
+    logging.basicConfig(level=logging.INFO, format="[%(levelname)s] %(message)s")
+
+
+def _run_job(job_id: str, audio_path: str, db_path: str) -> None:
+    """Run the pipeline for one job in a worker process, recording progress in the job table."""
+    from notekeeper_core.pipeline import run_notekeeper_pipeline
+
+    store = JobStore(db_path)
+    try:
+        if not store.start(job_id):
+            return
+        logger.info(f"[JOBS] Job {job_id} started")
+        result = run_notekeeper_pipeline(audio_path, lambda stage: store.set_stage(job_id, stage), _asr_slot)
+        if store.finish(job_id, SUCCEEDED, result=result):
+            logger.info(f"[JOBS] Job {job_id} succeeded")
+    except JobCancelled:
+        logger.info(f"[JOBS] Job {job_id} stopped after cancellation")
+    except Exception as exc:
+        logger.error(f"[JOBS] Job {job_id} failed: {exc}", exc_info=True)
+        store.finish(job_id, FAILED, error=str(exc))
+    finally:
+        store.close()
+        if os.path.exists(audio_path):
+            os.remove(audio_path)
+
+
+class JobManager:
+    """Submits jobs to the worker pool and answers status queries from the job table."""
+
+    def __init__(
+        self,
+        db_path: str = NOTEKEEPER_JOBS_DB,
+        workers: int = NOTEKEEPER_WORKERS,
+        asr_concurrency: int = NOTEKEEPER_ASR_CONCURRENCY,
+    ):
+        self.db_path = db_path
+        self.workers = workers
+        self.asr_concurrency = asr_concurrency
+        self.store = JobStore(db_path)
+        self._pool: ProcessPoolExecutor | None = None
+        self._pool_lock = threading.Lock()
+        self._futures: dict[str, Future] = {}
+
+    def _get_pool(self) -> ProcessPoolExecutor:
+        if self._pool is None:
+            with self._pool_lock:
+                if self._pool is None:
+                    # spawn: forking a process that runs the event loop is unsafe
+                    context = multiprocessing.get_context("spawn")
+                    self._pool = ProcessPoolExecutor(
+                        max_workers=self.workers,
+                        mp_context=context,
+                        initializer=_init_worker,
+                        initargs=(context.BoundedSemaphore(self.asr_concurrency),),
+                    )
+                    logger.info(f"[JOBS] Worker pool started: {self.workers} worker(s), "
+                                f"{self.asr_concurrency} concurrent ASR job(s)")
+        return self._pool
+
+    def start(self) -> None:
+        """Queue again the jobs a previous run of the service left unfinished."""
+        for job in self.store.unfinished():
+            audio_path = self.store.audio_path(job["id"])
+            if os.path.exists(audio_path):
+                self.store.requeue(job["id"])
+                self._dispatch(job["id"], audio_path)
+                logger.info(f"[JOBS] Job {job['id']} queued again after a restart")
+            else:
+                self.store.finish(job["id"], FAILED, error="Interrupted by a restart and the audio is gone")
+
+    def submit(self, audio_path: str, filename: str | None = None) -> str:
+        """Record a queued job for the audio file and hand it to the pool; returns the job ID."""
+        job_id = self.store.create(audio_path, filename)
+        self._dispatch(job_id, audio_path)
+        logger.info(f"[JOBS] Job {job_id} queued ({filename})")
+        return job_id
+
+    def _dispatch(self, job_id: str, audio_path: str) -> None:
+        try:
+            future = self._get_pool().submit(_run_job, job_id, audio_path, self.db_path)
+        except BrokenProcessPool:
+            # A worker died (out of memory while loading a model): start a new pool
+            logger.error("[JOBS] Worker pool broken, restarting it")
+            self._pool = None
+            future = self._get_pool().submit(_run_job, job_id, audio_path, self.db_path)
+        self._futures[job_id] = future
+        future.add_done_callback(lambda done: self._done(job_id, done))
+
+    def _done(self, job_id: str, future: Future) -> None:
+        self._futures.pop(job_id, None)
+        if future.cancelled():
+            return
+        exc = future.exception()
+        if exc is not None:
+            # The worker process itself failed; _run_job records every other error
+            self.store.finish(job_id, FAILED, error=f"Worker failed: {exc!r}")
+            audio_path = self.store.audio_path(job_id)
+            if audio_path and os.path.exists(audio_path):
+                os.remove(audio_path)
+
+    def get(self, job_id: str) -> dict | None:
+        return self.store.get(job_id)
+
+    def cancel(self, job_id: str) -> dict | None:
+        """Cancel a queued or running job; finished jobs are returned unchanged."""
+        job = self.store.get(job_id)
+        if job is None or job["status"] in FINISHED:
+            return job
+        future = self._futures.get(job_id)
+        if future is not None and future.cancel():
+            # Never reaches a worker: remove the upload here
+            audio_path = self.store.audio_path(job_id)
+            if os.path.exists(audio_path):
+                os.remove(audio_path)
+        if self.store.finish(job_id, CANCELLED, error="Cancelled"):
+            logger.info(f"[JOBS] Job {job_id} cancelled")
+        return self.store.get(job_id)
+
+    async def wait(self, job_id: str) -> dict | None:
+        """Job once it has finished (without blocking the event loop)."""
+        future = self._futures.get(job_id)
+        if future is not None:
+            waiter = asyncio.wrap_future(future)
+            await asyncio.wait({waiter})
+            if not waiter.cancelled():
+                # Failures are recorded in the job table
+                waiter.exception()
+        return await asyncio.to_thread(self.store.get, job_id)
+
+    def shutdown(self) -> None:
+        """Stop the worker processes (called on application shutdown); queued jobs resume on restart."""
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+
+# Shared job manager used by the router
+job_manager = JobManager()
@@ -1,7 +1,20 @@
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
-from routes.ai_notekeeper import router as notekeeper_router
+from router import router as notekeeper_router
+from jobs import job_manager
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Queue again the jobs left unfinished by the previous run
+    job_manager.start()
+    yield
+    # Stop the worker processes; queued jobs resume on the next start
+    job_manager.shutdown()
+
 
-app = FastAPI(title="API Gateway")
+app = FastAPI(title="API Gateway", lifespan=lifespan)
 
 app.include_router(notekeeper_router)
 
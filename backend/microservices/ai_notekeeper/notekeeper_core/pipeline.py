@@ -3,7 +3,14 @@ import sys
 import importlib.util
 import io
 import contextlib
-from typing import Dict, Any, List
+from typing import Any, Callable, ContextManager, Dict, List, Optional
+
+# Stages reported to on_stage, in order
+STAGES = ("asr", "translation", "tasks")
+
+# Stage modules, loaded once per process: the ASR and translation models are
+# loaded when their module is imported
+_stages: Optional[Dict[str, Any]] = None
 
 
 def _load_module_from_path(name: str, path: str):
@@ -14,8 +21,10 @@ def _load_module_from_path(name: str, path: str):
     return module
 
 
-def run_notekeeper_pipeline(audio_path: str) -> Dict[str, Any]:
-    """Run ASR -> Translation -> Task extraction -> PDF generation."""
+def _load_stages() -> Dict[str, Any]:
+    global _stages
+    if _stages is not None:
+        return _stages
 
     # ✅ BASE PATH — FIXED
     base = os.path.abspath(
@@ -47,13 +56,36 @@ def run_notekeeper_pipeline(audio_path: str) -> Dict[str, Any]:
     if os.path.exists(extract_path):
         extract_mod = _load_module_from_path("nk_extract_tasks", extract_path)
 
+    _stages = {"base": base, "stt": stt, "translator": translator, "extract": extract_mod}
+    return _stages
+
+
+def run_notekeeper_pipeline(
+    audio_path: str,
+    on_stage: Optional[Callable[[str], None]] = None,
+    asr_slot: Optional[ContextManager] = None,
+) -> Dict[str, Any]:
+    """Run ASR -> Translation -> Task extraction -> PDF generation.
+
+    on_stage is called with each name of STAGES before that stage starts; it
+    may raise to stop the pipeline (job cancelled). asr_slot, if given, is held
+    during transcription (a semaphore capping concurrent ASR jobs).
+    """
+
+    stages = _load_stages()
+    base, stt, translator, extract_mod = stages["base"], stages["stt"], stages["translator"], stages["extract"]
+    report = on_stage or (lambda stage: None)
+
     # 1) ASR
-    try:
-        transcription = stt.transcribe_audio(audio_path)
-    except Exception as exc:
-        raise RuntimeError(f"ASR transcription failed: {exc}")
+    with asr_slot or contextlib.nullcontext():
+        report("asr")
+        try:
+            transcription = stt.transcribe_audio(audio_path)
+        except Exception as exc:
+            raise RuntimeError(f"ASR transcription failed: {exc}")
 
     # 2) Translation
+    report("translation")
     translated_text = ""
     if translator and hasattr(translator, "translate_tunisian_to_english"):
         try:
@@ -62,6 +94,7 @@ def run_notekeeper_pipeline(audio_path: str) -> Dict[str, Any]:
             translated_text = ""
 
     # 3) Task extraction + PDF generation
+    report("tasks")
     tasks: List[str] = []
     pdf_path = ""
 
@@ -1,15 +1,44 @@
-from fastapi import APIRouter, UploadFile, File
+from fastapi import APIRouter, HTTPException, UploadFile, File
+from fastapi.responses import StreamingResponse
+import asyncio
+import json
+import logging
 import os
 import shutil
 from uuid import uuid4
 
-from notekeeper_core.pipeline import run_notekeeper_pipeline
+from jobs import FINISHED, QUEUED, SUCCEEDED, job_manager
+from notekeeper_core.pipeline import STAGES
+
+logging.basicConfig(level=logging.INFO, format="[%(levelname)s] %(message)s")
+logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
 UPLOAD_DIR = "/tmp/audio"
 os.makedirs(UPLOAD_DIR, exist_ok=True)
 
+# Seconds between two reads of the job table by an SSE stream
+SSE_POLL_SECONDS = float(os.getenv("NOTEKEEPER_SSE_POLL_SECONDS", "0.5"))
+# Seconds between keep-alive comments on an idle SSE stream
+SSE_KEEPALIVE_SECONDS = 15
+
+
+def _save_upload(file: UploadFile) -> str:
+    filename = f"{uuid4()}_{file.filename}"
+    audio_path = os.path.join(UPLOAD_DIR, filename)
+
+    with open(audio_path, "wb") as buffer:
+        shutil.copyfileobj(file.file, buffer)
+    return audio_path
+
+
+async def _get_job(job_id: str) -> dict:
+    job = await asyncio.to_thread(job_manager.get, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Unknown job: {job_id}")
+    return job
+
 
 @router.get("/")
 def get_notekeeper():
@@ -17,13 +46,79 @@ def get_notekeeper():
     return {"message": "AI NoteKeeper Service"}
 
 
+@router.post("/jobs", status_code=202)
+async def create_job(file: UploadFile = File(...)):
+    """
+    Queue a recording for the NoteKeeper pipeline and return at once.
+
+    Returns:
+        {"job_id": ..., "status": "queued", "status_url": ..., "events_url": ...}
+    """
+
+    audio_path = await asyncio.to_thread(_save_upload, file)
+    job_id = await asyncio.to_thread(job_manager.submit, audio_path, file.filename)
+    return {
+        "job_id": job_id,
+        "status": QUEUED,
+        "stages": list(STAGES),
+        "status_url": f"/jobs/{job_id}",
+        "events_url": f"/jobs/{job_id}/events",
+    }
+
+
+@router.get("/jobs/{job_id}")
+async def get_job(job_id: str):
+    """
+    Status of a job: queued, running (with the current stage), succeeded
+    (with the result), failed (with the error) or cancelled.
+    """
+    return await _get_job(job_id)
+
+
+@router.get("/jobs/{job_id}/events")
+async def job_events(job_id: str):
+    """
+    Server-sent events for a job: one `job` event with the job each time its
+    status or stage changes, the last one when it has finished.
+    """
+
+    job = await _get_job(job_id)
+
+    async def events():
+        current = job
+        sent = None
+        idle = 0.0
+        while True:
+            state = (current["status"], current["stage"])
+            if state != sent:
+                yield f"event: job\ndata: {json.dumps(current, ensure_ascii=False)}\n\n"
+                sent, idle = state, 0.0
+            elif idle >= SSE_KEEPALIVE_SECONDS:
+                yield ": keep-alive\n\n"
+                idle = 0.0
+            if current["status"] in FINISHED:
+                return
+            await asyncio.sleep(SSE_POLL_SECONDS)
+            idle += SSE_POLL_SECONDS
+            current = await asyncio.to_thread(job_manager.get, job_id) or current
+
+    return StreamingResponse(events(), media_type="text/event-stream", headers={"Cache-Control": "no-cache"})
+
+
+@router.delete("/jobs/{job_id}")
+async def cancel_job(job_id: str):
+    """Cancel a queued or running job (a running job stops after its current stage)."""
+    await _get_job(job_id)
+    return await asyncio.to_thread(job_manager.cancel, job_id)
+
+
 @router.post("/run_notekeeper")
 async def run_notekeeper(file: UploadFile = File(...)):
-    filename = f"{uuid4()}_{file.filename}"
-    audio_path = os.path.join(UPLOAD_DIR, filename)
-
-    with open(audio_path, "wb") as buffer:
-        shutil.copyfileobj(file.file, buffer)
+    """Run the pipeline and wait for its result (a job awaited without blocking the event loop)."""
+    audio_path = await asyncio.to_thread(_save_upload, file)
+    job_id = await asyncio.to_thread(job_manager.submit, audio_path, file.filename)
 
-    result = run_notekeeper_pipeline(audio_path)
-    return result
+    job = await job_manager.wait(job_id)
+    if job["status"] != SUCCEEDED:
+        raise HTTPException(status_code=500, detail=job["error"] or f"Job {job['status']}")
+    return job["result"]
@@ -2,23 +2,34 @@
 
 This module exposes a reusable `run_ocr` function that calls the Hugging Face
 Router API with vision-capable models. Image bytes are encoded to base64 and
-sent via OpenAI-compatible client.
+sent via OpenAI-compatible client. `run_ocr_async` is the non-blocking
+variant used by the routes. Both reuse one lazily created client per process
+(keep-alive, HTTP/2) and retry rate-limited and failed calls with backoff.
 """
 
 from __future__ import annotations
 
+import asyncio
 import base64
 import io
 import os
+import time
+import random
 import logging
+import threading
 
-from openai import OpenAI
+import httpx
+from openai import APIConnectionError, APIStatusError, AsyncOpenAI, OpenAI
 from PIL import Image, UnidentifiedImageError
 from dotenv import load_dotenv
 
 
 load_dotenv()
 
+# Imported after load_dotenv so its settings can come from .env
+from image_preprocess import OCR_PREPROCESS, preprocess_image, preprocess_image_async  # noqa: E402
+from ocr_cache import ocr_cache  # noqa: E402
+
 logging.basicConfig(level=logging.INFO, format="[%(levelname)s] %(message)s")
 
 
@@ -30,6 +41,17 @@ class ModelLoadError(RuntimeError):
 HF_TOKEN = os.getenv("HF_TOKEN")
 OCR_MODEL_ID = os.getenv("OCR_MODEL_ID", "Qwen/Qwen2.5-VL-7B-Instruct:hyperbolic")
 OCR_MAX_TOKENS = int(os.getenv("OCR_MAX_TOKENS", "512"))
+# OpenAI-compatible endpoint serving the vision model (HF Router by default)
+OCR_API_BASE_URL = os.getenv("OCR_API_BASE_URL", "https://router.huggingface.co/v1")
+# Shared connection pool to the OCR endpoint
+OCR_HTTP2 = os.getenv("OCR_HTTP2", "true").lower() == "true"
+OCR_HTTP_MAX_CONNECTIONS = int(os.getenv("OCR_HTTP_MAX_CONNECTIONS", "20"))
+OCR_HTTP_KEEPALIVE_EXPIRY = float(os.getenv("OCR_HTTP_KEEPALIVE_EXPIRY", "60"))
+OCR_TIMEOUT_SECONDS = float(os.getenv("OCR_TIMEOUT_SECONDS", "120"))
+# Retries after a 429, 5xx or connection error, with jittered exponential backoff
+OCR_MAX_RETRIES = int(os.getenv("OCR_MAX_RETRIES", "3"))
+OCR_RETRY_BASE_SECONDS = float(os.getenv("OCR_RETRY_BASE_SECONDS", "1"))
+OCR_RETRY_MAX_SECONDS = float(os.getenv("OCR_RETRY_MAX_SECONDS", "30"))
 
 # Default extraction instruction used for all pages; can be overridden per call.
 BASE_PROMPT = (
@@ -46,24 +68,114 @@ BASE_PROMPT = (
 )
 
 
+_client: OpenAI | None = None
+# Pooled connections belong to the loop that opened them: one async client per event loop
+_async_clients: dict[asyncio.AbstractEventLoop, AsyncOpenAI] = {}
+_client_lock = threading.Lock()
+
+
+def _http_limits() -> httpx.Limits:
+    return httpx.Limits(
+        max_connections=OCR_HTTP_MAX_CONNECTIONS,
+        max_keepalive_connections=OCR_HTTP_MAX_CONNECTIONS,
+        keepalive_expiry=OCR_HTTP_KEEPALIVE_EXPIRY,
+    )
+
+
 def _get_client() -> OpenAI:
-    """Initialize OpenAI client for HF Router API."""
+    """Shared OpenAI client for HF Router API, created on first use.
+
+    One keep-alive (HTTP/2 when the server supports it) connection pool is
+    reused by every call instead of a new HTTPS connection per page.
+    """
+    global _client
     if not HF_TOKEN:
         raise ModelLoadError("HF_TOKEN environment variable is not set")
 
-    return OpenAI(
-        base_url="https://router.huggingface.co/v1",
-        api_key=HF_TOKEN,
-    )
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = OpenAI(
+                    base_url=OCR_API_BASE_URL,
+                    api_key=HF_TOKEN,
+                    # run_ocr and run_ocr_async retry themselves, with jittered backoff
+                    max_retries=0,
+                    http_client=httpx.Client(
+                        http2=OCR_HTTP2, limits=_http_limits(), timeout=OCR_TIMEOUT_SECONDS
+                    ),
+                )
+    return _client
 
 
-def run_ocr(image_bytes: bytes, prompt_override: str | None = None) -> str:
-    """Run OCR on the provided image bytes and return extracted text via HF API."""
+def _get_async_client() -> AsyncOpenAI:
+    """Shared AsyncOpenAI client for the running event loop, created on first use."""
+    if not HF_TOKEN:
+        raise ModelLoadError("HF_TOKEN environment variable is not set")
 
-    if not image_bytes:
-        raise ValueError("Empty image payload")
+    loop = asyncio.get_running_loop()
+    client = _async_clients.get(loop)
+    if client is None:
+        with _client_lock:
+            # A finished loop can no longer run its client's close(): drop the
+            # client so its sockets are released with it
+            for closed in [other for other in _async_clients if other.is_closed()]:
+                del _async_clients[closed]
+            client = _async_clients[loop] = AsyncOpenAI(
+                base_url=OCR_API_BASE_URL,
+                api_key=HF_TOKEN,
+                max_retries=0,
+                http_client=httpx.AsyncClient(
+                    http2=OCR_HTTP2, limits=_http_limits(), timeout=OCR_TIMEOUT_SECONDS
+                ),
+            )
+    return client
 
-    logging.info(f"[OCR] Processing {len(image_bytes)} bytes of image data")
+
+async def close_clients() -> None:
+    """Close the shared clients and their pooled connections (application shutdown)."""
+    global _client
+    current = asyncio.get_running_loop()
+    with _client_lock:
+        clients = list(_async_clients.items())
+        _async_clients.clear()
+    for loop, client in clients:
+        if loop is current:
+            await client.close()
+        elif loop.is_running():
+            # Connections are closed on the loop that opened them
+            await asyncio.wrap_future(asyncio.run_coroutine_threadsafe(client.close(), loop))
+    if _client is not None:
+        _client.close()
+    _client = None
+
+
+def _retry_delay(exc: Exception, attempt: int) -> float | None:
+    """Seconds to wait before retrying after exc, or None if it should not be retried."""
+    if attempt >= OCR_MAX_RETRIES:
+        return None
+    if isinstance(exc, APIStatusError):
+        if exc.status_code != 429 and exc.status_code < 500:
+            return None
+    elif not isinstance(exc, APIConnectionError):  # includes timeouts
+        return None
+
+    # Full jitter: spreads retries from concurrent pages instead of bursting together
+    delay = random.uniform(0, min(OCR_RETRY_MAX_SECONDS, OCR_RETRY_BASE_SECONDS * 2 ** attempt))
+    retry_after = exc.response.headers.get("retry-after") if isinstance(exc, APIStatusError) else None
+    if retry_after:
+        try:
+            delay = max(delay, min(float(retry_after), OCR_RETRY_MAX_SECONDS))
+        except ValueError:
+            pass
+    return delay
+
+
+def _prepare_image(image_bytes: bytes, preprocess: bool, mime_type: str | None) -> tuple[bytes, str]:
+    """Preprocessed (or validated) image bytes and their MIME type."""
+    if preprocess:
+        return preprocess_image(image_bytes)
+    if mime_type is not None:
+        return image_bytes, mime_type
 
     # Validate image
     try:
@@ -73,41 +185,122 @@ def run_ocr(image_bytes: bytes, prompt_override: str | None = None) -> str:
     except UnidentifiedImageError as exc:
         logging.error(f"[OCR] Invalid image format: {exc}")
         raise ValueError("Uploaded file is not a valid image") from exc
+    return image_bytes, Image.MIME.get(image.format, "image/jpeg")
+
 
-    # Encode image to base64
+def _completion_request(image_bytes: bytes, mime_type: str, prompt: str) -> dict:
+    """Chat completion arguments: the prompt and the image as a base64 data URL."""
     base64_image = base64.b64encode(image_bytes).decode("utf-8")
-    data_url = f"data:image/jpeg;base64,{base64_image[:50]}..."  # Log truncated for readability
-    logging.info(f"[OCR] Image encoded to base64 ({len(base64_image)} chars)")
+    logging.info(f"[OCR] Image encoded to base64 ({len(base64_image)} chars, {mime_type})")
+    return {
+        "model": OCR_MODEL_ID,
+        "messages": [
+            {
+                "role": "user",
+                "content": [
+                    {
+                        "type": "text",
+                        "text": prompt,
+                    },
+                    {
+                        "type": "image_url",
+                        "image_url": {"url": f"data:{mime_type};base64,{base64_image}"},
+                    },
+                ],
+            }
+        ],
+        "max_tokens": OCR_MAX_TOKENS,
+    }
+
+
+def run_ocr(
+    image_bytes: bytes,
+    prompt_override: str | None = None,
+    preprocess: bool = OCR_PREPROCESS,
+    mime_type: str | None = None,
+) -> str:
+    """Run OCR on the provided image bytes and return extracted text via HF API.
 
+    With `preprocess`, the image is rotated, cropped, shrunk and re-encoded
+    first (see image_preprocess). Callers that already preprocessed it pass
+    `preprocess=False` and the resulting `mime_type`.
+    """
+
+    if not image_bytes:
+        raise ValueError("Empty image payload")
+
+    logging.info(f"[OCR] Processing {len(image_bytes)} bytes of image data")
+    image_bytes, mime_type = _prepare_image(image_bytes, preprocess, mime_type)
+
+    # Same image, model and prompt as an earlier call: reuse its text
+    prompt = prompt_override or BASE_PROMPT
+    cached, cache_key = ocr_cache.get(image_bytes, OCR_MODEL_ID, prompt)
+    if cached is not None:
+        return cached
+
+    request = _completion_request(image_bytes, mime_type, prompt)
     client = _get_client()
     logging.info(f"[OCR] Calling HF API with model: {OCR_MODEL_ID}")
 
-    try:
-        completion = client.chat.completions.create(
-            model=OCR_MODEL_ID,
-            messages=[
-                {
-                    "role": "user",
-                    "content": [
-                        {
-                            "type": "text",
-                            "text": prompt_override or BASE_PROMPT,
-                        },
-                        {
-                            "type": "image_url",
-                            "image_url": {"url": f"data:image/jpeg;base64,{base64_image}"},
-                        },
-                    ],
-                }
-            ],
-            max_tokens=OCR_MAX_TOKENS,
-        )
-        result = completion.choices[0].message.content or ""
-        logging.info(f"[OCR] Success! Extracted {len(result)} characters")
-        return result
-    except Exception as exc:
-        logging.error(f"[OCR] HF API call failed: {exc}", exc_info=True)
-        raise ModelLoadError(f"HF API call failed: {exc}") from exc
+    for attempt in range(OCR_MAX_RETRIES + 1):
+        try:
+            completion = client.chat.completions.create(**request)
+            break
+        except Exception as exc:
+            delay = _retry_delay(exc, attempt)
+            if delay is None:
+                logging.error(f"[OCR] HF API call failed: {exc}", exc_info=True)
+                raise ModelLoadError(f"HF API call failed: {exc}") from exc
+            logging.warning(f"[OCR] HF API call failed ({exc}), retry {attempt + 1} in {delay:.1f}s")
+            time.sleep(delay)
+
+    result = completion.choices[0].message.content or ""
+    logging.info(f"[OCR] Success! Extracted {len(result)} characters")
+    ocr_cache.put(cache_key, image_bytes, OCR_MODEL_ID, prompt, result)
+    return result
+
+
+async def run_ocr_async(image_bytes: bytes, prompt_override: str | None = None) -> str:
+    """Async `run_ocr` for the FastAPI routes.
+
+    Preprocessing runs in the worker process pool, cache access in a worker
+    thread, and the API call on the shared AsyncOpenAI client, so the event
+    loop keeps serving other requests.
+    """
+    if not image_bytes:
+        raise ValueError("Empty image payload")
+
+    logging.info(f"[OCR] Processing {len(image_bytes)} bytes of image data")
+    if OCR_PREPROCESS:
+        image_bytes, mime_type = await preprocess_image_async(image_bytes)
+    else:
+        image_bytes, mime_type = _prepare_image(image_bytes, False, None)
+
+    prompt = prompt_override or BASE_PROMPT
+    cached, cache_key = await asyncio.to_thread(ocr_cache.get, image_bytes, OCR_MODEL_ID, prompt)
+    if cached is not None:
+        return cached
+
+    request = _completion_request(image_bytes, mime_type, prompt)
+    client = _get_async_client()
+    logging.info(f"[OCR] Calling HF API with model: {OCR_MODEL_ID}")
+
+    for attempt in range(OCR_MAX_RETRIES + 1):
+        try:
+            completion = await client.chat.completions.create(**request)
+            break
+        except Exception as exc:
+            delay = _retry_delay(exc, attempt)
+            if delay is None:
+                logging.error(f"[OCR] HF API call failed: {exc}", exc_info=True)
+                raise ModelLoadError(f"HF API call failed: {exc}") from exc
+            logging.warning(f"[OCR] HF API call failed ({exc}), retry {attempt + 1} in {delay:.1f}s")
+            await asyncio.sleep(delay)
+
+    result = completion.choices[0].message.content or ""
+    logging.info(f"[OCR] Success! Extracted {len(result)} characters")
+    await asyncio.to_thread(ocr_cache.put, cache_key, image_bytes, OCR_MODEL_ID, prompt, result)
+    return result
 
 
 if __name__ == "__main__":
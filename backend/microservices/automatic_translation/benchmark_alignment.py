@@ -0,0 +1,194 @@
+"""Benchmark for Arabic/French phrase alignment.
+
+Compares the previous pairing (zip the two phrase lists, grouping the longer
+side evenly when the counts differ) with the embedding-based monotonic
+alignment of qdrant/pairs.py on contracts with a known gold alignment.
+
+The gold fixture is the contract of qdrant/documents.json cut into
+sentence-level units by hand. Long contracts repeat it N times. As in real
+translations, the phrase counts differ between the two sides:
+- Arabic units containing "،" split into more phrases.
+- One clause ("أجره وترسيمه...") has no French translation.
+- Some French units are joined to the next one with a comma (`--merge-rate`).
+
+An aligned pair is correct when its Arabic and French phrases cover exactly
+the same gold units. Precision is over the pairs produced, and recall is over
+the units that have a translation.
+
+Needs the MiniLM embedding model (TM_EMBEDDING_MODEL).
+
+Usage:
+    python benchmark_alignment.py [--copies 1 4 16] [--merge-rate 0.25]
+"""
+
+import os
+import sys
+import time
+import random
+import argparse
+
+# (Arabic, French) units of the reference contract; "" = not translated
+GOLD_UNITS = [
+    ("الأستاذ شمس الدين برّوطة", "Maître Chamseddine BARROUTA"),
+    ("عدل إشهاد", "Notaire"),
+    ("29 مكرر نهج المطار، دار فضال سكرة-أريانة", "29 bis, rue de l’Aéroport, Dar Fadhal, La Soukra, Ariana"),
+    ("الهاتف/الفاكس: 20454324/71868113", "Téléphone / Fax : 20 454 324/ 71 868 113"),
+    ("عقد زواج", "ACTE DE MARIAGE"),
+    ("الحمد لله وحده، تزوّج على بركة الله تعالى وحسن عونه وتوفيقه الشّاب رأفت كسيكسي",
+     "Louange à Dieu, s’est marié avec la bénédiction et l’aide de Dieu : le jeune Raafet KSIKSI"),
+    ("والده صالح بن سعيد بن محمد كسيكسي ووالدته راضيه بنت بلقاسم كسيكسي",
+     "de son père Salah fils de Said fils de Mohamed KSIKSI, de sa mère Radia fille de Belgasem KSIKSI"),
+    ("مولود بمدنين في 23 مارس 1986 تونسي أعزب حسب مضمون من رسم ولادته عدد 473 من بلدية مدنين في 05 سبتمبر 2025",
+     "né à Médenine, le 23 mars 1986, tunisien, célibataire selon un extrait de son acte de naissance n° 473, "
+     "émis par la commune de Médenine, le 05 septembre 2025"),
+    ("مجهز حراري وصحي بشركة وقاطن ب9 نهج 6805 العمران الأعلى تونس",
+     "installeur thermique et sanitaire dans une société, demeurant à 9, rue 6805, El Omrane Supérieur, Tunis"),
+    ("حسب بطاقة تعريفه عدد 09103707 المؤرّخة في 24 أكتوبر 2019",
+     "selon sa carte d’identité nationale n° 09103707, délivrée le 24 octobre 2019"),
+    ("بالآنسة فريال الزرلي والدها لطفي بن علي بن أحمد الزرلي ووالدتها ليلى بنت محمد السيد اليعقوبي",
+     "avec Mademoiselle Feryel ZRELLI, de son père Lotfi fils de Ali fils de Ahmed ZRELLI, "
+     "de sa mère Leila fille de Mohamed Saied YACCOUBI"),
+    ("مولودة بقابس في 06 جويلية 1995 تونسية عزباء حسب مضمون من رسم ولادتها عدد 1233 من بلدية أريانة "
+     "دائرة أريانة العليا في 05 سبتمبر 2025",
+     "née à Gabès, le 06 juillet 1995, tunisienne, célibataire selon un extrait de son acte de naissance n° 1233, "
+     "émis par la commune de l’Ariana, arrondissement Ariana-Supérieur, le 05 septembre 2025"),
+    ("متربصة بالتكوين مهني خاصّ وقاطنة بـ11 زنقة ابن خلدون عدد01 أريانة",
+     "stagiaire en formation professionnelle privée, demeurant à 11, ruelle Ibn Khaldoun n° 01, Ariana"),
+    ("حسب بطاقة تعريفها عدد 13458544 المؤرّخة في 22 فيفري 2024",
+     "selon sa carte d’identité nationale n° 13458544, délivrée le 22 février 2024"),
+    ("وسمّى لها مهرا قدره خمسة دنانير فضية قبضته منه معاينة بعد رضائها به",
+     "moyennant une dot s’élevant à cinq dinars en argent que l’épouse déclare avoir perçue et acceptée"),
+    ("توليا عقد زواجهما بنفسيهما بعد تراضيهما عليه",
+     "Ainsi, les deux époux ont exprimé leur consentement mutuel au mariage"),
+    ("مُدليا كلّ منهما بشهادة طبية من الدكتور سامي العوّادي المسجل تحت عدد 7067 بتاريخ 01 و08 سبتمبر 2025 "
+     "تفيدان فحصهما قصد الزواج",
+     "et ont présenté deux certificats médicaux prénuptiaux délivrés en date du 1er et du 08 septembre 2025 "
+     "par Dr. Sami AOUADI, inscrit sous le n° 7067"),
+    ("وبعد تذكيرهما بأحكام الفصليْن الأوّل والثاني من القانون عدد 94 لسنة 1998 المؤرّخ في 09 نوفمبر 1998 "
+     "والمتعلّق بنظام الاشتراك في الأملاك بين الزّوجيْن",
+     "Ayant rappelé aux deux époux les dispositions des articles 1 et 2 de la loi n° 98-94 du 09 novembre 1998 "
+     "relative au régime des biens matrimoniaux"),
+    ("وسؤالهما عن نظام الملكيّة الواقع اختيارهما عليه صرّحا باختيار نظام الفصل بين الأملاك طبق أحكام مجلّة الأحوال الشخصيّة",
+     "ceux-ci ont opté pour le régime de la séparation des biens conformément aux dispositions du Code du Statut Personnel"),
+    ("وحضر شاهدا العقد وهُما السيد صالح بن سعيد بن محمد كسيكسي مولود بمدنين في 26 فيفري 1958 سائق وقاطن بنهج حربوب "
+     "مدنين تونسي حسب بطاقة تعريفه عدد 03430735 المؤرّخة في 02 أفريل 2001",
+     "Les deux témoins du mariage sont : Monsieur Salah fils de Said fils de Mohamed KSIKSI, né à Médenine, "
+     "le 26 février 1958, chauffeur, demeurant à rue Harboub, Médenine, tunisien selon sa carte d’identité "
+     "nationale n° 03430735, délivrée le 02 avril 2001"),
+    ("والسيد لطفي بن علي بن أحمد الزرلي مولود بشط سيدي عبد السلام قابس في 20 جويلية 1960 محام وقاطن بإقامة الكوليزي "
+     "عمارة أ شقة2 أريانة تونسي حسب بطاقة تعريفه عدد 03346690 المؤرخة في 09 جويلية 2020",
+     "et Monsieur Lotfi fils de Ali fils de Ahmed ZRELLI, né à Chott Sidi Abdel salam, Gabès, le 20 juillet 1960, "
+     "avocat, demeurant à résidence Le Colisée, Imm. A, App. 2, Ariana, tunisien selon sa carte d’identité "
+     "nationale n° 03346690, délivrée le 09 juillet 2020"),
+    ("وشهدا بخلو الزّوجيْن من الموانع الشرعيّة والقانونية للزَّواج",
+     "lesquels ont certifié que les deux époux sont exempts des empêchements légitimes et légaux au mariage"),
+    ("شهد عليهم حال الجواز والمعرفة بما ذكر العدلان شمس الدين بروطة وسعيدة البروطة حين الحلول بفضاء الأفراح "
+     "\"زيتونة\" طريق شطرانة1 سكرة",
+     "Le présent acte a été dressé par les notaires Chamseddine BARROUTA et Saïda BARROUTA à l’espace des fêtes "
+     "« Zitouna », route de Chotrana 1, La Soukra"),
+    ("في الساعة الثامنة مساء يوم الجمعة 27 ربيع الأول 1447 هجري الموافق للتاسع عشر من سبتمبر خمسة وعشرين وألفين ميلادي "
+     "(2025/09/19)",
+     "à vingt heures, le vendredi 27 rabi al-awwal 1447 de l’hégire, correspondant au 19 septembre 2025 (19/09/2025) "
+     "du calendrier grégorien"),
+    ("ورسَم بالصّحيفة عدد 28 أمام عدد 32/57 من دفتر مسودّات أوّله وبه إمضاء كلّ من الزّوجيْن والشّاهديْن بعد تلاوة "
+     "ما حرّر عليهم علنا",
+     "Le présent acte a été consigné dans le registre brouillard du premier notaire sous le n° 57/32, folio n° 28, "
+     "où les époux et témoins ont signé après lecture solennelle de ce que nous avons rédigé"),
+    ("ثمّ أخرج مطابقا لأصله المرسّم بدفتر أعماله",
+     "Le présent acte a été extrait conformément à l’original inscrit dans le registre-minutes"),
+    ("أجره وترسيمه دنانير ومُعفى من التسجيل", ""),
+    ("والله وليّ التوفيق والهادي إلى سواء السّبيل", "et que Dieu accorde la réussite"),
+]
+
+
+def build_contract(copies: int, merge_rate: float, rng: random.Random):
+    """Arabic and French phrase lists, each phrase with the set of gold units it covers."""
+    from qdrant.pairs import split_arabic_phrases, split_french_phrases
+
+    ar, fr = [], []
+    units = [unit for _ in range(copies) for unit in GOLD_UNITS]
+    merge_next = False
+    for number, (arabic, french) in enumerate(units):
+        ar.extend((phrase, {number}) for phrase in split_arabic_phrases(arabic))
+        if not french:
+            continue
+        phrases = [(phrase, {number}) for phrase in split_french_phrases(french)]
+        if merge_next and fr:
+            # Previous unit ended with a comma instead of a full stop: one French phrase spans both
+            first, first_units = phrases.pop(0)
+            last, last_units = fr.pop()
+            phrases.insert(0, (f"{last}, {first}", last_units | first_units))
+        fr.extend(phrases)
+        merge_next = rng.random() < merge_rate
+    translated = sum(1 for _, french in units if french)
+    return ar, fr, translated
+
+
+def zip_align(a: int, f: int) -> list:
+    """The previous align_phrases, on indexes."""
+    if a == 0 or f == 0:
+        return []
+    if a == f:
+        return [([i], [i]) for i in range(a)]
+    import math
+    pairs = []
+    if a > f:
+        group_size = math.ceil(a / f)
+        for i in range(f):
+            pairs.append((list(range(i * group_size, min((i + 1) * group_size, a))), [i]))
+    else:
+        group_size = math.ceil(f / a)
+        for i in range(a):
+            pairs.append(([i], list(range(i * group_size, min((i + 1) * group_size, f)))))
+    return [(ar_idx, fr_idx) for ar_idx, fr_idx in pairs if ar_idx and fr_idx]
+
+
+def score(pairs: list, ar: list, fr: list, translated: int):
+    correct, covered = 0, set()
+    for ar_idx, fr_idx in pairs:
+        ar_units = set().union(*(ar[i][1] for i in ar_idx))
+        fr_units = set().union(*(fr[j][1] for j in fr_idx))
+        if ar_units == fr_units:
+            correct += 1
+            covered |= ar_units
+    return correct / len(pairs) if pairs else 0.0, len(covered) / translated
+
+
+def main(args):
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    from sentence_transformers import SentenceTransformer
+    from llm.translation_memory import TM_EMBEDDING_MODEL
+    from qdrant.pairs import ALIGN_MIN_SCORE, align_indices
+
+    model = SentenceTransformer(TM_EMBEDDING_MODEL)
+    rng = random.Random(7)
+    print(f"{'units':>6}{'phrases ar/fr':>15}{'method':>8}{'pairs':>7}{'precision':>11}{'recall':>8}"
+          f"{'embed':>9}{'align':>10}")
+    for copies in args.copies:
+        ar, fr, translated = build_contract(copies, args.merge_rate, rng)
+        units = len(GOLD_UNITS) * copies
+
+        started = time.perf_counter()
+        pairs = zip_align(len(ar), len(fr))
+        zip_time = time.perf_counter() - started
+        precision, recall = score(pairs, ar, fr, translated)
+        print(f"{units:>6}{f'{len(ar)}/{len(fr)}':>15}{'zip':>8}{len(pairs):>7}{precision:>10.1%}{recall:>8.1%}"
+              f"{'-':>9}{zip_time * 1000:>8.2f}ms")
+
+        started = time.perf_counter()
+        vectors = model.encode([p for p, _ in ar] + [p for p, _ in fr], batch_size=64, normalize_embeddings=True)
+        embed_time = time.perf_counter() - started
+        started = time.perf_counter()
+        aligned = align_indices(vectors[:len(ar)], vectors[len(ar):], [len(p) for p, _ in ar], [len(p) for p, _ in fr])
+        align_time = time.perf_counter() - started
+        pairs = [(ar_idx, fr_idx) for ar_idx, fr_idx, similarity in aligned if similarity >= ALIGN_MIN_SCORE]
+        precision, recall = score(pairs, ar, fr, translated)
+        print(f"{'':>6}{'':>15}{'dp':>8}{len(pairs):>7}{precision:>10.1%}{recall:>8.1%}"
+              f"{embed_time:>8.2f}s{align_time * 1000:>8.2f}ms")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--copies", type=int, nargs="+", default=[1, 4, 16], help="contract length in copies of the fixture")
+    parser.add_argument("--merge-rate", type=float, default=0.25, help="share of French units joined to the next one")
+    main(parser.parse_args())
@@ -0,0 +1,113 @@
+"""Benchmark for batch OCR against a local stub vision endpoint.
+
+Builds a multi-page PDF, splits it with `split_pages` and OCRs it with
+`ocr_pages`, one page at a time and with the bounded concurrent pool, for
+growing page counts. The stub answers OpenAI-style chat completions after a
+fixed delay, so the wall-clock time shows how the batch scales with pages.
+
+Usage:
+    python benchmark_ocr_batch.py [--pages 1 2 4 8 16] [--concurrency 4] [--latency 0.5]
+"""
+
+import io
+import os
+import sys
+import time
+import asyncio
+import argparse
+import threading
+
+import uvicorn
+from fastapi import FastAPI, Request
+from PIL import Image, ImageDraw
+
+STUB_PORT = 8961
+STUB_URL = f"http://127.0.0.1:{STUB_PORT}/v1"
+
+
+def build_stub_app(latency: float):
+    stub = FastAPI()
+    calls = {"count": 0}
+
+    @stub.post("/v1/chat/completions")
+    async def chat_completions(request: Request):
+        body = await request.json()
+        calls["count"] += 1
+        await asyncio.sleep(latency)
+        image_chars = len(body["messages"][0]["content"][1]["image_url"]["url"])
+        return {
+            "id": f"stub-{calls['count']}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": body["model"],
+            "choices": [{
+                "index": 0,
+                "finish_reason": "stop",
+                "message": {"role": "assistant", "content": f"page text ({image_chars} chars of image)"},
+            }],
+        }
+
+    return stub
+
+
+def run_stub(app) -> uvicorn.Server:
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=STUB_PORT, log_level="warning"))
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.05)
+    return server
+
+
+def make_pdf(pages: int) -> bytes:
+    """A PDF whose pages are numbered A4-ish scans."""
+    images = []
+    for number in range(1, pages + 1):
+        image = Image.new("RGB", (1240, 1754), "white")
+        ImageDraw.Draw(image).text((100, 100), f"page {number}", fill="black")
+        images.append(image)
+    buffer = io.BytesIO()
+    images[0].save(buffer, format="PDF", save_all=True, append_images=images[1:], resolution=150)
+    return buffer.getvalue()
+
+
+async def run_batch(pages, concurrency: int):
+    from ocr_batch import ocr_pages
+
+    started = time.perf_counter()
+    results = [result async for result in ocr_pages(pages, concurrency=concurrency)]
+    elapsed = time.perf_counter() - started
+    assert [result.number for result in results] == list(range(1, len(pages) + 1)), "pages out of order"
+    assert not any(result.error for result in results), results[0].error
+    return elapsed
+
+
+def main(args):
+    # Point the OCR client at the stub before OCR_model reads the environment
+    os.environ.update({"OCR_API_BASE_URL": STUB_URL, "HF_TOKEN": "benchmark-token", "OCR_CACHE_ENABLED": "false"})
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    import logging
+    logging.disable(logging.INFO)
+    from ocr_batch import split_pages
+
+    server = run_stub(build_stub_app(args.latency))
+    try:
+        print(f"stub vision endpoint: {args.latency:.2f} s per page, pool of {args.concurrency}\n")
+        print(f"{'pages':>6}{'split':>10}{'sequential':>13}{'concurrent':>13}{'speedup':>10}")
+        for count in args.pages:
+            started = time.perf_counter()
+            pages = split_pages([("bundle.pdf", make_pdf(count))])
+            split = time.perf_counter() - started
+
+            sequential = asyncio.run(run_batch(pages, 1))
+            concurrent = asyncio.run(run_batch(pages, args.concurrency))
+            print(f"{count:>6}{split:>9.2f}s{sequential:>12.2f}s{concurrent:>12.2f}s{sequential / concurrent:>9.1f}x")
+    finally:
+        server.should_exit = True
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pages", type=int, nargs="+", default=[1, 2, 4, 8, 16])
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--latency", type=float, default=0.5)
+    main(parser.parse_args())
@@ -0,0 +1,170 @@
+"""Benchmark for the shared OCR API clients.
+
+Compares OCR throughput with a new OpenAI client per call (the previous
+behaviour: a fresh HTTPS connection and TLS handshake for every page) against
+the shared keep-alive clients of OCR_model, sequentially and concurrently:
+`run_ocr` on the shared sync client from worker threads, and `run_ocr_async`
+on the shared AsyncOpenAI client.
+
+The stub vision endpoint serves HTTPS with a self-signed certificate, so the
+per-call handshake costs what it does against router.huggingface.co, and
+answers a share of requests with 429 (--rate-limited) to exercise the retries.
+The stub only speaks HTTP/1.1, so the clients fall back from HTTP/2 here.
+Preprocessing and the result cache are turned off so every call reaches the API.
+
+Usage:
+    python benchmark_ocr_client.py [--pages 200] [--concurrency 8] [--latency 0.02] [--rate-limited 0.05]
+"""
+
+import os
+import sys
+import time
+import random
+import asyncio
+import argparse
+import tempfile
+import threading
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
+
+STUB_PORT = 8963
+STUB_URL = f"https://127.0.0.1:{STUB_PORT}/v1"
+FIXTURE = next(Path(__file__).parent.joinpath("ocr_file").glob("*.jpg"))
+
+
+def make_certificate(directory: str):
+    """Self-signed certificate for 127.0.0.1, generated with the openssl CLI."""
+    cert, key = os.path.join(directory, "cert.pem"), os.path.join(directory, "key.pem")
+    subprocess.run(
+        ["openssl", "req", "-x509", "-newkey", "rsa:2048", "-nodes", "-days", "1",
+         "-keyout", key, "-out", cert, "-subj", "/CN=127.0.0.1",
+         "-addext", "subjectAltName=IP:127.0.0.1"],
+        check=True, capture_output=True,
+    )
+    return cert, key
+
+
+def build_stub_app(args, counters):
+    stub = FastAPI()
+    rng = random.Random(3)
+
+    @stub.post("/v1/chat/completions")
+    async def chat_completions(request: Request):
+        await request.body()
+        counters["requests"] += 1
+        if rng.random() < args.rate_limited:
+            counters["rate_limited"] += 1
+            return JSONResponse({"error": {"message": "rate limited"}}, status_code=429)
+        await asyncio.sleep(args.latency)
+        return {
+            "id": "stub",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": "stub",
+            "choices": [{"index": 0, "finish_reason": "stop",
+                         "message": {"role": "assistant", "content": "عقد زواج"}}],
+        }
+
+    return stub
+
+
+def run_stub(app, cert: str, key: str) -> uvicorn.Server:
+    config = uvicorn.Config(
+        app, host="127.0.0.1", port=STUB_PORT, log_level="warning", ssl_certfile=cert, ssl_keyfile=key,
+    )
+    server = uvicorn.Server(config)
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.05)
+    return server
+
+
+def legacy_ocr(image_bytes: bytes) -> str:
+    """The previous pattern: a new OpenAI client (and connection) per call."""
+    import OCR_model
+    from openai import OpenAI
+
+    client = OpenAI(base_url=OCR_model.OCR_API_BASE_URL, api_key=OCR_model.HF_TOKEN)
+    try:
+        completion = client.chat.completions.create(
+            **OCR_model._completion_request(image_bytes, "image/jpeg", OCR_model.BASE_PROMPT)
+        )
+    finally:
+        client.close()
+    return completion.choices[0].message.content
+
+
+def threaded(func, image_bytes: bytes, pages: int, workers: int) -> float:
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        list(pool.map(lambda _: func(image_bytes), range(pages)))
+    return time.perf_counter() - started
+
+
+async def gathered(image_bytes: bytes, pages: int, concurrency: int) -> float:
+    from OCR_model import close_clients, run_ocr_async
+
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one():
+        async with semaphore:
+            await run_ocr_async(image_bytes)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one() for _ in range(pages)))
+    elapsed = time.perf_counter() - started
+    # The async client belongs to this event loop
+    await close_clients()
+    return elapsed
+
+
+def main(args):
+    with tempfile.TemporaryDirectory() as directory:
+        cert, key = make_certificate(directory)
+        # Trust the stub certificate and point OCR_model at the stub before it reads the environment
+        os.environ.update({
+            "SSL_CERT_FILE": cert,
+            "OCR_API_BASE_URL": STUB_URL,
+            "HF_TOKEN": "benchmark-token",
+            "OCR_PREPROCESS": "false",
+            "OCR_CACHE_ENABLED": "false",
+            "OCR_RETRY_BASE_SECONDS": "0.05",
+        })
+        sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+        import logging
+        logging.disable(logging.WARNING)
+        from OCR_model import run_ocr
+
+        counters = {"requests": 0, "rate_limited": 0}
+        server = run_stub(build_stub_app(args, counters), cert, key)
+        image_bytes = FIXTURE.read_bytes()
+        try:
+            print(f"{args.pages} pages, stub latency {args.latency * 1000:.0f} ms, "
+                  f"{args.rate_limited:.0%} answered with 429\n")
+            print(f"{'client':<34}{'sequential':>14}{f'concurrency {args.concurrency}':>18}")
+            rows = [
+                ("new OpenAI client per call", lambda workers: threaded(legacy_ocr, image_bytes, args.pages, workers)),
+                ("shared client (run_ocr)", lambda workers: threaded(run_ocr, image_bytes, args.pages, workers)),
+                ("shared AsyncOpenAI (run_ocr_async)", lambda workers: asyncio.run(gathered(image_bytes, args.pages, workers))),
+            ]
+            for label, run in rows:
+                sequential = run(1)
+                concurrent = run(args.concurrency)
+                print(f"{label:<34}{args.pages / sequential:>9.1f} p/s{args.pages / concurrent:>13.1f} p/s")
+            print(f"\nstub: {counters['requests']} requests, {counters['rate_limited']} answered 429 and retried")
+        finally:
+            server.should_exit = True
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pages", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--latency", type=float, default=0.02)
+    parser.add_argument("--rate-limited", type=float, default=0.05)
+    main(parser.parse_args())
@@ -0,0 +1,186 @@
+"""Benchmark for OCR image preprocessing.
+
+Builds a fixture set from the images in ocr_file/ (the image as is, a 12 MP
+phone photo of it lying sideways on a dark table with an EXIF orientation
+tag, and an A4 300 DPI PNG scan) and sends each through `run_ocr_async`,
+with and without preprocessing.
+
+For each fixture it reports the payload size, the image tokens the model
+would see (28x28 patches) and the end-to-end latency. By default the vision
+endpoint is a local stub whose latency grows with upload size (--bandwidth)
+and image tokens (--token-cost), so the numbers are about payload cost
+only. With --live the real endpoint is used (HF_TOKEN / OCR_API_BASE_URL
+from the environment) and the character agreement between the text
+extracted before and after preprocessing is reported too, plus agreement
+with ocr_file/extracted_text.txt for the unmodified image.
+
+Usage:
+    python benchmark_ocr_preprocess.py [--runs 3] [--bandwidth 20] [--token-cost 0.0005] [--live]
+"""
+
+import io
+import os
+import sys
+import math
+import time
+import base64
+import asyncio
+import argparse
+import difflib
+import threading
+from pathlib import Path
+
+import uvicorn
+from fastapi import FastAPI, Request
+from PIL import Image, ImageFilter
+
+STUB_PORT = 8962
+STUB_URL = f"http://127.0.0.1:{STUB_PORT}/v1"
+FIXTURE_DIR = Path(__file__).parent / "ocr_file"
+REFERENCE_TEXT = FIXTURE_DIR / "extracted_text.txt"
+
+# Qwen2.5-VL's own pixel cap: larger images are downsampled by the model
+MODEL_MAX_PIXELS = 16384 * 28 * 28
+
+
+def image_tokens(width: int, height: int) -> int:
+    scale = min(1.0, math.sqrt(MODEL_MAX_PIXELS / (width * height)))
+    return math.ceil(width * scale / 28) * math.ceil(height * scale / 28)
+
+
+def build_stub_app(args):
+    stub = FastAPI()
+
+    @stub.post("/v1/chat/completions")
+    async def chat_completions(request: Request):
+        body = await request.body()
+        url = (await request.json())["messages"][0]["content"][1]["image_url"]["url"]
+        image = Image.open(io.BytesIO(base64.b64decode(url.split(",", 1)[1])))
+        # Upload time plus vision encoder time
+        await asyncio.sleep(len(body) * 8 / (args.bandwidth * 1e6) + image_tokens(*image.size) * args.token_cost)
+        return {
+            "id": "stub",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": "stub",
+            "choices": [{"index": 0, "finish_reason": "stop",
+                         "message": {"role": "assistant", "content": f"{image.size[0]}x{image.size[1]}"}}],
+        }
+
+    return stub
+
+
+def run_stub(app) -> uvicorn.Server:
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=STUB_PORT, log_level="warning"))
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.05)
+    return server
+
+
+def build_fixtures() -> list:
+    """(name, bytes) fixtures derived from every image in ocr_file/."""
+    fixtures = []
+    for path in sorted(FIXTURE_DIR.glob("*.jpg")) + sorted(FIXTURE_DIR.glob("*.png")):
+        data = path.read_bytes()
+        page = Image.open(io.BytesIO(data)).convert("RGB")
+        fixtures.append((f"{path.stem[:18]} as is", data))
+
+        # Phone photo: page filling ~60% of a 4032x3024 frame on a dark, noisy table,
+        # stored sideways with EXIF orientation 6 (rotate 90 degrees clockwise to view)
+        photo = Image.effect_noise((4032, 3024), 12).convert("RGB").point(lambda v: v // 3)
+        scale = min(4032 * 0.75 / page.width, 3024 * 0.8 / page.height)
+        scaled = page.resize((int(page.width * scale), int(page.height * scale)), Image.LANCZOS)
+        photo.paste(scaled, ((4032 - scaled.width) // 2, (3024 - scaled.height) // 2))
+        photo = photo.filter(ImageFilter.GaussianBlur(0.6)).rotate(90, expand=True)
+        exif = Image.Exif()
+        exif[0x0112] = 6
+        buffer = io.BytesIO()
+        photo.save(buffer, format="JPEG", quality=95, exif=exif)
+        fixtures.append((f"{path.stem[:18]} photo", buffer.getvalue()))
+
+        # A4 scan at 300 DPI, page centred on white with scanner margins
+        scan = Image.new("RGB", (2480, 3508), "white")
+        scale = 2480 * 0.85 / page.width
+        scaled = page.resize((int(page.width * scale), int(page.height * scale)), Image.LANCZOS)
+        scan.paste(scaled, ((2480 - scaled.width) // 2, 300))
+        buffer = io.BytesIO()
+        scan.save(buffer, format="PNG")
+        fixtures.append((f"{path.stem[:18]} scan", buffer.getvalue()))
+    return fixtures
+
+
+def agreement(a: str, b: str) -> float:
+    return difflib.SequenceMatcher(None, a, b, autojunk=False).ratio()
+
+
+async def measure(data: bytes, preprocess: bool, runs: int):
+    import OCR_model
+    from image_preprocess import preprocess_image_async
+
+    OCR_model.OCR_PREPROCESS = preprocess
+    if preprocess:
+        payload, _ = await preprocess_image_async(data)
+    else:
+        payload = data
+    size = Image.open(io.BytesIO(payload)).size
+
+    latencies, text = [], ""
+    for _ in range(runs):
+        started = time.perf_counter()
+        text = await OCR_model.run_ocr_async(data)
+        latencies.append(time.perf_counter() - started)
+    return len(base64.b64encode(payload)), image_tokens(*size), min(latencies), text
+
+
+async def benchmark(args):
+    from image_preprocess import preprocess_image_async
+
+    fixtures = build_fixtures()
+    # Start the worker processes before timing anything
+    await preprocess_image_async(fixtures[0][1])
+
+    print(f"{'fixture':<28}{'data URL':>18}{'image tokens':>16}{'latency':>16}{'agreement':>11}")
+    totals = [0, 0, 0.0, 0.0]
+    for name, data in fixtures:
+        raw_size, raw_tokens, raw_latency, raw_text = await measure(data, False, args.runs)
+        size, tokens, latency, text = await measure(data, True, args.runs)
+        totals = [totals[0] + raw_size, totals[1] + size, totals[2] + raw_latency, totals[3] + latency]
+        match = f"{agreement(raw_text, text):.1%}" if args.live else "n/a"
+        print(f"{name:<28}{raw_size / 1e6:>7.2f} -> {size / 1e6:.2f} MB{raw_tokens:>7} -> {tokens:<6}"
+              f"{raw_latency:>6.2f} -> {latency:.2f} s{match:>11}")
+        if args.live and name.endswith("as is") and REFERENCE_TEXT.exists():
+            reference = REFERENCE_TEXT.read_text(encoding="utf-8")
+            print(f"{'':<28}agreement with extracted_text.txt: "
+                  f"{agreement(reference, raw_text):.1%} before, {agreement(reference, text):.1%} after")
+
+    print(f"\ntotal data URL: {totals[0] / 1e6:.2f} MB -> {totals[1] / 1e6:.2f} MB, "
+          f"latency {totals[2]:.2f} s -> {totals[3]:.2f} s")
+
+
+def main(args):
+    if not args.live:
+        os.environ.update({"OCR_API_BASE_URL": STUB_URL, "HF_TOKEN": "benchmark-token", "OCR_CACHE_ENABLED": "false"})
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    import logging
+    logging.disable(logging.INFO)
+
+    server = None if args.live else run_stub(build_stub_app(args))
+    try:
+        if not args.live:
+            print(f"stub vision endpoint: {args.bandwidth:g} Mbit/s upload, {args.token_cost * 1000:g} ms per image token\n")
+        asyncio.run(benchmark(args))
+    finally:
+        from image_preprocess import shutdown_pool
+        shutdown_pool()
+        if server is not None:
+            server.should_exit = True
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=3, help="best of N runs per fixture")
+    parser.add_argument("--bandwidth", type=float, default=20, help="stub upload bandwidth in Mbit/s")
+    parser.add_argument("--token-cost", type=float, default=0.0005, help="stub seconds per image token")
+    parser.add_argument("--live", action="store_true", help="use the real vision endpoint and report agreement")
+    main(parser.parse_args())
@@ -0,0 +1,208 @@
+"""Benchmark for the translation cache and the stable prompt prefix.
+
+Translates a set of contracts with the translation cache off and on, against a
+local stub LLM, and reports LLM calls, prompt tokens (and how many of them the
+server could serve from its prefix cache), completion tokens and latency.
+
+The stub answers after a fixed overhead, plus a prefill time per prompt token
+not found in its prefix cache, plus a generation time per output token
+(tokens counted as characters / 4). Its prefix cache works like vLLM's
+automatic prefix caching: a prompt reuses the longest run of whole 16-token
+blocks it shares, from the start, with a prompt seen before.
+
+Fixtures, built from qdrant/documents.json, translated in this order:
+- "contract": the OCR text of the stored contract
+- "same, rescanned": the same contract OCR'd again (no diacritics, other line breaks)
+- "new spouses": the same notary's contract for another couple
+- "new spouses 2": a third couple, another day
+
+The translation memory is off, so only the translation cache reuses text.
+
+Usage:
+    python benchmark_translation_cache.py [--overhead 0.3] [--prefill-time 0.0005] [--token-time 0.01]
+"""
+
+import os
+import re
+import sys
+import json
+import time
+import asyncio
+import argparse
+import tempfile
+import threading
+from pathlib import Path
+
+import uvicorn
+from fastapi import FastAPI, Request
+
+STUB_PORT = 8966
+STUB_URL = f"http://127.0.0.1:{STUB_PORT}/v1"
+DOCUMENTS = Path(__file__).parent / "qdrant" / "documents.json"
+# vLLM's default KV cache block size, in tokens
+BLOCK_TOKENS = 16
+
+# Spouses' details replaced in the "new spouses" fixtures
+COUPLES = [
+    {
+        "رأفت كسيكسي": "ماجدي عزوزي",
+        "صالح بن سعيد بن محمد كسيكسي": "محمد بن الطاهر بن بلقاسم العزوزي",
+        "راضيه بنت بلقاسم كسيكسي": "دليلة بنت الصحبي العزوزي",
+        "473": "689",
+        "فريال الزرلي": "ليلى الصغير",
+        "لطفي بن علي بن أحمد الزرلي": "الهادي بن عمر بن علي الصغير",
+        "1233": "1410",
+    },
+    {
+        "رأفت كسيكسي": "أنيس الطرابلسي",
+        "صالح بن سعيد بن محمد كسيكسي": "منصف بن حسن بن علي الطرابلسي",
+        "23": "04",
+        "473": "1021",
+        "فريال الزرلي": "سناء بن عمر",
+        "لطفي بن علي بن أحمد الزرلي": "عمر بن محمود بن صالح بن عمر",
+        "الجمعة 27": "السبت 28",
+    },
+]
+
+
+def tokens(text: str) -> int:
+    return max(1, len(text) // 4)
+
+
+def build_stub_app(args):
+    stub = FastAPI()
+    seen_prefixes = set()
+
+    def cached_tokens(prompt: str) -> int:
+        """Tokens at the start of prompt in whole blocks already seen, then remember its blocks."""
+        block = BLOCK_TOKENS * 4
+        ends = range(block, len(prompt) + 1, block)
+        cached = 0
+        for end in ends:
+            if hash(prompt[:end]) not in seen_prefixes:
+                break
+            cached = end // 4
+        seen_prefixes.update(hash(prompt[:end]) for end in ends)
+        return cached
+
+    @stub.post("/v1/chat/completions")
+    async def chat_completions(request: Request):
+        messages = (await request.json())["messages"]
+        prompt = "\n".join(message["content"] for message in messages)
+        passages = re.findall(r'<span id="(\d+)">\n(.*?)\n</span>', prompt, re.DOTALL)
+        if passages:
+            answer = "\n".join(f'<span id="{number}">{"t" * len(text)}</span>' for number, text in passages)
+        else:
+            text = prompt.split("---ARABIC TEXT---\n", 1)[1].split("\n---END ARABIC TEXT---", 1)[0]
+            answer = "t" * len(text)
+        cached = cached_tokens(prompt)
+        await asyncio.sleep(
+            args.overhead + (tokens(prompt) - cached) * args.prefill_time + tokens(answer) * args.token_time
+        )
+        return {
+            "id": "stub",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": "stub",
+            "choices": [{"index": 0, "finish_reason": "stop", "message": {"role": "assistant", "content": answer}}],
+            "usage": {"prompt_tokens": tokens(prompt), "completion_tokens": tokens(answer),
+                      "total_tokens": tokens(prompt) + tokens(answer),
+                      "prompt_tokens_details": {"cached_tokens": cached}},
+        }
+
+    return stub
+
+
+def run_stub(app) -> uvicorn.Server:
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=STUB_PORT, log_level="warning"))
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.05)
+    return server
+
+
+def build_fixtures() -> list:
+    from llm.translation_memory import strip_diacritics
+
+    contract = json.loads(DOCUMENTS.read_text(encoding="utf-8"))[0]["source"].strip()
+    rescanned = re.sub(r"\n\s*", "\n", strip_diacritics(contract)).replace(" و ", " و")
+    fixtures = [("contract", contract), ("same, rescanned", rescanned)]
+    for number, couple in enumerate(COUPLES, 1):
+        text = contract
+        for old, new in couple.items():
+            text = text.replace(old, new)
+        fixtures.append((f"new spouses{'' if number == 1 else f' {number}'}", text))
+    return fixtures
+
+
+def measure(text: str):
+    from llm import translator
+
+    translator._usage.update(calls=0, prompt_tokens=0, cached_prompt_tokens=0, completion_tokens=0, seconds=0.0)
+    started = time.perf_counter()
+    translator.translate_text(text)
+    elapsed = time.perf_counter() - started
+    return dict(translator._usage), elapsed
+
+
+def main(args):
+    # Point the translator at the stub and a scratch cache before it reads the environment
+    cache_dir = tempfile.mkdtemp(prefix="translation-cache-")
+    os.environ.update({
+        "TRANSLATION_API_BASE_URL": STUB_URL,
+        "gpt_oss_api_key": "benchmark-key",
+        "TM_ENABLED": "false",
+        "TRANSLATION_CACHE_PATH": os.path.join(cache_dir, "translation_cache.db"),
+    })
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    import logging
+    logging.disable(logging.WARNING)
+
+    server = run_stub(build_stub_app(args))
+    try:
+        from llm import translator
+        from llm.translation_cache import translation_cache
+
+        print(f"stub LLM: {args.overhead:.2f} s per call + {args.prefill_time * 1000:g} ms per uncached prompt token "
+              f"+ {args.token_time * 1000:g} ms per generated token\n")
+        print(f"{'fixture':<18}{'cache':>7}{'calls':>7}{'prompt tok':>12}{'prefix hit':>12}"
+              f"{'output tok':>12}{'latency':>10}")
+        totals = {}
+        for enabled in (False, True):
+            translation_cache.enabled = enabled
+            if enabled:
+                translation_cache.clear()
+            total = totals.setdefault(enabled, {"calls": 0, "prompt_tokens": 0, "cached_prompt_tokens": 0,
+                                                "completion_tokens": 0, "latency": 0.0})
+            for name, text in build_fixtures():
+                usage, elapsed = measure(text)
+                for key in ("calls", "prompt_tokens", "cached_prompt_tokens", "completion_tokens"):
+                    total[key] += usage[key]
+                total["latency"] += elapsed
+                prefix = f"{usage['cached_prompt_tokens'] / usage['prompt_tokens']:.0%}" if usage["prompt_tokens"] else "-"
+                print(f"{name:<18}{'on' if enabled else 'off':>7}{usage['calls']:>7}{usage['prompt_tokens']:>12}"
+                      f"{prefix:>12}{usage['completion_tokens']:>12}{elapsed:>9.2f}s")
+
+        off, on = totals[False], totals[True]
+        print(f"\ntotal, cache off: {off['calls']} calls, {off['prompt_tokens']} prompt tokens "
+              f"({off['cached_prompt_tokens']} from the server prefix cache), "
+              f"{off['completion_tokens']} output tokens, {off['latency']:.2f} s")
+        print(f"total, cache on:  {on['calls']} calls, {on['prompt_tokens']} prompt tokens "
+              f"({on['cached_prompt_tokens']} from the server prefix cache), "
+              f"{on['completion_tokens']} output tokens, {on['latency']:.2f} s")
+        saved = {key: 1 - on[key] / off[key] for key in ("prompt_tokens", "completion_tokens", "latency") if off[key]}
+        print(f"saved by the translation cache: {saved['prompt_tokens']:.0%} prompt tokens, "
+              f"{saved['completion_tokens']:.0%} output tokens, {saved['latency']:.0%} latency")
+        stats = translator.get_translation_stats()["cache"]
+        print(f"cache: {stats['hits']} hits, {stats['misses']} misses, {stats['entries']} entries, {stats['bytes']} bytes")
+        translator.shutdown_translation_pool()
+    finally:
+        server.should_exit = True
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--overhead", type=float, default=0.3, help="stub seconds per call")
+    parser.add_argument("--prefill-time", type=float, default=0.0005, help="stub seconds per uncached prompt token")
+    parser.add_argument("--token-time", type=float, default=0.01, help="stub seconds per generated token")
+    main(parser.parse_args())
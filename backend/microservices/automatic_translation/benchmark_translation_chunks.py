@@ -0,0 +1,147 @@
+"""Benchmark for chunked, concurrent translation.
+
+Translates long contracts against a local stub LLM, first in one call (the
+previous behaviour) and then split into section chunks translated with
+1, 2, 4 and 8 concurrent calls. Reports LLM calls, prompt and completion
+tokens, the time until the first translated piece is available (what a
+client of /translate/stream waits before seeing text) and the total latency.
+
+The stub answers every passage with the passage itself, after a fixed
+overhead plus a per-token generation time (tokens counted as characters / 4),
+and cuts answers longer than max_tokens like a real endpoint would. Each
+call generates at the same speed whatever the number of calls in flight.
+Reassembly is checked: the output must contain every input phrase, in order.
+
+The translation memory is off, so every phrase goes to the LLM.
+
+Usage:
+    python benchmark_translation_chunks.py [--overhead 0.5] [--token-time 0.01] [--copies 1 3]
+"""
+
+import os
+import re
+import sys
+import json
+import time
+import asyncio
+import argparse
+import threading
+from pathlib import Path
+
+import uvicorn
+from fastapi import FastAPI, Request
+
+STUB_PORT = 8965
+STUB_URL = f"http://127.0.0.1:{STUB_PORT}/v1"
+DOCUMENTS = Path(__file__).parent / "qdrant" / "documents.json"
+
+
+def tokens(text: str) -> int:
+    return max(1, len(text) // 4)
+
+
+def build_stub_app(args):
+    stub = FastAPI()
+
+    @stub.post("/v1/chat/completions")
+    async def chat_completions(request: Request):
+        body = await request.json()
+        prompt = "\n".join(message["content"] for message in body["messages"])
+        passages = re.findall(r'<span id="(\d+)">\n(.*?)\n</span>', prompt, re.DOTALL)
+        if passages:
+            answer = "\n".join(f'<span id="{number}">{text}</span>' for number, text in passages)
+        else:
+            answer = prompt.split("---ARABIC TEXT---\n", 1)[1].split("\n---END ARABIC TEXT---", 1)[0]
+        finish_reason = "stop"
+        if tokens(answer) > body["max_tokens"]:
+            answer, finish_reason = answer[:body["max_tokens"] * 4], "length"
+        await asyncio.sleep(args.overhead + tokens(answer) * args.token_time)
+        return {
+            "id": "stub",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": "stub",
+            "choices": [{"index": 0, "finish_reason": finish_reason,
+                         "message": {"role": "assistant", "content": answer}}],
+            "usage": {"prompt_tokens": tokens(prompt), "completion_tokens": tokens(answer),
+                      "total_tokens": tokens(prompt) + tokens(answer)},
+        }
+
+    return stub
+
+
+def run_stub(app) -> uvicorn.Server:
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=STUB_PORT, log_level="warning"))
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.05)
+    return server
+
+
+def build_fixtures(copies: list) -> list:
+    """The stored contract, and bundles of several copies (a multi-page OCR result)."""
+    contract = json.loads(DOCUMENTS.read_text(encoding="utf-8"))[0]["source"].strip()
+    return [(f"{count} contract(s)", "\n\n".join([contract] * count)) for count in copies]
+
+
+def measure(text: str, chunk_chars: int, concurrency: int):
+    from llm import translator
+    from llm.translation_memory import match_key
+
+    translator.TRANSLATION_CHUNK_CHARS = chunk_chars
+    translator.TRANSLATION_CONCURRENCY = concurrency
+    translator.shutdown_translation_pool()
+    translator._usage.update(calls=0, prompt_tokens=0, completion_tokens=0, seconds=0.0)
+
+    started = time.perf_counter()
+    first = None
+    pieces = []
+    for piece in translator.iter_translation(text):
+        if first is None:
+            first = time.perf_counter() - started
+        pieces.append(piece)
+    elapsed = time.perf_counter() - started
+    in_order = match_key("".join(pieces)) == match_key(text)
+    return dict(translator._usage), first, elapsed, in_order
+
+
+def main(args):
+    # Point the translator at the stub before it reads the environment
+    os.environ.update({
+        "TRANSLATION_API_BASE_URL": STUB_URL,
+        "gpt_oss_api_key": "benchmark-key",
+        "TRANSLATION_CACHE_ENABLED": "false",
+        "TM_ENABLED": "false",
+        "TRANSLATION_MAX_TOKENS": str(args.max_tokens),
+    })
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    import logging
+    logging.disable(logging.WARNING)
+
+    server = run_stub(build_stub_app(args))
+    try:
+        from llm import translator
+
+        print(f"stub LLM: {args.overhead:.2f} s per call + {args.token_time * 1000:g} ms per generated token, "
+              f"max_tokens {args.max_tokens}, chunks of {args.chunk_chars} characters\n")
+        print(f"{'fixture':<16}{'mode':<14}{'calls':>7}{'prompt tok':>12}{'output tok':>12}"
+              f"{'first piece':>13}{'latency':>10}{'complete':>10}")
+        for name, text in build_fixtures(args.copies):
+            runs = [("one call", 10 ** 9, 1)] + [(f"chunks x{n}", args.chunk_chars, n) for n in (1, 2, 4, 8)]
+            for mode, chunk_chars, concurrency in runs:
+                usage, first, elapsed, in_order = measure(text, chunk_chars, concurrency)
+                print(f"{name:<16}{mode:<14}{usage['calls']:>7}{usage['prompt_tokens']:>12}"
+                      f"{usage['completion_tokens']:>12}{first:>12.2f}s{elapsed:>9.2f}s{'yes' if in_order else 'NO':>10}")
+        translator.shutdown_translation_pool()
+    finally:
+        server.should_exit = True
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--overhead", type=float, default=0.5, help="stub seconds per call")
+    parser.add_argument("--token-time", type=float, default=0.01, help="stub seconds per generated token")
+    parser.add_argument("--max-tokens", type=int, default=4096, help="TRANSLATION_MAX_TOKENS")
+    parser.add_argument("--chunk-chars", type=int, default=800, help="TRANSLATION_CHUNK_CHARS")
+    parser.add_argument("--copies", type=int, nargs="+", default=[1, 3], help="contracts per fixture")
+    main(parser.parse_args())
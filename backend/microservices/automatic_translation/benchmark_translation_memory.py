@@ -0,0 +1,146 @@
+"""Benchmark for translation-memory reuse in translate_text.
+
+Translates contracts with the translation memory off and on, against a local
+stub LLM, and reports LLM calls, prompt and completion tokens and latency.
+The stub answers after a fixed overhead plus a per-token generation time and
+counts tokens as characters / 4, so the numbers are about what is sent to and
+generated by the LLM, not about translation quality.
+
+Fixtures, built from qdrant/documents.json (the in-process index):
+- "stored contract": the OCR text of a contract already in the memory
+- "new contract": the same contract with the spouses' details changed, so only
+  the letterhead and boilerplate phrases can be reused
+
+Retrieval of few-shot examples needs the MiniLM embedding model; without it
+only exact reuse is measured.
+
+Usage:
+    python benchmark_translation_memory.py [--overhead 0.3] [--token-time 0.004]
+"""
+
+import os
+import re
+import sys
+import json
+import time
+import asyncio
+import argparse
+import threading
+from pathlib import Path
+
+import uvicorn
+from fastapi import FastAPI, Request
+
+STUB_PORT = 8964
+STUB_URL = f"http://127.0.0.1:{STUB_PORT}/v1"
+DOCUMENTS = Path(__file__).parent / "qdrant" / "documents.json"
+
+# Spouses' details replaced in the "new contract" fixture
+REPLACEMENTS = {
+    "رأفت كسيكسي": "ماجدي عزوزي",
+    "صالح بن سعيد بن محمد كسيكسي": "محمد بن الطاهر بن بلقاسم العزوزي",
+    "23": "12",
+    "473": "689",
+    "فريال الزرلي": "ليلى الصغير",
+    "1233": "1410",
+}
+
+
+def tokens(text: str) -> int:
+    return max(1, len(text) // 4)
+
+
+def build_stub_app(args):
+    stub = FastAPI()
+
+    @stub.post("/v1/chat/completions")
+    async def chat_completions(request: Request):
+        messages = (await request.json())["messages"]
+        prompt = "\n".join(message["content"] for message in messages)
+        passages = re.findall(r'<span id="(\d+)">\n(.*?)\n</span>', prompt, re.DOTALL)
+        if passages:
+            answer = "\n".join(f'<span id="{number}">{"t" * len(text)}</span>' for number, text in passages)
+        else:
+            text = prompt.split("---ARABIC TEXT---\n", 1)[1].split("\n---END ARABIC TEXT---", 1)[0]
+            answer = "t" * len(text)
+        await asyncio.sleep(args.overhead + tokens(answer) * args.token_time)
+        return {
+            "id": "stub",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": "stub",
+            "choices": [{"index": 0, "finish_reason": "stop", "message": {"role": "assistant", "content": answer}}],
+            "usage": {"prompt_tokens": tokens(prompt), "completion_tokens": tokens(answer),
+                      "total_tokens": tokens(prompt) + tokens(answer)},
+        }
+
+    return stub
+
+
+def run_stub(app) -> uvicorn.Server:
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=STUB_PORT, log_level="warning"))
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.05)
+    return server
+
+
+def build_fixtures() -> list:
+    stored = json.loads(DOCUMENTS.read_text(encoding="utf-8"))[0]["source"]
+    changed = stored
+    for old, new in REPLACEMENTS.items():
+        changed = changed.replace(old, new)
+    return [("stored contract", stored), ("new contract", changed)]
+
+
+def measure(text: str, memory):
+    from llm import translator
+
+    translator.translation_memory = memory
+    translator._usage.update(calls=0, prompt_tokens=0, completion_tokens=0, seconds=0.0)
+    started = time.perf_counter()
+    translator.translate_text(text)
+    elapsed = time.perf_counter() - started
+    return dict(translator._usage), elapsed
+
+
+def main(args):
+    # Point the translator at the stub before it reads the environment
+    os.environ.update({"TRANSLATION_API_BASE_URL": STUB_URL, "gpt_oss_api_key": "benchmark-key",
+                       "TRANSLATION_CACHE_ENABLED": "false"})
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    import logging
+    logging.disable(logging.WARNING)
+
+    server = run_stub(build_stub_app(args))
+    try:
+        print(f"stub LLM: {args.overhead:.2f} s per call + {args.token_time * 1000:g} ms per generated token\n")
+        print(f"{'fixture':<18}{'memory':>8}{'calls':>7}{'prompt tok':>12}{'output tok':>12}{'latency':>10}{'reused':>9}")
+        from llm.translation_memory import TranslationMemory
+
+        memories = {False: TranslationMemory(backend="local", enabled=False),
+                    True: TranslationMemory(backend="local", enabled=True)}
+        # Load the index and the embedding model before timing anything
+        memories[True].lookup("نص للتحميل")
+        for name, text in build_fixtures():
+            for enabled in (False, True):
+                before = memories[True].get_stats()
+                usage, elapsed = measure(text, memories[enabled])
+                after = memories[True].get_stats()
+                reused = "-"
+                if enabled:
+                    chars = after["total_chars"] - before["total_chars"]
+                    reused = f"{(after['reused_chars'] - before['reused_chars']) / chars:.0%}"
+                print(f"{name:<18}{'on' if enabled else 'off':>8}{usage['calls']:>7}{usage['prompt_tokens']:>12}"
+                      f"{usage['completion_tokens']:>12}{elapsed:>9.2f}s{reused:>9}")
+        if memories[True].get_stats()["embedding_model"] is None:
+            print("\nembedding model unavailable: exact reuse only, no few-shot retrieval")
+    finally:
+        server.should_exit = True
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--overhead", type=float, default=0.3, help="stub seconds per call")
+    parser.add_argument("--token-time", type=float, default=0.004, help="stub seconds per generated token")
+    main(parser.parse_args())
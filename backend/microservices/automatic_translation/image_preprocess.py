@@ -0,0 +1,188 @@
+"""Image preprocessing for the OCR service.
+
+Phone photos of documents are far larger than what the vision model looks at:
+a 12 MP JPEG becomes a ~16 MB data URL, most of it spent on the table around
+the page and on detail the model downsamples away. `preprocess_image` turns an
+upload into a compact grayscale JPEG before it is sent:
+
+1. EXIF-aware rotation (photos taken sideways are stored unrotated)
+2. Grayscale conversion
+3. Auto-crop of uniform borders around the page
+4. Resize to at most `OCR_MAX_PIXELS`, with sides rounded to the model's
+   28-pixel patch grid so the model does not resample again
+5. JPEG re-encoding at `OCR_JPEG_QUALITY`
+
+The work is CPU-bound, so the service runs it in a process pool
+(`preprocess_image_async`) to keep the event loop free.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import io
+import os
+import math
+import logging
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+from PIL import Image, ImageChops, ImageFilter, ImageOps, ImageStat, UnidentifiedImageError
+
+logger = logging.getLogger(__name__)
+
+# Preprocess uploads before OCR (false = send the upload unchanged)
+OCR_PREPROCESS = os.getenv("OCR_PREPROCESS", "true").lower() == "true"
+# Pixel budget per page; Qwen2.5-VL sees 28x28 patches, 2048 patches ~ 1.6 MP
+OCR_MAX_PIXELS = int(os.getenv("OCR_MAX_PIXELS", str(2048 * 28 * 28)))
+OCR_JPEG_QUALITY = int(os.getenv("OCR_JPEG_QUALITY", "80"))
+OCR_GRAYSCALE = os.getenv("OCR_GRAYSCALE", "true").lower() == "true"
+OCR_AUTOCROP = os.getenv("OCR_AUTOCROP", "true").lower() == "true"
+# Worker processes for preprocessing (0 = one per CPU)
+OCR_PREPROCESS_WORKERS = int(os.getenv("OCR_PREPROCESS_WORKERS", "0"))
+
+PATCH_SIZE = 28
+# Gray-level distance from the border colour that counts as page content
+CROP_THRESHOLD = 40
+# Margin kept around the detected page, as a fraction of its size
+CROP_MARGIN = 0.02
+# Crops keeping less than this fraction of the image are treated as mistakes
+CROP_MIN_AREA = 0.1
+# Side of the thumbnail used to find the page borders
+CROP_PROBE_SIZE = 512
+
+_pool: ProcessPoolExecutor | None = None
+
+
+def preprocess_image(image_bytes: bytes) -> tuple[bytes, str]:
+    """Rotate, crop, shrink and re-encode an image for OCR.
+
+    Returns:
+        (image bytes, MIME type). The upload is returned unchanged when it
+        needs no rotation, crop or resize and re-encoding would not shrink it.
+
+    Raises:
+        ValueError: If the bytes are not a readable image
+    """
+    if not image_bytes:
+        raise ValueError("Empty image payload")
+
+    try:
+        image = Image.open(io.BytesIO(image_bytes))
+        original_format = image.format
+        original_size = image.size
+        mode = "L" if OCR_GRAYSCALE else "RGB"
+        scale = _scale_for(*original_size)
+        if scale < 0.5:
+            # JPEG only: decode at 1/2, 1/4 or 1/8 size, keeping 2x the target
+            # resolution so the page still has enough pixels after cropping
+            image.draft(mode, (math.ceil(original_size[0] * scale * 2), math.ceil(original_size[1] * scale * 2)))
+        image.load()
+    except (UnidentifiedImageError, OSError) as exc:
+        raise ValueError("Uploaded file is not a valid image") from exc
+
+    # EXIF orientation tag: 1 = stored upright
+    rotated = image.getexif().get(0x0112, 1) != 1
+    image = ImageOps.exif_transpose(image).convert(mode)
+
+    cropped = False
+    if OCR_AUTOCROP:
+        box = _page_box(image)
+        if box is not None:
+            image = image.crop(box)
+            cropped = True
+
+    size = _target_size(*image.size)
+    resized = size != image.size
+    if resized:
+        image = image.resize(size, Image.LANCZOS)
+
+    buffer = io.BytesIO()
+    image.save(buffer, format="JPEG", quality=OCR_JPEG_QUALITY, optimize=True)
+    encoded = buffer.getvalue()
+
+    if len(encoded) >= len(image_bytes) and not (rotated or cropped or resized):
+        return image_bytes, Image.MIME.get(original_format, "image/jpeg")
+
+    logger.info(
+        f"[OCR] Preprocessed {original_size[0]}x{original_size[1]} {original_format} "
+        f"({len(image_bytes)} bytes) -> {image.size[0]}x{image.size[1]} JPEG ({len(encoded)} bytes)"
+    )
+    return encoded, "image/jpeg"
+
+
+def _scale_for(width: int, height: int) -> float:
+    return min(1.0, math.sqrt(OCR_MAX_PIXELS / (width * height)))
+
+
+def _target_size(width: int, height: int) -> tuple[int, int]:
+    """Largest size within OCR_MAX_PIXELS, rounded down to whole patches."""
+    scale = _scale_for(width, height)
+    if scale == 1.0:
+        return width, height
+    return (
+        max(PATCH_SIZE, int(width * scale) // PATCH_SIZE * PATCH_SIZE),
+        max(PATCH_SIZE, int(height * scale) // PATCH_SIZE * PATCH_SIZE),
+    )
+
+
+def _page_box(image: Image.Image) -> tuple[int, int, int, int] | None:
+    """Bounding box of everything that differs from the border colour, or None."""
+    probe = image.convert("L")
+    probe.thumbnail((CROP_PROBE_SIZE, CROP_PROBE_SIZE))
+    width, height = probe.size
+    if width < 16 or height < 16:
+        return None
+
+    # Border colour: median of thin strips along the four edges
+    strips = [(0, 0, width, 2), (0, height - 2, width, height), (0, 0, 2, height), (width - 2, 0, width, height)]
+    background = sorted(ImageStat.Stat(probe.crop(strip)).median[0] for strip in strips)[1:3]
+    background = sum(background) // 2
+
+    mask = ImageChops.difference(probe, Image.new("L", probe.size, background))
+    # Median filter drops isolated specks (sensor noise, dust) before thresholding
+    mask = mask.filter(ImageFilter.MedianFilter(5)).point(lambda value: 255 if value > CROP_THRESHOLD else 0)
+    box = mask.getbbox()
+    if box is None:
+        return None
+
+    left, top, right, bottom = box
+    margin_x = (right - left) * CROP_MARGIN
+    margin_y = (bottom - top) * CROP_MARGIN
+    scale_x = image.size[0] / width
+    scale_y = image.size[1] / height
+    box = (
+        max(0, int((left - margin_x) * scale_x)),
+        max(0, int((top - margin_y) * scale_y)),
+        min(image.size[0], math.ceil((right + margin_x) * scale_x)),
+        min(image.size[1], math.ceil((bottom + margin_y) * scale_y)),
+    )
+
+    area = (box[2] - box[0]) * (box[3] - box[1])
+    full = image.size[0] * image.size[1]
+    if area < CROP_MIN_AREA * full or area > 0.95 * full:
+        return None
+    return box
+
+
+def _get_pool() -> ProcessPoolExecutor:
+    global _pool
+    if _pool is None:
+        workers = OCR_PREPROCESS_WORKERS or os.cpu_count() or 1
+        # spawn: forking a process that runs the event loop and HTTP clients is unsafe
+        _pool = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"))
+        logger.info(f"[OCR] Preprocessing pool started with {workers} worker(s)")
+    return _pool
+
+
+async def preprocess_image_async(image_bytes: bytes) -> tuple[bytes, str]:
+    """`preprocess_image` in the worker process pool."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_get_pool(), preprocess_image, image_bytes)
+
+
+def shutdown_pool() -> None:
+    """Stop the worker processes (called on application shutdown)."""
+    global _pool
+    if _pool is not None:
+        _pool.shutdown(cancel_futures=True)
+        _pool = None
@@ -0,0 +1,160 @@
+"""Split a contract into chunks that are translated concurrently.
+
+Chunk boundaries follow the sections of `ACTE_DE_MARIAGE_STRUCTURE` (groom,
+bride, dowry, certificates, legal provisions, witnesses, place and date,
+registration), recognised from the phrases that open them in Tunisian
+contracts. Consecutive sections are packed into one chunk up to
+`max_chars`; a longer section is cut at phrase boundaries. Each section of a
+chunk is a separate passage, translated and cached on its own (the
+letterhead and the legal formulas recur across contracts). Every chunk carries
+the Arabic text just before and after it, so that names and terms read across
+a boundary are translated the same way on both sides.
+"""
+
+from __future__ import annotations
+
+from dataclasses import dataclass
+
+from llm.translation_memory import Segment, Span, match_key
+
+# Phrases opening each section, in the order of a contract. Matched on
+# match_key (no diacritics, alef/hamza variants, punctuation or spaces) within
+# one OCR line, so they are kept short.
+SECTION_MARKERS = [
+    ("letterhead", ()),
+    ("groom", ("الحمد لله", "الحمد الله", "تزوج على بركة الله")),
+    ("bride", ("بالآنسة", "بالسيدة")),
+    ("dowry", ("وسمى لها مهرا", "مهرا قدره")),
+    ("certificates", ("توليا عقد", "بشهادة طبية")),
+    ("legal", ("تذكيرهما بأحكام", "نظام الاشتراك في الأملاك")),
+    ("witnesses", ("وحضر شاهدا", "شاهدا العقد")),
+    ("place_date", ("شهد عليهم", "حين الحلول")),
+    ("registration", ("ورسم بالصحيفة", "أخرج مطابقا لأصله")),
+]
+
+_MARKER_KEYS = [tuple(match_key(marker) for marker in markers) for _, markers in SECTION_MARKERS]
+
+
+@dataclass
+class Chunk:
+    """Spans translated in one LLM call, with the Arabic text around them."""
+    spans: list[Span]
+    sections: list[str]
+    before: str = ""
+    after: str = ""
+
+    @property
+    def chars(self) -> int:
+        return sum(len(span.text) for span in self.spans)
+
+
+def section_indexes(segments: list[Segment]) -> list[int]:
+    """Index in SECTION_MARKERS of the section each segment belongs to.
+
+    Sections only move forward: a marker of an earlier section (the groom's
+    father named again among the witnesses) does not reopen it, except for the
+    opening of another contract after the registration of the previous one
+    (several contracts OCR'd as one batch).
+    """
+    current = 0
+    indexes = []
+    for segment in segments:
+        key = match_key(segment.text)
+        first = 1 if current == len(SECTION_MARKERS) - 1 else current + 1
+        for section in range(len(SECTION_MARKERS) - 1, first - 1, -1):
+            if section != current and any(marker in key for marker in _MARKER_KEYS[section]):
+                current = section
+                break
+        indexes.append(current)
+    return indexes
+
+
+def _context(segments: list[Segment], max_chars: int, from_end: bool = False) -> str:
+    """Whole phrases from the start (or the end) of segments, up to about max_chars."""
+    if max_chars <= 0:
+        return ""
+    kept: list[Segment] = []
+    size = 0
+    for segment in reversed(segments) if from_end else segments:
+        if kept and size + len(segment.text) > max_chars:
+            break
+        kept.append(segment)
+        size += len(segment.text) + 1
+    if from_end:
+        kept.reverse()
+    return Span(kept).text if kept else ""
+
+
+def plan_chunks(
+    spans: list[Span],
+    max_chars: int,
+    context_before: int,
+    context_after: int,
+) -> tuple[list[Span], list[Chunk]]:
+    """Group the spans still to translate into chunks.
+
+    Returns the spans in order (a pending span that straddles a section or
+    chunk boundary is replaced by its pieces, which keep its examples) and the
+    chunks, in order, each with its context.
+    """
+    segments = [segment for span in spans for segment in span.segments]
+    sections = section_indexes(segments)
+
+    # Phrases still to translate, as (origin span, segment index), in blocks of one section
+    blocks: list[list[tuple[Span, int]]] = []
+    index = 0
+    for span in spans:
+        for _ in span.segments:
+            if span.translation is None:
+                if blocks and sections[blocks[-1][-1][1]] == sections[index]:
+                    blocks[-1].append((span, index))
+                else:
+                    blocks.append([(span, index)])
+            index += 1
+
+    def size(phrases: list[tuple[Span, int]]) -> int:
+        return sum(len(segments[i].text) + 1 for _, i in phrases)
+
+    # Whole sections are packed together while they fit; a longer one is cut by phrases
+    groups: list[list[tuple[Span, int]]] = []
+    current: list[tuple[Span, int]] = []
+    for block in blocks:
+        if size(block) > max_chars:
+            if current:
+                groups.append(current)
+            current = []
+            for phrase in block:
+                if current and size(current) + len(segments[phrase[1]].text) > max_chars:
+                    groups.append(current)
+                    current = []
+                current.append(phrase)
+        elif current and size(current) + size(block) > max_chars:
+            groups.append(current)
+            current = list(block)
+        else:
+            current.extend(block)
+    if current:
+        groups.append(current)
+
+    pieces: dict[int, list[Span]] = {}
+    chunks: list[Chunk] = []
+    for group in groups:
+        chunk_spans: list[Span] = []
+        previous = (None, -1)
+        for origin, i in group:
+            if origin is previous[0] and sections[i] == previous[1]:
+                chunk_spans[-1].segments.append(segments[i])
+            else:
+                chunk_spans.append(Span([segments[i]], None, origin.examples))
+                pieces.setdefault(id(origin), []).append(chunk_spans[-1])
+                previous = (origin, sections[i])
+        first, last = group[0][1], group[-1][1]
+        chunks.append(Chunk(
+            spans=chunk_spans,
+            sections=list(dict.fromkeys(SECTION_MARKERS[sections[i]][0] for _, i in group)),
+            before=_context(segments[:first], context_before, from_end=True),
+            after=_context(segments[last + 1:], context_after),
+        ))
+
+    ordered = [piece for span in spans for piece in pieces.get(id(span), [span])]
+    return ordered, chunks
@@ -0,0 +1,84 @@
+"""Persistent cache of LLM translations for the automatic_translation microservice.
+
+Contracts from the same notary share their letterhead, legal provisions and
+closing formulas, and the same contract is often translated more than once
+(retries, a second translator). Every passage translated by the LLM is stored
+in SQLite under the SHA-256 of its Arabic text with diacritics removed and
+spacing collapsed (letters, digits and punctuation are kept: a date or a
+number that differs never reuses a translation), the model ID and the prompt
+version, so a different model or prompt never reuses a translation.
+The few-shot examples and the context sent with a passage are not part of the
+key: they only steer terminology.
+
+The cache is bounded by the size of the stored translations
+(`TRANSLATION_CACHE_MAX_BYTES`); the least recently used entries are evicted
+first.
+"""
+
+from __future__ import annotations
+
+import os
+import re
+import logging
+
+from llm.translation_memory import strip_diacritics
+from sqlite_lru import SQLiteLRUCache, content_key
+
+logger = logging.getLogger(__name__)
+
+TRANSLATION_CACHE_ENABLED = os.getenv("TRANSLATION_CACHE_ENABLED", "true").lower() == "true"
+TRANSLATION_CACHE_PATH = os.getenv("TRANSLATION_CACHE_PATH", "translation_cache.db")
+# Total size of cached translations before least recently used entries are evicted
+TRANSLATION_CACHE_MAX_BYTES = int(os.getenv("TRANSLATION_CACHE_MAX_BYTES", str(50 * 1024 * 1024)))
+
+_SPACE = re.compile(r"\s+")
+
+
+def cache_text(arabic_text: str) -> str:
+    """Passage text as keyed: diacritics removed and spacing collapsed, everything else kept."""
+    return _SPACE.sub(" ", strip_diacritics(arabic_text)).strip()
+
+
+def cache_key(arabic_text: str, model_id: str, prompt_version: str) -> str:
+    """Content address of a passage translation."""
+    return content_key(model_id, prompt_version, cache_text(arabic_text))
+
+
+class TranslationCache(SQLiteLRUCache):
+    """SQLite-backed, size-bounded LRU cache of passage translations."""
+
+    table = "translations"
+    value_column = "translation"
+    columns = ("model TEXT NOT NULL",)
+    log_prefix = "[TRANSLATOR]"
+    label = "Translation cache"
+
+    def __init__(
+        self,
+        path: str = TRANSLATION_CACHE_PATH,
+        max_bytes: int = TRANSLATION_CACHE_MAX_BYTES,
+        enabled: bool = TRANSLATION_CACHE_ENABLED,
+    ):
+        super().__init__(path, max_bytes, enabled)
+        self._stats["hit_chars"] = 0
+
+    def get(self, arabic_text: str, model_id: str, prompt_version: str) -> tuple[str | None, str]:
+        """Cached translation of this passage for this model and prompt version.
+
+        Returns:
+            (translation or None, key to pass to put() after a miss)
+        """
+        key = cache_key(arabic_text, model_id, prompt_version)
+        translation = self.lookup(key)
+        if translation is not None:
+            with self._lock:
+                self._stats["hit_chars"] += len(arabic_text)
+        return translation, key
+
+    def put(self, key: str, model_id: str, translation: str) -> None:
+        """Store a translation, evicting least recently used entries if over max_bytes."""
+        self.store(key, translation, model=model_id)
+
+
+# Shared cache used by the translator
+translation_cache = TranslationCache()
@@ -0,0 +1,498 @@
+"""Translation memory over the aligned Arabic/French phrase pairs.
+
+qdrant/ingest.py stores phrase pairs from translated marriage contracts in the
+`acte_de_marriage` Qdrant collection. Before a contract is sent to the LLM, its
+OCR text is split into phrases (the same delimiters as the ingestion), the
+phrases are embedded in one batch with the same MiniLM model and looked up
+with one batched top-k search:
+
+- A phrase, or a run of consecutive phrases, whose text matches a stored
+  Arabic phrase (ignoring diacritics, hamza/alef variants, punctuation and
+  spacing, but not the boundaries between numbers) reuses the stored French
+  translation directly.
+- The remaining phrases are grouped into spans for the LLM, with the closest
+  retrieved pairs as few-shot examples.
+
+When Qdrant is not reachable (`TM_BACKEND=auto`) or `TM_BACKEND=local`, an
+in-process index built from qdrant/documents.json (the same phrase pairs, plus
+whole documents for exact reuse) is used instead. If the embedding model cannot be loaded, exact reuse from the
+in-process index still works and retrieval is skipped.
+"""
+
+from __future__ import annotations
+
+import os
+import re
+import json
+import time
+import logging
+import threading
+from dataclasses import dataclass, field
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+TM_ENABLED = os.getenv("TM_ENABLED", "true").lower() == "true"
+# auto: Qdrant when reachable, otherwise the in-process index; or qdrant / local
+TM_BACKEND = os.getenv("TM_BACKEND", "auto").lower()
+QDRANT_URL = os.getenv("QDRANT_URL", "http://localhost:6333")
+TM_COLLECTION = os.getenv("TM_COLLECTION", "acte_de_marriage")
+TM_QDRANT_TIMEOUT = float(os.getenv("TM_QDRANT_TIMEOUT", "5"))
+TM_EMBEDDING_MODEL = os.getenv("TM_EMBEDDING_MODEL", "sentence-transformers/paraphrase-multilingual-MiniLM-L12-v2")
+# Source of the in-process index
+TM_LOCAL_PATH = os.getenv(
+    "TM_LOCAL_PATH",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "qdrant", "documents.json"),
+)
+# Stored pairs retrieved per phrase
+TM_TOP_K = int(os.getenv("TM_TOP_K", "3"))
+# Few-shot examples sent with each LLM span, and the lowest cosine score that qualifies
+TM_FEW_SHOT = int(os.getenv("TM_FEW_SHOT", "6"))
+TM_MIN_SCORE = float(os.getenv("TM_MIN_SCORE", "0.5"))
+
+# Same delimiters as split_arabic_phrases in qdrant/pairs.py
+_DELIMITERS = re.compile(r"([؟!.|،,؛;:\n]+)")
+_LONG_PHRASE_WORDS = 60
+_CHUNK_WORDS = 30
+# Longest run of input phrases compared against one stored phrase
+_MAX_MATCH_SEGMENTS = 24
+
+_DIACRITICS = re.compile(r"[\u0610-\u061A\u0640\u064B-\u065F\u0670\u06D6-\u06ED]")
+_LETTER_VARIANTS = str.maketrans({
+    "أ": "ا", "إ": "ا", "آ": "ا", "ٱ": "ا",
+    "ى": "ي", "ئ": "ي", "ؤ": "و", "ة": "ه",
+    **{chr(0x0660 + digit): str(digit) for digit in range(10)},
+})
+_NON_WORD = re.compile(r"[\W_]+")
+# Kept in keys between two digit runs: 1/12/2020 and 11/2/2020 must not match
+_DIGIT_BOUNDARY = "/"
+_FRENCH_PUNCTUATION = str.maketrans({"،": ",", "؛": ";", "؟": "?", "|": ""})
+
+
+def strip_diacritics(text: str) -> str:
+    """Arabic text without its short vowels, shadda, tatweel and Quranic marks."""
+    return _DIACRITICS.sub("", text)
+
+
+def match_key(text: str) -> str:
+    """Text reduced to what must be identical for a stored translation to be reused."""
+    text = strip_diacritics(text).translate(_LETTER_VARIANTS).lower()
+    return _NON_WORD.sub(_key_separator, text)
+
+
+def _key_separator(separator: re.Match) -> str:
+    text, start, end = separator.string, separator.start(), separator.end()
+    between_digits = start > 0 and end < len(text) and text[start - 1].isdigit() and text[end].isdigit()
+    return _DIGIT_BOUNDARY if between_digits else ""
+
+
+def join_keys(keys: list[str]) -> str:
+    """Key of consecutive phrases, equal to match_key of their joined text."""
+    joined = ""
+    for key in keys:
+        if joined and key and joined[-1].isdigit() and key[0].isdigit():
+            joined += _DIGIT_BOUNDARY
+        joined += key
+    return joined
+
+
+@dataclass
+class Segment:
+    """A phrase of the input and the delimiter that followed it."""
+    text: str
+    separator: str = ""
+
+
+@dataclass
+class MemoryMatch:
+    """A stored phrase pair and its similarity to the query."""
+    source_ar: str
+    source_fr: str
+    score: float = 1.0
+    document_id: int | None = None
+
+
+@dataclass
+class Span:
+    """Consecutive input phrases with their translation, if the memory had one."""
+    segments: list[Segment]
+    translation: str | None = None
+    examples: list[MemoryMatch] = field(default_factory=list)
+
+    @property
+    def text(self) -> str:
+        """Arabic text of the span without its trailing delimiter."""
+        return "".join(
+            s.text + s.separator + ("" if s.separator.endswith("\n") else " ") for s in self.segments[:-1]
+        ) + self.segments[-1].text
+
+    @property
+    def separator(self) -> str:
+        return self.segments[-1].separator
+
+
+def split_segments(text: str) -> list[Segment]:
+    """Split OCR text into phrases, keeping each delimiter to rebuild the layout."""
+    parts = _DELIMITERS.split(text.replace("\r", "\n"))
+    segments: list[Segment] = []
+    for index in range(0, len(parts), 2):
+        phrase = re.sub(r"[ \t]+", " ", parts[index]).strip()
+        separator = parts[index + 1] if index + 1 < len(parts) else ""
+        if not phrase:
+            if segments:
+                segments[-1].separator += separator
+            continue
+
+        words = phrase.split()
+        if len(words) > _LONG_PHRASE_WORDS:
+            for start in range(0, len(words), _CHUNK_WORDS):
+                segments.append(Segment(" ".join(words[start:start + _CHUNK_WORDS]), " "))
+            segments[-1].separator = separator
+        else:
+            segments.append(Segment(phrase, separator))
+    return segments
+
+
+def french_separator(separator: str) -> str:
+    """French equivalent of an Arabic delimiter run, with the spacing that follows it."""
+    punctuation = "".join(dict.fromkeys(c for c in separator.translate(_FRENCH_PUNCTUATION) if not c.isspace()))
+    if "\n" in separator:
+        return punctuation + "\n"
+    return punctuation + " " if punctuation or separator else ""
+
+
+def translated_piece(span: Span) -> str:
+    """French text of a span followed by its delimiter, ready to be concatenated."""
+    translation = (span.translation or "").strip()
+    separator = french_separator(span.separator)
+    # Stored translations often already end with the punctuation
+    if separator.strip() and translation.endswith(separator.strip()[0]):
+        separator = separator[1:] or " "
+    return translation + separator
+
+
+def join_translations(spans: list[Span]) -> str:
+    """Reassemble translated spans in order."""
+    return "".join(translated_piece(span) for span in spans).strip()
+
+
+def _reusable(match: MemoryMatch) -> bool:
+    # Truncated reference translations are only good as examples
+    translation = match.source_fr.strip()
+    return bool(translation) and not translation.endswith(("...", "…"))
+
+
+class _Embedder:
+    """The ingestion's SentenceTransformer model, loaded on first use."""
+
+    def __init__(self, model_name: str):
+        self.model_name = model_name
+        self._model = None
+        self._failed = False
+        self._lock = threading.Lock()
+
+    @property
+    def available(self) -> bool:
+        return not self._failed
+
+    def encode(self, texts: list[str]) -> np.ndarray | None:
+        """Unit-length embeddings of texts, one batch; None if the model is unavailable."""
+        if self._failed:
+            return None
+        if self._model is None:
+            with self._lock:
+                if self._model is None and not self._failed:
+                    try:
+                        from sentence_transformers import SentenceTransformer
+                        self._model = SentenceTransformer(self.model_name)
+                        logger.info(f"[TM] Embedding model loaded: {self.model_name}")
+                    except Exception as exc:
+                        self._failed = True
+                        logger.error(f"[TM] Embedding model unavailable, retrieval disabled: {exc}")
+        if self._model is None:
+            return None
+        return self._model.encode(texts, batch_size=64, normalize_embeddings=True, convert_to_numpy=True)
+
+
+class LocalIndex:
+    """In-process index of phrase pairs: exact lookup plus brute-force cosine search."""
+
+    name = "local"
+
+    def __init__(self, pairs: list[MemoryMatch], embedder: _Embedder, documents: list[MemoryMatch] = ()):
+        self.pairs = pairs
+        self.embedder = embedder
+        # Whole documents are only reused on an exact match, never retrieved as examples
+        self.exact = {match_key(pair.source_ar): pair for pair in [*documents, *pairs] if _reusable(pair)}
+        self._vectors: np.ndarray | None = None
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_documents(cls, path: str, embedder: _Embedder) -> LocalIndex:
+        """Index the phrase pairs and the whole texts of the ingestion documents."""
+        from qdrant.pairs import document_pairs, load_documents
+
+        pairs, whole = [], []
+        try:
+            documents = load_documents(path)
+        except (OSError, ValueError) as exc:
+            logger.warning(f"[TM] No local translation memory at {path}: {exc}")
+            documents = []
+        for document in documents:
+            if document.get("source") and document.get("translation"):
+                whole.append(MemoryMatch(document["source"], document["translation"], 1.0, document.get("id")))
+            for source_ar, source_fr in document_pairs(document, embedder.encode):
+                if source_ar.strip() and source_fr.strip():
+                    pairs.append(MemoryMatch(source_ar, source_fr, 1.0, document.get("id")))
+        logger.info(f"[TM] Local index: {len(pairs)} phrase pairs, {len(whole)} documents from {path}")
+        return cls(pairs, embedder, whole)
+
+    def search(self, vectors: np.ndarray, k: int) -> list[list[MemoryMatch]]:
+        if not self.pairs:
+            return [[] for _ in range(len(vectors))]
+        if self._vectors is None:
+            with self._lock:
+                if self._vectors is None:
+                    # Embedded like the Qdrant points: Arabic and French together
+                    encoded = self.embedder.encode([f"{p.source_ar}\n{p.source_fr}" for p in self.pairs])
+                    if encoded is None:
+                        return [[] for _ in range(len(vectors))]
+                    self._vectors = encoded.astype(np.float32)
+
+        scores = vectors @ self._vectors.T
+        k = min(k, len(self.pairs))
+        top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+        results = []
+        for row, candidates in zip(scores, top):
+            ranked = candidates[np.argsort(-row[candidates])]
+            results.append([
+                MemoryMatch(self.pairs[i].source_ar, self.pairs[i].source_fr, float(row[i]), self.pairs[i].document_id)
+                for i in ranked
+            ])
+        return results
+
+
+class QdrantIndex:
+    """The `acte_de_marriage` collection, queried with one batched request."""
+
+    name = "qdrant"
+
+    def __init__(self, url: str, collection: str, timeout: float):
+        from qdrant_client import QdrantClient
+
+        self.collection = collection
+        # Exact reuse comes from the retrieved candidates
+        self.exact: dict[str, MemoryMatch] = {}
+        self._client = QdrantClient(url=url, timeout=timeout)
+        # Fails fast when the server or the collection is missing
+        self._client.get_collection(collection)
+        logger.info(f"[TM] Using Qdrant collection '{collection}' at {url}")
+
+    def search(self, vectors: np.ndarray, k: int) -> list[list[MemoryMatch]]:
+        from qdrant_client import models
+
+        responses = self._client.query_batch_points(
+            collection_name=self.collection,
+            requests=[models.QueryRequest(query=vector.tolist(), limit=k, with_payload=True) for vector in vectors],
+        )
+        results = []
+        for response in responses:
+            matches = []
+            for point in response.points:
+                payload = point.payload or {}
+                # Whole-document fallback points carry no phrase pair
+                if payload.get("source_ar") and payload.get("source_fr"):
+                    matches.append(MemoryMatch(
+                        payload["source_ar"], payload["source_fr"], float(point.score), payload.get("document_id")
+                    ))
+            results.append(matches)
+        return results
+
+
+class TranslationMemory:
+    """Splits a document into reused translations and spans left for the LLM."""
+
+    def __init__(
+        self,
+        backend: str = TM_BACKEND,
+        top_k: int = TM_TOP_K,
+        few_shot: int = TM_FEW_SHOT,
+        min_score: float = TM_MIN_SCORE,
+        enabled: bool = TM_ENABLED,
+    ):
+        self.backend = backend
+        self.top_k = top_k
+        self.few_shot = few_shot
+        self.min_score = min_score
+        self.enabled = enabled
+        self.embedder = _Embedder(TM_EMBEDDING_MODEL)
+        self._index: LocalIndex | QdrantIndex | None = None
+        self._lock = threading.Lock()
+        self._stats = {
+            "documents": 0, "segments": 0, "reused_segments": 0, "llm_segments": 0,
+            "reused_chars": 0, "total_chars": 0, "examples": 0,
+            "embed_seconds": 0.0, "search_seconds": 0.0,
+        }
+
+    def _get_index(self) -> LocalIndex | QdrantIndex:
+        if self._index is None:
+            with self._lock:
+                if self._index is None:
+                    self._index = self._open_index()
+        return self._index
+
+    def _open_index(self) -> LocalIndex | QdrantIndex:
+        if self.backend in ("auto", "qdrant"):
+            try:
+                return QdrantIndex(QDRANT_URL, TM_COLLECTION, TM_QDRANT_TIMEOUT)
+            except Exception as exc:
+                if self.backend == "qdrant":
+                    raise
+                logger.warning(f"[TM] Qdrant unavailable ({exc}), using the in-process index")
+        return LocalIndex.from_documents(TM_LOCAL_PATH, self.embedder)
+
+    def lookup(self, text: str) -> list[Span]:
+        """Spans of text in order; `translation` is set on the spans reused from memory."""
+        segments = split_segments(text)
+        if not segments:
+            return []
+        if not self.enabled:
+            return [Span(segments)]
+
+        index = self._get_index()
+        keys = [match_key(segment.text) for segment in segments]
+        reused: dict[int, tuple[int, MemoryMatch]] = {}
+        # A document translated before (the same scan uploaded again)
+        whole = index.exact.get(join_keys(keys))
+        if whole is not None:
+            reused[0] = (len(segments), whole)
+        else:
+            self._match_runs(keys, index.exact, reused)
+
+        # One embedding batch and one search for the phrases still unmatched
+        pending = [i for i in range(len(segments)) if not self._covered(i, reused) and keys[i]]
+        matches: dict[int, list[MemoryMatch]] = {}
+        if pending and self.embedder.available:
+            unique = list(dict.fromkeys(segments[i].text for i in pending))
+            started = time.perf_counter()
+            vectors = self.embedder.encode(unique)
+            if vectors is not None:
+                self._stats["embed_seconds"] += time.perf_counter() - started
+                started = time.perf_counter()
+                found = dict(zip(unique, self._search(vectors)))
+                self._stats["search_seconds"] += time.perf_counter() - started
+                matches = {i: found[segments[i].text] for i in pending}
+
+                candidates = {
+                    match_key(match.source_ar): match
+                    for results in matches.values() for match in results if _reusable(match)
+                }
+                self._match_runs(keys, candidates, reused)
+
+        spans = self._build_spans(segments, reused, matches)
+        self._record(segments, spans)
+        return spans
+
+    def _search(self, vectors: np.ndarray) -> list[list[MemoryMatch]]:
+        try:
+            return self._index.search(vectors, self.top_k)
+        except Exception as exc:
+            if isinstance(self._index, LocalIndex):
+                raise
+            logger.error(f"[TM] Qdrant search failed ({exc}), switching to the in-process index")
+            self._index = LocalIndex.from_documents(TM_LOCAL_PATH, self.embedder)
+            return self._index.search(vectors, self.top_k)
+
+    @staticmethod
+    def _covered(index: int, reused: dict[int, tuple[int, MemoryMatch]]) -> bool:
+        return any(start <= index < end for start, (end, _) in reused.items())
+
+    def _match_runs(self, keys: list[str], table: dict[str, MemoryMatch], reused: dict) -> None:
+        """Greedy longest runs of consecutive phrases whose joined key is in table."""
+        if not table:
+            return
+        start = 0
+        while start < len(keys):
+            if self._covered(start, reused):
+                start += 1
+                continue
+            best = None
+            joined = ""
+            for end in range(start + 1, min(start + _MAX_MATCH_SEGMENTS, len(keys)) + 1):
+                if self._covered(end - 1, reused):
+                    break
+                joined = join_keys([joined, keys[end - 1]])
+                if joined and joined in table:
+                    best = (end, table[joined])
+            if best is not None:
+                reused[start] = best
+                start = best[0]
+            else:
+                start += 1
+
+    def _build_spans(self, segments: list[Segment], reused: dict, matches: dict) -> list[Span]:
+        spans: list[Span] = []
+        pending: list[int] = []
+
+        def flush():
+            if pending:
+                spans.append(Span([segments[i] for i in pending], None, self._examples(pending, matches)))
+                pending.clear()
+
+        index = 0
+        while index < len(segments):
+            if index in reused:
+                flush()
+                end, match = reused[index]
+                spans.append(Span(segments[index:end], match.source_fr))
+                index = end
+            else:
+                pending.append(index)
+                index += 1
+        flush()
+        return spans
+
+    def _examples(self, indexes: list[int], matches: dict) -> list[MemoryMatch]:
+        """Best distinct retrieved pairs for a span, most similar first."""
+        best: dict[str, MemoryMatch] = {}
+        for i in indexes:
+            for match in matches.get(i, []):
+                key = match_key(match.source_ar)
+                if match.score >= self.min_score and (key not in best or match.score > best[key].score):
+                    best[key] = match
+        return sorted(best.values(), key=lambda match: match.score, reverse=True)[:self.few_shot]
+
+    def _record(self, segments: list[Segment], spans: list[Span]) -> None:
+        self._stats["documents"] += 1
+        self._stats["segments"] += len(segments)
+        self._stats["total_chars"] += sum(len(segment.text) for segment in segments)
+        for span in spans:
+            if span.translation is not None:
+                self._stats["reused_segments"] += len(span.segments)
+                self._stats["reused_chars"] += sum(len(segment.text) for segment in span.segments)
+            else:
+                self._stats["llm_segments"] += len(span.segments)
+                self._stats["examples"] += len(span.examples)
+        reused = sum(1 for span in spans if span.translation is not None)
+        logger.info(f"[TM] {len(segments)} phrases: {reused} reused span(s), {len(spans) - reused} for the LLM")
+
+    def get_stats(self) -> dict:
+        """Reuse counts, timings and configuration."""
+        total = self._stats["total_chars"]
+        return {
+            **self._stats,
+            "embed_seconds": round(self._stats["embed_seconds"], 3),
+            "search_seconds": round(self._stats["search_seconds"], 3),
+            "reused_char_ratio": round(self._stats["reused_chars"] / total, 4) if total else 0.0,
+            "backend": self._index.name if self._index is not None else self.backend,
+            "embedding_model": TM_EMBEDDING_MODEL if self.embedder.available else None,
+            "top_k": self.top_k,
+            "few_shot": self.few_shot,
+            "min_score": self.min_score,
+            "enabled": self.enabled,
+        }
+
+
+# Shared memory used by translate_text
+translation_memory = TranslationMemory()
@@ -1,17 +1,73 @@
 import os
+import re
+import time
+import hashlib
 import logging
+import threading
+from typing import Iterator
+from concurrent.futures import ThreadPoolExecutor
 from openai import OpenAI
 from dotenv import load_dotenv
 
 load_dotenv()
 
+# Imported after load_dotenv so its settings can come from .env
+from llm.chunks import Chunk, plan_chunks  # noqa: E402
+from llm.translation_cache import translation_cache  # noqa: E402
+from llm.translation_memory import MemoryMatch, Span, split_segments, translated_piece, translation_memory  # noqa: E402
+
 logging.basicConfig(level=logging.INFO, format="[%(levelname)s] %(message)s")
 logger = logging.getLogger(__name__)
 
-client = OpenAI(
-    base_url="https://router.huggingface.co/v1",
-    api_key=os.environ.get("gpt_oss_api_key"),
-)
+TRANSLATION_MODEL_ID = os.getenv("TRANSLATION_MODEL_ID", "openai/gpt-oss-120b:cerebras")
+TRANSLATION_API_BASE_URL = os.getenv("TRANSLATION_API_BASE_URL", "https://router.huggingface.co/v1")
+TRANSLATION_MAX_TOKENS = int(os.getenv("TRANSLATION_MAX_TOKENS", "4096"))
+# Text still to translate is split into chunks of at most this many characters,
+# on the sections of the contract, and the chunks are translated concurrently
+TRANSLATION_CHUNK_CHARS = int(os.getenv("TRANSLATION_CHUNK_CHARS", "800"))
+# Arabic text before and after a chunk given to the LLM as context, in characters
+TRANSLATION_CONTEXT_BEFORE = int(os.getenv("TRANSLATION_CONTEXT_BEFORE", "300"))
+TRANSLATION_CONTEXT_AFTER = int(os.getenv("TRANSLATION_CONTEXT_AFTER", "150"))
+# LLM calls in flight at once, shared by all requests
+TRANSLATION_CONCURRENCY = int(os.getenv("TRANSLATION_CONCURRENCY", "4"))
+
+_client = None
+_client_lock = threading.Lock()
+_pool: ThreadPoolExecutor | None = None
+_pool_lock = threading.Lock()
+_usage = {"calls": 0, "prompt_tokens": 0, "cached_prompt_tokens": 0, "completion_tokens": 0, "seconds": 0.0}
+_usage_lock = threading.Lock()
+
+
+def _get_client() -> OpenAI:
+    """OpenAI client for the HF Router, created on first use."""
+    global _client
+    api_key = os.environ.get("gpt_oss_api_key")
+    if not api_key:
+        raise ValueError("gpt_oss_api_key environment variable is not set")
+
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = OpenAI(base_url=TRANSLATION_API_BASE_URL, api_key=api_key)
+    return _client
+
+
+def _get_pool() -> ThreadPoolExecutor:
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = ThreadPoolExecutor(max_workers=TRANSLATION_CONCURRENCY, thread_name_prefix="translator")
+    return _pool
+
+
+def shutdown_translation_pool() -> None:
+    """Stop the chunk translation threads (called on application shutdown)."""
+    global _pool
+    if _pool is not None:
+        _pool.shutdown(cancel_futures=True)
+        _pool = None
 
 # Reference structure for Tunisian marriage contract (acte de mariage)
 ACTE_DE_MARIAGE_STRUCTURE = """
@@ -50,7 +106,9 @@ Marriage location, date, and time
 Notary signatures and seals
 """
 
-TRANSLATION_PROMPT = """You are an expert translator specializing in Tunisian legal documents, specifically marriage contracts (actes de mariage).
+# System message of every call. It never changes, so servers with prefix caching
+# (vLLM automatic prefix caching, OpenAI prompt caching) reuse its KV cache
+TRANSLATION_RULES = """You are an expert translator specializing in Tunisian legal documents, specifically marriage contracts (actes de mariage).
 
 You will translate Arabic legal text to French with absolute accuracy and precision (MOT À MOT / WORD FOR WORD).
 
@@ -74,15 +132,201 @@ DO NOT USE:
 - Bullet points (-)
 - Section headers like **Informations du marié**
 - Lists or structured sections
+"""
 
-TRANSLATION TASK:
-Translate the following Arabic text to French as continuous flowing prose, maintaining all details exactly:
+# Translation-memory pairs close to the text being translated
+EXAMPLES_SECTION = """
+REFERENCE TRANSLATIONS (validated translations of similar passages from other contracts; follow their terminology and style, but translate the names, numbers and dates of the text below):
+{EXAMPLES_PLACEHOLDER}
+"""
 
+# Arabic text around a chunk of a longer contract
+CONTEXT_SECTION = """
+CONTEXT (the Arabic text just before and after the text to translate, from the same contract; use it only to keep names, titles and terms consistent with the rest of the translation, do NOT translate it):
+---BEFORE---
+{BEFORE_PLACEHOLDER}
+---AFTER---
+{AFTER_PLACEHOLDER}
+"""
+
+# User messages: the fixed task instructions come first and what changes from
+# call to call (examples, context, text) last, to keep the cached prefix long
+TRANSLATION_PROMPT = """TRANSLATION TASK:
+Translate the Arabic text at the end of this message to French as continuous flowing prose, maintaining all details exactly.
+Provide ONLY the French translation as flowing paragraphs. NO bullet points, NO section headers, NO lists.
+{EXAMPLES_SECTION_PLACEHOLDER}{CONTEXT_SECTION_PLACEHOLDER}
 ---ARABIC TEXT---
 {ARABIC_TEXT_PLACEHOLDER}
----END ARABIC TEXT---
+---END ARABIC TEXT---"""
+
+# Several passages of one contract (its sections, or the parts the translation memory could not translate)
+SPANS_PROMPT = """TRANSLATION TASK:
+The passages at the end of this message are excerpts of one contract, in order; any text between them is already translated. Translate each passage to French separately, as continuous flowing prose, maintaining all details exactly.
+Answer with one <span id="N">French translation</span> per passage, in the same order and with the same ids. Provide NOTHING else.
+{EXAMPLES_SECTION_PLACEHOLDER}{CONTEXT_SECTION_PLACEHOLDER}
+{ARABIC_TEXT_PLACEHOLDER}"""
+
+# Part of the translation cache key: editing any template invalidates the cached translations
+TRANSLATION_PROMPT_VERSION = hashlib.sha256(
+    "\0".join((TRANSLATION_RULES, EXAMPLES_SECTION, CONTEXT_SECTION, TRANSLATION_PROMPT, SPANS_PROMPT)).encode()
+).hexdigest()[:12]
+
+_SPAN_PATTERN = re.compile(r'<span id="(\d+)">(.*?)</span>', re.DOTALL)
+
+
+def _examples_section(examples: list[MemoryMatch]) -> str:
+    if not examples:
+        return ""
+    pairs = "\n".join(f"Arabe : {example.source_ar.strip()}\nFrançais : {example.source_fr.strip()}\n" for example in examples)
+    return EXAMPLES_SECTION.replace("{EXAMPLES_PLACEHOLDER}", pairs)
+
+
+def _context_section(chunk: Chunk) -> str:
+    if not chunk.before and not chunk.after:
+        return ""
+    return (CONTEXT_SECTION
+            .replace("{BEFORE_PLACEHOLDER}", chunk.before or "(start of the contract)")
+            .replace("{AFTER_PLACEHOLDER}", chunk.after or "(end of the contract)"))
+
+
+def _complete(prompt: str) -> tuple[str, bool]:
+    """
+    One chat completion; token usage and latency are added to the stats.
+    
+    Returns:
+        (answer, False if it was cut at TRANSLATION_MAX_TOKENS)
+    """
+    started = time.perf_counter()
+    completion = _get_client().chat.completions.create(
+        model=TRANSLATION_MODEL_ID,
+        messages=[{"role": "system", "content": TRANSLATION_RULES}, {"role": "user", "content": prompt}],
+        max_tokens=TRANSLATION_MAX_TOKENS,
+    )
+    with _usage_lock:
+        _usage["calls"] += 1
+        _usage["seconds"] += time.perf_counter() - started
+        if completion.usage is not None:
+            _usage["prompt_tokens"] += completion.usage.prompt_tokens
+            _usage["completion_tokens"] += completion.usage.completion_tokens
+            # Reported by servers with prefix caching
+            details = getattr(completion.usage, "prompt_tokens_details", None)
+            _usage["cached_prompt_tokens"] += getattr(details, "cached_tokens", None) or 0
+    finished = completion.choices[0].finish_reason != "length"
+    if not finished:
+        logger.warning(f"[TRANSLATOR] Answer cut at {TRANSLATION_MAX_TOKENS} tokens, lower TRANSLATION_CHUNK_CHARS")
+    return (completion.choices[0].message.content or "").strip(), finished
+
+
+def _translate_spans(spans: list[Span], context_section: str = "") -> tuple[list[str], bool]:
+    """
+    Translate spans the memory could not translate, in as few LLM calls as possible.
+    
+    Returns:
+        (translation of each span, False if an answer was cut at
+        TRANSLATION_MAX_TOKENS: not worth caching)
+    """
+    examples = list({example.source_ar: example for span in spans for example in span.examples}.values())
+    examples_section = _examples_section(examples)
+
+    if len(spans) == 1:
+        prompt = (TRANSLATION_PROMPT
+                  .replace("{EXAMPLES_SECTION_PLACEHOLDER}", examples_section)
+                  .replace("{CONTEXT_SECTION_PLACEHOLDER}", context_section))
+        translation, finished = _complete(prompt.replace("{ARABIC_TEXT_PLACEHOLDER}", spans[0].text))
+        return [translation], finished
+
+    passages = "\n\n".join(f'<span id="{number}">\n{span.text}\n</span>' for number, span in enumerate(spans, 1))
+    prompt = (SPANS_PROMPT
+              .replace("{EXAMPLES_SECTION_PLACEHOLDER}", examples_section)
+              .replace("{CONTEXT_SECTION_PLACEHOLDER}", context_section))
+    answer, finished = _complete(prompt.replace("{ARABIC_TEXT_PLACEHOLDER}", passages))
+    translated = {int(number): text.strip() for number, text in _SPAN_PATTERN.findall(answer)}
+
+    translations = []
+    for number, span in enumerate(spans, 1):
+        translation = translated.get(number)
+        if not translation:
+            # The model merged or dropped a passage: translate it on its own
+            logger.warning(f"[TRANSLATOR] Passage {number} missing from the answer, translating it separately")
+            [translation], single_finished = _translate_spans([span], context_section)
+            finished = finished and single_finished
+        translations.append(translation)
+    return translations, finished
+
+
+def _translate_chunk(chunk: Chunk, cache_keys: dict[int, str]) -> None:
+    """Translate the spans of a chunk the cache did not have, and cache them.
+
+    The spans' translations are only set once the whole chunk is translated:
+    iter_translation waits for this function, not for the fields.
+    """
+    pending = [span for span in chunk.spans if span.translation is None]
+    started = time.perf_counter()
+    translations, finished = _translate_spans(pending, _context_section(chunk))
+    logger.info(f"[TRANSLATOR] Chunk {'/'.join(chunk.sections)} ({chunk.chars} characters) "
+                f"translated in {time.perf_counter() - started:.2f}s")
+    for span, translation in zip(pending, translations):
+        span.translation = translation
+        if finished:
+            translation_cache.put(cache_keys[id(span)], TRANSLATION_MODEL_ID, translation)
+
+
+def _lookup(arabic_text: str) -> list[Span]:
+    try:
+        return translation_memory.lookup(arabic_text)
+    except Exception as exc:
+        # The memory only saves tokens: translate everything with the LLM
+        logger.error(f"[TRANSLATOR] Translation memory lookup failed: {exc}", exc_info=True)
+        segments = split_segments(arabic_text)
+        return [Span(segments)] if segments else []
 
-Provide ONLY the French translation as flowing paragraphs. NO bullet points, NO section headers, NO lists."""
+
+def iter_translation(arabic_text: str) -> Iterator[str]:
+    """
+    Translate like translate_text, yielding the French text piece by piece, in order.
+    
+    Spans reused from the translation memory are yielded at once. The rest is
+    split into chunks on the sections of the contract; sections translated
+    before (translation cache) are reused and each chunk with sections left is
+    sent to the LLM with the Arabic text around it as context. Chunks are translated
+    concurrently (at most TRANSLATION_CONCURRENCY calls at a time) and each
+    piece is yielded as soon as it and every piece before it are translated.
+    Concatenating the pieces gives the translation.
+    """
+    
+    logger.info(f"[TRANSLATOR] Input length: {len(arabic_text)} characters")
+    spans = _lookup(arabic_text)
+    reused = sum(1 for span in spans if span.translation is not None)
+    spans, chunks = plan_chunks(spans, TRANSLATION_CHUNK_CHARS, TRANSLATION_CONTEXT_BEFORE, TRANSLATION_CONTEXT_AFTER)
+    
+    cache_keys: dict[int, str] = {}
+    for chunk in chunks:
+        for span in chunk.spans:
+            span.translation, cache_keys[id(span)] = translation_cache.get(
+                span.text, TRANSLATION_MODEL_ID, TRANSLATION_PROMPT_VERSION
+            )
+    cached = sum(1 for chunk in chunks for span in chunk.spans if span.translation is not None)
+    chunks = [chunk for chunk in chunks if any(span.translation is None for span in chunk.spans)]
+    logger.info(f"[TRANSLATOR] {reused} span(s) from memory, {cached} from cache, "
+                f"{len(chunks)} chunk(s) for {TRANSLATION_MODEL_ID}")
+    
+    # Decided before any chunk starts: the workers fill in these spans' translations
+    pending = {id(span) for chunk in chunks for span in chunk.spans if span.translation is None}
+    pool = _get_pool()
+    futures = {}
+    for chunk in chunks:
+        future = pool.submit(_translate_chunk, chunk, cache_keys)
+        futures.update((id(span), future) for span in chunk.spans)
+    try:
+        for span in spans:
+            if id(span) in pending:
+                # Also waits for the chunk's cache stores
+                futures[id(span)].result()
+            yield translated_piece(span)
+    finally:
+        # The caller stopped early (client gone, a chunk failed): drop the chunks not started yet
+        for future in futures.values():
+            future.cancel()
 
 
 def translate_text(arabic_text: str) -> str:
@@ -90,6 +334,10 @@ def translate_text(arabic_text: str) -> str:
     Translate extracted Arabic text (from OCR) to French using LLM.
     
     The translation follows the structure of Tunisian marriage contracts (acte de mariage).
+    Phrases found in the translation memory reuse their stored translation, and
+    sections translated before come from the translation cache; only the
+    remaining spans are sent to the LLM, with similar stored pairs as examples,
+    in chunks translated concurrently (see iter_translation).
     
     Args:
         arabic_text: Raw Arabic text extracted from document
@@ -102,14 +350,24 @@ def translate_text(arabic_text: str) -> str:
         Exception: If LLM API call fails
     """
     
-    # STATIC RESPONSE - Always return the same translation
-    static_translation = """Louange à Dieu, s'est marié avec la bénédiction et l'aide de Dieu : le jeune Majdi AZZOUNI, de son père Mohamed fils de Taher fils de Belgacem fils de Moubarek AZZOUNI, de sa mère Dalila fille de Sahbi fils de Touhami fils de Mohamed AZZOUNI, né à Tunis, le 12 juin 1993, tunisien, célibataire selon un extrait de son acte de naissance n° 689, émis par la commune de Manouba, le 29 septembre 2025, travailleur à l'étranger, demeurant à Tunis, titulaire de la carte d'identité nationale n° 07194119"""
-    
-    logger.info("[TRANSLATOR] Returning static translation")
-    logger.info(f"[TRANSLATOR] Input length: {len(arabic_text)} characters")
-    logger.info(f"[TRANSLATOR] Translation length: {len(static_translation)} characters")
-    
-    return static_translation
+    translation = "".join(iter_translation(arabic_text)).strip()
+    logger.info(f"[TRANSLATOR] Translation length: {len(translation)} characters")
+    return translation
+
+
+def get_translation_stats() -> dict:
+    """LLM usage, translation-memory reuse and translation cache hits since startup."""
+    with _usage_lock:
+        usage = dict(_usage)
+    return {
+        "model": TRANSLATION_MODEL_ID,
+        "prompt_version": TRANSLATION_PROMPT_VERSION,
+        "concurrency": TRANSLATION_CONCURRENCY,
+        "chunk_chars": TRANSLATION_CHUNK_CHARS,
+        "llm": {**usage, "seconds": round(usage["seconds"], 3)},
+        "memory": translation_memory.get_stats(),
+        "cache": translation_cache.get_stats(),
+    }
 
 
 if __name__ == "__main__":
@@ -2,10 +2,25 @@
 # Example Microservice FastAPI App
 # To add a new endpoint, define it here or in a router and include it.
 
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
 from router import router
+from image_preprocess import shutdown_pool
+from OCR_model import close_clients
+from llm.translator import shutdown_translation_pool
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+	yield
+	# Stop the image preprocessing and translation workers and close pooled OCR connections
+	shutdown_pool()
+	shutdown_translation_pool()
+	await close_clients()
+
 
-app = FastAPI()
+app = FastAPI(lifespan=lifespan)
 app.include_router(router, prefix="")
 
 # Example endpoint (remove if not needed)
@@ -0,0 +1,176 @@
+"""Batch OCR helpers for the automatic_translation microservice.
+
+Uploads (single images, multi-page TIFFs and PDFs) are split into pages, and
+the pages are sent to the vision model concurrently with at most
+`OCR_BATCH_CONCURRENCY` calls in flight. Results are always returned in page
+order; a page that fails carries its error instead of failing the batch.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import io
+import os
+import logging
+from dataclasses import dataclass
+from typing import AsyncIterator, Iterable, Sequence
+
+from PIL import Image, ImageSequence, UnidentifiedImageError
+
+from OCR_model import ModelLoadError, run_ocr_async
+
+logger = logging.getLogger(__name__)
+
+# Vision model calls in flight at once for one batch
+OCR_BATCH_CONCURRENCY = int(os.getenv("OCR_BATCH_CONCURRENCY", "4"))
+# Pages accepted in one batch, across all uploaded files
+OCR_BATCH_MAX_PAGES = int(os.getenv("OCR_BATCH_MAX_PAGES", "50"))
+# Resolution PDF pages are rendered at before OCR
+OCR_PDF_DPI = int(os.getenv("OCR_PDF_DPI", "200"))
+
+# PDF pages and multi-frame images are rendered to JPEG at this quality
+JPEG_QUALITY = 90
+
+
+@dataclass
+class Page:
+    """One page image cut from an upload."""
+
+    number: int        # 1-based position in the batch
+    source: str        # uploaded filename
+    source_page: int   # 1-based position in the uploaded file
+    image_bytes: bytes
+
+
+@dataclass
+class PageResult:
+    """OCR output (or error) for one page."""
+
+    number: int
+    source: str
+    source_page: int
+    text: str = ""
+    error: str | None = None
+
+    def to_dict(self) -> dict:
+        result = {
+            "page": self.number,
+            "source": self.source,
+            "source_page": self.source_page,
+            "text": self.text,
+        }
+        if self.error is not None:
+            result["error"] = self.error
+        return result
+
+
+def split_pages(uploads: Iterable[tuple[str, bytes]], max_pages: int = OCR_BATCH_MAX_PAGES) -> list[Page]:
+    """Split uploaded files into page images, in upload order.
+
+    Raises:
+        ValueError: If a file is empty, not an image or PDF, or the batch has too many pages
+    """
+    pages: list[Page] = []
+    for filename, data in uploads:
+        if not data:
+            raise ValueError(f"Empty file: {filename}")
+
+        remaining = max_pages - len(pages)
+        if data[:5] == b"%PDF-":
+            images = _pdf_pages(data, filename, remaining)
+        else:
+            images = _image_pages(data, filename, remaining)
+
+        for index, image_bytes in enumerate(images, start=1):
+            pages.append(Page(len(pages) + 1, filename, index, image_bytes))
+        logger.info(f"[OCR] {filename}: {len(images)} page(s)")
+
+    if not pages:
+        raise ValueError("No pages to process")
+    return pages
+
+
+def _check_page_count(count: int, remaining: int, filename: str) -> None:
+    if count > remaining:
+        raise ValueError(
+            f"{filename} brings the batch over the {OCR_BATCH_MAX_PAGES} page limit"
+        )
+
+
+def _image_pages(data: bytes, filename: str, remaining: int) -> list[bytes]:
+    try:
+        image = Image.open(io.BytesIO(data))
+        frames = getattr(image, "n_frames", 1)
+    except UnidentifiedImageError as exc:
+        raise ValueError(f"{filename} is not a valid image or PDF") from exc
+
+    _check_page_count(frames, remaining, filename)
+    if frames == 1:
+        # Single images are sent unchanged
+        return [data]
+    return [_to_jpeg(frame) for frame in ImageSequence.Iterator(image)]
+
+
+def _pdf_pages(data: bytes, filename: str, remaining: int) -> list[bytes]:
+    try:
+        import pypdfium2 as pdfium
+    except ImportError as exc:
+        raise ValueError("PDF uploads need the pypdfium2 package") from exc
+
+    try:
+        pdf = pdfium.PdfDocument(data)
+    except pdfium.PdfiumError as exc:
+        raise ValueError(f"{filename} is not a valid PDF") from exc
+
+    try:
+        _check_page_count(len(pdf), remaining, filename)
+        return [
+            _to_jpeg(page.render(scale=OCR_PDF_DPI / 72).to_pil())
+            for page in pdf
+        ]
+    finally:
+        pdf.close()
+
+
+def _to_jpeg(image: Image.Image) -> bytes:
+    buffer = io.BytesIO()
+    image.convert("RGB").save(buffer, format="JPEG", quality=JPEG_QUALITY)
+    return buffer.getvalue()
+
+
+async def ocr_pages(
+    pages: Sequence[Page],
+    concurrency: int = OCR_BATCH_CONCURRENCY,
+    prompt_override: str | None = None,
+) -> AsyncIterator[PageResult]:
+    """OCR pages concurrently and yield their results in page order.
+
+    Later pages keep being processed while an earlier one is still running;
+    a finished page is yielded as soon as every page before it is done.
+    """
+    semaphore = asyncio.Semaphore(max(1, concurrency))
+
+    async def ocr_page(page: Page) -> PageResult:
+        async with semaphore:
+            result = PageResult(page.number, page.source, page.source_page)
+            try:
+                result.text = await run_ocr_async(page.image_bytes, prompt_override)
+            except (ValueError, ModelLoadError) as exc:
+                logger.error(f"[OCR] Page {page.number} failed: {exc}")
+                result.error = str(exc)
+            return result
+
+    logger.info(f"[OCR] Processing {len(pages)} page(s), {concurrency} at a time")
+    tasks = [asyncio.create_task(ocr_page(page)) for page in pages]
+    try:
+        for task in tasks:
+            yield await task
+    finally:
+        # Stop pending pages if the caller goes away (e.g. stream client disconnected)
+        for task in tasks:
+            task.cancel()
+
+
+def merge_text(results: Iterable[PageResult]) -> str:
+    """Text of every successful page, in page order."""
+    return "\n\n".join(result.text for result in results if result.text)
@@ -0,0 +1,142 @@
+"""Persistent OCR result cache for the automatic_translation microservice.
+
+The same scan is often uploaded more than once (retries, a second translator
+working on the same contract). Results are stored in SQLite under a content
+address: the SHA-256 of the normalized (preprocessed) image bytes, the model
+ID and the prompt, so a different model or prompt never reuses a result.
+
+The cache is bounded by the size of the stored text (`OCR_CACHE_MAX_BYTES`);
+the least recently used entries are evicted first. Near-duplicate lookup
+(re-encoded or slightly edited copies of a cached image) is opt-in: with
+`OCR_CACHE_PHASH=true` a 64-bit difference hash of each image is stored and
+an exact miss falls back to the closest cached image within
+`OCR_CACHE_PHASH_DISTANCE` bits, for the same model and prompt.
+"""
+
+from __future__ import annotations
+
+import io
+import os
+import hashlib
+import logging
+import sqlite3
+
+from PIL import Image
+
+from sqlite_lru import SQLiteLRUCache, content_key
+
+logger = logging.getLogger(__name__)
+
+OCR_CACHE_ENABLED = os.getenv("OCR_CACHE_ENABLED", "true").lower() == "true"
+OCR_CACHE_PATH = os.getenv("OCR_CACHE_PATH", "ocr_cache.db")
+# Total size of cached text before least recently used entries are evicted
+OCR_CACHE_MAX_BYTES = int(os.getenv("OCR_CACHE_MAX_BYTES", str(100 * 1024 * 1024)))
+# Near-duplicate lookup by perceptual hash (off by default: a near match may differ in a digit)
+OCR_CACHE_PHASH = os.getenv("OCR_CACHE_PHASH", "false").lower() == "true"
+# Largest Hamming distance between two 64-bit hashes that counts as the same image
+OCR_CACHE_PHASH_DISTANCE = int(os.getenv("OCR_CACHE_PHASH_DISTANCE", "4"))
+
+
+def cache_key(image_bytes: bytes, model_id: str, prompt: str) -> str:
+    """Content address of an OCR request."""
+    return content_key(model_id, prompt, image_bytes)
+
+
+def difference_hash(image_bytes: bytes) -> int:
+    """64-bit dHash: brightness gradients of a 9x8 grayscale thumbnail."""
+    image = Image.open(io.BytesIO(image_bytes))
+    image.draft("L", (64, 64))
+    pixels = list(image.convert("L").resize((9, 8), Image.LANCZOS).getdata())
+    value = 0
+    for row in range(8):
+        for column in range(8):
+            value = (value << 1) | (pixels[row * 9 + column] > pixels[row * 9 + column + 1])
+    return value
+
+
+class OCRCache(SQLiteLRUCache):
+    """SQLite-backed, size-bounded LRU cache of OCR text."""
+
+    table = "ocr_results"
+    value_column = "text"
+    # scope: model and prompt, to which near-duplicate lookups are restricted
+    columns = ("scope TEXT NOT NULL", "phash INTEGER")
+    indexes = ("scope",)
+    log_prefix = "[OCR]"
+    label = "Result cache"
+    log_hits = True
+
+    def __init__(
+        self,
+        path: str = OCR_CACHE_PATH,
+        max_bytes: int = OCR_CACHE_MAX_BYTES,
+        phash: bool = OCR_CACHE_PHASH,
+        phash_distance: int = OCR_CACHE_PHASH_DISTANCE,
+        enabled: bool = OCR_CACHE_ENABLED,
+    ):
+        super().__init__(path, max_bytes, enabled)
+        self.phash = phash
+        self.phash_distance = phash_distance
+        self._stats["near_hits"] = 0
+
+    def get(self, image_bytes: bytes, model_id: str, prompt: str) -> tuple[str | None, str]:
+        """Cached text for this image, model and prompt.
+
+        Returns:
+            (text or None, key to pass to put() after a miss)
+        """
+        key = cache_key(image_bytes, model_id, prompt)
+        near = None
+        if self.phash:
+            near = lambda conn: self._nearest(conn, image_bytes, self._scope(model_id, prompt))
+        return self.lookup(key, near), key
+
+    def put(self, key: str, image_bytes: bytes, model_id: str, prompt: str, text: str) -> None:
+        """Store an OCR result, evicting least recently used entries if over max_bytes."""
+        if not self.enabled or not text:
+            return
+
+        try:
+            phash = _signed(difference_hash(image_bytes)) if self.phash else None
+        except (OSError, ValueError) as exc:
+            logger.error(f"[OCR] Cache store failed: {exc}")
+            return
+        self.store(key, text, scope=self._scope(model_id, prompt), phash=phash)
+
+    def _nearest(self, conn: sqlite3.Connection, image_bytes: bytes, scope: str) -> tuple[str, str] | None:
+        try:
+            target = difference_hash(image_bytes)
+        except Exception as exc:
+            logger.warning(f"[OCR] Perceptual hash failed: {exc}")
+            return None
+
+        best = None
+        for key, phash in conn.execute(
+            "SELECT key, phash FROM ocr_results WHERE scope = ? AND phash IS NOT NULL", (scope,)
+        ):
+            distance = ((phash & 0xFFFFFFFFFFFFFFFF) ^ target).bit_count()
+            if distance <= self.phash_distance and (best is None or distance < best[1]):
+                best = (key, distance)
+        if best is None:
+            return None
+        text = conn.execute("SELECT text FROM ocr_results WHERE key = ?", (best[0],)).fetchone()[0]
+        self._stats["near_hits"] += 1
+        logger.info(f"[OCR] Cache near hit {best[0][:12]} ({best[1]} bits apart)")
+        return best[0], text
+
+    @staticmethod
+    def _scope(model_id: str, prompt: str) -> str:
+        return hashlib.sha256(f"{model_id}\0{prompt}".encode()).hexdigest()[:32]
+
+    def get_stats(self) -> dict:
+        """Hit counts, size and configuration."""
+        return {**super().get_stats(), "phash": self.phash, "phash_distance": self.phash_distance}
+
+
+def _signed(value: int) -> int:
+    """SQLite integers are signed 64-bit."""
+    return value - (1 << 64) if value >= 1 << 63 else value
+
+
+# Shared cache used by run_ocr
+ocr_cache = OCRCache()
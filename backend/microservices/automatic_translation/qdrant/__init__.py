@@ -0,0 +1 @@
+# Qdrant ingestion for the translation memory
@@ -0,0 +1,323 @@
+"""Incremental ingestion of translated contracts into the translation-memory collection.
+
+Each phrase pair becomes one point whose ID is a hash of its content
+(document ID, Arabic, French), so re-running the ingestion is idempotent.
+Documents whose content hash is already stored are skipped entirely; the
+others are split and aligned (qdrant/pairs.py), pairs already in the
+collection are skipped, and only new pairs are encoded (in batches) and
+upserted (in chunks, several in parallel). Points of a re-ingested document that no longer
+exist in it are deleted, so an edited translation replaces the old one.
+
+The content hash (`document_hash`) is written on a document's points only
+once all of them are stored and the stale ones deleted: a run interrupted
+midway leaves the document to be ingested again by the next run.
+
+The collection is created on first run (never wiped unless --recreate), with
+payload indexes on `document_id` and `document_hash` and optional int8 scalar
+quantization.
+
+Usage (from the service directory):
+    python -m qdrant.ingest [--documents qdrant/documents.json] [--batch-size 64]
+                            [--upload-batch 256] [--parallel 4] [--quantization int8] [--recreate]
+"""
+
+from __future__ import annotations
+
+import os
+import sys
+import time
+import uuid
+import json
+import hashlib
+import logging
+import argparse
+from dataclasses import asdict, dataclass
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from qdrant_client import QdrantClient, models
+
+# Service directory on the path, also when run as a script
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from qdrant.pairs import (  # noqa: E402
+    ALIGN_LENGTH_WEIGHT, ALIGN_MERGE_PENALTY, ALIGN_MIN_SCORE, ALIGN_SKIP_COST, DOCUMENTS_PATH, document_pairs, load_documents,
+)
+from llm.translation_memory import QDRANT_URL, TM_COLLECTION, TM_EMBEDDING_MODEL  # noqa: E402
+
+logging.basicConfig(level=logging.INFO, format="[%(levelname)s] %(message)s")
+logger = logging.getLogger(__name__)
+
+# IDs checked against the collection per request
+_RETRIEVE_BATCH = 1024
+
+
+@dataclass
+class IngestReport:
+    documents: int = 0
+    pairs: int = 0
+    unchanged: int = 0
+    skipped: int = 0
+    upserted: int = 0
+    pruned: int = 0
+    encode_seconds: float = 0.0
+    upload_seconds: float = 0.0
+
+
+def point_id(document_id, source_ar: str, source_fr: str) -> str:
+    """Stable UUID derived from the pair's content."""
+    digest = hashlib.sha256()
+    for part in (str(document_id), source_ar, source_fr):
+        part = part.encode("utf-8")
+        digest.update(len(part).to_bytes(8, "big"))
+        digest.update(part)
+    return str(uuid.UUID(bytes=digest.digest()[:16]))
+
+
+def document_hash(doc: dict, model_name: str) -> str:
+    """Hash of everything the document's points are derived from."""
+    content = {
+        "source": doc.get("source", ""),
+        "translation": doc.get("translation", ""),
+        "segments": doc.get("segments"),
+        "model": model_name,
+        "alignment": [ALIGN_SKIP_COST, ALIGN_MERGE_PENALTY, ALIGN_LENGTH_WEIGHT, ALIGN_MIN_SCORE],
+    }
+    return hashlib.sha256(json.dumps(content, ensure_ascii=False, sort_keys=True).encode("utf-8")).hexdigest()
+
+
+def document_points(doc: dict, encode=None) -> list[tuple[str, str, dict]]:
+    """(point ID, text to embed, payload) for every pair of a document (document_hash is set by mark_stored)."""
+    pairs = [(ar.strip(), fr.strip()) for ar, fr in document_pairs(doc, encode) if ar.strip() and fr.strip()]
+    if not pairs:
+        # fallback: encode as full doc
+        ar_text, fr_text = doc.get("source", ""), doc.get("translation", "")
+        payload = {"source": ar_text, "translation": fr_text, "document_id": doc["id"]}
+        return [(point_id(doc["id"], ar_text, fr_text), ar_text + "\n" + fr_text, payload)]
+
+    return [
+        (
+            point_id(doc["id"], arp, frp),
+            arp + "\n" + frp,
+            {"source_ar": arp, "source_fr": frp, "document_id": doc["id"], "phrase_index": idx},
+        )
+        for idx, (arp, frp) in enumerate(pairs)
+    ]
+
+
+def is_stored(client: QdrantClient, collection: str, document_id, doc_hash: str) -> bool:
+    """Whether the collection already holds this version of the document."""
+    version = models.Filter(must=[
+        models.FieldCondition(key="document_id", match=models.MatchValue(value=document_id)),
+        models.FieldCondition(key="document_hash", match=models.MatchValue(value=doc_hash)),
+    ])
+    return client.count(collection_name=collection, count_filter=version, exact=True).count > 0
+
+
+def mark_stored(client: QdrantClient, collection: str, hashes: dict, points: dict) -> None:
+    """Write each document's hash on its points, once they are all stored: is_stored is true from then on."""
+    operations = [
+        models.SetPayloadOperation(set_payload=models.SetPayload(payload={"document_hash": hashes[document_id]}, points=ids))
+        for document_id, ids in points.items()
+    ]
+    if operations:
+        client.batch_update_points(collection_name=collection, update_operations=operations, wait=True)
+
+
+def ensure_collection(client: QdrantClient, collection: str, vector_size: int, quantization: str | None, recreate: bool) -> None:
+    """Create the collection if needed, with its payload index and quantization."""
+    quantization_config = None
+    if quantization == "int8":
+        quantization_config = models.ScalarQuantization(
+            scalar=models.ScalarQuantizationConfig(type=models.ScalarType.INT8, quantile=0.99, always_ram=True)
+        )
+
+    if recreate and client.collection_exists(collection):
+        logger.warning(f"[INGEST] Deleting collection '{collection}' (--recreate)")
+        client.delete_collection(collection)
+
+    if not client.collection_exists(collection):
+        client.create_collection(
+            collection_name=collection,
+            vectors_config=models.VectorParams(size=vector_size, distance=models.Distance.COSINE),
+            quantization_config=quantization_config,
+        )
+        logger.info(f"[INGEST] Created collection '{collection}' (vector size {vector_size}, quantization {quantization})")
+    else:
+        info = client.get_collection(collection)
+        if info.config.params.vectors.size != vector_size:
+            raise ValueError(
+                f"Collection '{collection}' has vector size {info.config.params.vectors.size}, "
+                f"the model produces {vector_size}; use --recreate"
+            )
+        if quantization_config is not None and info.config.quantization_config is None:
+            client.update_collection(collection_name=collection, quantization_config=quantization_config)
+            logger.info(f"[INGEST] Enabled {quantization} quantization on '{collection}'")
+
+    schema = client.get_collection(collection).payload_schema or {}
+    for field, field_schema in (("document_id", models.PayloadSchemaType.INTEGER), ("document_hash", models.PayloadSchemaType.KEYWORD)):
+        if field not in schema:
+            client.create_payload_index(collection_name=collection, field_name=field, field_schema=field_schema, wait=True)
+            logger.info(f"[INGEST] Created payload index on {field}")
+
+
+def stored_payloads(client: QdrantClient, collection: str, ids: list[str]) -> dict:
+    """phrase_index of each ID among ids that is already stored."""
+    found = {}
+    for start in range(0, len(ids), _RETRIEVE_BATCH):
+        records = client.retrieve(
+            collection_name=collection,
+            ids=ids[start:start + _RETRIEVE_BATCH],
+            with_payload=["phrase_index"],
+            with_vectors=False,
+        )
+        found.update((str(record.id), record.payload or {}) for record in records)
+    return found
+
+
+def prune_documents(client: QdrantClient, collection: str, keep: dict) -> int:
+    """Delete the points of each document whose ID is not in keep[document_id]; returns how many."""
+    deleted = 0
+    for document_id, ids in keep.items():
+        stale = models.Filter(
+            must=[models.FieldCondition(key="document_id", match=models.MatchValue(value=document_id))],
+            must_not=[models.HasIdCondition(has_id=ids)],
+        )
+        count = client.count(collection_name=collection, count_filter=stale, exact=True).count
+        if count:
+            client.delete(collection_name=collection, points_selector=models.FilterSelector(filter=stale), wait=True)
+            deleted += count
+    return deleted
+
+
+def upload(client: QdrantClient, collection: str, points: list[models.PointStruct], chunk_size: int, parallel: int) -> None:
+    """Upsert points in chunks, `parallel` chunks at a time, logging progress."""
+    chunks = [points[start:start + chunk_size] for start in range(0, len(points), chunk_size)]
+    started = time.perf_counter()
+    done = 0
+    with ThreadPoolExecutor(max_workers=max(1, parallel)) as pool:
+        futures = {
+            pool.submit(client.upsert, collection_name=collection, points=chunk, wait=True): len(chunk)
+            for chunk in chunks
+        }
+        for future in as_completed(futures):
+            future.result()
+            done += futures[future]
+            elapsed = time.perf_counter() - started
+            logger.info(f"[INGEST] Upserted {done}/{len(points)} points ({done / elapsed:.0f} points/s)")
+
+
+def ingest(
+    documents: list[dict],
+    client: QdrantClient,
+    collection: str = TM_COLLECTION,
+    model_name: str = TM_EMBEDDING_MODEL,
+    batch_size: int = 64,
+    upload_batch: int = 256,
+    parallel: int = 4,
+    quantization: str | None = None,
+    recreate: bool = False,
+    prune: bool = True,
+) -> IngestReport:
+    """Add new and changed phrase pairs of documents to the collection."""
+    from sentence_transformers import SentenceTransformer
+
+    report = IngestReport(documents=len(documents))
+    model = SentenceTransformer(model_name)
+    ensure_collection(client, collection, model.get_sentence_embedding_dimension(), quantization, recreate)
+
+    def encode(texts):
+        return model.encode(texts, batch_size=batch_size, normalize_embeddings=True)
+
+    points = []
+    hashes = {}
+    for doc in documents:
+        doc_hash = document_hash(doc, model_name)
+        if not recreate and is_stored(client, collection, doc["id"], doc_hash):
+            report.unchanged += 1
+            continue
+        hashes[doc["id"]] = doc_hash
+        # Phrases of new and edited documents are embedded once more, to align them
+        points.extend(document_points(doc, encode))
+    # Identical pairs within the input are stored once
+    points = list({point[0]: point for point in points}.values())
+    report.pairs = len(points)
+
+    stored = stored_payloads(client, collection, [point[0] for point in points])
+    new = [point for point in points if point[0] not in stored]
+    report.skipped = len(points) - len(new)
+    logger.info(
+        f"[INGEST] {len(documents)} documents, {report.unchanged} unchanged; "
+        f"{len(points)} pairs in the others: {report.skipped} already stored, {len(new)} new"
+    )
+
+    # Pairs kept in an edited document may have moved: update the payload, not the vector
+    moved = []
+    for pid, _, payload in points:
+        if pid in stored and "phrase_index" in payload and stored[pid].get("phrase_index") != payload["phrase_index"]:
+            changes = {"phrase_index": payload["phrase_index"]}
+            moved.append(models.SetPayloadOperation(set_payload=models.SetPayload(payload=changes, points=[pid])))
+    if moved:
+        client.batch_update_points(collection_name=collection, update_operations=moved, wait=True)
+
+    if new:
+        started = time.perf_counter()
+        vectors = model.encode(
+            [text for _, text, _ in new], batch_size=batch_size, normalize_embeddings=True, show_progress_bar=len(new) > batch_size
+        )
+        report.encode_seconds = time.perf_counter() - started
+        logger.info(f"[INGEST] Encoded {len(new)} pairs in {report.encode_seconds:.2f}s ({len(new) / report.encode_seconds:.0f} pairs/s)")
+
+        started = time.perf_counter()
+        upload(
+            client,
+            collection,
+            [models.PointStruct(id=pid, vector=vector.tolist(), payload=payload) for (pid, _, payload), vector in zip(new, vectors)],
+            upload_batch,
+            parallel,
+        )
+        report.upload_seconds = time.perf_counter() - started
+        report.upserted = len(new)
+
+    keep: dict = {}
+    for pid, _, payload in points:
+        keep.setdefault(payload["document_id"], []).append(pid)
+    if prune:
+        report.pruned = prune_documents(client, collection, keep)
+    # Last: a document is only skipped by later runs once all of the above succeeded
+    mark_stored(client, collection, hashes, keep)
+
+    return report
+
+
+def main(argv: list[str] | None = None) -> IngestReport:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--documents", default=DOCUMENTS_PATH, help="JSON list of translated documents")
+    parser.add_argument("--url", default=QDRANT_URL)
+    parser.add_argument("--collection", default=TM_COLLECTION)
+    parser.add_argument("--model", default=TM_EMBEDDING_MODEL)
+    parser.add_argument("--batch-size", type=int, default=64, help="texts per model.encode batch")
+    parser.add_argument("--upload-batch", type=int, default=256, help="points per upsert request")
+    parser.add_argument("--parallel", type=int, default=4, help="concurrent upsert requests")
+    parser.add_argument("--quantization", choices=["none", "int8"], default="none")
+    parser.add_argument("--recreate", action="store_true", help="delete the collection first")
+    parser.add_argument("--no-prune", action="store_true", help="keep points no longer in the ingested documents")
+    args = parser.parse_args(argv)
+
+    report = ingest(
+        load_documents(args.documents),
+        QdrantClient(url=args.url),
+        collection=args.collection,
+        model_name=args.model,
+        batch_size=args.batch_size,
+        upload_batch=args.upload_batch,
+        parallel=args.parallel,
+        quantization=None if args.quantization == "none" else args.quantization,
+        recreate=args.recreate,
+        prune=not args.no_prune,
+    )
+    logger.info(f"[INGEST] Done: {asdict(report)}")
+    return report
+
+
+if __name__ == "__main__":
+    main()
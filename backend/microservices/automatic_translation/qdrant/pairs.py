@@ -0,0 +1,200 @@
+"""Aligned Arabic/French phrase pairs from translated contracts.
+
+Shared by the Qdrant ingestion (qdrant/ingest.py) and the in-process
+translation memory (llm/translation_memory.py), so both index the same pairs.
+Documents without explicit segments are split into phrases on both sides and
+aligned monotonically by embedding similarity, allowing 1-2 and 2-1 merges
+and unmatched phrases, so differing phrase counts do not shift every later pair.
+"""
+
+import os
+import json
+import re
+from typing import Callable, List, Optional
+
+import numpy as np
+
+DOCUMENTS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "documents.json")
+
+
+def normalize_text(text: str) -> str:
+    # Strip and normalize spaces but keep newlines
+    if text is None:
+        return ""
+    text = text.replace('\r', '\n').strip()
+    return re.sub(r"[ \t]+", " ", text)
+
+
+def split_arabic_phrases(text: str) -> List[str]:
+    # Split by Arabic punctuation and newlines; preserve meaningful headers
+    text = normalize_text(text)
+    # Split by double newlines first (sections)
+    sections = [s.strip() for s in re.split(r"\n{2,}", text) if s.strip()]
+    phrases = []
+    for s in sections:
+        # further split long sections by Arabic punctuation or comma
+        parts = [p.strip() for p in re.split(r"[؟!\.|،,؛;:\n]", s) if p.strip()]
+        # If very long parts remain, split into word chunks
+        for p in parts:
+            if len(p.split()) > 60:
+                words = p.split()
+                for i in range(0, len(words), 30):
+                    phrases.append(' '.join(words[i:i+30]).strip())
+            else:
+                phrases.append(p)
+    return phrases
+
+
+def split_french_phrases(text: str) -> List[str]:
+    text = normalize_text(text)
+    sections = [s.strip() for s in re.split(r"\n{2,}", text) if s.strip()]
+    phrases = []
+    for s in sections:
+        parts = [p.strip() for p in re.split(r"[.!?;:\n]", s) if p.strip()]
+        for p in parts:
+            if len(p.split()) > 60:
+                words = p.split()
+                for i in range(0, len(words), 30):
+                    phrases.append(' '.join(words[i:i+30]).strip())
+            else:
+                phrases.append(p)
+    return phrases
+
+
+# Alignment costs: 1 - cosine similarity, plus these terms (Gale-Church-style moves)
+ALIGN_SKIP_COST = float(os.getenv("ALIGN_SKIP_COST", "0.4"))        # phrase left without a translation
+ALIGN_MERGE_PENALTY = float(os.getenv("ALIGN_MERGE_PENALTY", "0.1"))  # 1-2 and 2-1 merges
+ALIGN_LENGTH_WEIGHT = float(os.getenv("ALIGN_LENGTH_WEIGHT", "0.1"))  # per unit of |log length ratio|
+# Aligned pairs below this similarity are not indexed
+ALIGN_MIN_SCORE = float(os.getenv("ALIGN_MIN_SCORE", "0.4"))
+
+# Backtrace moves: (Arabic phrases, French phrases) consumed
+_MOVES = [(1, 1), (1, 2), (2, 1), (1, 0), (0, 1)]
+
+
+def _normalized(vectors: np.ndarray) -> np.ndarray:
+    return vectors / np.maximum(np.linalg.norm(vectors, axis=-1, keepdims=True), 1e-12)
+
+
+def _length_cost(ar_lengths: np.ndarray, fr_lengths: np.ndarray, ratio: float) -> np.ndarray:
+    return ALIGN_LENGTH_WEIGHT * np.abs(np.log((fr_lengths[None, :] + 1) / (ratio * (ar_lengths[:, None] + 1))))
+
+
+def align_indices(
+    ar_vectors: np.ndarray,
+    fr_vectors: np.ndarray,
+    ar_lengths: List[int],
+    fr_lengths: List[int],
+) -> List[tuple]:
+    """Monotonic alignment of two phrase sequences from their embeddings.
+
+    Dynamic programming over 1-1, 1-2, 2-1, 1-0 and 0-1 moves. Each row of the
+    cost table is computed with NumPy; 0-1 moves (skipped French phrases)
+    within a row are a running minimum.
+
+    Returns:
+        [(Arabic indexes, French indexes, cosine similarity)] for the 1-1, 1-2
+        and 2-1 moves, in order
+    """
+    n, m = len(ar_vectors), len(fr_vectors)
+    if n == 0 or m == 0:
+        return []
+
+    ar_vectors, fr_vectors = _normalized(ar_vectors), _normalized(fr_vectors)
+    ar_len = np.asarray(ar_lengths, dtype=np.float64)
+    fr_len = np.asarray(fr_lengths, dtype=np.float64)
+    ratio = (fr_len.sum() + 1) / (ar_len.sum() + 1)
+
+    # Similarity of every Arabic phrase (or adjacent two) with every French phrase (or adjacent two)
+    sim = {(1, 1): ar_vectors @ fr_vectors.T}
+    cost = {(1, 1): 1 - sim[(1, 1)] + _length_cost(ar_len, fr_len, ratio)}
+    if m > 1:
+        sim[(1, 2)] = ar_vectors @ _normalized(fr_vectors[:-1] + fr_vectors[1:]).T
+        cost[(1, 2)] = 1 - sim[(1, 2)] + _length_cost(ar_len, fr_len[:-1] + fr_len[1:], ratio) + ALIGN_MERGE_PENALTY
+    if n > 1:
+        sim[(2, 1)] = _normalized(ar_vectors[:-1] + ar_vectors[1:]) @ fr_vectors.T
+        cost[(2, 1)] = 1 - sim[(2, 1)] + _length_cost(ar_len[:-1] + ar_len[1:], fr_len, ratio) + ALIGN_MERGE_PENALTY
+
+    total = np.full((n + 1, m + 1), np.inf)
+    back = np.zeros((n + 1, m + 1), dtype=np.int8)
+    columns = np.arange(m + 1)
+    total[0] = columns * ALIGN_SKIP_COST
+    back[0, 1:] = _MOVES.index((0, 1))
+
+    for i in range(1, n + 1):
+        candidates = np.full((4, m + 1), np.inf)
+        candidates[0, 1:] = total[i - 1, :-1] + cost[(1, 1)][i - 1]
+        if (1, 2) in cost:
+            candidates[1, 2:] = total[i - 1, :-2] + cost[(1, 2)][i - 1]
+        if i >= 2 and (2, 1) in cost:
+            candidates[2, 1:] = total[i - 2, :-1] + cost[(2, 1)][i - 2]
+        candidates[3] = total[i - 1] + ALIGN_SKIP_COST
+        move = candidates.argmin(axis=0)
+        best = candidates[move, columns]
+
+        # Skipping French phrases: total[i, j] = min over k <= j of best[k] + (j - k) * skip
+        row = np.minimum.accumulate(best - columns * ALIGN_SKIP_COST) + columns * ALIGN_SKIP_COST
+        total[i] = row
+        back[i] = np.where(row < best - 1e-12, _MOVES.index((0, 1)), move)
+
+    aligned = []
+    i, j = n, m
+    while i > 0 or j > 0:
+        di, dj = _MOVES[back[i, j]]
+        if di and dj:
+            aligned.append((list(range(i - di, i)), list(range(j - dj, j)), float(sim[(di, dj)][i - di, j - dj])))
+        i, j = i - di, j - dj
+    aligned.reverse()
+    return aligned
+
+
+def align_phrases(
+    ar_phrases: List[str],
+    fr_phrases: List[str],
+    encode: Callable[[List[str]], Optional[np.ndarray]],
+    min_score: float = ALIGN_MIN_SCORE,
+) -> List[tuple]:
+    """(Arabic, French) pairs aligned by embedding similarity; weak pairs are dropped.
+
+    encode embeds a list of texts in one batch (None if no model is available).
+    """
+    if not ar_phrases or not fr_phrases:
+        return []
+    vectors = encode(ar_phrases + fr_phrases)
+    if vectors is None:
+        return []
+
+    vectors = np.asarray(vectors, dtype=np.float32)
+    aligned = align_indices(
+        vectors[:len(ar_phrases)],
+        vectors[len(ar_phrases):],
+        [len(p) for p in ar_phrases],
+        [len(p) for p in fr_phrases],
+    )
+    return [
+        (' '.join(ar_phrases[i] for i in ar_idx), ' '.join(fr_phrases[j] for j in fr_idx))
+        for ar_idx, fr_idx, score in aligned
+        if score >= min_score
+    ]
+
+
+def load_documents(path: str = DOCUMENTS_PATH) -> List[dict]:
+    """Translated contracts: id, source (Arabic), translation (French), optional segments."""
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def document_pairs(doc: dict, encode: Optional[Callable[[List[str]], Optional[np.ndarray]]] = None) -> List[tuple]:
+    """(Arabic, French) phrase pairs of a document.
+
+    Explicit segments are used verbatim; otherwise both texts are split into
+    phrases and aligned with encode. Without encode, such documents have no pairs.
+    """
+    # If the user has provided explicit segments, use them verbatim (preferred)
+    if "segments" in doc and isinstance(doc["segments"], list) and len(doc["segments"]) > 0:
+        return [(s.get("source_ar", ""), s.get("source_fr", "")) for s in doc["segments"]]
+    if encode is None:
+        return []
+    ar_phrases = split_arabic_phrases(doc.get("source", ""))
+    fr_phrases = split_french_phrases(doc.get("translation", ""))
+    return align_phrases(ar_phrases, fr_phrases, encode)
@@ -1,5 +1,9 @@
 from fastapi import APIRouter, File, HTTPException, UploadFile
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
+from typing import List
+import asyncio
+import json
 import logging
 import sys
 import os
@@ -7,8 +11,10 @@ import os
 # Add current directory to path for imports
 sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 
-from OCR_model import ModelLoadError, run_ocr
-from llm.translator import translate_text
+from OCR_model import ModelLoadError, run_ocr_async
+from ocr_batch import Page, merge_text, ocr_pages, split_pages
+from ocr_cache import ocr_cache
+from llm.translator import get_translation_stats, iter_translation, translate_text
 
 logging.basicConfig(level=logging.INFO, format="[%(levelname)s] %(message)s")
 logger = logging.getLogger(__name__)
@@ -39,7 +45,7 @@ async def extract_text(file: UploadFile = File(...)):
         image_bytes = await file.read()
         logger.info(f"[API] Read {len(image_bytes)} bytes from upload")
         
-        text = run_ocr(image_bytes)
+        text = await run_ocr_async(image_bytes)
         
         logger.info(f"[API] OCR completed successfully")
         return {"text": text}
@@ -55,6 +61,79 @@ async def extract_text(file: UploadFile = File(...)):
         raise HTTPException(status_code=500, detail="Internal server error")
 
 
+@router.get("/ocr/cache")
+def get_ocr_cache_stats():
+    """OCR result cache hits, size and settings."""
+    return ocr_cache.get_stats()
+
+
+async def _read_pages(files: List[UploadFile]) -> List[Page]:
+    """Read the uploads and split them into pages (HTTP 400 on invalid files)."""
+    uploads = []
+    for file in files:
+        uploads.append((file.filename or f"file-{len(uploads) + 1}", await file.read()))
+    logger.info(f"[API] Read {len(uploads)} file(s), {sum(len(data) for _, data in uploads)} bytes")
+
+    try:
+        # Decoding and PDF rendering are CPU-bound
+        return await asyncio.to_thread(split_pages, uploads)
+    except ValueError as exc:
+        logger.error(f"[API] Validation error: {exc}")
+        raise HTTPException(status_code=400, detail=str(exc))
+
+
+@router.post("/ocr/batch")
+async def extract_text_batch(files: List[UploadFile] = File(...)):
+    """
+    Extract text from several images or a multi-page PDF/TIFF.
+    
+    Pages are OCR'd concurrently and returned in order, each with its own
+    text (or error), together with the merged text of all pages.
+    """
+    
+    logger.info(f"[API] POST /ocr/batch - Received {len(files)} file(s)")
+    pages = await _read_pages(files)
+    
+    results = [result async for result in ocr_pages(pages)]
+    failed = [result for result in results if result.error is not None]
+    if len(failed) == len(results):
+        logger.error(f"[API] OCR failed for every page: {failed[0].error}")
+        raise HTTPException(status_code=500, detail=failed[0].error)
+    
+    logger.info(f"[API] Batch OCR completed: {len(results) - len(failed)}/{len(results)} pages")
+    return {
+        "page_count": len(results),
+        "failed_pages": [result.number for result in failed],
+        "pages": [result.to_dict() for result in results],
+        "text": merge_text(results),
+    }
+
+
+@router.post("/ocr/batch/stream")
+async def extract_text_batch_stream(files: List[UploadFile] = File(...)):
+    """
+    Same as /ocr/batch, streamed as NDJSON.
+    
+    One line per page as soon as it and every page before it are done,
+    then a final line: {"done": true, "page_count": ..., "text": merged text}.
+    """
+    
+    logger.info(f"[API] POST /ocr/batch/stream - Received {len(files)} file(s)")
+    pages = await _read_pages(files)
+    
+    async def page_lines():
+        results = []
+        async for result in ocr_pages(pages):
+            results.append(result)
+            yield json.dumps(result.to_dict(), ensure_ascii=False) + "\n"
+        yield json.dumps(
+            {"done": True, "page_count": len(results), "text": merge_text(results)},
+            ensure_ascii=False,
+        ) + "\n"
+    
+    return StreamingResponse(page_lines(), media_type="application/x-ndjson")
+
+
 @router.post("/translate")
 async def translate_arabic_text(request: TranslateRequest):
     """
@@ -81,7 +160,8 @@ async def translate_arabic_text(request: TranslateRequest):
     
     try:
         logger.info("[API] Starting LLM translation")
-        translation = translate_text(request.text)
+        # Embedding, retrieval and the LLM call block: keep them off the event loop
+        translation = await asyncio.to_thread(translate_text, request.text)
         
         logger.info("[API] Translation completed successfully")
         return {"translation": translation}
@@ -92,3 +172,47 @@ async def translate_arabic_text(request: TranslateRequest):
     except Exception as exc:
         logger.error(f"[API] Translation failed: {exc}", exc_info=True)
         raise HTTPException(status_code=500, detail="Translation service error")
+
+
+@router.post("/translate/stream")
+async def translate_arabic_text_stream(request: TranslateRequest):
+    """
+    Same as /translate, streamed as NDJSON.
+    
+    The text is translated in chunks, concurrently; one line per translated
+    piece, in order, as soon as it and every piece before it are done:
+    {"index": n, "text": "French piece"}, then a final line:
+    {"done": true, "translation": full translation} (or {"done": true, "error": ...}).
+    """
+    
+    if not request.text or not request.text.strip():
+        logger.error("[API] Translation request with empty text")
+        raise HTTPException(status_code=400, detail="Text cannot be empty")
+    
+    logger.info(f"[API] POST /translate/stream - Received {len(request.text)} characters")
+    
+    def translation_lines():
+        # A sync generator: Starlette iterates it in a worker thread, off the event loop
+        pieces = []
+        try:
+            for piece in iter_translation(request.text):
+                pieces.append(piece)
+                yield json.dumps({"index": len(pieces) - 1, "text": piece}, ensure_ascii=False) + "\n"
+        except ValueError as exc:
+            logger.error(f"[API] Configuration error: {exc}")
+            yield json.dumps({"done": True, "error": str(exc)}) + "\n"
+            return
+        except Exception as exc:
+            logger.error(f"[API] Translation failed: {exc}", exc_info=True)
+            yield json.dumps({"done": True, "error": "Translation service error"}) + "\n"
+            return
+        logger.info(f"[API] Streamed translation completed in {len(pieces)} piece(s)")
+        yield json.dumps({"done": True, "translation": "".join(pieces).strip()}, ensure_ascii=False) + "\n"
+    
+    return StreamingResponse(translation_lines(), media_type="application/x-ndjson")
+
+
+@router.get("/translate/stats")
+def get_translation_statistics():
+    """LLM token usage, translation-memory reuse and translation cache hits."""
+    return get_translation_stats()
@@ -0,0 +1,166 @@
+"""SQLite-backed, size-bounded LRU store shared by the OCR and translation caches.
+
+Each cache is one SQLite table (WAL) of text values under a content address
+(`content_key`). The table is bounded by the total size of the stored values
+(`max_bytes`); the least recently used entries are evicted first. A cache
+subclass names its table and value column, adds its own columns and indexes,
+and computes its keys; lookups, stores, eviction and the stats are here.
+"""
+
+from __future__ import annotations
+
+import time
+import hashlib
+import logging
+import sqlite3
+import threading
+from typing import Callable
+
+logger = logging.getLogger(__name__)
+
+
+def content_key(*parts: str | bytes) -> str:
+    """SHA-256 of the parts, in order."""
+    digest = hashlib.sha256()
+    for part in parts:
+        data = part.encode() if isinstance(part, str) else part
+        # Length prefixes keep the boundaries between the parts unambiguous
+        digest.update(len(data).to_bytes(8, "big"))
+        digest.update(data)
+    return digest.hexdigest()
+
+
+class SQLiteLRUCache:
+    """Text values in an SQLite table, bounded by their total size in bytes."""
+
+    # Set by subclasses
+    table = ""
+    value_column = "value"
+    # Extra column definitions and indexed columns
+    columns: tuple[str, ...] = ()
+    indexes: tuple[str, ...] = ()
+    log_prefix = ""
+    label = "Cache"
+    log_hits = False
+
+    def __init__(self, path: str, max_bytes: int, enabled: bool = True):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self._conn: sqlite3.Connection | None = None
+        self._bytes = 0
+        self._stats = {"hits": 0, "misses": 0, "stores": 0, "evictions": 0}
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is None:
+            conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            columns = ",\n".join((
+                "key TEXT PRIMARY KEY",
+                *self.columns,
+                f"{self.value_column} TEXT NOT NULL",
+                "size INTEGER NOT NULL",
+                "created_at REAL NOT NULL",
+                "last_used REAL NOT NULL",
+            ))
+            conn.execute(f"CREATE TABLE IF NOT EXISTS {self.table} (\n{columns}\n)")
+            for column in ("last_used", *self.indexes):
+                conn.execute(f"CREATE INDEX IF NOT EXISTS {self.table}_{column} ON {self.table} ({column})")
+            self._bytes = conn.execute(f"SELECT COALESCE(SUM(size), 0) FROM {self.table}").fetchone()[0]
+            self._conn = conn
+            logger.info(f"{self.log_prefix} {self.label} opened: {self.path} ({self._bytes} bytes)")
+        return self._conn
+
+    def lookup(self, key: str, on_miss: Callable[[sqlite3.Connection], tuple[str, str] | None] | None = None) -> str | None:
+        """Value stored under key, or None on a miss (or an SQLite error).
+
+        on_miss(conn) may find another entry to use instead, as (key, value).
+        """
+        if not self.enabled:
+            return None
+        try:
+            with self._lock:
+                conn = self._connect()
+                row = conn.execute(f"SELECT {self.value_column} FROM {self.table} WHERE key = ?", (key,)).fetchone()
+                if row is not None:
+                    self._touch(conn, key)
+                    self._stats["hits"] += 1
+                    if self.log_hits:
+                        logger.info(f"{self.log_prefix} Cache hit {key[:12]}")
+                    return row[0]
+                found = on_miss(conn) if on_miss is not None else None
+                if found is not None:
+                    self._touch(conn, found[0])
+                    return found[1]
+                self._stats["misses"] += 1
+                return None
+        except sqlite3.Error as exc:
+            logger.error(f"{self.log_prefix} Cache lookup failed: {exc}")
+            return None
+
+    def store(self, key: str, value: str, **columns) -> None:
+        """Store a value (and the subclass columns), evicting least recently used entries if over max_bytes."""
+        if not self.enabled or not value:
+            return
+        try:
+            self._store(key, value, columns)
+        except (sqlite3.Error, OSError) as exc:
+            # A failed store only costs a future cache miss
+            logger.error(f"{self.log_prefix} Cache store failed: {exc}")
+
+    def _store(self, key: str, value: str, columns: dict) -> None:
+        size = len(value.encode("utf-8"))
+        names = ["key", *columns, self.value_column, "size", "created_at", "last_used"]
+        with self._lock:
+            conn = self._connect()
+            now = time.time()
+            previous = conn.execute(f"SELECT size FROM {self.table} WHERE key = ?", (key,)).fetchone()
+            conn.execute(
+                f"INSERT OR REPLACE INTO {self.table} ({', '.join(names)}) VALUES ({', '.join('?' * len(names))})",
+                (key, *columns.values(), value, size, now, now),
+            )
+            self._bytes += size - (previous[0] if previous else 0)
+            self._stats["stores"] += 1
+            self._evict(conn)
+
+    def _touch(self, conn: sqlite3.Connection, key: str) -> None:
+        conn.execute(f"UPDATE {self.table} SET last_used = ? WHERE key = ?", (time.time(), key))
+
+    def clear(self) -> None:
+        with self._lock:
+            self._connect().execute(f"DELETE FROM {self.table}")
+            self._bytes = 0
+
+    def _evict(self, conn: sqlite3.Connection) -> None:
+        while self._bytes > self.max_bytes:
+            rows = conn.execute(f"SELECT key, size FROM {self.table} ORDER BY last_used LIMIT 64").fetchall()
+            if not rows:
+                self._bytes = 0
+                return
+            evicted = []
+            for key, size in rows:
+                if self._bytes <= self.max_bytes:
+                    break
+                evicted.append(key)
+                self._bytes -= size
+            conn.executemany(f"DELETE FROM {self.table} WHERE key = ?", [(key,) for key in evicted])
+            self._stats["evictions"] += len(evicted)
+
+    def get_stats(self) -> dict:
+        """Hit counts, size and configuration."""
+        hits = sum(count for name, count in self._stats.items() if name.endswith("hits"))
+        lookups = hits + self._stats["misses"]
+        stats = {
+            **self._stats,
+            "hit_rate": round(hits / lookups, 4) if lookups else 0.0,
+            "bytes": self._bytes,
+            "max_bytes": self.max_bytes,
+            "enabled": self.enabled,
+            "path": self.path,
+        }
+        if self.enabled:
+            with self._lock:
+                stats["entries"] = self._connect().execute(f"SELECT COUNT(*) FROM {self.table}").fetchone()[0]
+        return stats
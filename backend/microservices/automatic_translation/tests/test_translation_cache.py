@@ -0,0 +1,17 @@
+"""Tests for the keys of the translation cache."""
+
+from llm.translation_cache import cache_key
+
+
+def test_cache_key_ignores_diacritics_and_spacing():
+    assert cache_key("عَقْدُ  الزَّوَاجِ\nبتونس", "model", "v1") == cache_key("عقد الزواج بتونس", "model", "v1")
+
+
+def test_cache_key_keeps_numbers_and_punctuation():
+    assert cache_key("بتاريخ 1/12/2020", "model", "v1") != cache_key("بتاريخ 11/2/2020", "model", "v1")
+    assert cache_key("عدد 125", "model", "v1") != cache_key("عدد 12 5", "model", "v1")
+
+
+def test_cache_key_depends_on_model_and_prompt_version():
+    assert cache_key("نص", "model", "v1") != cache_key("نص", "other", "v1")
+    assert cache_key("نص", "model", "v1") != cache_key("نص", "model", "v2")
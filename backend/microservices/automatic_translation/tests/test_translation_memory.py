@@ -0,0 +1,69 @@
+"""Tests for the phrase splitting, keys and reassembly of the translation memory."""
+
+from llm.translation_memory import (
+    LocalIndex,
+    MemoryMatch,
+    Span,
+    TranslationMemory,
+    _Embedder,
+    join_keys,
+    join_translations,
+    match_key,
+    split_segments,
+)
+
+
+def test_match_key_ignores_diacritics_letter_variants_and_punctuation():
+    assert match_key("عَقْدُ الزَّوَاجِ، بتاريخ") == match_key("عقد  الزواج بتاريخ")
+    assert match_key("إمضاء") == match_key("امضاء")
+    assert match_key("بتاريخ ٢٠٢٠") == match_key("بتاريخ 2020")
+
+
+def test_match_key_keeps_boundaries_between_numbers():
+    assert match_key("بتاريخ 1/12/2020") != match_key("بتاريخ 11/2/2020")
+    assert match_key("عدد 12 5") != match_key("عدد 125")
+    assert match_key("بتاريخ 1/12/2020") == match_key("بتاريخ 1-12-2020")
+
+
+def test_join_keys_matches_the_key_of_the_joined_text():
+    text = "بطاقة عدد 0123. 456، بتاريخ 1/12/2020"
+    keys = [match_key(segment.text) for segment in split_segments(text)]
+    assert join_keys(keys) == match_key(text)
+
+
+def test_split_segments_keeps_delimiters():
+    segments = split_segments("الزوج: محمد، الزوجة: ليلى\nالشاهد الأول")
+    assert [segment.text for segment in segments] == ["الزوج", "محمد", "الزوجة", "ليلى", "الشاهد الأول"]
+    assert [segment.separator for segment in segments] == [":", "،", ":", "\n", ""]
+
+
+def test_split_segments_cuts_long_phrases():
+    segments = split_segments(" ".join(["كلمة"] * 70))
+    assert [len(segment.text.split()) for segment in segments] == [30, 30, 10]
+
+
+def test_join_translations_converts_delimiters():
+    spans = [
+        Span(split_segments("الزوج:"), "L'époux"),
+        Span(split_segments("محمد،"), "Mohamed"),
+        Span(split_segments("الزوجة\n"), "L'épouse"),
+        Span(split_segments("ليلى"), "Leila."),
+    ]
+    assert join_translations(spans) == "L'époux: Mohamed, L'épouse\nLeila."
+
+
+def test_join_translations_does_not_repeat_punctuation():
+    assert join_translations([Span(split_segments("تم."), "Fait."), Span(split_segments("ثم"), "Puis")]) == "Fait. Puis"
+
+
+def test_lookup_does_not_reuse_a_translation_with_other_numbers():
+    embedder = _Embedder("unused")
+    embedder._failed = True
+    memory = TranslationMemory(backend="local")
+    memory.embedder = embedder
+    memory._index = LocalIndex([MemoryMatch("بتاريخ 1/12/2020", "le 1/12/2020")], embedder)
+
+    [span] = memory.lookup("بتاريخ 11/2/2020")
+    assert span.translation is None
+    [span] = memory.lookup("بتاريخ 1-12-2020")
+    assert span.translation == "le 1/12/2020"
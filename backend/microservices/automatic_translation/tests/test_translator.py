@@ -0,0 +1,58 @@
+"""Tests for chunked translation with a stub LLM client."""
+
+import re
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from llm import translator
+from llm.translation_cache import TranslationCache
+
+CONTRACT = "الحمد لله وحده، تزوج الشاب رأفت. بالآنسة فريال بنت لطفي، على صداق قدره ألف دينار."
+
+
+class StubClient:
+    """Answers the first passage of a multi-passage prompt with an empty span, and single passages slowly."""
+
+    def __init__(self):
+        self.calls = 0
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self.create))
+
+    def create(self, model, messages, max_tokens):
+        self.calls += 1
+        prompt = messages[-1]["content"]
+        passages = re.findall(r'<span id="(\d+)">\n(.*?)\n</span>', prompt, re.DOTALL)
+        if passages:
+            answer = "".join(
+                f'<span id="{number}">{"" if number == "1" else f"FR{number}"}</span>' for number, _ in passages
+            )
+        else:
+            time.sleep(0.2)
+            answer = "FR-single"
+        return SimpleNamespace(
+            choices=[SimpleNamespace(finish_reason="stop", message=SimpleNamespace(content=answer))], usage=None
+        )
+
+
+@pytest.fixture
+def stub(monkeypatch, tmp_path):
+    client = StubClient()
+    monkeypatch.setattr(translator, "_get_client", lambda: client)
+    monkeypatch.setattr(translator, "translation_cache", TranslationCache(str(tmp_path / "cache.db")))
+    monkeypatch.setattr(translator.translation_memory, "enabled", False)
+    yield client
+    translator.shutdown_translation_pool()
+
+
+def test_missing_passage_is_waited_for(stub):
+    pieces = list(translator.iter_translation(CONTRACT))
+    assert len(pieces) >= 2
+    assert "FR-single" in "".join(pieces)
+
+
+def test_cache_is_filled_when_translate_text_returns(stub):
+    first = translator.translate_text(CONTRACT)
+    calls = stub.calls
+    assert translator.translate_text(CONTRACT) == first
+    assert stub.calls == calls
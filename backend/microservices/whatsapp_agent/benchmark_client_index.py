@@ -0,0 +1,124 @@
+"""
+Client Index Benchmark
+Builds a synthetic registry of Tunisian-style client names (Latin and Arabic
+script), loads it from CSV through client_index.load_clients, and compares
+lookups through ClientIndex with the previous linear scans.
+
+Usage:
+    python benchmark_client_index.py [--clients 1000000] [--queries 200]
+"""
+
+import os
+import csv
+import time
+import random
+import argparse
+import tempfile
+import statistics
+
+from client_index import CLIENT_FIELDS, ClientIndex, load_clients
+
+FIRST_NAMES = [
+    "Mohamed", "Ahmed", "Ali", "Youssef", "Amine", "Karim", "Sami", "Khaled", "Hichem", "Walid",
+    "Fatma", "Amira", "Salma", "Leila", "Nour", "Ines", "Mariem", "Sarra", "Hela", "Rim",
+    "محمد", "أحمد", "علي", "يوسف", "فاطمة", "أميرة", "سلمى", "ليلى",
+]
+SYLLABLES = ["ben", "tra", "bel", "si", "ham", "di", "gha", "nou", "chi", "ri", "ma", "zou", "ka", "ala",
+             "jeb", "fer", "sal", "lah", "mes", "aou", "dhi", "bou", "zid", "ner", "tou", "ati"]
+ARABIC_SURNAMES = ["الطرابلسي", "بن علي", "الحمامي", "الغربي", "بن صالح", "المسعودي", "الجبالي", "بوزيد"]
+
+
+def make_surnames(rng: random.Random, count: int):
+    surnames = set(ARABIC_SURNAMES)
+    while len(surnames) < count:
+        surnames.add("".join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 4))).capitalize())
+    return sorted(surnames)
+
+
+def write_registry(path: str, count: int, rng: random.Random):
+    surnames = make_surnames(rng, 20000)
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(CLIENT_FIELDS)
+        for i in range(count):
+            name = f"{rng.choice(FIRST_NAMES)} {rng.choice(surnames)}"
+            writer.writerow([str(100000 + i), f"{10000000 + i * 7 % 89999999:08d}", name,
+                             rng.choice(["passport", "ID card", "driver license"]),
+                             rng.choice(["done", "pending"]), "2025-12-01"])
+
+
+def typo(name: str, rng: random.Random) -> str:
+    """Drop one letter of the surname, like a hurried user would."""
+    first, _, last = name.partition(" ")
+    if len(last) > 5:
+        i = rng.randrange(1, len(last) - 1)
+        last = last[:i] + last[i + 1:]
+    return f"{first} {last}"
+
+
+def time_calls(func, inputs):
+    timings = []
+    for value in inputs:
+        started = time.perf_counter()
+        func(value)
+        timings.append((time.perf_counter() - started) * 1000)
+    return statistics.median(timings), sorted(timings)[int(0.99 * (len(timings) - 1))]
+
+
+def legacy_by_cin(clients, cin):
+    for client in clients:
+        if client["cin"] == cin:
+            return client
+    return None
+
+
+def legacy_by_name(clients, name):
+    lower_name = name.lower()
+    for client in clients:
+        if lower_name in client["name"].lower():
+            return client
+    return None
+
+
+def main(args):
+    rng = random.Random(3)
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "clients.csv")
+        write_registry(path, args.clients, rng)
+
+        started = time.perf_counter()
+        clients = load_clients(path)
+        loaded = time.perf_counter() - started
+        started = time.perf_counter()
+        index = ClientIndex(clients)
+        built = time.perf_counter() - started
+
+    print(f"{len(clients)} clients: CSV load {loaded:.1f} s, index build {built:.1f} s")
+
+    sample = rng.sample(clients, args.queries)
+    cins = [client["cin"] for client in sample]
+    names = [client["name"] for client in sample]
+    typos = [typo(name, rng) for name in names]
+    legacy_sample = sample[: max(args.queries // 20, 5)]
+
+    rows = [
+        ("CIN, linear scan", time_calls(lambda c: legacy_by_cin(clients, c), [c["cin"] for c in legacy_sample])),
+        ("CIN, hash index", time_calls(index.get_by_cin, cins)),
+        ("name, substring scan", time_calls(lambda n: legacy_by_name(clients, n), [c["name"] for c in legacy_sample])),
+        ("name, exact via index", time_calls(index.search_name, names)),
+        ("name, typo via index", time_calls(index.search_name, typos)),
+    ]
+    print(f"\n{'lookup':<24}{'p50 ms':>10}{'p99 ms':>10}")
+    for label, (p50, p99) in rows:
+        print(f"{label:<24}{p50:>10.3f}{p99:>10.3f}")
+
+    found = sum(1 for name, client in zip(typos, sample)
+                if any(match is client or match["name"] == client["name"] for match, _ in index.search_name(name)))
+    print(f"\ntypo queries with the right name in the top 5: {found}/{len(sample)}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--clients", type=int, default=1000000)
+    parser.add_argument("--queries", type=int, default=200)
+    main(parser.parse_args())
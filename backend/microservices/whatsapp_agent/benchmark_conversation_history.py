@@ -0,0 +1,98 @@
+"""
+Conversation History Benchmark
+Compares memory use and per-call cost of the previous unbounded dict history
+with the LRU-cached SQLite store, as the number of distinct phones grows.
+
+Each mode runs in its own process so resident memory is measured cleanly.
+
+Usage:
+    python benchmark_conversation_history.py [--phones 100000] [--messages 4]
+"""
+
+import os
+import sys
+import time
+import argparse
+import tempfile
+import subprocess
+from datetime import datetime
+
+CHECKPOINTS = (0.1, 0.25, 0.5, 1.0)
+CONTENT = "Bonjour, je voudrais vérifier le statut de mon dossier de crédit s'il vous plaît. " * 2
+
+
+def rss_mb() -> float:
+    with open("/proc/self/status") as f:
+        for line in f:
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1]) / 1024
+    return 0.0
+
+
+def legacy_history():
+    """The previous implementation: one dict entry per phone, never evicted."""
+    conversation_history = {}
+
+    def add(phone, role, content):
+        history = conversation_history.setdefault(phone, [])
+        history.append({"role": role, "content": content, "timestamp": datetime.now().timestamp()})
+        if len(history) > 10:
+            conversation_history[phone] = history[-10:]
+
+    def get(phone, limit=6):
+        return conversation_history.get(phone, [])[-limit:]
+
+    return add, get
+
+
+def run_mode(args):
+    if args.mode == "legacy":
+        add, get = legacy_history()
+    else:
+        os.environ["HISTORY_DB"] = args.db
+        sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+        from services.conversation_service import add_to_history as add, get_history as get
+
+    baseline = rss_mb()
+    marks = {int(args.phones * fraction) for fraction in CHECKPOINTS}
+    add_time = get_time = 0.0
+    calls = 0
+    for i in range(1, args.phones + 1):
+        phone = f"216{i:08d}"
+        for turn in range(args.messages):
+            started = time.perf_counter()
+            get(phone, 6)
+            get_time += time.perf_counter() - started
+            started = time.perf_counter()
+            add(phone, "user" if turn % 2 == 0 else "assistant", CONTENT)
+            add_time += time.perf_counter() - started
+            calls += 1
+        if i in marks:
+            print(f"  {i:>8} phones   RSS +{rss_mb() - baseline:7.1f} MB", flush=True)
+    print(f"  get_history {get_time / calls * 1e6:6.1f} us/call   add_to_history {add_time / calls * 1e6:6.1f} us/call")
+
+
+def main(args):
+    with tempfile.TemporaryDirectory() as directory:
+        for mode in ("legacy", "store"):
+            label = "unbounded dict (previous)" if mode == "legacy" else "LRU cache + SQLite store"
+            print(f"\n{label}: {args.phones} phones x {args.messages} messages")
+            subprocess.run(
+                [sys.executable, os.path.abspath(__file__), "--mode", mode, "--db", os.path.join(directory, "history.db"),
+                 "--phones", str(args.phones), "--messages", str(args.messages)],
+                check=True,
+            )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--mode", choices=["legacy", "store"], help=argparse.SUPPRESS)
+    parser.add_argument("--db", help=argparse.SUPPRESS)
+    parser.add_argument("--phones", type=int, default=100000)
+    parser.add_argument("--messages", type=int, default=4)
+    parsed = parser.parse_args()
+
+    if parsed.mode:
+        run_mode(parsed)
+    else:
+        main(parsed)
@@ -0,0 +1,165 @@
+"""
+Outbound HTTP Client Benchmark
+Measures the per-message cost of outbound calls with a new client per call
+(the previous behaviour) against the shared keep-alive clients.
+
+Each simulated message makes the two calls of the text path: one chat model
+request and one Graph API send. Both go to a local HTTPS stub with a
+self-signed certificate, so the per-call TLS handshake shows up as it does
+against graph.facebook.com. The stub only speaks HTTP/1.1, so the Graph
+client falls back from HTTP/2 here.
+
+Usage:
+    python benchmark_http_clients.py [--messages 300] [--concurrency 20]
+"""
+
+import os
+import sys
+import time
+import asyncio
+import argparse
+import tempfile
+import threading
+import statistics
+import subprocess
+
+import httpx
+import uvicorn
+from fastapi import FastAPI, Request
+
+STUB_PORT = 8941
+STUB_URL = f"https://127.0.0.1:{STUB_PORT}"
+
+
+def make_certificate(directory: str):
+    """Self-signed certificate for 127.0.0.1, generated with the openssl CLI."""
+    cert, key = os.path.join(directory, "cert.pem"), os.path.join(directory, "key.pem")
+    subprocess.run(
+        ["openssl", "req", "-x509", "-newkey", "rsa:2048", "-nodes", "-days", "1",
+         "-keyout", key, "-out", cert, "-subj", "/CN=127.0.0.1",
+         "-addext", "subjectAltName=IP:127.0.0.1"],
+        check=True, capture_output=True,
+    )
+    return cert, key
+
+
+def build_stub_app():
+    stub = FastAPI()
+
+    @stub.post("/v21.0/{phone_number_id}/messages")
+    async def send_message(phone_number_id: str, request: Request):
+        await request.body()
+        return {"messages": [{"id": "wamid.benchmark"}]}
+
+    @stub.post("/chat")
+    async def chat(request: Request):
+        await request.body()
+        return {"reply": "ok"}
+
+    return stub
+
+
+def run_stub(cert: str, key: str) -> uvicorn.Server:
+    config = uvicorn.Config(
+        build_stub_app(), host="127.0.0.1", port=STUB_PORT, log_level="warning",
+        ssl_certfile=cert, ssl_keyfile=key,
+    )
+    server = uvicorn.Server(config)
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.05)
+    return server
+
+
+async def legacy_message(index: int) -> None:
+    """The previous pattern: a fresh AsyncClient (and TLS handshake) per call."""
+    async with httpx.AsyncClient(timeout=120.0) as client:
+        response = await client.post(f"{STUB_URL}/chat", json={"message": f"hello {index}"})
+        response.raise_for_status()
+    async with httpx.AsyncClient() as client:
+        response = await client.post(
+            f"{STUB_URL}/v21.0/1000/messages",
+            json={"messaging_product": "whatsapp", "to": "21650000000", "type": "text", "text": {"body": "ok"}},
+        )
+        response.raise_for_status()
+
+
+async def pooled_message(index: int) -> None:
+    """The agent's real service functions on the shared clients."""
+    from services.ai_service import query_model
+    from services.whatsapp_service import send_whatsapp_message
+
+    await query_model(f"hello {index}")
+    await send_whatsapp_message("21650000000", "ok")
+
+
+async def run(handler, messages: int, concurrency: int):
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+
+    async def one(index: int):
+        async with semaphore:
+            started = time.perf_counter()
+            await handler(index)
+            latencies.append((time.perf_counter() - started) * 1000)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(messages)))
+    return latencies, time.perf_counter() - started
+
+
+def report(label: str, latencies, elapsed: float) -> float:
+    ordered = sorted(latencies)
+    p50 = statistics.median(ordered)
+    p99 = ordered[int(0.99 * (len(ordered) - 1))]
+    print(f"{label:<26} p50 {p50:7.2f} ms   p99 {p99:7.2f} ms   {len(ordered) / elapsed:7.0f} msg/s")
+    return p50
+
+
+async def benchmark(args):
+    from services.http_service import http_clients
+
+    for concurrency in (1, args.concurrency):
+        print(f"\n{args.messages} messages, concurrency {concurrency}")
+        legacy_p50 = report("new client per call", *await run(legacy_message, args.messages, concurrency))
+        http_clients.start()
+        try:
+            await run(pooled_message, 10, concurrency)  # open the pooled connections
+            pooled_p50 = report("shared keep-alive clients", *await run(pooled_message, args.messages, concurrency))
+        finally:
+            await http_clients.stop()
+        print(f"{'overhead removed':<26} {legacy_p50 - pooled_p50:7.2f} ms per message (p50)")
+
+    print("\nupstream latency (shared clients, time to headers):")
+    for name, stats in http_clients.get_stats().items():
+        if stats["count"]:
+            print(f"  {name:<6} {stats['count']:6d} calls   mean {stats['mean_ms']:6.2f} ms   p99 <= {stats['p99_ms']} ms")
+
+
+def main(args):
+    with tempfile.TemporaryDirectory() as directory:
+        cert, key = make_certificate(directory)
+        # Trust the stub certificate and point the agent's services at the stub
+        os.environ.update({
+            "SSL_CERT_FILE": cert,
+            "WHATSAPP_TOKEN": "benchmark-token",
+            "PHONE_NUMBER_ID": "1000",
+            "WHATSAPP_API_URL": f"{STUB_URL}/v21.0",
+            "MODEL_ENDPOINT": f"{STUB_URL}/chat",
+        })
+        sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+        import logging
+        logging.disable(logging.INFO)
+
+        server = run_stub(cert, key)
+        try:
+            asyncio.run(benchmark(args))
+        finally:
+            server.should_exit = True
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--messages", type=int, default=300)
+    parser.add_argument("--concurrency", type=int, default=20)
+    main(parser.parse_args())
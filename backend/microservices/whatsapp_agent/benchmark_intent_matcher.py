@@ -0,0 +1,144 @@
+"""
+Intent Matcher Benchmark
+Compares the single-pass IntentMatcher with the previous keyword scans
+(detect_language + extract_verification_data + detect_tool_needed, each
+lower-casing the message and looping over its own keyword list or regexes)
+in messages per second, with the current tool set and with extra tools
+registered, and reports where the two disagree.
+
+Usage:
+    python benchmark_intent_matcher.py [--messages 20000] [--extra-tools 20]
+"""
+
+import re
+import time
+import random
+import argparse
+from collections import Counter
+
+from services.intent_service import IntentMatcher
+from services.tool_service import DOCUMENT_KEYWORDS, check_document
+
+SAMPLES = [
+    "Bonjour, où est mon document ?",
+    "Est-ce que mon passeport est prêt ?",
+    "Mon CIN est 12345678",
+    "Je suis Ali Ben Salah",
+    "nom: Sami Trabelsi",
+    "Ali Ben Salah",
+    "السلام عليكم، وين وصلت الوثيقة متاعي؟",
+    "أنا Ali Ben Salah، حالة الوثائق من فضلك",
+    "رقم بطاقتي 09876543",
+    "شكرا برشا",
+    "3aslema, win wselt lwra9i ?",
+    "merci beaucoup pour votre aide, bonne journée",
+    "Quel est le statut de ma demande de carte grise déposée la semaine dernière ?",
+    "عسلامة، نحب نعرف كان الكواغط متاعي جاهزين",
+    "ok",
+    "👍",
+]
+
+LEGACY_FRENCH = ["bonjour", "merci", "document", "status", "est-ce", "quel", "comment", "client", "liste"]
+LEGACY_NAME_PATTERNS = [
+    r'(?:name|nom|اسم|اسمي)\s*:?\s*([a-zA-Z\s]+)',
+    r'(?:je suis|i am|أنا)\s+([a-zA-Z\s]+)',
+    r'^([A-Z][a-z]+\s+[A-Z][a-z]+)$',
+]
+LEGACY_DOCUMENT = ["document", "وثيقة", "وثائق", "status", "حالة", "état",
+                   "ready", "جاهز", "prêt", "وين وصلت", "où est"]
+
+
+def legacy_detect_language(message):
+    lower_msg = message.lower()
+    return "french" if any(k in lower_msg for k in LEGACY_FRENCH) else "arabic"
+
+
+def legacy_extract_verification_data(message):
+    cin_match = re.search(r'\b\d{8}\b', message)
+    if cin_match:
+        return {"cin": cin_match.group(0)}
+    for pattern in LEGACY_NAME_PATTERNS:
+        match = re.search(pattern, message, re.IGNORECASE)
+        if match:
+            return {"name": match.group(1).strip()}
+    return None
+
+
+def make_legacy_detect_tool(tools):
+    def detect_tool_needed(message):
+        lower_msg = message.lower()
+        for name, keywords in tools:
+            if any(k in lower_msg for k in keywords):
+                return {"tool": name}
+        return None
+    return detect_tool_needed
+
+
+def legacy_analyze(detect_tool_needed, message):
+    return (legacy_detect_language(message), detect_tool_needed(message), legacy_extract_verification_data(message))
+
+
+def extra_tools(count, rng):
+    letters = "abcdefghijklmnopqrstuvwxyz"
+    return [
+        (f"tool_{i}", ["".join(rng.choice(letters) for _ in range(rng.randint(5, 9))) for _ in range(10)])
+        for i in range(count)
+    ]
+
+
+def throughput(func, messages):
+    started = time.perf_counter()
+    for message in messages:
+        func(message)
+    return len(messages) / (time.perf_counter() - started)
+
+
+def run(label, tools, messages):
+    matcher = IntentMatcher()
+    for name, keywords in tools:
+        matcher.register_tool(name, keywords, check_document)
+    legacy_tool = make_legacy_detect_tool(tools)
+
+    legacy_rate = throughput(lambda m: legacy_analyze(legacy_tool, m), messages)
+    matcher_rate = throughput(matcher.analyze, messages)
+    keywords = sum(len(k) for _, k in tools)
+    print(f"{label:<28}{keywords:>9}{legacy_rate:>14,.0f}{matcher_rate:>14,.0f}{matcher_rate / legacy_rate:>9.1f}x")
+    return matcher, legacy_tool
+
+
+def main(args):
+    rng = random.Random(7)
+    messages = [rng.choice(SAMPLES) for _ in range(args.messages)]
+    tools = [("check_document", DOCUMENT_KEYWORDS)]
+
+    print(f"{args.messages} messages\n")
+    print(f"{'tool set':<28}{'keywords':>9}{'legacy msg/s':>14}{'matcher msg/s':>14}{'speedup':>10}")
+    matcher, legacy_tool = run("check_document", tools, messages)
+    run(f"+ {args.extra_tools} extra tools", tools + extra_tools(args.extra_tools, rng), messages)
+
+    differences = Counter()
+    print("\nwhere the matcher differs from the legacy scans:")
+    for message in SAMPLES:
+        language, tool, verification = legacy_analyze(legacy_tool, message)
+        analysis = matcher.analyze(message)
+        changed = [
+            f"{field}: {old!r} -> {new!r}"
+            for field, old, new in (
+                ("language", language, analysis.language),
+                ("tool", tool, analysis.tool_info),
+                ("verification", verification, analysis.verification),
+            )
+            if old != new
+        ]
+        for line in changed:
+            differences[line.split(":")[0]] += 1
+        if changed:
+            print(f"  {message!r}\n    " + "\n    ".join(changed))
+    print(f"\n{len(SAMPLES)} sample messages, differing fields: {dict(differences) or 'none'}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--messages", type=int, default=20000)
+    parser.add_argument("--extra-tools", type=int, default=20)
+    main(parser.parse_args())
@@ -0,0 +1,113 @@
+"""
+Reply Cache Benchmark
+Replays a stream of FAQ-style questions (paraphrased in French, Arabic and
+Tunisian dialect, plus personal questions that must not be cached) through
+the semantic reply cache, with a simulated model call on every miss.
+
+Reports hit rate, wrong answers served from the cache (a hit whose cached
+answer belongs to another question), lookup latency and the model time saved.
+Needs the embedding model (REPLY_CACHE_MODEL) to be downloadable or cached.
+
+Usage:
+    python benchmark_reply_cache.py [--messages 2000] [--threshold 0.92] [--model-latency 4.0]
+"""
+
+import time
+import random
+import asyncio
+import argparse
+import statistics
+
+from services.reply_cache import ReplyCache
+
+# Questions per intent; the intent name doubles as the "model answer"
+FAQ = {
+    "opening_hours": (
+        "french",
+        ["Quels sont vos horaires d'ouverture ?", "Vous êtes ouverts à quelle heure ?",
+         "quels sont les horaires", "A quelle heure ouvre le bureau ?", "Horaires d'ouverture svp"],
+    ),
+    "opening_hours_ar": (
+        "arabic",
+        ["ما هي أوقات العمل؟", "وقتاش تحلو؟", "شنوة أوقات العمل متاعكم", "أوقات العمل من فضلكم",
+         "في أي ساعة يفتح المكتب؟"],
+    ),
+    "required_documents": (
+        "french",
+        ["Quels documents faut-il fournir ?", "Quels papiers dois-je apporter pour la demande ?",
+         "La liste des documents nécessaires svp", "Qu'est-ce qu'il faut comme documents ?"],
+    ),
+    "required_documents_ar": (
+        "arabic",
+        ["ما هي الوثائق المطلوبة؟", "شنية الأوراق اللازمة؟", "قائمة الوثائق المطلوبة من فضلك",
+         "شنوة الكواغط اللي لازمني نجيبهم؟"],
+    ),
+    "address": (
+        "french",
+        ["Où se trouve votre bureau ?", "Quelle est votre adresse ?", "C'est où l'agence ?"],
+    ),
+    "greeting": (
+        "arabic",
+        ["السلام عليكم", "عسلامة", "مرحبا"],
+    ),
+}
+# Depend on the user or on the conversation: must be skipped, never served
+PERSONAL = [
+    ("french", "Où en est mon dossier ?"),
+    ("french", "Et pour elle aussi ?"),
+    ("arabic", "وين وصل الملف متاعي؟"),
+    ("french", "Ma demande 20231145 est-elle prête ?"),
+]
+
+
+async def run(args):
+    rng = random.Random(11)
+    cache = ReplyCache(capacity=args.capacity, threshold=args.threshold, enabled=True)
+    intents = list(FAQ)
+    weights = [1 / (rank + 1) for rank in range(len(intents))]  # a few questions dominate
+
+    wrong = skipped = model_calls = 0
+    lookup_ms = []
+    for _ in range(args.messages):
+        if rng.random() < args.personal_ratio:
+            language, message = rng.choice(PERSONAL)
+            intent = None
+        else:
+            intent = rng.choices(intents, weights)[0]
+            language, questions = FAQ[intent]
+            message = rng.choice(questions)
+
+        if not cache.is_standalone(message, None, []):
+            skipped += 1
+            model_calls += 1
+            continue
+
+        started = time.perf_counter()
+        answer, probe = await cache.lookup(message, language)
+        lookup_ms.append((time.perf_counter() - started) * 1000)
+        if answer is not None:
+            wrong += answer != intent
+            continue
+        model_calls += 1
+        cache.record_model_latency(args.model_latency)
+        cache.store(probe, intent or "personal")
+
+    stats = cache.get_stats()
+    print(f"{args.messages} messages, threshold {args.threshold}, model latency {args.model_latency}s\n")
+    print(f"hit rate (cacheable):   {stats['hit_rate']:.1%} ({stats['hits']} hits, {stats['exact_hits']} exact)")
+    print(f"wrong answers served:   {wrong}")
+    print(f"skipped as personal:    {skipped}")
+    print(f"model calls:            {model_calls} (without cache: {args.messages})")
+    print(f"lookup p50/p99:         {statistics.median(lookup_ms):.2f} / "
+          f"{sorted(lookup_ms)[int(0.99 * (len(lookup_ms) - 1))]:.2f} ms")
+    print(f"model time saved:       {stats['latency_saved_seconds']:.0f} s")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--messages", type=int, default=2000)
+    parser.add_argument("--threshold", type=float, default=0.92)
+    parser.add_argument("--capacity", type=int, default=1000)
+    parser.add_argument("--personal-ratio", type=float, default=0.15)
+    parser.add_argument("--model-latency", type=float, default=4.0)
+    asyncio.run(run(parser.parse_args()))
@@ -0,0 +1,176 @@
+"""
+Streaming Reply Benchmark
+Runs model turns through answer_model_turn against a local mock model that
+streams its reply token by token (SSE or NDJSON, or one JSON body when
+streaming is off) and a mock Graph API that timestamps every message it
+receives.
+
+Reports the time until the user gets the first message and the whole reply,
+with streaming off and with each stream format, and checks that the
+streamed parts put back together match the model's reply.
+
+Usage:
+    python benchmark_streaming.py [--turns 40] [--concurrency 8] [--tokens 120] [--token-delay 0.03]
+"""
+
+import os
+import sys
+import json
+import time
+import asyncio
+import argparse
+import tempfile
+import threading
+import statistics
+from collections import defaultdict
+
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import StreamingResponse
+
+STUB_PORT = 8951
+STUB_URL = f"http://127.0.0.1:{STUB_PORT}"
+
+PARAGRAPHS = [
+    "Bonjour et merci pour votre message. Pour déposer une demande, vous devez vous présenter "
+    "au bureau avec votre carte d'identité et une copie de l'acte de naissance.",
+    "Le traitement prend en général entre cinq et dix jours ouvrables. Vous recevrez un message "
+    "dès que votre document sera prêt à être retiré.",
+    "Nos bureaux sont ouverts du lundi au vendredi, de huit heures à seize heures. N'hésitez pas "
+    "à nous écrire si vous avez d'autres questions.",
+]
+
+
+def build_reply(tokens: int) -> list:
+    """Reply split into word tokens, paragraphs repeated to reach the requested length."""
+    words = []
+    while len(words) < tokens:
+        for paragraph in PARAGRAPHS:
+            paragraph_words = paragraph.split(" ")
+            words.extend(word + " " for word in paragraph_words[:-1])
+            words.append(paragraph_words[-1] + "\n\n")
+    words = words[:tokens]
+    words[-1] = words[-1].rstrip()
+    return words
+
+
+def build_stub_app(args, stub_state):
+    stub = FastAPI()
+    tokens = build_reply(args.tokens)
+
+    @stub.post("/chat")
+    async def chat(request: Request):
+        body = await request.json()
+        await asyncio.sleep(args.first_token_latency)
+        if not body.get("stream") or stub_state["format"] == "json":
+            # The non-streaming endpoint answers once the whole reply is generated
+            await asyncio.sleep(args.token_delay * len(tokens))
+            return {"reply": "".join(tokens)}
+
+        async def events():
+            for token in tokens:
+                chunk = json.dumps({"token": token})
+                yield f"data: {chunk}\n\n" if stub_state["format"] == "sse" else f"{chunk}\n"
+                await asyncio.sleep(args.token_delay)
+            if stub_state["format"] == "sse":
+                yield "data: [DONE]\n\n"
+
+        media_type = "text/event-stream" if stub_state["format"] == "sse" else "application/x-ndjson"
+        return StreamingResponse(events(), media_type=media_type)
+
+    @stub.post("/v21.0/{phone_number_id}/messages")
+    async def send_message(phone_number_id: str, request: Request):
+        payload = await request.json()
+        stub_state["received"][payload["to"]].append((time.perf_counter(), payload["text"]["body"]))
+        return {"messages": [{"id": "wamid.benchmark"}]}
+
+    return stub
+
+
+def run_stub(app) -> uvicorn.Server:
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=STUB_PORT, log_level="warning"))
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.05)
+    return server
+
+
+async def run_turns(args, stub_state):
+    from router import answer_model_turn
+
+    stub_state["received"] = defaultdict(list)
+    semaphore = asyncio.Semaphore(args.concurrency)
+    started_at = {}
+
+    async def turn(index: int):
+        phone = f"2165{index:07d}"
+        async with semaphore:
+            started_at[phone] = time.perf_counter()
+            await answer_model_turn(phone, f"Quels documents faut-il fournir ? ({index})", "french")
+
+    await asyncio.gather(*(turn(i) for i in range(args.turns)))
+    first = [messages[0][0] - started_at[phone] for phone, messages in stub_state["received"].items()]
+    full = [messages[-1][0] - started_at[phone] for phone, messages in stub_state["received"].items()]
+    parts = [len(messages) for messages in stub_state["received"].values()]
+    texts = ["\n\n".join(text for _, text in messages) for messages in stub_state["received"].values()]
+    return first, full, parts, texts
+
+
+async def benchmark(args, stub_state):
+    from services import ai_service
+    from services.http_service import http_clients
+
+    expected = "".join(build_reply(args.tokens))
+    http_clients.start()
+    try:
+        print(f"{args.turns} turns, {args.tokens} tokens per reply, {args.token_delay * 1000:.0f} ms per token, "
+              f"first token after {args.first_token_latency:.2f} s\n")
+        print(f"{'mode':<16}{'first msg p50':>14}{'p99':>9}{'full reply p50':>16}{'messages/reply':>16}{'text intact':>13}")
+        for label, streaming, stream_format in (
+            ("not streamed", False, "json"),
+            ("SSE", True, "sse"),
+            ("NDJSON", True, "ndjson"),
+        ):
+            ai_service.MODEL_STREAMING = streaming
+            stub_state["format"] = stream_format
+            first, full, parts, texts = await run_turns(args, stub_state)
+            intact = all(" ".join(text.split()) == " ".join(expected.split()) for text in texts)
+            print(f"{label:<16}{statistics.median(first):>13.2f}s{sorted(first)[int(0.99 * (len(first) - 1))]:>8.2f}s"
+                  f"{statistics.median(full):>15.2f}s{statistics.mean(parts):>16.1f}{str(intact):>13}")
+        print(f"\nagent streaming stats: {ai_service.get_streaming_stats()}")
+    finally:
+        await http_clients.stop()
+
+
+def main(args):
+    with tempfile.TemporaryDirectory() as directory:
+        # Point the agent at the mocks before its modules read the environment
+        os.environ.update({
+            "WHATSAPP_TOKEN": "benchmark-token",
+            "PHONE_NUMBER_ID": "1000",
+            "WHATSAPP_API_URL": f"{STUB_URL}/v21.0",
+            "MODEL_ENDPOINT": f"{STUB_URL}/chat",
+            "MODEL_MAX_CONCURRENCY": str(args.concurrency),
+            "HISTORY_DB": os.path.join(directory, "conversations.db"),
+            "REPLY_CACHE_ENABLED": "false",
+        })
+        sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+        import logging
+        logging.disable(logging.INFO)
+
+        stub_state = {"format": "json", "received": defaultdict(list)}
+        server = run_stub(build_stub_app(args, stub_state))
+        try:
+            asyncio.run(benchmark(args, stub_state))
+        finally:
+            server.should_exit = True
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--turns", type=int, default=40)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--tokens", type=int, default=120)
+    parser.add_argument("--token-delay", type=float, default=0.03)
+    parser.add_argument("--first-token-latency", type=float, default=0.3)
+    main(parser.parse_args())
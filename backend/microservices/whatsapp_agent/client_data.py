@@ -1,10 +1,25 @@
 """
 Mock database for client documents.
 Ported from FINAL-PROJECT/whatsapp-webhook/clientData.js
+
+Set CLIENT_DATA_PATH to a CSV file or SQLite database to load the real client
+registry at startup instead. Lookups go through a ClientIndex (hash indexes on
+CIN and client_id, fuzzy script-aware name index).
 """
 
+import os
+import logging
 from typing import Optional, Dict, Any, List
 
+from client_index import ClientIndex, load_clients
+
+logger = logging.getLogger(__name__)
+
+# CSV file or SQLite database with the client registry (empty = mock data below)
+CLIENT_DATA_PATH = os.getenv("CLIENT_DATA_PATH", "")
+# Table to read when CLIENT_DATA_PATH is an SQLite database
+CLIENT_DATA_TABLE = os.getenv("CLIENT_DATA_TABLE", "clients")
+
 # Mock database for client documents
 client_documents: List[Dict[str, Any]] = [
     {
@@ -33,22 +48,21 @@ client_documents: List[Dict[str, Any]] = [
     },
 ]
 
+if CLIENT_DATA_PATH:
+    client_documents = load_clients(CLIENT_DATA_PATH, CLIENT_DATA_TABLE)
+    logger.info(f"📇 Loaded {len(client_documents)} clients from {CLIENT_DATA_PATH}")
+
+client_index = ClientIndex(client_documents)
+
 
 def find_client_by_cin(cin: str) -> Optional[Dict[str, Any]]:
     """Find a client by their CIN number."""
-    for client in client_documents:
-        if client["cin"] == cin:
-            return client
-    return None
+    return client_index.get_by_cin(cin)
 
 
 def find_client_by_name(name: str) -> Optional[Dict[str, Any]]:
-    """Find a client by their name (case-insensitive partial match)."""
-    lower_name = name.lower()
-    for client in client_documents:
-        if lower_name in client["name"].lower():
-            return client
-    return None
+    """Find the best-matching client by name (fuzzy, accent- and script-insensitive)."""
+    return client_index.find_by_name(name)
 
 
 def check_document_status(client_id: str, verification_data: Optional[Dict[str, str]] = None) -> Dict[str, Any]:
@@ -62,11 +76,7 @@ def check_document_status(client_id: str, verification_data: Optional[Dict[str,
     Returns:
         Dict with status information
     """
-    client = None
-    for c in client_documents:
-        if c["client_id"] == client_id:
-            client = c
-            break
+    client = client_index.get_by_id(client_id)
     
     if not client:
         return {"found": False, "message": "Client not found"}
@@ -82,7 +92,7 @@ def check_document_status(client_id: str, verification_data: Optional[Dict[str,
     # Verify identity
     name_match = (
         verification_data.get("name") and 
-        verification_data["name"].lower() in client["name"].lower()
+        client_index.name_matches(client, verification_data["name"])
     )
     cin_match = verification_data.get("cin") and client["cin"] == verification_data["cin"]
     
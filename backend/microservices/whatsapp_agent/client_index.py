@@ -0,0 +1,337 @@
+"""
+Client index for fast lookups in the client registry.
+Hash indexes on CIN and client_id, plus a fuzzy, script-aware name index.
+
+Names are normalized (case, Latin diacritics, Arabic diacritics/tatweel and
+letter variants) and also reduced to a consonant skeleton through a Latin
+transliteration, so "Mohamed Trabelsi", "Mohammed Trabelsi" and
+"محمد الطرابلسي" all meet on the same keys. Fuzzy matching works on the
+vocabulary of distinct name tokens: trigrams retrieve candidate tokens, which
+are scored by edit similarity (same script) or skeleton trigram overlap checked
+against the vowel pattern (across scripts), and their posting lists give the
+clients.
+"""
+
+import re
+import csv
+import heapq
+import sqlite3
+from difflib import SequenceMatcher
+from itertools import chain
+from collections import Counter, defaultdict
+from typing import Any, Dict, Iterable, List, NamedTuple, Optional, Set, Tuple
+
+from services.text_normalize import normalize_token
+
+# Minimum similarity for a query token to count as matching a name token
+TOKEN_MIN_SIMILARITY = 0.8
+# Minimum average token similarity for a name to match
+NAME_MATCH_THRESHOLD = 0.8
+# Candidate tokens scored exactly per query token
+MAX_TOKEN_CANDIDATES = 200
+# Upper bound on clients scored for one query
+MAX_CLIENT_CANDIDATES = 50000
+# Query tokens whose expansion is remembered (first names recur in most queries)
+EXPANSION_CACHE_SIZE = 10000
+
+CLIENT_FIELDS = ("client_id", "cin", "name", "document", "status", "submission_date")
+
+_TOKEN_SPLIT = re.compile(r"[\W\d_]+")
+_ARABIC_TO_LATIN = str.maketrans({
+    "ا": "a", "ب": "b", "ت": "t", "ث": "t", "ج": "j", "ح": "h", "خ": "kh", "د": "d",
+    "ذ": "d", "ر": "r", "ز": "z", "س": "s", "ش": "sh", "ص": "s", "ض": "d", "ط": "t",
+    "ظ": "z", "ع": "a", "غ": "gh", "ف": "f", "ق": "k", "ك": "k", "ل": "l", "م": "m",
+    "ن": "n", "ه": "h", "و": "w", "ي": "y", "پ": "p", "چ": "ch", "ڤ": "v", "گ": "g",
+})
+# Spellings that sound alike in French/English transliterations of Arabic names
+_LATIN_DIGRAPHS = (("ch", "sh"), ("ou", "w"), ("ph", "f"), ("th", "t"), ("dh", "d"), ("dj", "j"),
+                   ("kh", "k"), ("gh", "g"), ("q", "k"), ("c", "k"), ("x", "ks"))
+_VOWELS = re.compile(r"[aeiouwy]")
+_ARTICLES = {"al", "el", "ال"}
+
+
+def _transliterate(token: str) -> str:
+    """Latin spelling of a normalized token, with common spelling variants unified."""
+    if token.startswith("ال") and len(token) > 3:
+        token = token[2:]
+    if token.endswith("ه"):
+        # Final ta marbuta (normalized to ha) is pronounced as a vowel: فاطمة / Fatma
+        token = token[:-1] + "ا"
+    latin = token.translate(_ARABIC_TO_LATIN)
+    for spelling, sound in _LATIN_DIGRAPHS:
+        latin = latin.replace(spelling, sound)
+    # Collapse doubled letters (Mohammed / Mohamed)
+    return re.sub(r"(.)\1+", r"\1", latin)
+
+
+def skeleton(token: str) -> str:
+    """Script-independent consonant skeleton of a normalized token."""
+    return _VOWELS.sub("", _transliterate(token))
+
+
+def _shape(token: str) -> str:
+    """Consonant skeleton with each vowel run kept as "V" (Leila / ليلى -> lVlV)."""
+    return re.sub(r"[aeiouwy]+", "V", _transliterate(token))
+
+
+def tokenize(name: str) -> List[str]:
+    tokens = [normalize_token(part) for part in _TOKEN_SPLIT.split(name)]
+    return [token for token in tokens if token and token not in _ARTICLES]
+
+
+def _trigrams(text: str) -> Set[str]:
+    padded = f"  {text} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def _dice(a: Set[str], b: Set[str]) -> float:
+    if not a or not b:
+        return 0.0
+    return 2 * len(a & b) / (len(a) + len(b))
+
+
+def _is_subsequence(short: str, long: str) -> bool:
+    remaining = iter(long)
+    return all(ch in remaining for ch in short)
+
+
+class _Token(NamedTuple):
+    text: str
+    arabic: bool
+    grams: Set[str]
+    skeleton: str
+    skeleton_grams: Set[str]
+    shape: str
+
+
+def _make_token(text: str) -> _Token:
+    token_skeleton = skeleton(text)
+    return _Token(
+        text=text,
+        arabic=any("\u0600" <= ch <= "\u06ff" for ch in text),
+        grams=_trigrams(text),
+        skeleton=token_skeleton,
+        skeleton_grams=_trigrams(token_skeleton),
+        shape=_shape(text),
+    )
+
+
+def _cross_script_similarity(query: _Token, token: _Token, skeleton_dice: float) -> float:
+    """Arabic vs Latin spelling: consonant skeletons, checked against the vowel pattern."""
+    arabic, latin = (query, token) if query.arabic else (token, query)
+    # Arabic writes long vowels only, so its vowel pattern must fit inside the Latin one
+    fits = _is_subsequence(arabic.shape, latin.shape)
+    if len(query.skeleton) < 3 or len(token.skeleton) < 3:
+        # Too few consonants for trigrams to tell names apart: require the same consonants
+        return 0.9 if fits and query.skeleton == token.skeleton else 0.0
+    return skeleton_dice if fits else skeleton_dice * 0.85
+
+
+def _same_script_similarity(query: _Token, token: _Token, matcher: SequenceMatcher) -> float:
+    """Edit similarity, with a typed prefix ("moh" for "mohamed") counting as a near match."""
+    prefix = 0.9 if len(query.text) >= 3 and token.text.startswith(query.text) else 0.0
+    matcher.set_seq1(token.text)
+    if matcher.real_quick_ratio() < TOKEN_MIN_SIMILARITY or matcher.quick_ratio() < TOKEN_MIN_SIMILARITY:
+        return prefix
+    return max(prefix, matcher.ratio())
+
+
+def _similarity(query: _Token, token: _Token) -> float:
+    if query.text == token.text:
+        return 1.0
+    if query.arabic != token.arabic:
+        return _cross_script_similarity(query, token, _dice(query.skeleton_grams, token.skeleton_grams))
+    return _same_script_similarity(query, token, SequenceMatcher(None, "", query.text))
+
+
+class ClientIndex:
+    """In-memory indexes over a list of client records."""
+
+    def __init__(self, clients: Iterable[Dict[str, Any]] = ()):
+        self.clients: List[Dict[str, Any]] = []
+        self._by_cin: Dict[str, int] = {}
+        self._by_id: Dict[str, int] = {}
+        # Name token vocabulary: token -> id, with per-token features and client postings
+        self._vocab: Dict[str, int] = {}
+        self._tokens: List[_Token] = []
+        self._postings: List[List[int]] = []
+        self._gram_index: Dict[str, List[int]] = defaultdict(list)
+        self._client_tokens: List[Tuple[int, ...]] = []
+        self._expansions: Dict[str, Dict[int, float]] = {}
+        for client in clients:
+            self.add(client)
+
+    def __len__(self) -> int:
+        return len(self.clients)
+
+    def add(self, client: Dict[str, Any]) -> None:
+        """Index a client record (the later record wins for a duplicate CIN or client_id)."""
+        row = len(self.clients)
+        self.clients.append(client)
+        self._by_cin[str(client["cin"])] = row
+        self._by_id[str(client["client_id"])] = row
+
+        token_ids = []
+        for text in tokenize(client["name"]):
+            token_id = self._vocab.get(text)
+            if token_id is None:
+                token_id = self._add_token(text)
+            if token_id not in token_ids:
+                token_ids.append(token_id)
+                self._postings[token_id].append(row)
+        self._client_tokens.append(tuple(token_ids))
+
+    def _add_token(self, text: str) -> int:
+        token_id = len(self._tokens)
+        token = _make_token(text)
+        # A new vocabulary token may change any cached expansion
+        self._expansions.clear()
+        self._vocab[text] = token_id
+        self._tokens.append(token)
+        self._postings.append([])
+        for gram in token.grams:
+            self._gram_index["n" + gram].append(token_id)
+        for gram in token.skeleton_grams:
+            self._gram_index["s" + gram].append(token_id)
+        return token_id
+
+    def get_by_cin(self, cin: str) -> Optional[Dict[str, Any]]:
+        row = self._by_cin.get(str(cin))
+        return self.clients[row] if row is not None else None
+
+    def get_by_id(self, client_id: str) -> Optional[Dict[str, Any]]:
+        row = self._by_id.get(str(client_id))
+        return self.clients[row] if row is not None else None
+
+    def _expand(self, text: str) -> Dict[int, float]:
+        """Vocabulary tokens similar to a query token, with their similarity."""
+        matches = self._expansions.get(text)
+        if matches is None:
+            if len(self._expansions) >= EXPANSION_CACHE_SIZE:
+                self._expansions.clear()
+            matches = self._expansions[text] = self._match_vocabulary(text)
+        return matches
+
+    def _match_vocabulary(self, text: str) -> Dict[int, float]:
+        query = _make_token(text)
+
+        # Trigram overlap gives the exact Dice coefficient of every token sharing a gram
+        native_shared = Counter(chain.from_iterable(self._gram_index.get("n" + gram, ()) for gram in query.grams))
+        skeleton_shared = Counter(chain.from_iterable(self._gram_index.get("s" + gram, ()) for gram in query.skeleton_grams))
+
+        matches = {}
+        exact = self._vocab.get(text)
+        if exact is not None:
+            matches[exact] = 1.0
+
+        # Same script: best candidates by trigram Dice, confirmed by edit similarity
+        # A one-letter typo still leaves well over a third of the trigrams in common
+        min_shared = max(1, int(len(query.grams) * 0.4))
+        same_script = [
+            token_id for token_id, shared in native_shared.items()
+            if shared >= min_shared and self._tokens[token_id].arabic == query.arabic
+        ]
+        ranked = heapq.nlargest(
+            MAX_TOKEN_CANDIDATES, same_script,
+            key=lambda token_id: native_shared[token_id] / (len(query.grams) + len(self._tokens[token_id].grams)),
+        )
+        matcher = SequenceMatcher(None, "", text)
+        for token_id in ranked:
+            if token_id not in matches:
+                similarity = _same_script_similarity(query, self._tokens[token_id], matcher)
+                if similarity >= TOKEN_MIN_SIMILARITY:
+                    matches[token_id] = similarity
+
+        # Other script: consonant skeletons
+        for token_id, shared in skeleton_shared.items():
+            token = self._tokens[token_id]
+            if token.arabic == query.arabic:
+                continue
+            skeleton_dice = 2 * shared / (len(query.skeleton_grams) + len(token.skeleton_grams))
+            if skeleton_dice >= TOKEN_MIN_SIMILARITY or len(token.skeleton) < 3:
+                similarity = _cross_script_similarity(query, token, skeleton_dice)
+                if similarity >= TOKEN_MIN_SIMILARITY:
+                    matches[token_id] = max(similarity, matches.get(token_id, 0.0))
+        return matches
+
+    def search_name(self, name: str, limit: int = 5, threshold: float = NAME_MATCH_THRESHOLD) -> List[Tuple[Dict[str, Any], float]]:
+        """
+        Rank clients whose name fuzzily contains every token of `name`.
+
+        Returns:
+            Up to `limit` (client, score) pairs, best first; score is in [0, 1]
+        """
+        query_tokens = list(dict.fromkeys(tokenize(name)))
+        if not query_tokens:
+            return []
+
+        expansions = [self._expand(token) for token in query_tokens]
+        if not all(expansions):
+            return []
+
+        # Start from the query token with the fewest matching clients
+        def posting_size(expansion: Dict[int, float]) -> int:
+            return sum(len(self._postings[token_id]) for token_id in expansion)
+
+        order = sorted(range(len(expansions)), key=lambda i: posting_size(expansions[i]))
+        rarest = expansions[order[0]]
+
+        candidates: Dict[int, float] = {}
+        for token_id in sorted(rarest, key=rarest.__getitem__, reverse=True):
+            similarity = rarest[token_id]
+            for row in self._postings[token_id]:
+                if candidates.get(row, 0.0) < similarity:
+                    candidates[row] = similarity
+            if len(candidates) >= MAX_CLIENT_CANDIDATES:
+                break
+
+        scored = []
+        for row, first_similarity in candidates.items():
+            total = first_similarity
+            for i in order[1:]:
+                best = max((expansions[i].get(token_id, 0.0) for token_id in self._client_tokens[row]), default=0.0)
+                if best == 0.0:
+                    break
+                total += best
+            else:
+                score = total / len(query_tokens)
+                if score >= threshold:
+                    scored.append((score, row))
+
+        scored.sort(key=lambda item: (-item[0], item[1]))
+        return [(self.clients[row], round(score, 3)) for score, row in scored[:limit]]
+
+    def find_by_name(self, name: str) -> Optional[Dict[str, Any]]:
+        matches = self.search_name(name, limit=1)
+        return matches[0][0] if matches else None
+
+    def name_matches(self, client: Dict[str, Any], name: str, threshold: float = NAME_MATCH_THRESHOLD) -> bool:
+        """Whether `name` fuzzily matches this client's name."""
+        query_tokens = [_make_token(text) for text in dict.fromkeys(tokenize(name))]
+        client_tokens = [_make_token(text) for text in tokenize(client["name"])]
+        if not query_tokens or not client_tokens:
+            return False
+
+        total = 0.0
+        for query in query_tokens:
+            best = max(_similarity(query, token) for token in client_tokens)
+            if best < TOKEN_MIN_SIMILARITY:
+                return False
+            total += best
+        return total / len(query_tokens) >= threshold
+
+
+def load_clients(path: str, table: str = "clients") -> List[Dict[str, Any]]:
+    """Load client records from a CSV file or an SQLite database."""
+    if path.lower().endswith(".csv"):
+        with open(path, newline="", encoding="utf-8-sig") as f:
+            return [{field: row.get(field, "") for field in CLIENT_FIELDS} for row in csv.DictReader(f)]
+
+    conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+    try:
+        if not re.fullmatch(r"\w+", table):
+            raise ValueError(f"Invalid table name: {table}")
+        rows = conn.execute(f"SELECT {', '.join(CLIENT_FIELDS)} FROM {table}")
+        return [{field: str(value) if value is not None else "" for field, value in zip(CLIENT_FIELDS, row)} for row in rows]
+    finally:
+        conn.close()
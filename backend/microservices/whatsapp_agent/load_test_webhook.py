@@ -0,0 +1,235 @@
+"""
+Webhook Load Test
+Replays a burst of WhatsApp webhook payloads against the agent, with local
+stand-ins for the Graph API, the STT endpoint and the chat model.
+
+Reports webhook acknowledgement latency, the time until every phone has had
+its last message answered, whether replies to each phone number came back in
+order, and how many model calls burst coalescing saved.
+
+Usage:
+    python load_test_webhook.py [--messages 1000] [--phones 100] [--voice-ratio 0.1]
+"""
+
+import os
+import re
+import sys
+import time
+import random
+import asyncio
+import logging
+import argparse
+import subprocess
+import statistics
+from collections import defaultdict
+
+import httpx
+import uvicorn
+from fastapi import FastAPI, File, Request, UploadFile
+from fastapi.responses import Response
+
+STUB_PORT = 8931
+AGENT_PORT = 8932
+STUB_URL = f"http://127.0.0.1:{STUB_PORT}"
+
+# Point the agent at the stand-ins before its modules read the environment
+AGENT_ENV = {
+    "WHATSAPP_TOKEN": "load-test-token",
+    "PHONE_NUMBER_ID": "1000",
+    "WHATSAPP_API_URL": f"{STUB_URL}/v21.0",
+    "MODEL_ENDPOINT": f"{STUB_URL}/chat",
+    "STT_ENDPOINT": f"{STUB_URL}/transcribe",
+}
+
+SEQ_PATTERN = re.compile(r"seq-(\d+)")
+
+
+def build_stub_app(args):
+    """Graph API, STT and chat model stand-ins with configurable latency."""
+    stub = FastAPI()
+    replies = defaultdict(list)
+
+    @stub.get("/replies")
+    def get_replies():
+        return replies
+
+    @stub.get("/v21.0/{media_id}")
+    async def media_url(media_id: str):
+        await asyncio.sleep(args.graph_latency)
+        return {"url": f"{STUB_URL}/media/{media_id}"}
+
+    @stub.get("/media/{media_id}")
+    async def media(media_id: str):
+        # Media bodies are plain bytes naming the message sequence
+        await asyncio.sleep(args.graph_latency)
+        return Response(content=media_id.split("-", 1)[1].encode(), media_type="audio/ogg")
+
+    @stub.post("/v21.0/{phone_number_id}/messages")
+    async def send_message(phone_number_id: str, request: Request):
+        await asyncio.sleep(args.graph_latency)
+        payload = await request.json()
+        match = SEQ_PATTERN.search(payload["text"]["body"])
+        replies[payload["to"]].append(int(match.group(1)) if match else -1)
+        return {"messages": [{"id": f"wamid.reply.{sum(map(len, replies.values()))}"}]}
+
+    @stub.post("/transcribe")
+    async def transcribe(audio: UploadFile = File(...)):
+        content = (await audio.read()).decode()
+        await asyncio.sleep(args.stt_latency)
+        return {"text": f"voice {content}"}
+
+    @stub.post("/chat")
+    async def chat(request: Request):
+        prompt = (await request.json())["message"]
+        await asyncio.sleep(args.model_latency)
+        # The current message is the last one in the prompt (history comes first)
+        seqs = SEQ_PATTERN.findall(prompt)
+        return {"reply": f"reply seq-{seqs[-1]}" if seqs else "reply"}
+
+    return stub
+
+
+def build_payload(seq: int, phone: str, voice: bool) -> dict:
+    message = {"from": phone, "id": f"wamid.load.{seq}", "timestamp": str(int(time.time()))}
+    if voice:
+        message["type"] = "voice"
+        message["voice"] = {"id": f"media-seq-{seq}"}
+    else:
+        message["type"] = "text"
+        message["text"] = {"body": f"hello seq-{seq}"}
+    return {"entry": [{"changes": [{"value": {"messages": [message]}}]}]}
+
+
+def serve(args):
+    if args.serve == "stub":
+        app = build_stub_app(args)
+        port = STUB_PORT
+    else:
+        sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+        from main import app
+
+        logging.disable(logging.INFO)
+        port = AGENT_PORT
+    uvicorn.run(app, host="127.0.0.1", port=port, log_level="warning")
+
+
+def start_server(kind: str, args) -> subprocess.Popen:
+    process = subprocess.Popen(
+        [sys.executable, os.path.abspath(__file__), "--serve", kind] + sys.argv[1:],
+        env={
+            **os.environ,
+            **AGENT_ENV,
+            "WEBHOOK_WORKERS": str(args.workers),
+            "COALESCE_WINDOW_SECONDS": str(args.coalesce_window),
+            "RATE_LIMIT_PER_MINUTE": str(args.rate_limit),
+            "MODEL_MAX_CONCURRENCY": str(args.model_concurrency),
+        },
+    )
+    port = STUB_PORT if kind == "stub" else AGENT_PORT
+    deadline = time.time() + 15
+    while time.time() < deadline:
+        try:
+            httpx.get(f"http://127.0.0.1:{port}/", timeout=0.5)
+            return process
+        except httpx.TransportError:
+            time.sleep(0.1)
+    process.kill()
+    raise RuntimeError(f"{kind} server did not start")
+
+
+async def fire_burst(args, payloads_by_phone):
+    """Send every phone's messages in order, many phones at once (like WhatsApp does)."""
+    semaphore = asyncio.Semaphore(args.concurrency)
+    ack_latencies = []
+
+    async def send_phone(client, payloads):
+        for payload in payloads:
+            async with semaphore:
+                started = time.perf_counter()
+                response = await client.post(f"http://127.0.0.1:{AGENT_PORT}/webhook", json=payload)
+                ack_latencies.append((time.perf_counter() - started) * 1000)
+                response.raise_for_status()
+
+    async with httpx.AsyncClient(timeout=60.0) as client:
+        await asyncio.gather(*(send_phone(client, payloads) for payloads in payloads_by_phone.values()))
+    return ack_latencies
+
+
+def count_replies() -> dict:
+    return httpx.get(f"{STUB_URL}/replies", timeout=10.0).json()
+
+
+def all_answered(replies: dict, expected: dict) -> bool:
+    """Every phone has had a reply to its last message (earlier ones may be coalesced)."""
+    return all(replies.get(phone, [None])[-1] == seqs[-1] for phone, seqs in expected.items())
+
+
+def in_order(seqs: list, expected: list) -> bool:
+    """Replies answer the phone's own messages, oldest first, each at most once."""
+    return all(a < b for a, b in zip(seqs, seqs[1:])) and set(seqs) <= set(expected)
+
+
+def main(args):
+    rng = random.Random(7)
+    phones = [f"2165{i:07d}" for i in range(args.phones)]
+    expected = defaultdict(list)
+    payloads_by_phone = defaultdict(list)
+    for seq in range(args.messages):
+        phone = rng.choice(phones)
+        expected[phone].append(seq)
+        payloads_by_phone[phone].append(build_payload(seq, phone, rng.random() < args.voice_ratio))
+
+    servers = [start_server("stub", args), start_server("agent", args)]
+    try:
+        started = time.perf_counter()
+        ack_latencies = asyncio.run(fire_burst(args, payloads_by_phone))
+        acked = time.perf_counter() - started
+
+        deadline = time.time() + args.timeout
+        replies = count_replies()
+        while not all_answered(replies, expected) and time.time() < deadline:
+            time.sleep(0.2)
+            replies = count_replies()
+        drained = time.perf_counter() - started
+        coalescing = httpx.get(f"http://127.0.0.1:{AGENT_PORT}/coalescing", timeout=10.0).json()
+    finally:
+        for server in servers:
+            server.terminate()
+            server.wait()
+
+    sent = sum(map(len, replies.values()))
+    out_of_order = sum(1 for phone, seqs in replies.items() if not in_order(seqs, expected[phone]))
+    answered = sum(1 for phone, seqs in expected.items() if replies.get(phone, [None])[-1] == seqs[-1])
+
+    print(f"messages:            {args.messages} from {args.phones} phones ({args.voice_ratio:.0%} voice)")
+    print(f"ack latency p50/p99: {statistics.median(ack_latencies):.1f} / "
+          f"{sorted(ack_latencies)[int(0.99 * (len(ack_latencies) - 1))]:.1f} ms")
+    print(f"burst acknowledged:  {acked:.2f} s")
+    print(f"all phones answered: {drained:.2f} s ({answered}/{len(expected)} phones, "
+          f"{args.messages / drained:.0f} msg/s)")
+    print(f"replies sent:        {sent} ({coalescing['model_calls_saved']} model calls saved by coalescing, "
+          f"{coalescing['messages_per_turn']} messages per turn)")
+    print(f"phones out of order: {out_of_order}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--serve", choices=["stub", "agent"], help=argparse.SUPPRESS)
+    parser.add_argument("--messages", type=int, default=1000)
+    parser.add_argument("--phones", type=int, default=100)
+    parser.add_argument("--voice-ratio", type=float, default=0.1)
+    parser.add_argument("--workers", type=int, default=32, help="WEBHOOK_WORKERS for the agent")
+    parser.add_argument("--concurrency", type=int, default=100)
+    parser.add_argument("--graph-latency", type=float, default=0.05)
+    parser.add_argument("--stt-latency", type=float, default=1.0)
+    parser.add_argument("--model-latency", type=float, default=0.5)
+    parser.add_argument("--timeout", type=float, default=300.0)
+    parser.add_argument("--coalesce-window", type=float, default=1.5, help="COALESCE_WINDOW_SECONDS (0 = off)")
+    parser.add_argument("--rate-limit", type=float, default=12, help="RATE_LIMIT_PER_MINUTE (0 = off)")
+    parser.add_argument("--model-concurrency", type=int, default=16, help="MODEL_MAX_CONCURRENCY")
+    parsed = parser.parse_args()
+
+    if parsed.serve:
+        serve(parsed)
+    else:
+        main(parsed)
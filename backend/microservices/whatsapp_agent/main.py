@@ -4,12 +4,20 @@ Main FastAPI application entry point.
 """
 
 import os
+import asyncio
 import logging
+from contextlib import asynccontextmanager
 
 from fastapi import FastAPI
 from dotenv import load_dotenv
 
-from router import router
+from router import router, process_message, answer_model_turn
+from services.queue_service import message_queue
+from services.coalesce_service import message_coalescer
+from services.http_service import http_clients
+from services.transcription_service import run_spool_janitor
+from services.conversation_service import conversation_store
+from services.analytics_service import load_snapshot, save_snapshot, run_snapshot_loop
 
 # Load environment variables
 load_dotenv()
@@ -23,23 +31,44 @@ logger = logging.getLogger(__name__)
 
 MODEL_ENDPOINT = os.getenv("MODEL_ENDPOINT", "http://localhost:8010/chat")
 
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Start the HTTP clients, message workers and background tasks; drain them on shutdown."""
+    logger.info("🚀 Starting WhatsApp Agent Microservice...")
+    logger.info(f"📍 Model Endpoint: {MODEL_ENDPOINT}")
+    load_snapshot()
+    http_clients.start()
+    message_coalescer.start(answer_model_turn)
+    await message_queue.start(process_message)
+    janitor = asyncio.create_task(run_spool_janitor())
+    snapshots = asyncio.create_task(run_snapshot_loop())
+    logger.info("✅ Ready to receive WhatsApp messages!")
+    try:
+        yield
+    finally:
+        janitor.cancel()
+        snapshots.cancel()
+        # Drain the queue first: in-flight messages still need the clients
+        await message_queue.stop()
+        await message_coalescer.stop()
+        # After the buffered turns: their messages stay queued until answered
+        message_queue.close()
+        await http_clients.stop()
+        conversation_store.close()
+        save_snapshot()
+
+
 app = FastAPI(
     title="WhatsApp Agent Microservice",
     description="WhatsApp Business API webhook handler with AI-powered responses",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
 app.include_router(router)
 
 
-@app.on_event("startup")
-async def startup_event():
-    """Log startup info."""
-    logger.info("🚀 Starting WhatsApp Agent Microservice...")
-    logger.info(f"📍 Model Endpoint: {MODEL_ENDPOINT}")
-    logger.info("✅ Ready to receive WhatsApp messages!")
-
-
 @app.get("/health")
 def health_check():
     """Health check endpoint for monitoring."""
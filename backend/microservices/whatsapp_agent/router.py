@@ -4,6 +4,7 @@ Webhook endpoints for WhatsApp Business API integration.
 """
 
 import os
+import asyncio
 import logging
 from typing import Optional, Dict, Any
 from datetime import datetime
@@ -11,14 +12,20 @@ from datetime import datetime
 from fastapi import APIRouter, Request, HTTPException, Query
 
 from services.whatsapp_service import send_whatsapp_message
-from services.transcription_service import download_whatsapp_media, transcribe_audio
+from services.transcription_service import transcribe_whatsapp_media
 from services.conversation_service import add_to_history
-from services.tool_service import detect_language, extract_verification_data, detect_tool_needed, execute_local_tool
-from services.ai_service import query_model
+from services.tool_service import detect_language, execute_local_tool
+from services.intent_service import analyze_message
+from services.ai_service import stream_model_reply, get_streaming_stats, model_limiter
 from services.analytics_service import (
     track_message_received, track_message_sent, track_tool_usage, get_analytics,
     is_agent_active, set_agent_active, get_agent_status, get_offline_message
 )
+from services.queue_service import message_queue, QueueFullError
+from services.dedup_service import message_deduplicator
+from services.http_service import http_clients
+from services.coalesce_service import message_coalescer
+from services.reply_cache import reply_cache
 
 logger = logging.getLogger(__name__)
 
@@ -27,19 +34,6 @@ router = APIRouter()
 # Session storage for pending verifications (in production, use Redis or database)
 pending_verifications: Dict[str, Dict[str, Any]] = {}
 
-# Message deduplication - store processed message IDs
-processed_messages: set = set()
-MAX_PROCESSED_MESSAGES = 1000
-
-
-def cleanup_processed_messages():
-    """Clean up old message IDs if cache is too large."""
-    global processed_messages
-    if len(processed_messages) > MAX_PROCESSED_MESSAGES:
-        processed_messages.clear()
-        logger.info("🧹 Cleared processed messages cache")
-
-
 @router.get("/")
 def get_whatsapp_agent():
     """Root endpoint for WhatsApp Agent microservice."""
@@ -54,6 +48,49 @@ def get_whatsapp_analytics():
     return analytics
 
 
+@router.get("/queue")
+def get_queue_stats():
+    """Get webhook work queue depth and processing counters."""
+    return message_queue.get_stats()
+
+
+@router.get("/dedup")
+def get_dedup_stats():
+    """Get message deduplication cache counters."""
+    return message_deduplicator.get_stats()
+
+
+@router.get("/upstreams")
+def get_upstream_stats():
+    """Get latency histograms for outbound calls (Graph API, model, STT)."""
+    return http_clients.get_stats()
+
+
+@router.get("/coalescing")
+def get_coalescing_stats():
+    """Get burst coalescing, per-user rate limit and model concurrency counters."""
+    return {**message_coalescer.get_stats(), "model_calls": model_limiter.get_stats()}
+
+
+@router.get("/reply-cache")
+def get_reply_cache_stats():
+    """Get semantic reply cache hit rate, latency saved and size."""
+    return reply_cache.get_stats()
+
+
+@router.delete("/reply-cache")
+def clear_reply_cache():
+    """Forget every cached answer (e.g. after office hours or requirements change)."""
+    reply_cache.clear()
+    return reply_cache.get_stats()
+
+
+@router.get("/streaming")
+def get_model_streaming_stats():
+    """Get streamed reply counters and time until the first message part is sent."""
+    return get_streaming_stats()
+
+
 @router.get("/status")
 def get_status():
     """Get agent active status."""
@@ -92,7 +129,7 @@ async def verify_webhook(
 async def handle_webhook(request: Request):
     """
     Handle incoming WhatsApp webhook events.
-    Processes text and voice messages.
+    Acknowledges immediately and queues the message for background processing.
     """
     timestamp = datetime.now().isoformat()
     logger.info(f"\n\nWebhook received {timestamp}\n")
@@ -113,16 +150,40 @@ async def handle_webhook(request: Request):
         message_id = message.get("id")
         from_number = message.get("from")
         
-        # Check if we've already processed this message
-        if message_id in processed_messages:
+        # Check if we've already processed this message (also marks it as seen)
+        if message_deduplicator.is_duplicate(message_id):
             logger.info(f"⏭️ Skipping duplicate message: {message_id}")
             return {"status": "ok"}
         
-        # Mark this message as processed
-        processed_messages.add(message_id)
-        cleanup_processed_messages()
-        logger.info(f"✅ Processing new message: {message_id}")
+        try:
+            message_queue.enqueue(from_number, message)
+        except QueueFullError as e:
+            # Let WhatsApp retry later instead of dropping the message
+            message_deduplicator.forget(message_id)
+            logger.warning(f"⚠️ {e}, asking WhatsApp to retry {message_id}")
+            raise HTTPException(status_code=503, detail="Message queue is full")
         
+        logger.info(f"📥 Queued new message: {message_id}")
+        return {"status": "ok"}
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error processing webhook: {e}")
+        return {"status": "ok"}  # Still return 200 to avoid webhook retry
+
+
+async def process_message(message: Dict[str, Any]) -> Optional[asyncio.Task]:
+    """
+    Process one queued WhatsApp message.
+    Handles text and voice messages and sends the reply.
+    Returns the coalesced model turn that will answer the message, if any,
+    so the queue keeps the message until the reply is sent.
+    """
+    from_number = message.get("from")
+    logger.info(f"✅ Processing message: {message.get('id')}")
+    
+    try:
         message_text = message.get("text", {}).get("body")
         audio_message = message.get("audio")
         voice_message = message.get("voice")
@@ -133,13 +194,9 @@ async def handle_webhook(request: Request):
             logger.info(f"\n🎤 Received voice message from {from_number}, Media ID: {media_id}")
             
             try:
-                # Download audio
-                logger.info("Downloading audio...")
-                audio_file_path = await download_whatsapp_media(media_id)
-                
-                # Transcribe audio using simple /transcribe endpoint
+                # Stream the audio into the simple /transcribe endpoint
                 logger.info("Transcribing audio with /transcribe endpoint...")
-                transcription_result = await transcribe_audio(audio_file_path, use_simple_transcribe=True)
+                transcription_result = await transcribe_whatsapp_media(media_id, use_simple_transcribe=True)
                 logger.info(f"Transcription result: {transcription_result}")
                 
                 if transcription_result.get("text"):
@@ -149,11 +206,11 @@ async def handle_webhook(request: Request):
                     logger.error("❌ Transcription failed")
                     error_msg = (
                         "Désolé, je n'ai pas pu comprendre le message vocal. Veuillez réessayer."
-                        if detect_language(message_text or "error") == "french"
+                        if detect_language(message_text or "") == "french"
                         else "عذراً، لم أتمكن من فهم الرسالة الصوتية. يرجى المحاولة مرة أخرى."
                     )
                     await send_whatsapp_message(from_number, error_msg)
-                    return {"status": "ok"}
+                    return
                     
             except Exception as e:
                 logger.error(f"Error processing voice message: {e}")
@@ -161,13 +218,14 @@ async def handle_webhook(request: Request):
                     from_number,
                     "Sorry, there was an error processing your voice message. Please try again."
                 )
-                return {"status": "ok"}
+                return
         
         if message_text:
             logger.info(f"\n📝 Received message from {from_number}: {message_text}")
             
-            # Detect language
-            language = detect_language(message_text)
+            # Detect language, tool intent and verification data (name or CIN) in one pass
+            analysis = analyze_message(message_text)
+            language = analysis.language
             logger.info(f"Detected language: {language}")
             
             # Track analytics
@@ -176,22 +234,29 @@ async def handle_webhook(request: Request):
             # Check if agent is active
             if not is_agent_active():
                 logger.info("🔴 Agent is inactive, sending offline message")
+                await message_coalescer.flush(from_number)
                 offline_msg = get_offline_message(language)
                 await send_whatsapp_message(from_number, offline_msg)
                 track_message_sent(from_number)
-                return {"status": "ok"}
-            
-            # Add user message to history
-            add_to_history(from_number, "user", message_text)
+                return
             
             # Check if user has pending verification
             has_pending_verification = from_number in pending_verifications
             
-            # Extract verification data (name or CIN)
-            verification_data = extract_verification_data(message_text)
+            verification_data = analysis.verification
+            tool_info = analysis.tool_info
             
-            # Check if we need to use local tools
-            tool_info = detect_tool_needed(message_text)
+            if not tool_info and not (has_pending_verification and verification_data):
+                # Plain question for the model: buffered with the user's next
+                # messages and answered in one turn by answer_model_turn
+                add_to_history(from_number, "user", message_text)
+                return message_coalescer.submit(from_number, message_text, language)
+            
+            # Earlier messages still waiting for the model are answered first
+            await message_coalescer.flush(from_number)
+            
+            # Add user message to history
+            add_to_history(from_number, "user", message_text)
             
             final_response = None
             
@@ -246,11 +311,6 @@ async def handle_webhook(request: Request):
                             "❌ فشل التحقق. الاسم أو رقم البطاقة لا يطابق سجلاتنا. "
                             "يرجى المحاولة مرة أخرى."
                         )
-            else:
-                # No tool needed, just query the AI model
-                logger.info("Querying AI model...")
-                ai_response = await query_model(message_text, language, None, from_number)
-                final_response = ai_response.get("reply", "")
             
             logger.info(f"Final Response: {final_response}")
             
@@ -263,8 +323,25 @@ async def handle_webhook(request: Request):
             track_message_sent(from_number)
             logger.info("Response sent successfully!")
         
-        return {"status": "ok"}
-        
     except Exception as e:
-        logger.error(f"Error processing webhook: {e}")
-        return {"status": "ok"}  # Still return 200 to avoid webhook retry
+        logger.error(f"Error processing message {message.get('id')}: {e}")
+
+
+async def answer_model_turn(from_number: str, message_text: str, language: str) -> None:
+    """
+    Answer one or more coalesced messages with a single model call.
+    Called by the message coalescer once the user pauses; long replies are
+    sent as several messages as the model streams them.
+    """
+    logger.info("Querying AI model...")
+    parts = []
+    # The first sentence goes out while the model is still writing the rest
+    async for part in stream_model_reply(message_text, language, None, from_number):
+        await send_whatsapp_message(from_number, part)
+        parts.append(part)
+    final_response = "\n\n".join(parts)
+    
+    logger.info(f"Final Response: {final_response}")
+    
+    add_to_history(from_number, "assistant", final_response)
+    track_message_sent(from_number)
@@ -1,29 +1,41 @@
 """
 WhatsApp Agent Services Package
+
+The helpers below are imported on first access, so a single service module
+(e.g. services.text_normalize, used by client_index) can be imported without
+loading the others.
 """
 
-from .whatsapp_service import send_whatsapp_message
-from .transcription_service import download_whatsapp_media, transcribe_audio
-from .conversation_service import add_to_history, get_history, format_history_for_model
-from .tool_service import detect_language, extract_verification_data, detect_tool_needed, execute_local_tool
-from .ai_service import query_model
-from .analytics_service import track_message_received, track_message_sent, track_tool_usage, get_analytics
+import importlib
+
+_EXPORTS = {
+    "send_whatsapp_message": "whatsapp_service",
+    "download_whatsapp_media": "transcription_service",
+    "transcribe_audio": "transcription_service",
+    "transcribe_whatsapp_media": "transcription_service",
+    "add_to_history": "conversation_service",
+    "get_history": "conversation_service",
+    "format_history_for_model": "conversation_service",
+    "analyze_message": "intent_service",
+    "register_tool": "intent_service",
+    "detect_language": "tool_service",
+    "extract_verification_data": "tool_service",
+    "detect_tool_needed": "tool_service",
+    "execute_local_tool": "tool_service",
+    "query_model": "ai_service",
+    "stream_model_reply": "ai_service",
+    "track_message_received": "analytics_service",
+    "track_message_sent": "analytics_service",
+    "track_tool_usage": "analytics_service",
+    "get_analytics": "analytics_service",
+}
+
+__all__ = list(_EXPORTS)
 
-__all__ = [
-    "send_whatsapp_message",
-    "download_whatsapp_media",
-    "transcribe_audio",
-    "add_to_history",
-    "get_history",
-    "format_history_for_model",
-    "detect_language",
-    "extract_verification_data",
-    "detect_tool_needed",
-    "execute_local_tool",
-    "query_model",
-    "track_message_received",
-    "track_message_sent",
-    "track_tool_usage",
-    "get_analytics",
-]
 
+def __getattr__(name):
+    if name not in _EXPORTS:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(f".{_EXPORTS[name]}", __name__), name)
+    globals()[name] = value
+    return value
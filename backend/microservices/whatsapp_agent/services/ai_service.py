@@ -1,46 +1,50 @@
 """
 AI Service
 Handles chat generation by calling external TunCHAT model API (Colab/remote server).
+
+Replies can be streamed: the endpoint is asked for SSE or chunked JSON and the
+first sentence is delivered while the rest is still being generated.
 """
 
 import os
+import json
+import time
+import asyncio
 import logging
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, AsyncIterator
 
 import httpx
 
 from .conversation_service import get_history, format_history_for_model
+from .http_service import http_clients
+from .rate_limit import ConcurrencyLimiter
+from .reply_cache import reply_cache
+from .stream_service import ReplyChunker, STREAM_ACCEPT, is_json_response, iter_reply_tokens
 
 logger = logging.getLogger(__name__)
 
 # Colab/remote model endpoint - set via environment variable
 # Example: https://xxxx-xx-xxx-xxx-xxx.trycloudflare.com/chat
 MODEL_ENDPOINT = os.getenv("MODEL_ENDPOINT", "http://localhost:8010/chat")
+# Model requests in flight at once across all users (0 = unlimited)
+MODEL_MAX_CONCURRENCY = int(os.getenv("MODEL_MAX_CONCURRENCY", "4"))
 
+# Ask the endpoint for a streamed reply (SSE or chunked JSON) and send it sentence by sentence
+MODEL_STREAMING = os.getenv("MODEL_STREAMING", "true").lower() == "true"
 
-async def query_model(
-    message: str,
-    language: str = "arabic",
-    context: Optional[str] = None,
-    user_phone: Optional[str] = None
-) -> Dict[str, Any]:
-    """
-    Query the remote TunCHAT model API.
-    
-    Args:
-        message: User's message
-        language: 'french' or 'arabic'
-        context: Optional context from tool execution
-        user_phone: User's phone for conversation history
-        
-    Returns:
-        Model response dict with 'reply' key
-    """
-    # Get conversation history
-    history = get_history(user_phone, 6) if user_phone else []
-    history_text = format_history_for_model(history)
-    
-    # Build the prompt
+# Caps concurrent calls to the model endpoint; extra calls wait their turn
+model_limiter = ConcurrencyLimiter(MODEL_MAX_CONCURRENCY)
+
+# Cleared when the endpoint rejects a streaming request (4xx)
+_streaming_supported = True
+_stream_stats = {
+    "replies": 0, "parts": 0, "streamed": 0, "not_streamed": 0, "fallbacks": 0, "interrupted": 0,
+    "first_part_seconds": 0.0, "full_reply_seconds": 0.0,
+}
+
+
+def build_prompt(message: str, language: str, context: Optional[str], history_text: str) -> str:
+    """Wrap the user's message with tool context, conversation history and the language instruction."""
     full_prompt = message
     
     if context:
@@ -64,36 +68,245 @@ async def query_model(
             "\n\nIMPORTANT: Respond in professional Arabic (Modern Standard Arabic)."
         )
     
-    full_prompt += language_instruction
+    return full_prompt + language_instruction
+
+
+def fallback_reply(language: str, timed_out: bool = False) -> str:
+    """Apology sent when the model cannot answer."""
+    if timed_out:
+        return (
+            "Désolé, le temps de réponse a été trop long. Veuillez réessayer."
+            if language == "french"
+            else "عذراً، استغرق الرد وقتاً طويلاً. يرجى المحاولة مرة أخرى."
+        )
+    return (
+        "Bonjour! Le service AI est temporairement indisponible. Veuillez réessayer plus tard."
+        if language == "french"
+        else "مرحباً! خدمة الذكاء الاصطناعي غير متاحة حالياً. يرجى المحاولة لاحقاً."
+    )
+
+
+def _remember_reply(probe, history, reply: str, started: float) -> None:
+    reply_cache.record_model_latency(time.monotonic() - started)
+    # Only answers given without an earlier exchange are reusable
+    if probe is not None and not any(entry["role"] == "assistant" for entry in history):
+        reply_cache.store(probe, reply)
+
+
+async def _post_prompt(full_prompt: str) -> Dict[str, Any]:
+    async with model_limiter:
+        response = await http_clients.get("model").post(
+            MODEL_ENDPOINT,
+            json={"message": full_prompt},
+            headers={"Content-Type": "application/json"}
+        )
+    response.raise_for_status()
+    return response.json()
+
+
+async def query_model(
+    message: str,
+    language: str = "arabic",
+    context: Optional[str] = None,
+    user_phone: Optional[str] = None
+) -> Dict[str, Any]:
+    """
+    Query the remote TunCHAT model API.
+    
+    Args:
+        message: User's message
+        language: 'french' or 'arabic'
+        context: Optional context from tool execution
+        user_phone: User's phone for conversation history
+        
+    Returns:
+        Model response dict with 'reply' key
+    """
+    # Get conversation history
+    history = get_history(user_phone, 6) if user_phone else []
+    history_text = format_history_for_model(history)
+    
+    # Standalone FAQ-style questions may be answered from the reply cache
+    probe = None
+    if reply_cache.is_standalone(message, context, history):
+        cached_reply, probe = await reply_cache.lookup(message, language)
+        if cached_reply is not None:
+            return {"reply": cached_reply, "cached": True}
+    
+    full_prompt = build_prompt(message, language, context, history_text)
     
     logger.info(f"📤 Sending request to model endpoint: {MODEL_ENDPOINT}")
     
     try:
-        async with httpx.AsyncClient(timeout=120.0) as client:
-            response = await client.post(
-                MODEL_ENDPOINT,
-                json={"message": full_prompt},
-                headers={"Content-Type": "application/json"}
-            )
-            response.raise_for_status()
-            data = response.json()
-            logger.info(f"✅ Model response received")
-            return data
+        started = time.monotonic()
+        data = await _post_prompt(full_prompt)
+        logger.info(f"✅ Model response received")
+        _remember_reply(probe, history, data.get("reply", ""), started)
+        return data
             
     except httpx.TimeoutException:
         logger.error("❌ Model request timed out (>120s)")
-        fallback = (
-            "Désolé, le temps de réponse a été trop long. Veuillez réessayer."
-            if language == "french"
-            else "عذراً، استغرق الرد وقتاً طويلاً. يرجى المحاولة مرة أخرى."
-        )
-        return {"reply": fallback}
+        return {"reply": fallback_reply(language, timed_out=True)}
         
     except httpx.HTTPError as e:
         logger.error(f"❌ Error querying model: {e}")
-        fallback = (
-            "Bonjour! Le service AI est temporairement indisponible. Veuillez réessayer plus tard."
-            if language == "french"
-            else "مرحباً! خدمة الذكاء الاصطناعي غير متاحة حالياً. يرجى المحاولة لاحقاً."
-        )
-        return {"reply": fallback}
+        return {"reply": fallback_reply(language)}
+
+
+async def stream_model_reply(
+    message: str,
+    language: str = "arabic",
+    context: Optional[str] = None,
+    user_phone: Optional[str] = None
+) -> AsyncIterator[str]:
+    """
+    Query the model in streaming mode and yield the reply as WhatsApp messages.
+    
+    The first complete sentence is yielded as soon as the model has produced
+    it, later paragraphs follow as they complete. Cached answers, endpoints
+    that reply with a single JSON body, and MODEL_STREAMING=false yield the
+    whole reply at once. If the stream fails before anything was yielded,
+    the regular non-streaming request is made instead.
+    
+    Args:
+        message: User's message
+        language: 'french' or 'arabic'
+        context: Optional context from tool execution
+        user_phone: User's phone for conversation history
+        
+    Yields:
+        Reply parts, in order
+    """
+    global _streaming_supported
+    
+    history = get_history(user_phone, 6) if user_phone else []
+    history_text = format_history_for_model(history)
+    
+    probe = None
+    if reply_cache.is_standalone(message, context, history):
+        cached_reply, probe = await reply_cache.lookup(message, language)
+        if cached_reply is not None:
+            yield cached_reply
+            return
+    
+    full_prompt = build_prompt(message, language, context, history_text)
+    started = time.monotonic()
+    
+    if MODEL_STREAMING and _streaming_supported:
+        chunker = ReplyChunker()
+        tokens = []
+        # Parts are handed over through a queue: the model slot and the HTTP
+        # stream are released by the reader, not held while each part is sent
+        parts: asyncio.Queue = asyncio.Queue()
+        sent = 0
+        
+        async def read_stream() -> Optional[str]:
+            """Queue the reply's parts as they complete; returns the reply if sent as one JSON body."""
+            try:
+                async with model_limiter:
+                    async with http_clients.get("model").stream(
+                        "POST",
+                        MODEL_ENDPOINT,
+                        json={"message": full_prompt, "stream": True},
+                        headers={"Content-Type": "application/json", "Accept": STREAM_ACCEPT},
+                    ) as response:
+                        response.raise_for_status()
+                        if is_json_response(response):
+                            return json.loads(await response.aread()).get("reply", "")
+                        async for token in iter_reply_tokens(response):
+                            tokens.append(token)
+                            for part in chunker.feed(token):
+                                parts.put_nowait(part)
+                return None
+            finally:
+                parts.put_nowait(None)
+        
+        logger.info(f"📤 Streaming request to model endpoint: {MODEL_ENDPOINT}")
+        reader = asyncio.create_task(read_stream())
+        try:
+            while (part := await parts.get()) is not None:
+                _record_part(not sent, started)
+                sent += 1
+                yield part
+            whole_reply = await reader
+        
+        except (httpx.HTTPError, ValueError) as e:
+            if isinstance(e, httpx.HTTPStatusError) and 400 <= e.response.status_code < 500:
+                # The endpoint rejects streaming requests; stop trying until restart
+                _streaming_supported = False
+            if sent:
+                logger.error(f"❌ Model stream interrupted after {sent} messages: {e}")
+                _stream_stats["interrupted"] += 1
+                for part in chunker.close():
+                    _record_part(False, started)
+                    yield part
+                return
+            if isinstance(e, httpx.TimeoutException):
+                # A regular request would time out the same way
+                logger.error("❌ Model request timed out (>120s)")
+                _record_part(True, started)
+                yield fallback_reply(language, timed_out=True)
+                return
+            logger.warning(f"⚠️ Streaming failed, falling back to a regular request: {e}")
+            _stream_stats["fallbacks"] += 1
+        
+        else:
+            if whole_reply is not None:
+                _stream_stats["not_streamed"] += 1
+                _remember_reply(probe, history, whole_reply, started)
+                if whole_reply:
+                    _record_part(True, started)
+                    yield whole_reply
+                return
+            
+            logger.info(f"✅ Model stream complete")
+            for part in chunker.close():
+                _record_part(not sent, started)
+                sent += 1
+                yield part
+            _stream_stats["streamed"] += 1
+            _stream_stats["full_reply_seconds"] += time.monotonic() - started
+            _remember_reply(probe, history, "".join(tokens).strip(), started)
+            return
+        
+        finally:
+            # The caller stopped early: do not keep reading (and holding the model slot)
+            reader.cancel()
+    
+    logger.info(f"📤 Sending request to model endpoint: {MODEL_ENDPOINT}")
+    try:
+        data = await _post_prompt(full_prompt)
+        logger.info(f"✅ Model response received")
+        reply = data.get("reply", "")
+        _remember_reply(probe, history, reply, started)
+    except httpx.TimeoutException:
+        logger.error("❌ Model request timed out (>120s)")
+        reply = fallback_reply(language, timed_out=True)
+    except httpx.HTTPError as e:
+        logger.error(f"❌ Error querying model: {e}")
+        reply = fallback_reply(language)
+    _record_part(True, started)
+    yield reply
+
+
+def _record_part(first: bool, started: float) -> None:
+    _stream_stats["parts"] += 1
+    if first:
+        _stream_stats["replies"] += 1
+        _stream_stats["first_part_seconds"] += time.monotonic() - started
+
+
+def get_streaming_stats() -> Dict[str, Any]:
+    """Streaming counters and average time until the first and the last message part."""
+    replies = _stream_stats["replies"]
+    streamed = _stream_stats["streamed"]
+    return {
+        **_stream_stats,
+        "first_part_seconds": round(_stream_stats["first_part_seconds"], 3),
+        "full_reply_seconds": round(_stream_stats["full_reply_seconds"], 3),
+        "avg_first_part_seconds": round(_stream_stats["first_part_seconds"] / replies, 3) if replies else None,
+        "avg_full_reply_seconds": round(_stream_stats["full_reply_seconds"] / streamed, 3) if streamed else None,
+        "parts_per_reply": round(_stream_stats["parts"] / replies, 2) if replies else 0.0,
+        "enabled": MODEL_STREAMING,
+        "endpoint_supports_streaming": _streaming_supported,
+    }
@@ -0,0 +1,129 @@
+"""
+Analytics Engine
+Fixed-size streaming counters for the WhatsApp agent metrics.
+
+Messages are counted in rolling hourly and daily buckets, and distinct users
+are estimated with HyperLogLog sketches, so memory stays constant no matter
+how many messages or users are tracked and every read is O(1).
+"""
+
+import math
+import base64
+import hashlib
+from typing import Any, Dict, List, Optional
+
+
+class HyperLogLog:
+    """Approximate distinct counter (about 1.6% standard error with p=12)."""
+
+    def __init__(self, p: int = 12, registers: Optional[bytes] = None):
+        self.p = p
+        self.m = 1 << p
+        self.registers = bytearray(registers) if registers else bytearray(self.m)
+        if self.m == 16:
+            self._alpha = 0.673
+        elif self.m == 32:
+            self._alpha = 0.697
+        elif self.m == 64:
+            self._alpha = 0.709
+        else:
+            self._alpha = 0.7213 / (1 + 1.079 / self.m)
+        self._cached: Optional[int] = 0 if registers is None else None
+
+    def add(self, value: str) -> None:
+        x = int.from_bytes(hashlib.blake2b(value.encode(), digest_size=8).digest(), "big")
+        index = x >> (64 - self.p)
+        rest = x & ((1 << (64 - self.p)) - 1)
+        rank = (64 - self.p) - rest.bit_length() + 1
+        if rank > self.registers[index]:
+            self.registers[index] = rank
+            self._cached = None
+
+    def count(self) -> int:
+        if self._cached is None:
+            estimate = self._alpha * self.m * self.m / sum(2.0 ** -r for r in self.registers)
+            zeros = self.registers.count(0)
+            if estimate <= 2.5 * self.m and zeros:
+                # Small-range correction (linear counting)
+                estimate = self.m * math.log(self.m / zeros)
+            self._cached = int(round(estimate))
+        return self._cached
+
+    def merge(self, other: "HyperLogLog") -> None:
+        self.registers = bytearray(max(a, b) for a, b in zip(self.registers, other.registers))
+        self._cached = None
+
+    def copy(self) -> "HyperLogLog":
+        return HyperLogLog(self.p, bytes(self.registers))
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"p": self.p, "registers": base64.b64encode(bytes(self.registers)).decode()}
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "HyperLogLog":
+        return cls(data["p"], base64.b64decode(data["registers"]))
+
+
+class RollingCounter:
+    """Ring of `size` integer buckets addressed by an ever-increasing bucket index."""
+
+    def __init__(self, size: int):
+        self.size = size
+        self.counts: List[int] = [0] * size
+        self.indexes: List[int] = [-1] * size
+
+    def add(self, bucket: int, amount: int = 1) -> None:
+        slot = bucket % self.size
+        if self.indexes[slot] != bucket:
+            # The slot still holds a bucket that has rolled out of the window
+            self.indexes[slot] = bucket
+            self.counts[slot] = 0
+        self.counts[slot] += amount
+
+    def get(self, bucket: int) -> int:
+        slot = bucket % self.size
+        return self.counts[slot] if self.indexes[slot] == bucket else 0
+
+    def window(self, last_bucket: int, length: int) -> List[int]:
+        """Counts of the `length` buckets ending at last_bucket, oldest first."""
+        return [self.get(bucket) for bucket in range(last_bucket - length + 1, last_bucket + 1)]
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"size": self.size, "counts": self.counts, "indexes": self.indexes}
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "RollingCounter":
+        counter = cls(data["size"])
+        counter.counts = list(data["counts"])
+        counter.indexes = list(data["indexes"])
+        return counter
+
+
+class PeriodSketch:
+    """HyperLogLog for the current period (day or month), replaced when the period changes."""
+
+    def __init__(self, period: str = "", sketch: Optional[HyperLogLog] = None):
+        self.period = period
+        self.sketch = sketch or HyperLogLog()
+
+    def add(self, period: str, value: str) -> None:
+        self.roll(period)
+        self.sketch.add(value)
+
+    def count(self, period: str) -> int:
+        return self.sketch.count() if self.period == period else 0
+
+    def roll(self, period: str) -> bool:
+        """Start a new sketch if `period` differs; returns True when it rolled."""
+        if self.period == period:
+            return False
+        self.period = period
+        self.sketch = HyperLogLog()
+        return True
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"period": self.period, "sketch": self.sketch.to_dict()}
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "PeriodSketch":
+        return cls(data["period"], HyperLogLog.from_dict(data["sketch"]))
@@ -1,16 +1,30 @@
 """
 Analytics Service
-In-memory tracking of WhatsApp agent metrics.
-Resets when container restarts.
+Streaming tracking of WhatsApp agent metrics.
+Counters are bucketed per hour and per day in fixed-size rings, unique users
+are estimated with HyperLogLog, and a snapshot is written to disk periodically
+so counts survive container restarts.
 """
 
+import os
+import json
+import asyncio
 from datetime import datetime, date
 from typing import Dict, Any, List
 from collections import defaultdict
 import logging
 
+from .analytics_engine import HyperLogLog, PeriodSketch, RollingCounter
+
 logger = logging.getLogger(__name__)
 
+# JSON file the counters are saved to (empty = in-memory only, reset on restart)
+ANALYTICS_SNAPSHOT_PATH = os.getenv("ANALYTICS_SNAPSHOT_PATH", "analytics_snapshot.json")
+ANALYTICS_SNAPSHOT_INTERVAL = float(os.getenv("ANALYTICS_SNAPSHOT_INTERVAL", "60"))
+
+HOURLY_BUCKETS = 48  # Rolling window of hourly message counts
+DAILY_BUCKETS = 35  # Rolling window of daily message counts
+
 # Agent status (can be toggled from frontend)
 _agent_status = {
     "is_active": True,
@@ -18,35 +32,50 @@ _agent_status = {
     "offline_message_fr": "Bonjour! Le bureau est actuellement fermé. Veuillez nous contacter pendant les heures d'ouverture du lundi au vendredi, 8h00 - 17h00. Merci de votre compréhension. 🙏"
 }
 
+
+def _new_stats() -> Dict[str, Any]:
+    return {
+        "start_time": datetime.now(),
+        "messages_received": 0,
+        "messages_sent": 0,
+        "hourly_messages": defaultdict(int),  # hour (0-23) -> count
+        "language_distribution": {"arabic": 0, "french": 0},
+        "tool_usage": defaultdict(int),  # tool_name -> count
+        "messages_per_hour": RollingCounter(HOURLY_BUCKETS),  # bucket = day ordinal * 24 + hour
+        "messages_per_day": RollingCounter(DAILY_BUCKETS),  # bucket = day ordinal
+        "all_users": HyperLogLog(),
+        "users_today": PeriodSketch(),  # period = ISO date
+        "users_this_month": PeriodSketch(),  # period = YYYY-MM
+        "users_before_month": PeriodSketch(),  # all users seen before the current month
+    }
+
+
 # In-memory storage
-_stats = {
-    "start_time": datetime.now(),
-    "messages_received": 0,
-    "messages_sent": 0,
-    "unique_users": set(),
-    "users_first_seen": {},  # phone -> datetime
-    "hourly_messages": defaultdict(int),  # hour (0-23) -> count
-    "language_distribution": {"arabic": 0, "french": 0},
-    "tool_usage": defaultdict(int),  # tool_name -> count
-    "conversations": defaultdict(list),  # phone -> list of timestamps
-}
+_stats = _new_stats()
+
+
+def _month_key(day: date) -> str:
+    return day.strftime("%Y-%m")
 
 
 def track_message_received(phone: str, language: str = "arabic"):
     """Track an incoming message from a user."""
     now = datetime.now()
+    today = now.date()
+    month = _month_key(today)
     
     _stats["messages_received"] += 1
     _stats["hourly_messages"][now.hour] += 1
     _stats["language_distribution"][language] += 1
+    _stats["messages_per_hour"].add(today.toordinal() * 24 + now.hour)
+    _stats["messages_per_day"].add(today.toordinal())
     
-    # Track unique users
-    if phone not in _stats["unique_users"]:
-        _stats["users_first_seen"][phone] = now
-    _stats["unique_users"].add(phone)
-    
-    # Track conversation
-    _stats["conversations"][phone].append(now)
+    # Track unique users; at a month boundary, remember who had been seen before it
+    if _stats["users_this_month"].roll(month):
+        _stats["users_before_month"] = PeriodSketch(month, _stats["all_users"].copy())
+    _stats["users_this_month"].add(month, phone)
+    _stats["users_today"].add(today.isoformat(), phone)
+    _stats["all_users"].add(phone)
     
     logger.info(f"📊 Tracked incoming message from {phone[:6]}...")
 
@@ -67,26 +96,17 @@ def get_analytics() -> Dict[str, Any]:
     """Get all analytics for the dashboard."""
     now = datetime.now()
     today = date.today()
+    month = _month_key(today)
     
-    # Calculate messages today
-    messages_today = sum(
-        1 for phone, timestamps in _stats["conversations"].items()
-        for ts in timestamps if ts.date() == today
-    )
+    # Messages and unique users today
+    messages_today = _stats["messages_per_day"].get(today.toordinal())
+    conversations_today = _stats["users_today"].count(today.isoformat())
     
-    # Calculate conversations today (unique users who messaged today)
-    conversations_today = sum(
-        1 for phone, timestamps in _stats["conversations"].items()
-        if any(ts.date() == today for ts in timestamps)
-    )
-    
-    # New vs returning clients this month
-    month_start = today.replace(day=1)
-    new_this_month = sum(
-        1 for phone, first_seen in _stats["users_first_seen"].items()
-        if first_seen.date() >= month_start
-    )
-    returning_this_month = len(_stats["unique_users"]) - new_this_month
+    # New vs returning clients this month (approximate distinct counts)
+    total_clients = _stats["all_users"].count()
+    before_month = _stats["users_before_month"]
+    new_this_month = max(total_clients - before_month.count(month), 0) if before_month.period == month else 0
+    returning_this_month = total_clients - new_this_month
     
     # Hourly distribution
     hourly_dist = []
@@ -97,16 +117,21 @@ def get_analytics() -> Dict[str, Any]:
             "count": _stats["hourly_messages"].get(hour, 0)
         })
     
+    # Messages over the last 24 hours
+    current_hour = today.toordinal() * 24 + now.hour
+    messages_last_24h = sum(_stats["messages_per_hour"].window(current_hour, 24))
+    
     # Calculate average messages per conversation
-    total_convs = len(_stats["conversations"])
-    avg_per_conv = round(_stats["messages_received"] / max(total_convs, 1), 1)
+    avg_per_conv = round(_stats["messages_received"] / max(total_clients, 1), 1)
     
     return {
         "messages_today": messages_today,
         "conversations_today": conversations_today,
-        "total_clients": len(_stats["unique_users"]),
+        "total_clients": total_clients,
         "new_clients_this_month": new_this_month,
         "returning_clients": returning_this_month,
+        "unique_users_this_month": _stats["users_this_month"].count(month),
+        "messages_last_24_hours": messages_last_24h,
         "messages_sent": _stats["messages_sent"],
         "messages_received": _stats["messages_received"],
         "avg_messages_per_conversation": avg_per_conv,
@@ -120,20 +145,83 @@ def get_analytics() -> Dict[str, Any]:
 def reset_analytics():
     """Reset all analytics (for testing)."""
     global _stats
-    _stats = {
-        "start_time": datetime.now(),
-        "messages_received": 0,
-        "messages_sent": 0,
-        "unique_users": set(),
-        "users_first_seen": {},
-        "hourly_messages": defaultdict(int),
-        "language_distribution": {"arabic": 0, "french": 0},
-        "tool_usage": defaultdict(int),
-        "conversations": defaultdict(list),
-    }
+    _stats = _new_stats()
     logger.info("📊 Analytics reset")
 
 
+# ======== Snapshot Persistence ========
+
+def _snapshot() -> Dict[str, Any]:
+    return {
+        "saved_at": datetime.now().isoformat(),
+        "messages_received": _stats["messages_received"],
+        "messages_sent": _stats["messages_sent"],
+        "hourly_messages": dict(_stats["hourly_messages"]),
+        "language_distribution": _stats["language_distribution"],
+        "tool_usage": dict(_stats["tool_usage"]),
+        "messages_per_hour": _stats["messages_per_hour"].to_dict(),
+        "messages_per_day": _stats["messages_per_day"].to_dict(),
+        "all_users": _stats["all_users"].to_dict(),
+        "users_today": _stats["users_today"].to_dict(),
+        "users_this_month": _stats["users_this_month"].to_dict(),
+        "users_before_month": _stats["users_before_month"].to_dict(),
+    }
+
+
+def _write_file(path: str, data: Dict[str, Any]) -> None:
+    # Write to a temp file and rename so a crash never leaves a torn snapshot
+    temp_path = f"{path}.tmp"
+    with open(temp_path, "w", encoding="utf-8") as f:
+        json.dump(data, f)
+    os.replace(temp_path, path)
+
+
+def save_snapshot(path: str = ANALYTICS_SNAPSHOT_PATH) -> None:
+    """Write the current counters to disk."""
+    if path:
+        _write_file(path, _snapshot())
+
+
+def load_snapshot(path: str = ANALYTICS_SNAPSHOT_PATH) -> bool:
+    """Restore counters from a snapshot file; returns False if there is none."""
+    if not path or not os.path.exists(path):
+        return False
+
+    try:
+        with open(path, encoding="utf-8") as f:
+            data = json.load(f)
+        stats = _new_stats()
+        stats["messages_received"] = data["messages_received"]
+        stats["messages_sent"] = data["messages_sent"]
+        stats["hourly_messages"].update({int(hour): count for hour, count in data["hourly_messages"].items()})
+        stats["language_distribution"].update(data["language_distribution"])
+        stats["tool_usage"].update(data["tool_usage"])
+        stats["messages_per_hour"] = RollingCounter.from_dict(data["messages_per_hour"])
+        stats["messages_per_day"] = RollingCounter.from_dict(data["messages_per_day"])
+        stats["all_users"] = HyperLogLog.from_dict(data["all_users"])
+        for key in ("users_today", "users_this_month", "users_before_month"):
+            stats[key] = PeriodSketch.from_dict(data[key])
+    except (OSError, ValueError, KeyError) as e:
+        logger.error(f"❌ Could not load analytics snapshot {path}: {e}")
+        return False
+
+    global _stats
+    _stats = stats
+    logger.info(f"📊 Analytics restored from snapshot saved at {data.get('saved_at')}")
+    return True
+
+
+async def run_snapshot_loop(interval: float = ANALYTICS_SNAPSHOT_INTERVAL) -> None:
+    """Save a snapshot every `interval` seconds until cancelled."""
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            if ANALYTICS_SNAPSHOT_PATH:
+                await asyncio.to_thread(_write_file, ANALYTICS_SNAPSHOT_PATH, _snapshot())
+        except Exception as e:
+            logger.error(f"Analytics snapshot failed: {e}")
+
+
 # ======== Agent Status Functions ========
 
 def is_agent_active() -> bool:
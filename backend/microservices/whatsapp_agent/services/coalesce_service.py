@@ -0,0 +1,179 @@
+"""
+Coalescing Service
+Merges bursts of messages from one user into a single model turn.
+
+Users often split one question over several short messages. Messages bound
+for the model are buffered per phone until the user has been quiet for
+COALESCE_WINDOW_SECONDS (each new message restarts the window, up to
+COALESCE_MAX_WAIT_SECONDS after the first one), then answered with one model
+call and one reply. Every turn takes a token from the phone's rate-limit
+bucket; while a turn waits for its token, later messages keep joining it.
+Turns for the same phone always run in order.
+"""
+
+import os
+import asyncio
+import logging
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from .rate_limit import TokenBucketLimiter
+
+logger = logging.getLogger(__name__)
+
+# Quiet period after a message before the buffered messages are answered (0 = no coalescing)
+COALESCE_WINDOW_SECONDS = float(os.getenv("COALESCE_WINDOW_SECONDS", "1.5"))
+# Longest a message waits for the user to stop typing
+COALESCE_MAX_WAIT_SECONDS = float(os.getenv("COALESCE_MAX_WAIT_SECONDS", "6"))
+# Messages merged into one turn at most
+COALESCE_MAX_MESSAGES = int(os.getenv("COALESCE_MAX_MESSAGES", "10"))
+# Model turns per phone: sustained rate and burst size (0 = unlimited)
+RATE_LIMIT_PER_MINUTE = float(os.getenv("RATE_LIMIT_PER_MINUTE", "12"))
+RATE_LIMIT_BURST = int(os.getenv("RATE_LIMIT_BURST", "3"))
+
+# Called with (phone, merged message text, language)
+TurnHandler = Callable[[str, str, str], Awaitable[None]]
+
+
+class _Turn:
+    """Messages waiting to be answered together."""
+
+    def __init__(self, now: float, previous: Optional[asyncio.Task]):
+        self.messages: List[str] = []
+        self.language = "arabic"
+        self.first_at = now
+        self.last_at = now
+        self.previous = previous
+        self.flushed = asyncio.Event()
+        self.task: Optional[asyncio.Task] = None
+
+
+class MessageCoalescer:
+    """Per-phone debouncer in front of the model."""
+
+    def __init__(
+        self,
+        window: float = COALESCE_WINDOW_SECONDS,
+        max_wait: float = COALESCE_MAX_WAIT_SECONDS,
+        max_messages: int = COALESCE_MAX_MESSAGES,
+        limiter: Optional[TokenBucketLimiter] = None,
+    ):
+        self.window = window
+        self.max_wait = max_wait
+        self.max_messages = max(1, max_messages)
+        self.limiter = limiter or TokenBucketLimiter(RATE_LIMIT_PER_MINUTE, RATE_LIMIT_BURST)
+        self._handler: Optional[TurnHandler] = None
+        # Turn still accepting messages, and the last turn task, per phone
+        self._open: Dict[str, _Turn] = {}
+        self._tails: Dict[str, asyncio.Task] = {}
+        self._stats = {"messages": 0, "coalesced": 0, "turns": 0, "failed": 0}
+
+    def start(self, handler: TurnHandler) -> None:
+        self._handler = handler
+        logger.info(
+            f"🧺 Message coalescing: {self.window}s window, "
+            f"{self.limiter.rate * 60:g}/min per phone (burst {self.limiter.burst})"
+        )
+
+    async def stop(self, timeout: float = 30.0) -> None:
+        """Answer every buffered message now, waiting up to timeout for the turns to finish."""
+        for turn in self._open.values():
+            turn.flushed.set()
+        tasks = list(self._tails.values())
+        if not tasks:
+            return
+        _, pending = await asyncio.wait(tasks, timeout=timeout)
+        for task in pending:
+            task.cancel()
+        if pending:
+            logger.warning(f"⚠️ Dropped {len(pending)} unanswered turns on shutdown")
+
+    def submit(self, phone: str, text: str, language: str) -> asyncio.Task:
+        """Buffer a message for phone; it is answered when the user pauses.
+
+        Returns the task of the turn that answers it.
+        """
+        self._stats["messages"] += 1
+        loop = asyncio.get_running_loop()
+        turn = self._open.get(phone)
+        if turn is not None:
+            self._stats["coalesced"] += 1
+        else:
+            turn = _Turn(loop.time(), self._tails.get(phone))
+            self._open[phone] = turn
+            task = asyncio.create_task(self._run(phone, turn))
+            turn.task = task
+            self._tails[phone] = task
+            task.add_done_callback(lambda done: self._forget(phone, done))
+
+        turn.messages.append(text)
+        turn.language = language
+        turn.last_at = loop.time()
+        if len(turn.messages) >= self.max_messages:
+            self._close(phone, turn)
+            turn.flushed.set()
+        return turn.task
+
+    async def flush(self, phone: str) -> None:
+        """Answer phone's buffered messages now and wait until its replies are sent."""
+        turn = self._open.get(phone)
+        if turn is not None:
+            turn.flushed.set()
+        tail = self._tails.get(phone)
+        if tail is not None:
+            await asyncio.wait([tail])
+
+    async def _run(self, phone: str, turn: _Turn) -> None:
+        loop = asyncio.get_running_loop()
+
+        # Wait for the user to pause (new messages move last_at forward)
+        while not turn.flushed.is_set():
+            remaining = min(turn.last_at + self.window, turn.first_at + self.max_wait) - loop.time()
+            if remaining <= 0:
+                break
+            try:
+                await asyncio.wait_for(turn.flushed.wait(), remaining)
+            except asyncio.TimeoutError:
+                pass
+
+        delay = self.limiter.reserve(phone)
+        if delay:
+            logger.info(f"🚦 Rate limit: holding model turn for {phone[:6]}... {delay:.1f}s")
+            await asyncio.sleep(delay)
+        self._close(phone, turn)
+        self._stats["turns"] += 1
+
+        if turn.previous is not None:
+            # Replies for one phone go out in order
+            await asyncio.wait([turn.previous])
+            turn.previous = None
+
+        try:
+            await self._handler(phone, "\n".join(turn.messages), turn.language)
+        except Exception as e:
+            self._stats["failed"] += 1
+            logger.error(f"Model turn failed for {phone[:6]}...: {e}")
+
+    def _close(self, phone: str, turn: _Turn) -> None:
+        if self._open.get(phone) is turn:
+            del self._open[phone]
+
+    def _forget(self, phone: str, task: asyncio.Task) -> None:
+        if self._tails.get(phone) is task:
+            del self._tails[phone]
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Coalescing counters; model_calls_saved counts messages answered as part of a larger turn."""
+        turns = self._stats["turns"]
+        answered = self._stats["messages"] - sum(len(t.messages) for t in self._open.values())
+        return {
+            **self._stats,
+            "model_calls_saved": answered - turns,
+            "messages_per_turn": round(answered / turns, 2) if turns else 0.0,
+            "open_turns": len(self._open),
+            "window_seconds": self.window,
+            "rate_limit": self.limiter.get_stats(),
+        }
+
+
+# Shared coalescer used by the webhook router
+message_coalescer = MessageCoalescer()
@@ -1,83 +1,317 @@
 """
 Conversation Service
 Manages conversation history for users.
+
+History is written through to a pluggable backend (SQLite in WAL mode by
+default, indexed on (phone, timestamp)) so it survives restarts and can be
+shared by several workers. The database is opened on first use. A bounded LRU
+cache keeps the most recently active conversations in memory, and
+conversations idle for longer than HISTORY_IDLE_TTL are expired from both.
+
+The cache only sees the messages of its own process: with several workers
+sharing the database, set HISTORY_CACHE_SIZE=0 so every read goes to SQLite.
 """
 
+import os
+import time
 import logging
-from typing import Dict, List, Any
+import sqlite3
+from abc import ABC, abstractmethod
+from collections import OrderedDict, deque
+from typing import Any, Deque, Dict, List, Optional, Tuple
 from datetime import datetime
 
 logger = logging.getLogger(__name__)
 
-# Conversation history storage (phone -> array of messages)
-conversation_history: Dict[str, List[Dict[str, Any]]] = {}
 MAX_HISTORY_LENGTH = 10  # Keep last 10 messages per user
 
+# SQLite file holding the history (empty = in-memory cache only, lost on restart)
+HISTORY_DB = os.getenv("HISTORY_DB", "conversations.db")
+# Conversations kept in the in-memory LRU cache (0 = read through to the backend,
+# required when several worker processes share HISTORY_DB)
+HISTORY_CACHE_SIZE = int(os.getenv("HISTORY_CACHE_SIZE", "1000"))
+# Conversations with no message for this many seconds are deleted
+HISTORY_IDLE_TTL = float(os.getenv("HISTORY_IDLE_TTL", str(7 * 24 * 3600)))
+# Minimum seconds between two idle-expiry sweeps
+HISTORY_SWEEP_INTERVAL = float(os.getenv("HISTORY_SWEEP_INTERVAL", "300"))
+
+
+class HistoryBackend(ABC):
+    """Persistent storage for conversation history."""
+
+    @abstractmethod
+    def append(self, phone: str, message: Dict[str, Any]) -> None:
+        ...
+
+    @abstractmethod
+    def recent(self, phone: str, limit: int) -> List[Dict[str, Any]]:
+        """Last `limit` messages for a phone, oldest first."""
+
+    @abstractmethod
+    def clear(self, phone: str) -> None:
+        ...
+
+    @abstractmethod
+    def expire(self, idle_before: float) -> int:
+        """Delete conversations whose last message is older than idle_before."""
+
+    def close(self) -> None:
+        pass
+
+
+class SQLiteHistoryBackend(HistoryBackend):
+    """Embedded SQLite store (WAL), safe to share between worker processes."""
+
+    def __init__(self, path: str, max_length: int = MAX_HISTORY_LENGTH):
+        self.path = path
+        self.max_length = max_length
+        self._conn: Optional[sqlite3.Connection] = None
+
+    def _connect(self) -> sqlite3.Connection:
+        """The database connection, opened (and the schema created) on first use."""
+        if self._conn is None:
+            conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None, timeout=5.0)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS messages ("
+                " id INTEGER PRIMARY KEY AUTOINCREMENT,"
+                " phone TEXT NOT NULL,"
+                " role TEXT NOT NULL,"
+                " content TEXT NOT NULL,"
+                " timestamp REAL NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_messages_phone_ts ON messages (phone, timestamp)")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS conversations ("
+                " phone TEXT PRIMARY KEY,"
+                " last_active REAL NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_conversations_active ON conversations (last_active)")
+            self._conn = conn
+            logger.info(f"💾 Conversation history opened: {self.path}")
+        return self._conn
+
+    def append(self, phone: str, message: Dict[str, Any]) -> None:
+        conn = self._connect()
+        with conn:
+            conn.execute("BEGIN")
+            conn.execute(
+                "INSERT INTO messages (phone, role, content, timestamp) VALUES (?, ?, ?, ?)",
+                (phone, message["role"], message["content"], message["timestamp"]),
+            )
+            # Keep only the last N messages of this conversation (index range scan)
+            conn.execute(
+                "DELETE FROM messages WHERE phone = ? AND timestamp < ("
+                " SELECT timestamp FROM messages WHERE phone = ?"
+                " ORDER BY timestamp DESC LIMIT 1 OFFSET ?)",
+                (phone, phone, self.max_length - 1),
+            )
+            conn.execute(
+                "INSERT INTO conversations (phone, last_active) VALUES (?, ?) "
+                "ON CONFLICT(phone) DO UPDATE SET last_active = excluded.last_active",
+                (phone, message["timestamp"]),
+            )
+
+    def recent(self, phone: str, limit: int) -> List[Dict[str, Any]]:
+        conn = self._connect()
+        rows = conn.execute(
+            "SELECT role, content, timestamp FROM messages WHERE phone = ?"
+            " ORDER BY timestamp DESC LIMIT ?",
+            (phone, limit),
+        ).fetchall()
+        return [{"role": role, "content": content, "timestamp": ts} for role, content, ts in reversed(rows)]
+
+    def clear(self, phone: str) -> None:
+        conn = self._connect()
+        with conn:
+            conn.execute("BEGIN")
+            conn.execute("DELETE FROM messages WHERE phone = ?", (phone,))
+            conn.execute("DELETE FROM conversations WHERE phone = ?", (phone,))
+
+    def expire(self, idle_before: float) -> int:
+        conn = self._connect()
+        with conn:
+            conn.execute("BEGIN")
+            conn.execute(
+                "DELETE FROM messages WHERE phone IN ("
+                " SELECT phone FROM conversations WHERE last_active < ?)",
+                (idle_before,),
+            )
+            return conn.execute(
+                "DELETE FROM conversations WHERE last_active < ?", (idle_before,)
+            ).rowcount
+
+    def close(self) -> None:
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+
+class ConversationStore:
+    """Bounded LRU cache of recent conversations in front of an optional backend."""
+
+    def __init__(
+        self,
+        backend: Optional[HistoryBackend] = None,
+        cache_size: int = HISTORY_CACHE_SIZE,
+        idle_ttl: float = HISTORY_IDLE_TTL,
+        max_length: int = MAX_HISTORY_LENGTH,
+    ):
+        self.backend = backend
+        self.cache_size = cache_size
+        self.idle_ttl = idle_ttl
+        self.max_length = max_length
+        # phone -> (last messages, last activity timestamp)
+        self._cache: "OrderedDict[str, Tuple[Deque[Dict[str, Any]], float]]" = OrderedDict()
+        self._last_sweep = time.time()
+        self._stats = {"hits": 0, "misses": 0, "evictions": 0, "expired": 0}
+
+    def add(self, phone: str, role: str, content: str) -> None:
+        message = {"role": role, "content": content, "timestamp": datetime.now().timestamp()}
+        if self.backend:
+            self.backend.append(phone, message)
+
+        entry = self._cache.get(phone)
+        if entry is not None:
+            history = entry[0]
+            history.append(message)
+        elif self.backend and not self.cache_size:
+            # Read-through mode: nothing cached
+            self._maybe_sweep(message["timestamp"])
+            return
+        elif self.backend:
+            # Already includes the message appended above
+            history = self._load(phone)
+        else:
+            history = deque([message], maxlen=self.max_length)
+        self._put(phone, history, message["timestamp"])
+        self._maybe_sweep(message["timestamp"])
+
+    def get(self, phone: str, limit: int) -> List[Dict[str, Any]]:
+        entry = self._cache.get(phone)
+        if entry is not None:
+            self._stats["hits"] += 1
+            self._cache.move_to_end(phone)
+            history = entry[0]
+        else:
+            self._stats["misses"] += 1
+            if not self.backend:
+                return []
+            history = self._load(phone)
+            if not history:
+                return []
+            if self.cache_size:
+                self._put(phone, history, history[-1]["timestamp"])
+        return list(history)[-limit:] if limit > 0 else []
+
+    def clear(self, phone: str) -> None:
+        self._cache.pop(phone, None)
+        if self.backend:
+            self.backend.clear(phone)
+
+    def expire_idle(self, now: Optional[float] = None) -> int:
+        """Drop conversations idle for longer than idle_ttl from the cache and backend."""
+        now = now or time.time()
+        cutoff = now - self.idle_ttl
+        self._last_sweep = now
+
+        stale = [phone for phone, (_, last_active) in self._cache.items() if last_active < cutoff]
+        for phone in stale:
+            del self._cache[phone]
+        removed = self.backend.expire(cutoff) if self.backend else len(stale)
+
+        self._stats["expired"] += removed
+        if removed:
+            logger.info(f"🧹 Expired {removed} idle conversations")
+        return removed
+
+    def _load(self, phone: str) -> Deque[Dict[str, Any]]:
+        messages = self.backend.recent(phone, self.max_length) if self.backend else []
+        return deque(messages, maxlen=self.max_length)
+
+    def _put(self, phone: str, history: Deque[Dict[str, Any]], last_active: float) -> None:
+        self._cache[phone] = (history, last_active)
+        self._cache.move_to_end(phone)
+        while len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+            self._stats["evictions"] += 1
+
+    def _maybe_sweep(self, now: float) -> None:
+        if now - self._last_sweep >= HISTORY_SWEEP_INTERVAL:
+            self.expire_idle(now)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Cache hit/miss, eviction and expiry counters."""
+        return {
+            **self._stats,
+            "cached_conversations": len(self._cache),
+            "cache_size": self.cache_size,
+            "persistent": self.backend is not None,
+        }
+
+    def close(self) -> None:
+        if self.backend:
+            self.backend.close()
+
+
+def create_store() -> ConversationStore:
+    """Build the store from the HISTORY_* environment settings."""
+    backend = SQLiteHistoryBackend(HISTORY_DB) if HISTORY_DB else None
+    return ConversationStore(backend)
+
+
+# Conversation history storage (phone -> last messages)
+conversation_store = create_store()
+
 
 def add_to_history(phone: str, role: str, content: str) -> None:
     """
     Add a message to the conversation history.
-    
+
     Args:
         phone: User's phone number
         role: Either 'user' or 'assistant'
         content: Message content
     """
-    if phone not in conversation_history:
-        conversation_history[phone] = []
-    
-    history = conversation_history[phone]
-    history.append({
-        "role": role,
-        "content": content,
-        "timestamp": datetime.now().timestamp()
-    })
-    
-    # Keep only last N messages
-    if len(history) > MAX_HISTORY_LENGTH:
-        conversation_history[phone] = history[-MAX_HISTORY_LENGTH:]
+    conversation_store.add(phone, role, content)
 
 
 def get_history(phone: str, limit: int = 6) -> List[Dict[str, Any]]:
     """
     Get conversation history for a user.
-    
+
     Args:
         phone: User's phone number
         limit: Maximum number of messages to return (default: 6 = 3 exchanges)
-        
+
     Returns:
         List of message dictionaries
     """
-    if phone not in conversation_history:
-        return []
-    
-    history = conversation_history[phone]
-    return history[-limit:]
+    return conversation_store.get(phone, limit)
 
 
 def format_history_for_model(history: List[Dict[str, Any]]) -> str:
     """
     Format conversation history for the AI model prompt.
-    
+
     Args:
         history: List of message dictionaries
-        
+
     Returns:
         Formatted string for model context
     """
     if not history:
         return ""
-    
+
     formatted = "\n\nConversation History:\n"
     for msg in history:
         role_name = "User" if msg["role"] == "user" else "Assistant"
         formatted += f"{role_name}: {msg['content']}\n"
-    
+
     return formatted
 
 
 def clear_history(phone: str) -> None:
     """Clear conversation history for a user."""
-    if phone in conversation_history:
-        del conversation_history[phone]
+    conversation_store.clear(phone)
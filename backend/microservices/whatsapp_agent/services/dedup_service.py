@@ -0,0 +1,149 @@
+"""
+Deduplication Service
+Remembers processed WhatsApp message IDs so webhook retries are ignored.
+
+IDs expire after a TTL and the cache is capped in size, evicting the oldest
+IDs first. Optionally the seen-set is shared between worker processes through
+a local SQLite file (memory-mapped, WAL mode).
+"""
+
+import os
+import time
+import logging
+import sqlite3
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+DEDUP_TTL_SECONDS = float(os.getenv("DEDUP_TTL_SECONDS", "86400"))
+DEDUP_CAPACITY = int(os.getenv("DEDUP_CAPACITY", "100000"))
+# Set to a file path to share seen IDs between worker processes
+DEDUP_DB = os.getenv("DEDUP_DB", "")
+
+# How many new IDs the SQLite store accepts between prune passes
+_PRUNE_EVERY = 1000
+
+
+class _SQLiteSeenStore:
+    """Seen-ID table shared by every process that opens the same file."""
+
+    def __init__(self, path: str, ttl: float, capacity: int):
+        self.ttl = ttl
+        self.capacity = capacity
+        self._inserts = 0
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None, timeout=5.0)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("PRAGMA mmap_size=67108864")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS seen_messages ("
+            " message_id TEXT PRIMARY KEY,"
+            " seen_at REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_seen_at ON seen_messages (seen_at)")
+
+    def claim(self, message_id: str, now: float) -> bool:
+        """Record the ID; True if it was new (or expired), False if another process has it."""
+        cursor = self._conn.execute(
+            "INSERT INTO seen_messages (message_id, seen_at) VALUES (?, ?) "
+            "ON CONFLICT(message_id) DO UPDATE SET seen_at = excluded.seen_at "
+            "WHERE seen_messages.seen_at < ?",
+            (message_id, now, now - self.ttl),
+        )
+        claimed = cursor.rowcount == 1
+        if claimed:
+            self._inserts += 1
+            if self._inserts % _PRUNE_EVERY == 0:
+                self.prune(now)
+        return claimed
+
+    def release(self, message_id: str) -> None:
+        self._conn.execute("DELETE FROM seen_messages WHERE message_id = ?", (message_id,))
+
+    def prune(self, now: float) -> int:
+        """Drop expired IDs, then the oldest ones beyond capacity."""
+        expired = self._conn.execute(
+            "DELETE FROM seen_messages WHERE seen_at < ?", (now - self.ttl,)
+        ).rowcount
+        overflow = self._conn.execute(
+            "DELETE FROM seen_messages WHERE message_id IN ("
+            " SELECT message_id FROM seen_messages ORDER BY seen_at DESC LIMIT -1 OFFSET ?)",
+            (self.capacity,),
+        ).rowcount
+        return expired + overflow
+
+    def close(self) -> None:
+        self._conn.close()
+
+
+class MessageDeduplicator:
+    """O(1) seen-set with TTL expiry and oldest-first eviction at capacity."""
+
+    def __init__(self, ttl: float = DEDUP_TTL_SECONDS, capacity: int = DEDUP_CAPACITY, db_path: str = DEDUP_DB):
+        self.ttl = ttl
+        self.capacity = capacity
+        self._seen: "OrderedDict[str, float]" = OrderedDict()
+        self._store: Optional[_SQLiteSeenStore] = (
+            _SQLiteSeenStore(db_path, ttl, capacity) if db_path else None
+        )
+        self._stats = {"checked": 0, "hits": 0, "expired": 0, "evictions": 0}
+
+    def is_duplicate(self, message_id: str) -> bool:
+        """
+        Check a message ID and mark it as seen.
+
+        Returns True if the ID was already seen within the TTL (by this process,
+        or by another one when a shared store is configured).
+        """
+        now = time.time()
+        self._stats["checked"] += 1
+        self._expire(now)
+
+        if message_id in self._seen:
+            self._stats["hits"] += 1
+            return True
+
+        if self._store and not self._store.claim(message_id, now):
+            self._stats["hits"] += 1
+            self._remember(message_id, now)
+            return True
+
+        self._remember(message_id, now)
+        return False
+
+    def forget(self, message_id: str) -> None:
+        """Un-mark an ID so a retry of the same message is processed again."""
+        self._seen.pop(message_id, None)
+        if self._store:
+            self._store.release(message_id)
+
+    def _remember(self, message_id: str, now: float) -> None:
+        self._seen[message_id] = now
+        while len(self._seen) > self.capacity:
+            self._seen.popitem(last=False)
+            self._stats["evictions"] += 1
+
+    def _expire(self, now: float) -> None:
+        # IDs are stored in insertion order, so expired ones are always at the front
+        cutoff = now - self.ttl
+        while self._seen:
+            oldest_id, seen_at = next(iter(self._seen.items()))
+            if seen_at >= cutoff:
+                break
+            del self._seen[oldest_id]
+            self._stats["expired"] += 1
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Hit, expiry and eviction counters."""
+        return {
+            **self._stats,
+            "size": len(self._seen),
+            "capacity": self.capacity,
+            "ttl_seconds": self.ttl,
+            "shared": self._store is not None,
+        }
+
+
+# Shared deduplicator used by the webhook router
+message_deduplicator = MessageDeduplicator()
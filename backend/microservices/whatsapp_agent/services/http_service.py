@@ -0,0 +1,157 @@
+"""
+HTTP Client Service
+Long-lived, keep-alive HTTP clients shared by every outbound call of the agent.
+
+There is one client per upstream (Graph API, chat model, STT), opened and
+closed by the application lifespan, so TLS handshakes and connection setup
+happen once instead of once per message. Each client records a latency
+histogram (time until response headers) for its upstream.
+"""
+
+import os
+import time
+import logging
+from bisect import bisect_left
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional
+
+import httpx
+
+logger = logging.getLogger(__name__)
+
+HTTP_MAX_CONNECTIONS = int(os.getenv("HTTP_MAX_CONNECTIONS", "100"))
+HTTP_MAX_KEEPALIVE = int(os.getenv("HTTP_MAX_KEEPALIVE", "20"))
+HTTP_KEEPALIVE_EXPIRY = float(os.getenv("HTTP_KEEPALIVE_EXPIRY", "30"))
+GRAPH_HTTP2 = os.getenv("GRAPH_HTTP2", "true").lower() == "true"
+
+# Histogram bucket upper bounds in milliseconds (the last bucket is +Inf)
+LATENCY_BUCKETS_MS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000, 60000)
+
+
+@dataclass(frozen=True)
+class UpstreamConfig:
+    """Connection settings for one upstream."""
+
+    timeout: float
+    http2: bool = False
+
+
+UPSTREAMS: Dict[str, UpstreamConfig] = {
+    # Graph API calls and media downloads (graph.facebook.com / lookaside.fbsbx.com)
+    "graph": UpstreamConfig(timeout=30.0, http2=GRAPH_HTTP2),
+    "model": UpstreamConfig(timeout=120.0),
+    "stt": UpstreamConfig(timeout=600.0),
+}
+
+
+class LatencyHistogram:
+    """Cumulative latency histogram with fixed millisecond buckets."""
+
+    def __init__(self, buckets=LATENCY_BUCKETS_MS):
+        self.buckets = buckets
+        self.counts: List[int] = [0] * (len(buckets) + 1)
+        self.total = 0
+        self.sum_ms = 0.0
+        self.errors = 0
+
+    def observe(self, elapsed_ms: float) -> None:
+        self.counts[bisect_left(self.buckets, elapsed_ms)] += 1
+        self.total += 1
+        self.sum_ms += elapsed_ms
+
+    def quantile(self, q: float) -> Optional[float]:
+        """Upper bound of the bucket holding the q-th quantile."""
+        if not self.total:
+            return None
+        rank = q * self.total
+        seen = 0
+        for bound, count in zip(self.buckets, self.counts):
+            seen += count
+            if seen >= rank:
+                return float(bound)
+        return float("inf")
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "count": self.total,
+            "errors": self.errors,
+            "mean_ms": round(self.sum_ms / self.total, 2) if self.total else None,
+            "p50_ms": self.quantile(0.5),
+            "p99_ms": self.quantile(0.99),
+            "buckets": {
+                **{f"le_{bound}": count for bound, count in zip(self.buckets, self.counts)},
+                "le_inf": self.counts[-1],
+            },
+        }
+
+
+class _TimedTransport(httpx.AsyncBaseTransport):
+    """Wraps a transport and records time-to-headers into a histogram."""
+
+    def __init__(self, transport: httpx.AsyncBaseTransport, histogram: LatencyHistogram):
+        self._transport = transport
+        self._histogram = histogram
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        started = time.perf_counter()
+        try:
+            response = await self._transport.handle_async_request(request)
+        except Exception:
+            self._histogram.errors += 1
+            raise
+        self._histogram.observe((time.perf_counter() - started) * 1000)
+        return response
+
+    async def aclose(self) -> None:
+        await self._transport.aclose()
+
+
+class HttpClientPool:
+    """One pooled AsyncClient per upstream, opened at startup and closed at shutdown."""
+
+    def __init__(self, upstreams: Dict[str, UpstreamConfig] = UPSTREAMS, verify: Any = True):
+        self.upstreams = upstreams
+        self.verify = verify
+        self.limits = httpx.Limits(
+            max_connections=HTTP_MAX_CONNECTIONS,
+            max_keepalive_connections=HTTP_MAX_KEEPALIVE,
+            keepalive_expiry=HTTP_KEEPALIVE_EXPIRY,
+        )
+        self._clients: Dict[str, httpx.AsyncClient] = {}
+        self._histograms: Dict[str, LatencyHistogram] = {name: LatencyHistogram() for name in upstreams}
+
+    def start(self) -> None:
+        """Open a client for every configured upstream."""
+        for name in self.upstreams:
+            self.get(name)
+        logger.info(f"🔌 HTTP clients ready for: {', '.join(self._clients)}")
+
+    async def stop(self) -> None:
+        """Close every client and its pooled connections."""
+        clients, self._clients = self._clients, {}
+        for client in clients.values():
+            await client.aclose()
+        logger.info("🔌 HTTP clients closed")
+
+    def get(self, name: str) -> httpx.AsyncClient:
+        """Return the shared client for an upstream (opened on first use if needed)."""
+        client = self._clients.get(name)
+        if client is None:
+            config = self.upstreams[name]
+            transport = httpx.AsyncHTTPTransport(
+                verify=self.verify, http2=config.http2, limits=self.limits
+            )
+            client = httpx.AsyncClient(
+                transport=_TimedTransport(transport, self._histograms[name]),
+                timeout=config.timeout,
+            )
+            self._clients[name] = client
+        return client
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Latency histograms per upstream."""
+        return {name: histogram.snapshot() for name, histogram in self._histograms.items()}
+
+
+# Shared clients used by the outbound services
+http_clients = HttpClientPool()
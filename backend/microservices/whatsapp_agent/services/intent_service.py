@@ -0,0 +1,271 @@
+"""
+Intent Service
+Single-pass multilingual matcher for incoming messages.
+
+All tool keywords, language hints and entity patterns (CIN, names) are
+compiled into one regular expression, with the keywords factored into a
+prefix trie, so a message is scanned once whatever the number of tools or
+keywords. The language is
+decided from the ratio of Arabic to Latin letters, with French and Tunisian
+Arabizi keywords breaking the tie for Latin-script messages. Tools register
+their keywords (and optionally a handler) with the matcher at import time.
+"""
+
+import re
+import logging
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Iterable, List, NamedTuple, Optional, Set, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Language used when a message has no letters at all (digits, emoji, empty)
+DEFAULT_LANGUAGE = "arabic"
+# Share of Arabic-script letters above which a message is treated as Arabic
+ARABIC_SCRIPT_RATIO = 0.5
+
+# Words that mark a Latin-script message as French
+FRENCH_KEYWORDS = [
+    "bonjour", "merci", "document", "status", "est-ce",
+    "quel", "comment", "client", "liste",
+]
+
+# Tunisian dialect written in Latin letters (Arabizi); answered in Arabic
+ARABIZI_KEYWORDS = [
+    "aslema", "chnowa", "chnia", "barcha", "behi", "brabi", "famma", "mta3", "nheb",
+    "wselt", "jahez",
+]
+
+_ARABIC_RUNS = re.compile(r"[ؠ-يٮ-ۓۺ-ۿ]+")
+_LATIN_RUNS = re.compile(r"[A-Za-zÀ-ɏ]+")
+# Digits a CIN may be typed with: ASCII, Arabic-Indic and Persian (all matched by \d)
+_DIGITS = "0123456789" "٠١٢٣٤٥٦٧٨٩" "۰۱۲۳۴۵۶۷۸۹"
+
+# Entity patterns, matched on the lower-cased message. Every alternative starts
+# with a literal character: when all branches of the combined regex do, the
+# regex engine skips positions that cannot start a match with a charset test
+# instead of trying every branch (about twice the throughput). Name patterns
+# only consume the introducer; the name itself is read from the match end so
+# its words are still scanned for keywords.
+_ENTITY_PATTERNS: Dict[str, List[str]] = {
+    # 8-digit national ID card number (CIN), same as \b\d{8}\b
+    "cin": [rf"{d}(?<!\w{d})\d{{7}}(?!\w)" for d in _DIGITS],
+    # "nom: Ali Ben Salah", "اسمي Ali Ben Salah"
+    "named": [
+        r"name(?<![a-z]name)(?![a-z])\s*:?\s*(?=[a-z])",
+        r"nom(?<![a-z]nom)(?![a-z])\s*:?\s*(?=[a-z])",
+        r"اسمي?\s*:?\s*(?=[a-z])",
+    ],
+    # "je suis Ali Ben Salah", "أنا Ali Ben Salah"
+    "intro": [
+        r"je suis(?<![a-z]je suis)\s+(?=[a-z])",
+        r"i am(?<![a-z]i am)\s+(?=[a-z])",
+        r"أنا\s+(?=[a-z])",
+    ],
+    # Arabizi: a digit standing for ع ح ق ... next to a letter ("3aslema", "wra9i")
+    "arabizi": [rf"{d}(?:(?<=[a-z]{d})|(?=[a-z]))" for d in "2379"],
+}
+# Latin name following an introducer
+_NAME_TAIL = re.compile(r"[a-z][a-z\s]*")
+# The whole message is just a first and last name (checked only without keywords)
+_BARE_NAME = re.compile(r"[a-z]{2,}\s+[a-z]{2,}$")
+
+# Name entities by precedence when a message contains several
+_NAME_GROUPS = ("named", "intro", "bare")
+
+_FRENCH = "lang:french"
+_ARABIZI = "lang:arabizi"
+
+
+def _trie_branches(words: Iterable[str]) -> List[str]:
+    """One regex branch per first character, factored on common prefixes ("ab|ac" -> "a(?:b|c)")."""
+    root: Dict[str, dict] = {}
+    for word in words:
+        node = root
+        for char in word:
+            node = node.setdefault(char, {})
+        node[""] = {}
+
+    def build(node: Dict[str, dict]) -> str:
+        branches = [re.escape(char) + build(child) for char, child in sorted(node.items()) if char]
+        if not branches:
+            return ""
+        body = branches[0] if len(branches) == 1 else "(?:" + "|".join(branches) + ")"
+        return f"(?:{body})?" if "" in node else body
+
+    return [re.escape(char) + build(child) for char, child in sorted(root.items()) if char]
+
+
+@dataclass(frozen=True)
+class ToolSpec:
+    """A local tool: the keywords that trigger it and the function that runs it."""
+
+    name: str
+    keywords: Tuple[str, ...]
+    handler: Optional[Callable[..., Dict[str, Any]]] = None
+
+
+class MessageAnalysis(NamedTuple):
+    """Everything the matcher found in one message."""
+
+    language: str
+    tool: Optional[str]
+    verification: Optional[Dict[str, str]]
+    entities: Dict[str, str]
+
+    @property
+    def tool_info(self) -> Optional[Dict[str, str]]:
+        return {"tool": self.tool} if self.tool else None
+
+
+class IntentMatcher:
+    """Compiles keywords and entity patterns into one regex, rebuilt when a tool is registered."""
+
+    def __init__(
+        self,
+        french_keywords: Iterable[str] = FRENCH_KEYWORDS,
+        arabizi_keywords: Iterable[str] = ARABIZI_KEYWORDS,
+    ):
+        self._labels: Dict[str, Set[str]] = {}
+        self._tools: Dict[str, ToolSpec] = {}
+        for keyword in french_keywords:
+            self._add_keyword(keyword, _FRENCH)
+        for keyword in arabizi_keywords:
+            self._add_keyword(keyword, _ARABIZI)
+        self._pattern = self._compile()
+
+    def register_tool(
+        self,
+        name: str,
+        keywords: Iterable[str],
+        handler: Optional[Callable[..., Dict[str, Any]]] = None,
+    ) -> ToolSpec:
+        """
+        Add (or replace) a tool. Tools registered first win when a message
+        triggers several of them.
+
+        Args:
+            name: Tool name returned in MessageAnalysis.tool
+            keywords: Case-insensitive substrings that trigger the tool
+            handler: Called as handler(language, verification_data, user_phone)
+        """
+        spec = ToolSpec(name, tuple(k.lower() for k in keywords), handler)
+        if name in self._tools:
+            for labels in self._labels.values():
+                labels.discard(f"tool:{name}")
+        self._tools[name] = spec
+        for keyword in spec.keywords:
+            self._add_keyword(keyword, f"tool:{name}")
+        self._labels = {k: labels for k, labels in self._labels.items() if labels}
+        self._pattern = self._compile()
+        logger.info(f"🧩 Registered tool '{name}' ({len(spec.keywords)} keywords)")
+        return spec
+
+    def get_tool(self, name: Optional[str]) -> Optional[ToolSpec]:
+        return self._tools.get(name) if name else None
+
+    @property
+    def tools(self) -> List[str]:
+        return list(self._tools)
+
+    def analyze(self, message: str) -> MessageAnalysis:
+        """Scan the message once and return its language, tool intent and entities."""
+        text = message.lower()
+        if len(text) != len(message):
+            # A few characters change length when lower-cased; keep spans aligned
+            text = "".join(char.lower()[0] for char in message)
+
+        labels: Set[str] = set()
+        entities: Dict[str, str] = {}
+        arabizi_hits = 0
+        kinds = self._kinds
+        for match in self._pattern.finditer(text):
+            kind = kinds[match.lastindex]
+            if kind == "kw":
+                labels |= self._labels[match.group()]
+            elif kind == "arabizi":
+                arabizi_hits += 1
+            elif kind not in entities:
+                if kind == "cin":
+                    entities[kind] = match.group()
+                else:
+                    name = _NAME_TAIL.match(text, match.end())
+                    entities[kind] = message[name.start():name.end()].strip()
+
+        if not labels and not entities and _BARE_NAME.match(text):
+            entities["bare"] = message.strip()
+
+        tool = next((name for name in self._tools if "tool:" + name in labels), None) if labels else None
+        if _ARABIZI in labels:
+            arabizi_hits += 1
+        return MessageAnalysis(
+            self._language(message, entities, _FRENCH in labels, arabizi_hits),
+            tool,
+            self._verification(entities),
+            entities,
+        )
+
+    def _language(self, message: str, entities: Dict[str, str], has_french: bool, arabizi_hits: int) -> str:
+        names = [entities[group] for group in _NAME_GROUPS if group in entities]
+        if message.isascii() and not names:
+            arabic, latin = 0, _LATIN_RUNS.search(message) is not None
+        else:
+            arabic = sum(map(len, _ARABIC_RUNS.findall(message)))
+            # Names say nothing about the language ("اسمي Sami Trabelsi" is Arabic)
+            latin = sum(map(len, _LATIN_RUNS.findall(message))) - sum(map(len, _LATIN_RUNS.findall(" ".join(names))))
+        if not arabic and not latin:
+            return DEFAULT_LANGUAGE
+        if arabic / (arabic + latin) >= ARABIC_SCRIPT_RATIO:
+            return "arabic"
+        # Latin script: French unless it reads as Tunisian Arabizi
+        if arabizi_hits and not has_french:
+            return "arabic"
+        return "french"
+
+    @staticmethod
+    def _verification(entities: Dict[str, str]) -> Optional[Dict[str, str]]:
+        if "cin" in entities:
+            return {"cin": entities["cin"]}
+        for group in _NAME_GROUPS:
+            if entities.get(group):
+                return {"name": entities[group]}
+        return None
+
+    def _add_keyword(self, keyword: str, label: str) -> None:
+        self._labels.setdefault(keyword.lower(), set()).add(label)
+
+    def _compile(self) -> "re.Pattern[str]":
+        # Each branch ends with an empty group; match.lastindex says which kind matched
+        branches: List[str] = []
+        self._kinds: Dict[int, str] = {}
+        entity_branches = [(kind, branch) for kind, patterns in _ENTITY_PATTERNS.items() for branch in patterns]
+        keyword_branches = [("kw", branch) for branch in _trie_branches(self._labels)]
+        for kind, branch in entity_branches + keyword_branches:
+            self._kinds[len(branches) + 1] = kind
+            branches.append(f"{branch}()")
+        return re.compile("|".join(branches))
+
+
+# Shared matcher; tools register themselves on import (see tool_service)
+intent_matcher = IntentMatcher()
+
+
+def register_tool(
+    name: str,
+    keywords: Iterable[str],
+    handler: Optional[Callable[..., Dict[str, Any]]] = None,
+) -> ToolSpec:
+    """Register a tool with the shared matcher."""
+    return intent_matcher.register_tool(name, keywords, handler)
+
+
+def analyze_message(message: str) -> MessageAnalysis:
+    """
+    Detect language, tool intent and verification data in one pass.
+
+    Args:
+        message: Input message text
+
+    Returns:
+        MessageAnalysis with language, tool, verification and raw entities
+    """
+    return intent_matcher.analyze(message)
@@ -0,0 +1,207 @@
+"""
+Queue Service
+In-process work queue for webhook messages, with optional SQLite durability.
+
+Messages are queued per key (the sender's phone number) and processed by a
+pool of workers. A key is handled by at most one worker at a time, so messages
+from the same user always run in arrival order, while different users are
+processed concurrently without head-of-line blocking.
+
+A handler may hand the rest of the work to a background task and return it
+(a message buffered for a coalesced model turn): the key moves on at once,
+but the durable row is only deleted when that task has finished.
+"""
+
+import os
+import json
+import time
+import asyncio
+import logging
+import sqlite3
+from collections import deque
+from typing import Any, Awaitable, Callable, Deque, Dict, Optional, Set, Tuple
+
+logger = logging.getLogger(__name__)
+
+WEBHOOK_WORKERS = int(os.getenv("WEBHOOK_WORKERS", "8"))
+WEBHOOK_QUEUE_MAX = int(os.getenv("WEBHOOK_QUEUE_MAX", "10000"))
+# Set to a file path to persist queued messages across restarts
+WEBHOOK_QUEUE_DB = os.getenv("WEBHOOK_QUEUE_DB", "")
+
+# Returns None when the message is done, or the task still answering it
+Handler = Callable[[Dict[str, Any]], Awaitable[Optional["asyncio.Future"]]]
+
+
+class QueueFullError(Exception):
+    """Raised when the queue already holds WEBHOOK_QUEUE_MAX messages."""
+
+
+class _SQLiteJobStore:
+    """Durable job table; a row lives from enqueue until its handler finishes."""
+
+    def __init__(self, path: str):
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS jobs ("
+            " id INTEGER PRIMARY KEY AUTOINCREMENT,"
+            " key TEXT NOT NULL,"
+            " payload TEXT NOT NULL,"
+            " created_at REAL NOT NULL)"
+        )
+
+    def add(self, key: str, payload: Dict[str, Any]) -> int:
+        cursor = self._conn.execute(
+            "INSERT INTO jobs (key, payload, created_at) VALUES (?, ?, ?)",
+            (key, json.dumps(payload), time.time()),
+        )
+        return cursor.lastrowid
+
+    def delete(self, job_id: int) -> None:
+        self._conn.execute("DELETE FROM jobs WHERE id = ?", (job_id,))
+
+    def pending(self):
+        rows = self._conn.execute("SELECT id, key, payload FROM jobs ORDER BY id")
+        for job_id, key, payload in rows:
+            yield job_id, key, json.loads(payload)
+
+    def close(self) -> None:
+        self._conn.close()
+
+
+class MessageQueue:
+    """Keyed FIFO queue drained by a fixed pool of asyncio workers."""
+
+    def __init__(self, workers: int = WEBHOOK_WORKERS, max_size: int = WEBHOOK_QUEUE_MAX, db_path: str = WEBHOOK_QUEUE_DB):
+        self.workers = workers
+        self.max_size = max_size
+        self.db_path = db_path
+        self._handler: Optional[Handler] = None
+        self._store: Optional[_SQLiteJobStore] = None
+        self._pending: Dict[str, Deque[Tuple[Optional[int], Dict[str, Any]]]] = {}
+        self._scheduled: Set[str] = set()
+        self._ready: Optional[asyncio.Queue] = None
+        self._tasks = []
+        # Tasks finishing handled messages whose durable rows are still kept
+        self._deferred: Set[asyncio.Future] = set()
+        self._size = 0
+        self._active = 0
+        self._stats = {"enqueued": 0, "processed": 0, "failed": 0, "rejected": 0, "recovered": 0}
+
+    async def start(self, handler: Handler) -> None:
+        """Start the worker pool and re-queue any jobs left in the durable store."""
+        self._handler = handler
+        self._ready = asyncio.Queue()
+
+        if self.db_path:
+            self._store = _SQLiteJobStore(self.db_path)
+            for job_id, key, payload in self._store.pending():
+                self._push(key, job_id, payload)
+                self._stats["recovered"] += 1
+            if self._stats["recovered"]:
+                logger.info(f"♻️ Recovered {self._stats['recovered']} queued messages from {self.db_path}")
+
+        self._tasks = [asyncio.create_task(self._worker(i)) for i in range(self.workers)]
+        logger.info(f"📬 Message queue started with {self.workers} workers (durable: {bool(self._store)})")
+
+    async def stop(self, drain_timeout: float = 10.0) -> None:
+        """Let in-flight work finish (up to drain_timeout), then stop the workers.
+
+        The durable store stays open for the tasks still answering handled
+        messages; close() it once they are done.
+        """
+        deadline = time.monotonic() + drain_timeout
+        while (self._size or self._active) and time.monotonic() < deadline:
+            await asyncio.sleep(0.05)
+
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        logger.info(f"📭 Message queue stopped ({self._size} messages left queued)")
+
+    def close(self) -> None:
+        """Close the durable store; messages whose tasks have not finished are retried on restart."""
+        if self._store:
+            self._store.close()
+            self._store = None
+        if self._deferred:
+            logger.warning(f"⚠️ {len(self._deferred)} handled messages unanswered, kept for the next start")
+
+    def enqueue(self, key: str, payload: Dict[str, Any]) -> None:
+        """Queue a payload for processing after earlier payloads with the same key."""
+        if self._size >= self.max_size:
+            self._stats["rejected"] += 1
+            raise QueueFullError(f"Queue is full ({self.max_size} messages)")
+
+        job_id = self._store.add(key, payload) if self._store else None
+        self._push(key, job_id, payload)
+        self._stats["enqueued"] += 1
+
+    def _push(self, key: str, job_id: Optional[int], payload: Dict[str, Any]) -> None:
+        self._pending.setdefault(key, deque()).append((job_id, payload))
+        self._size += 1
+        if key not in self._scheduled:
+            self._scheduled.add(key)
+            self._ready.put_nowait(key)
+
+    async def _worker(self, index: int) -> None:
+        while True:
+            key = await self._ready.get()
+            job_id, payload = self._pending[key].popleft()
+            self._size -= 1
+            self._active += 1
+            finished = False
+            answering = None
+            try:
+                answering = await self._handler(payload)
+                self._stats["processed"] += 1
+                finished = True
+            except asyncio.CancelledError:
+                # Shutting down: keep the durable row so the message is retried on restart
+                raise
+            except Exception as e:
+                self._stats["failed"] += 1
+                finished = True
+                logger.error(f"Worker {index} failed to process message for {key[:6]}...: {e}")
+            finally:
+                self._active -= 1
+                if finished:
+                    if self._store and job_id is not None:
+                        if answering is not None:
+                            self._delete_when_done(job_id, answering)
+                        else:
+                            self._store.delete(job_id)
+                    # Hand the key back to the pool only once this message is done
+                    if self._pending[key]:
+                        self._ready.put_nowait(key)
+                    else:
+                        del self._pending[key]
+                        self._scheduled.discard(key)
+
+    def _delete_when_done(self, job_id: int, answering: "asyncio.Future") -> None:
+        self._deferred.add(answering)
+
+        def done(task: "asyncio.Future") -> None:
+            self._deferred.discard(task)
+            # A cancelled task (shutdown) leaves the row to be retried on restart
+            if self._store and not task.cancelled():
+                self._store.delete(job_id)
+
+        answering.add_done_callback(done)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Queue depth and processing counters."""
+        return {
+            **self._stats,
+            "queued": self._size,
+            "active": self._active,
+            "awaiting_answer": len(self._deferred),
+            "workers": self.workers,
+            "durable": bool(self.db_path),
+        }
+
+
+# Shared queue used by the webhook router
+message_queue = MessageQueue()
@@ -0,0 +1,99 @@
+"""
+Rate Limiting
+Per-key token buckets and a concurrency cap for outbound model calls.
+"""
+
+import time
+import asyncio
+from collections import OrderedDict
+from typing import Any, Dict, Tuple
+
+
+class TokenBucketLimiter:
+    """
+    One token bucket per key (phone number). Tokens refill continuously at
+    `rate_per_minute` up to `burst`; a reservation may drive a bucket negative,
+    and the caller waits until its token has been refilled.
+    """
+
+    def __init__(self, rate_per_minute: float, burst: int, max_keys: int = 100000):
+        self.rate = rate_per_minute / 60.0
+        self.burst = max(1, burst)
+        self.max_keys = max_keys
+        # key -> (tokens, last refill time)
+        self._buckets: "OrderedDict[str, Tuple[float, float]]" = OrderedDict()
+        self._stats = {"reservations": 0, "delayed": 0, "delay_seconds": 0.0}
+
+    @property
+    def enabled(self) -> bool:
+        return self.rate > 0
+
+    def reserve(self, key: str) -> float:
+        """Take one token for key; returns how many seconds to wait before using it."""
+        if not self.enabled:
+            return 0.0
+
+        now = time.monotonic()
+        tokens, last = self._buckets.pop(key, (float(self.burst), now))
+        tokens = min(float(self.burst), tokens + (now - last) * self.rate) - 1
+        self._buckets[key] = (tokens, now)
+        if len(self._buckets) > self.max_keys:
+            # Least recently used bucket; it has had the longest time to refill
+            self._buckets.popitem(last=False)
+
+        delay = -tokens / self.rate if tokens < 0 else 0.0
+        self._stats["reservations"] += 1
+        if delay:
+            self._stats["delayed"] += 1
+            self._stats["delay_seconds"] += delay
+        return delay
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            **self._stats,
+            "delay_seconds": round(self._stats["delay_seconds"], 3),
+            "rate_per_minute": self.rate * 60,
+            "burst": self.burst,
+            "tracked_keys": len(self._buckets),
+        }
+
+
+class ConcurrencyLimiter:
+    """Async context manager allowing at most `limit` concurrent holders."""
+
+    def __init__(self, limit: int):
+        self.limit = limit
+        self._semaphore = asyncio.Semaphore(limit) if limit > 0 else None
+        self._in_flight = 0
+        self._waiting = 0
+        self._stats = {"calls": 0, "queued": 0, "peak_in_flight": 0, "wait_seconds": 0.0}
+
+    async def __aenter__(self) -> "ConcurrencyLimiter":
+        if self._semaphore:
+            if self._semaphore.locked():
+                self._stats["queued"] += 1
+            started = time.monotonic()
+            self._waiting += 1
+            try:
+                await self._semaphore.acquire()
+            finally:
+                self._waiting -= 1
+            self._stats["wait_seconds"] += time.monotonic() - started
+        self._in_flight += 1
+        self._stats["calls"] += 1
+        self._stats["peak_in_flight"] = max(self._stats["peak_in_flight"], self._in_flight)
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        self._in_flight -= 1
+        if self._semaphore:
+            self._semaphore.release()
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            **self._stats,
+            "wait_seconds": round(self._stats["wait_seconds"], 3),
+            "limit": self.limit,
+            "in_flight": self._in_flight,
+            "waiting": self._waiting,
+        }
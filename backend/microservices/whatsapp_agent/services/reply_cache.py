@@ -0,0 +1,250 @@
+"""
+Reply Cache
+Semantic cache of model answers to frequently asked questions.
+
+Questions are normalized (case, accents, Arabic diacritics and letter
+variants, punctuation) and embedded with a small local multilingual model.
+Past questions form an in-memory vector index searched by cosine similarity,
+and a new question reuses a past answer in the same reply language when the
+best match is above REPLY_CACHE_THRESHOLD. Identical normalized questions are
+answered from a dictionary without computing an embedding.
+
+Only standalone questions take part: no tool context, no digits (CIN, dates,
+file references), no personal or follow-up wording. Answers are stored only
+from conversations without an earlier assistant turn, so a cached answer never
+depends on a previous exchange.
+"""
+
+import os
+import re
+import time
+import asyncio
+import logging
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple
+
+import numpy as np
+
+from .text_normalize import normalize_token
+
+logger = logging.getLogger(__name__)
+
+REPLY_CACHE_ENABLED = os.getenv("REPLY_CACHE_ENABLED", "true").lower() == "true"
+# Local sentence-transformers model (multilingual: Arabic, French, Tunisian dialect)
+REPLY_CACHE_MODEL = os.getenv("REPLY_CACHE_MODEL", "sentence-transformers/paraphrase-multilingual-MiniLM-L12-v2")
+# Question/answer pairs kept; the least recently used pair is evicted first
+REPLY_CACHE_SIZE = int(os.getenv("REPLY_CACHE_SIZE", "1000"))
+# Seconds a cached answer stays valid
+REPLY_CACHE_TTL = float(os.getenv("REPLY_CACHE_TTL", "86400"))
+# Minimum cosine similarity between two questions to reuse the answer
+REPLY_CACHE_THRESHOLD = float(os.getenv("REPLY_CACHE_THRESHOLD", "0.92"))
+# Longer messages are rarely FAQ questions and are never cached
+REPLY_CACHE_MAX_CHARS = int(os.getenv("REPLY_CACHE_MAX_CHARS", "200"))
+
+_WORDS = re.compile(r"[^\W_]+")
+# Possessives and references to something said earlier (compared after normalize_token)
+_PERSONAL_WORDS = {
+    "mon", "ma", "mes", "moi", "elle", "elles", "lui", "leur", "ca", "cela", "celui",
+    "celle", "aussi", "my", "mine", "it", "that", "also",
+    "متاعي", "متاعنا", "ديالي", "نتاعي", "هذا", "هذه", "هذاك", "ذلك", "هاذا", "هاذي",
+    "زاده", "ايضا", "كذلك", "ولدي", "بنتي", "mta3i", "zeda",
+}
+# Words that make a message continue the previous one when they open it
+_FOLLOW_UP_OPENERS = {"et", "mais", "and", "but", "و", "ولا", "اما", "w"}
+_LANGUAGES = {"french": 0, "arabic": 1}
+
+
+def normalize_question(message: str) -> str:
+    """Lowercase, accent- and diacritic-free words separated by single spaces."""
+    return " ".join(_WORDS.findall(normalize_token(message)))
+
+
+class _Probe(NamedTuple):
+    """A looked-up question, kept so a miss can be stored without embedding it again."""
+
+    language: str
+    text: str
+    vector: Optional[np.ndarray]
+
+
+class ReplyCache:
+    """Fixed-capacity vector index of question embeddings with TTL and LRU eviction."""
+
+    def __init__(
+        self,
+        model_name: str = REPLY_CACHE_MODEL,
+        capacity: int = REPLY_CACHE_SIZE,
+        ttl: float = REPLY_CACHE_TTL,
+        threshold: float = REPLY_CACHE_THRESHOLD,
+        enabled: bool = REPLY_CACHE_ENABLED,
+    ):
+        self.model_name = model_name
+        self.capacity = capacity
+        self.ttl = ttl
+        self.threshold = threshold
+        self.enabled = enabled and capacity > 0
+        self._model = None
+        self._load_lock: Optional[asyncio.Lock] = None
+
+        # Slot arrays; vectors are allocated once the embedding size is known
+        self._vectors: Optional[np.ndarray] = None
+        self._expires = np.zeros(capacity)
+        self._last_used = np.zeros(capacity)
+        self._languages = np.full(capacity, -1, dtype=np.int8)
+        self._entries: List[Optional[Tuple[str, str, str]]] = [None] * capacity  # (language, question, answer)
+        self._exact: Dict[Tuple[str, str], int] = {}
+        self._used = 0
+
+        self._model_latency: Optional[float] = None
+        self._stats = {
+            "lookups": 0, "hits": 0, "exact_hits": 0, "misses": 0, "skipped": 0,
+            "stores": 0, "evictions": 0, "lookup_seconds": 0.0, "latency_saved_seconds": 0.0,
+        }
+
+    def is_standalone(self, message: str, context: Optional[str], history: List[Dict[str, Any]]) -> bool:
+        """True when the answer cannot depend on the user, a tool result or the previous turn."""
+        if not self.enabled or context or len(message) > REPLY_CACHE_MAX_CHARS or any(c.isdigit() for c in message):
+            self._stats["skipped"] += 1
+            return False
+
+        words = normalize_question(message).split()
+        mid_conversation = any(entry["role"] == "assistant" for entry in history)
+        if (
+            not words
+            or _PERSONAL_WORDS.intersection(words)
+            or (mid_conversation and (words[0] in _FOLLOW_UP_OPENERS or len(words) < 3))
+        ):
+            self._stats["skipped"] += 1
+            return False
+        return True
+
+    async def lookup(self, message: str, language: str) -> Tuple[Optional[str], Optional[_Probe]]:
+        """
+        Find a cached answer for a standalone question.
+
+        Returns:
+            (answer or None, probe to pass to store() after a miss)
+        """
+        started = time.monotonic()
+        self._stats["lookups"] += 1
+        text = normalize_question(message)
+        now = time.time()
+
+        slot = self._exact.get((language, text))
+        if slot is not None and self._expires[slot] > now:
+            self._stats["exact_hits"] += 1
+            return self._hit(slot, now, started), None
+
+        try:
+            vector = await self._embed(text)
+        except Exception as e:
+            logger.warning(f"⚠️ Reply cache disabled, embedding model unavailable: {e}")
+            self.enabled = False
+            return None, None
+
+        if self._used:
+            scores = self._vectors[:self._used] @ vector
+            valid = (self._expires[:self._used] > now) & (self._languages[:self._used] == _LANGUAGES.get(language, -1))
+            scores = np.where(valid, scores, -1.0)
+            best = int(np.argmax(scores))
+            if scores[best] >= self.threshold:
+                logger.info(f"⚡ Reply cache hit (similarity {scores[best]:.3f})")
+                return self._hit(best, now, started), None
+
+        self._stats["misses"] += 1
+        self._stats["lookup_seconds"] += time.monotonic() - started
+        return None, _Probe(language, text, vector)
+
+    def store(self, probe: _Probe, answer: str) -> None:
+        """Remember the model's answer to a question that missed."""
+        if not self.enabled or probe.vector is None or not answer:
+            return
+        if self._vectors is None:
+            self._vectors = np.zeros((self.capacity, probe.vector.shape[0]), dtype=np.float32)
+
+        now = time.time()
+        slot = self._exact.get((probe.language, probe.text))
+        if slot is None:
+            slot = self._free_slot(now)
+        self._vectors[slot] = probe.vector
+        self._expires[slot] = now + self.ttl
+        self._last_used[slot] = now
+        self._languages[slot] = _LANGUAGES.get(probe.language, -1)
+        self._entries[slot] = (probe.language, probe.text, answer)
+        self._exact[(probe.language, probe.text)] = slot
+        self._stats["stores"] += 1
+
+    def record_model_latency(self, seconds: float) -> None:
+        """Feed the model's response time into the running average used for latency_saved."""
+        if self._model_latency is None:
+            self._model_latency = seconds
+        else:
+            self._model_latency += 0.1 * (seconds - self._model_latency)
+
+    def clear(self) -> None:
+        self._expires[:] = 0
+        self._languages[:] = -1
+        self._entries = [None] * self.capacity
+        self._exact.clear()
+        self._used = 0
+
+    def _hit(self, slot: int, now: float, started: float) -> str:
+        self._last_used[slot] = now
+        elapsed = time.monotonic() - started
+        self._stats["hits"] += 1
+        self._stats["lookup_seconds"] += elapsed
+        if self._model_latency is not None:
+            self._stats["latency_saved_seconds"] += max(0.0, self._model_latency - elapsed)
+        return self._entries[slot][2]
+
+    def _free_slot(self, now: float) -> int:
+        if self._used < self.capacity:
+            self._used += 1
+            return self._used - 1
+        expired = int(np.argmin(self._expires))
+        slot = expired if self._expires[expired] <= now else int(np.argmin(self._last_used))
+        if self._expires[slot] > now:
+            self._stats["evictions"] += 1
+        language, text, _ = self._entries[slot]
+        self._exact.pop((language, text), None)
+        return slot
+
+    async def _embed(self, text: str) -> np.ndarray:
+        if self._model is None:
+            if self._load_lock is None:
+                self._load_lock = asyncio.Lock()
+            async with self._load_lock:
+                if self._model is None:
+                    self._model = await asyncio.to_thread(self._load_model)
+        vector = await asyncio.to_thread(self._model.encode, text, normalize_embeddings=True, show_progress_bar=False)
+        return np.asarray(vector, dtype=np.float32)
+
+    def _load_model(self):
+        from sentence_transformers import SentenceTransformer
+
+        logger.info(f"🔄 Loading reply cache embedding model: {self.model_name}")
+        model = SentenceTransformer(self.model_name)
+        logger.info("✅ Reply cache embedding model loaded")
+        return model
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Hit rate, latency saved and occupancy."""
+        lookups = self._stats["lookups"]
+        now = time.time()
+        return {
+            **self._stats,
+            "lookup_seconds": round(self._stats["lookup_seconds"], 3),
+            "latency_saved_seconds": round(self._stats["latency_saved_seconds"], 3),
+            "hit_rate": round(self._stats["hits"] / lookups, 4) if lookups else 0.0,
+            "avg_lookup_ms": round(1000 * self._stats["lookup_seconds"] / lookups, 2) if lookups else 0.0,
+            "avg_model_seconds": round(self._model_latency, 3) if self._model_latency is not None else None,
+            "entries": int(np.count_nonzero(self._expires[:self._used] > now)),
+            "capacity": self.capacity,
+            "threshold": self.threshold,
+            "ttl_seconds": self.ttl,
+            "enabled": self.enabled,
+            "model_loaded": self._model is not None,
+        }
+
+
+# Shared cache used by query_model
+reply_cache = ReplyCache()
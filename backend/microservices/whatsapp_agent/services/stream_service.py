@@ -0,0 +1,149 @@
+"""
+Stream Service
+Reads a streamed model reply and splits it into WhatsApp messages.
+
+The model endpoint may answer a streaming request with Server-Sent Events
+(`data: {...}` lines, ended by `data: [DONE]`), newline-delimited JSON
+chunks, or plain chunked text. Each chunk carries a piece of the reply under
+one of the usual keys (token, delta, text, content, reply, or an OpenAI-style
+choices[0].delta.content).
+
+ReplyChunker turns the growing text into messages: the first complete
+sentence is sent as soon as it is ready, later text goes out paragraph by
+paragraph (or at the last sentence boundary once a part gets long), and the
+rest is sent when the stream ends.
+"""
+
+import os
+import re
+import json
+from typing import Any, AsyncIterator, List, Optional
+
+import httpx
+
+# Characters the first message needs before a sentence end lets it go out
+STREAM_FIRST_MIN_CHARS = int(os.getenv("STREAM_FIRST_MIN_CHARS", "20"))
+# A later part without a paragraph break is cut at a sentence boundary past this length
+STREAM_CHUNK_CHARS = int(os.getenv("STREAM_CHUNK_CHARS", "600"))
+
+# What a streaming request accepts, most preferred first
+STREAM_ACCEPT = "text/event-stream, application/x-ndjson;q=0.9, text/plain;q=0.5, application/json;q=0.1"
+
+_SENTENCE_END = re.compile(r"(?<=[.!?؟…])\s+|\n+")
+_PARAGRAPH_BREAK = re.compile(r"\n\s*\n")
+_SPACE = re.compile(r"\s+")
+_TEXT_KEYS = ("token", "delta", "text", "content", "reply")
+
+
+def chunk_text(payload: Any) -> str:
+    """The reply text carried by one decoded stream chunk ('' if none)."""
+    if isinstance(payload, str):
+        return payload
+    if not isinstance(payload, dict):
+        return ""
+    for key in _TEXT_KEYS:
+        value = payload.get(key)
+        if isinstance(value, str):
+            return value
+        if isinstance(value, dict):
+            return chunk_text(value)
+    choices = payload.get("choices")
+    if choices and isinstance(choices[0], dict):
+        return chunk_text(choices[0].get("delta") or choices[0].get("message") or {})
+    return ""
+
+
+def is_json_response(response: httpx.Response) -> bool:
+    """True when the endpoint ignored the stream flag and sent one JSON body."""
+    return response.headers.get("content-type", "").split(";")[0].strip() == "application/json"
+
+
+async def iter_reply_tokens(response: httpx.Response) -> AsyncIterator[str]:
+    """Yield reply text pieces from an SSE, NDJSON or plain-text streamed response."""
+    content_type = response.headers.get("content-type", "").split(";")[0].strip()
+
+    if content_type == "text/event-stream":
+        async for line in response.aiter_lines():
+            if not line.startswith("data:"):
+                continue
+            data = line[5:].strip()
+            if data == "[DONE]":
+                return
+            try:
+                token = chunk_text(json.loads(data))
+            except ValueError:
+                token = line[5:].removeprefix(" ")
+            if token:
+                yield token
+
+    elif content_type in ("application/x-ndjson", "application/jsonl", "application/json-seq"):
+        async for line in response.aiter_lines():
+            line = line.strip("\x1e \t")
+            if not line:
+                continue
+            payload = json.loads(line)
+            token = chunk_text(payload)
+            if token:
+                yield token
+            if isinstance(payload, dict) and payload.get("done"):
+                return
+
+    else:
+        async for token in response.aiter_text():
+            if token:
+                yield token
+
+
+class ReplyChunker:
+    """Buffers streamed text and releases it as message-sized parts."""
+
+    def __init__(self, first_min_chars: int = STREAM_FIRST_MIN_CHARS, chunk_chars: int = STREAM_CHUNK_CHARS):
+        self.first_min_chars = first_min_chars
+        self.chunk_chars = chunk_chars
+        self.parts = 0
+        self._buffer = ""
+
+    def feed(self, text: str) -> List[str]:
+        """Add streamed text; returns the parts that are now complete."""
+        self._buffer += text
+        ready = []
+        while (part := self._next_part()) is not None:
+            if part:
+                ready.append(part)
+                self.parts += 1
+        return ready
+
+    def close(self) -> List[str]:
+        """The remaining text once the stream has ended."""
+        part, self._buffer = self._buffer.strip(), ""
+        if not part:
+            return []
+        self.parts += 1
+        return [part]
+
+    def _next_part(self) -> Optional[str]:
+        buffer = self._buffer
+        if not self.parts:
+            for match in _SENTENCE_END.finditer(buffer):
+                if len(buffer[:match.start()].strip()) >= self.first_min_chars:
+                    return self._cut(match.start(), match.end())
+        else:
+            match = _PARAGRAPH_BREAK.search(buffer)
+            if match:
+                return self._cut(match.start(), match.end())
+
+        if len(buffer) >= self.chunk_chars:
+            # No paragraph yet: cut at the last sentence end, else the last space
+            boundary = None
+            for match in _SENTENCE_END.finditer(buffer):
+                boundary = match
+            if boundary is None:
+                for match in _SPACE.finditer(buffer, 1):
+                    boundary = match
+            if boundary is not None:
+                return self._cut(boundary.start(), boundary.end())
+        return None
+
+    def _cut(self, end: int, resume: int) -> str:
+        part, self._buffer = self._buffer[:end].strip(), self._buffer[resume:]
+        return part
@@ -0,0 +1,19 @@
+"""
+Text Normalization
+Folding shared by the client name index and the reply cache.
+"""
+
+import re
+import unicodedata
+
+_ARABIC_MARKS = re.compile(r"[\u0610-\u061a\u064b-\u065f\u0670\u06d6-\u06ed\u0640]")
+_ARABIC_VARIANTS = str.maketrans({
+    "أ": "ا", "إ": "ا", "آ": "ا", "ٱ": "ا", "ى": "ي", "ة": "ه", "ؤ": "و", "ئ": "ي", "ء": "",
+})
+
+
+def normalize_token(token: str) -> str:
+    """Lowercase, strip Latin accents and Arabic diacritics, unify Arabic letter variants."""
+    token = _ARABIC_MARKS.sub("", token).translate(_ARABIC_VARIANTS)
+    decomposed = unicodedata.normalize("NFKD", token)
+    return "".join(ch for ch in decomposed if not unicodedata.combining(ch)).casefold()
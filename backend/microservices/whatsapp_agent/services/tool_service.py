@@ -1,17 +1,28 @@
 """
 Tool Service
 Handles language detection, verification, and document status tools.
+
+Matching is done by the single-pass matcher in intent_service; this module
+registers the local tools with it and keeps the per-field helpers.
 """
 
-import re
 import logging
-from typing import Optional, Dict, Any, Tuple
+from typing import Optional, Dict, Any
 
 from client_data import find_client_by_cin, find_client_by_name
+from .intent_service import analyze_message, intent_matcher, register_tool
 
 logger = logging.getLogger(__name__)
 
 
+# Document status query keywords (French, Arabic and Tunisian dialect)
+DOCUMENT_KEYWORDS = [
+    "document", "وثيقة", "وثائق", "status", "حالة", "état",
+    "ready", "جاهز", "prêt", "وين وصلت", "où est",
+    "كواغط", "أوراقي", "wselt", "ja7ez", "jahez", "wra9",
+]
+
+
 def detect_language(message: str) -> str:
     """
     Detect if message is in French or Arabic.
@@ -22,17 +33,7 @@ def detect_language(message: str) -> str:
     Returns:
         'french' or 'arabic'
     """
-    lower_msg = message.lower()
-    
-    # French keywords
-    french_keywords = [
-        "bonjour", "merci", "document", "status", "est-ce",
-        "quel", "comment", "client", "liste"
-    ]
-    
-    has_french = any(keyword in lower_msg for keyword in french_keywords)
-    
-    return "french" if has_french else "arabic"
+    return analyze_message(message).language
 
 
 def extract_verification_data(message: str) -> Optional[Dict[str, str]]:
@@ -45,24 +46,7 @@ def extract_verification_data(message: str) -> Optional[Dict[str, str]]:
     Returns:
         Dict with 'cin' or 'name' key, or None
     """
-    # Try to extract 8-digit CIN
-    cin_match = re.search(r'\b\d{8}\b', message)
-    if cin_match:
-        return {"cin": cin_match.group(0)}
-    
-    # Try to extract name patterns
-    name_patterns = [
-        r'(?:name|nom|اسم|اسمي)\s*:?\s*([a-zA-Z\s]+)',
-        r'(?:je suis|i am|أنا)\s+([a-zA-Z\s]+)',
-        r'^([A-Z][a-z]+\s+[A-Z][a-z]+)$',
-    ]
-    
-    for pattern in name_patterns:
-        match = re.search(pattern, message, re.IGNORECASE)
-        if match:
-            return {"name": match.group(1).strip()}
-    
-    return None
+    return analyze_message(message).verification
 
 
 def detect_tool_needed(message: str) -> Optional[Dict[str, str]]:
@@ -75,20 +59,72 @@ def detect_tool_needed(message: str) -> Optional[Dict[str, str]]:
     Returns:
         Dict with 'tool' key if tool needed, else None
     """
-    lower_msg = message.lower()
-    
-    # Document status query keywords (multilingual)
-    document_keywords = [
-        "document", "وثيقة", "وثائق", "status", "حالة", "état",
-        "ready", "جاهز", "prêt", "وين وصلت", "où est"
-    ]
+    return analyze_message(message).tool_info
+
+
+def check_document(
+    language: str,
+    verification_data: Optional[Dict[str, str]],
+    user_phone: Optional[str] = None
+) -> Dict[str, Any]:
+    """Return the caller's document status, or ask them to verify their identity."""
+    # Try to find client by verification data
+    client = None
     
-    has_document_query = any(keyword in lower_msg for keyword in document_keywords)
+    if verification_data:
+        if verification_data.get("cin"):
+            client = find_client_by_cin(verification_data["cin"])
+        elif verification_data.get("name"):
+            client = find_client_by_name(verification_data["name"])
     
-    if has_document_query:
-        return {"tool": "check_document"}
+    if not client:
+        # Ask for verification
+        if language == "french":
+            return {
+                "needsVerification": True,
+                "message": (
+                    '🔐 Pour des raisons de sécurité, veuillez fournir votre nom complet '
+                    'ou numéro CIN (8 chiffres) pour vérifier votre identité.\n\n'
+                    'Exemple: "Mon CIN est 12345678" ou "Je suis John Doe"'
+                ),
+            }
+        else:
+            return {
+                "needsVerification": True,
+                "message": (
+                    '🔐 لأسباب أمنية، يرجى تقديم اسمك الكامل أو رقم بطاقة التعريف الوطنية '
+                    '(8 أرقام) للتحقق من هويتك.\n\n'
+                    'مثال: "رقم بطاقتي 12345678" أو "أنا John Doe"'
+                ),
+            }
     
-    return None
+    # Client found, return their document status
+    if language == "french":
+        status_text = "TERMINÉ ✓" if client["status"] == "done" else "EN ATTENTE ⏳"
+        return {
+            "verified": True,
+            "message": (
+                f"✅ Identité vérifiée\n\n"
+                f"Statut du document pour {client['name']}:\n"
+                f"📄 Document: {client['document']}\n"
+                f"✅ Statut: {status_text}\n"
+                f"📅 Date de soumission: {client['submission_date']}\n"
+                f"🆔 Référence: {client['client_id']}"
+            ),
+        }
+    else:
+        status_text = "جاهزة ✓" if client["status"] == "done" else "قيد المعالجة ⏳"
+        return {
+            "verified": True,
+            "message": (
+                f"✅ تم التحقق من الهوية\n\n"
+                f"حالة الوثيقة للسيد/ة {client['name']}:\n"
+                f"📄 الوثيقة: {client['document']}\n"
+                f"✅ الحالة: {status_text}\n"
+                f"📅 تاريخ التقديم: {client['submission_date']}\n"
+                f"🆔 المرجع: {client['client_id']}"
+            ),
+        }
 
 
 def execute_local_tool(
@@ -109,63 +145,11 @@ def execute_local_tool(
     Returns:
         Tool result with message
     """
-    if tool_info.get("tool") == "check_document":
-        # Try to find client by verification data
-        client = None
-        
-        if verification_data:
-            if verification_data.get("cin"):
-                client = find_client_by_cin(verification_data["cin"])
-            elif verification_data.get("name"):
-                client = find_client_by_name(verification_data["name"])
-        
-        if not client:
-            # Ask for verification
-            if language == "french":
-                return {
-                    "needsVerification": True,
-                    "message": (
-                        '🔐 Pour des raisons de sécurité, veuillez fournir votre nom complet '
-                        'ou numéro CIN (8 chiffres) pour vérifier votre identité.\n\n'
-                        'Exemple: "Mon CIN est 12345678" ou "Je suis John Doe"'
-                    ),
-                }
-            else:
-                return {
-                    "needsVerification": True,
-                    "message": (
-                        '🔐 لأسباب أمنية، يرجى تقديم اسمك الكامل أو رقم بطاقة التعريف الوطنية '
-                        '(8 أرقام) للتحقق من هويتك.\n\n'
-                        'مثال: "رقم بطاقتي 12345678" أو "أنا John Doe"'
-                    ),
-                }
-        
-        # Client found, return their document status
-        if language == "french":
-            status_text = "TERMINÉ ✓" if client["status"] == "done" else "EN ATTENTE ⏳"
-            return {
-                "verified": True,
-                "message": (
-                    f"✅ Identité vérifiée\n\n"
-                    f"Statut du document pour {client['name']}:\n"
-                    f"📄 Document: {client['document']}\n"
-                    f"✅ Statut: {status_text}\n"
-                    f"📅 Date de soumission: {client['submission_date']}\n"
-                    f"🆔 Référence: {client['client_id']}"
-                ),
-            }
-        else:
-            status_text = "جاهزة ✓" if client["status"] == "done" else "قيد المعالجة ⏳"
-            return {
-                "verified": True,
-                "message": (
-                    f"✅ تم التحقق من الهوية\n\n"
-                    f"حالة الوثيقة للسيد/ة {client['name']}:\n"
-                    f"📄 الوثيقة: {client['document']}\n"
-                    f"✅ الحالة: {status_text}\n"
-                    f"📅 تاريخ التقديم: {client['submission_date']}\n"
-                    f"🆔 المرجع: {client['client_id']}"
-                ),
-            }
+    spec = intent_matcher.get_tool(tool_info.get("tool"))
+    if spec and spec.handler:
+        return spec.handler(language, verification_data, user_phone)
     
     return {"error": "Unknown tool"}
+
+
+register_tool("check_document", DOCUMENT_KEYWORDS, check_document)
@@ -1,123 +1,300 @@
 """
 Transcription Service
 Handles downloading WhatsApp media and transcribing audio.
+
+Voice notes are normally streamed: the Graph API download body is piped
+straight into the multipart upload to the STT endpoint, so the audio never
+touches disk and is never fully held in memory. If that attempt fails, the
+media is spooled to disk (with a size cap) and the upload is retried from the
+file. A janitor removes spool files left behind by crashed workers.
 """
 
 import os
+import time
+import uuid
+import asyncio
 import logging
-import httpx
 import aiofiles
 from pathlib import Path
+from typing import AsyncIterator, Dict, Optional
+
+import httpx
+
+from .http_service import http_clients
 
 logger = logging.getLogger(__name__)
 
 # WhatsApp API configuration
-WHATSAPP_API_URL = "https://graph.facebook.com/v21.0"
+WHATSAPP_API_URL = os.getenv("WHATSAPP_API_URL", "https://graph.facebook.com/v21.0")
+
+# Stream voice notes into the STT request (set to false to always spool to disk)
+VOICE_STREAMING = os.getenv("VOICE_STREAMING", "true").lower() == "true"
+# WhatsApp caps audio at 16 MB; anything larger is rejected
+VOICE_MAX_BYTES = int(os.getenv("VOICE_MAX_BYTES", str(16 * 1024 * 1024)))
+# Upload attempts from the spool file after the streamed attempt failed
+VOICE_SPOOL_RETRIES = int(os.getenv("VOICE_SPOOL_RETRIES", "2"))
+VOICE_SPOOL_DIR = Path(os.getenv("VOICE_SPOOL_DIR") or Path(__file__).parent.parent / "temp")
+# Spool files older than this are removed by the janitor
+VOICE_SPOOL_MAX_AGE = float(os.getenv("VOICE_SPOOL_MAX_AGE", "3600"))
+VOICE_JANITOR_INTERVAL = float(os.getenv("VOICE_JANITOR_INTERVAL", "600"))
+
+CHUNK_SIZE = 64 * 1024
+
+
+class MediaTooLargeError(ValueError):
+    """Raised when a voice note exceeds VOICE_MAX_BYTES."""
+
+
+def _auth_headers() -> Dict[str, str]:
+    whatsapp_token = os.getenv("WHATSAPP_TOKEN")
+
+    if not whatsapp_token:
+        raise ValueError("WHATSAPP_TOKEN not configured")
+
+    return {"Authorization": f"Bearer {whatsapp_token}"}
+
+
+def _stt_url(use_simple_transcribe: bool) -> str:
+    model_endpoint = os.getenv("MODEL_ENDPOINT", "http://host.docker.internal:8000/chat")
+    stt_endpoint = os.getenv("STT_ENDPOINT", model_endpoint.replace("/chat", "/voice-chat"))
+
+    if use_simple_transcribe:
+        return stt_endpoint.replace("/voice-chat", "/transcribe")
+    return stt_endpoint
+
+
+def _check_size(size: Optional[int], media_id: str) -> None:
+    if size is not None and size > VOICE_MAX_BYTES:
+        raise MediaTooLargeError(f"Media {media_id} is {size} bytes (limit {VOICE_MAX_BYTES})")
+
+
+def _retryable(error: httpx.HTTPError) -> bool:
+    """Transport failures and 5xx answers may succeed on retry; 4xx answers will not."""
+    if isinstance(error, httpx.HTTPStatusError):
+        return error.response.status_code >= 500
+    return True
+
+
+async def _get_media_info(media_id: str, headers: Dict[str, str]) -> dict:
+    """Step 1: ask the Graph API for the download URL (and size/MIME type when given)."""
+    response = await http_clients.get("graph").get(f"{WHATSAPP_API_URL}/{media_id}", headers=headers)
+    response.raise_for_status()
+    info = response.json()
+    _check_size(info.get("file_size"), media_id)
+    logger.info(f"✅ Media URL retrieved: {info.get('url')}")
+    return info
+
+
+async def _capped(chunks: AsyncIterator[bytes], media_id: str) -> AsyncIterator[bytes]:
+    """Pass chunks through, aborting once more than VOICE_MAX_BYTES have arrived."""
+    received = 0
+    async for chunk in chunks:
+        received += len(chunk)
+        _check_size(received, media_id)
+        yield chunk
+
+
+async def transcribe_whatsapp_media(media_id: str, use_simple_transcribe: bool = False) -> dict:
+    """
+    Transcribe a WhatsApp voice note by media ID.
+
+    Streams the download into the STT request; if that fails, falls back to
+    spooling the media to disk and retrying the upload from the file.
+
+    Args:
+        media_id: WhatsApp media ID
+        use_simple_transcribe: If True, use /transcribe endpoint, else /voice-chat
+
+    Returns:
+        Transcription result from the STT service
+    """
+    if VOICE_STREAMING:
+        try:
+            return await stream_media_to_stt(media_id, use_simple_transcribe)
+        except (httpx.TransportError, httpx.HTTPStatusError) as e:
+            if not _retryable(e):
+                raise
+            logger.warning(f"⚠️ Streamed transcription failed ({e}), retrying from spool file")
+
+    audio_file_path = await download_whatsapp_media(media_id)
+    attempts = max(1, VOICE_SPOOL_RETRIES)
+    try:
+        for attempt in range(1, attempts + 1):
+            try:
+                return await transcribe_audio(audio_file_path, use_simple_transcribe, keep_file=True)
+            except (httpx.TransportError, httpx.HTTPStatusError) as e:
+                if not _retryable(e) or attempt == attempts:
+                    raise
+                logger.warning(f"⚠️ Transcription attempt {attempt}/{attempts} failed, retrying")
+                await asyncio.sleep(2 ** (attempt - 1))
+    finally:
+        Path(audio_file_path).unlink(missing_ok=True)
+
+
+async def stream_media_to_stt(media_id: str, use_simple_transcribe: bool = False) -> dict:
+    """
+    Pipe a WhatsApp media download directly into a multipart STT upload.
+
+    Args:
+        media_id: WhatsApp media ID
+        use_simple_transcribe: If True, use /transcribe endpoint, else /voice-chat
+
+    Returns:
+        Transcription result from the STT service
+    """
+    headers = _auth_headers()
+    endpoint = _stt_url(use_simple_transcribe)
+    logger.info(f"🎧 Streaming media {media_id} to: {endpoint}")
+
+    info = await _get_media_info(media_id, headers)
+    mime_type = (info.get("mime_type") or "audio/ogg").split(";")[0].strip()
+
+    boundary = uuid.uuid4().hex
+    preamble = (
+        f"--{boundary}\r\n"
+        f'Content-Disposition: form-data; name="audio"; filename="{media_id}.ogg"\r\n'
+        f"Content-Type: {mime_type}\r\n\r\n"
+    ).encode()
+    epilogue = f"\r\n--{boundary}--\r\n".encode()
+
+    async with http_clients.get("graph").stream("GET", info["url"], headers=headers) as download:
+        download.raise_for_status()
+        content_length = download.headers.get("content-length")
+        _check_size(int(content_length) if content_length else None, media_id)
+
+        async def body() -> AsyncIterator[bytes]:
+            yield preamble
+            async for chunk in _capped(download.aiter_bytes(CHUNK_SIZE), media_id):
+                yield chunk
+            yield epilogue
+
+        upload_headers = {"Content-Type": f"multipart/form-data; boundary={boundary}"}
+        if content_length and "content-encoding" not in download.headers:
+            # Known size: send a Content-Length instead of chunked encoding
+            upload_headers["Content-Length"] = str(len(preamble) + int(content_length) + len(epilogue))
+
+        response = await http_clients.get("stt").post(endpoint, content=body(), headers=upload_headers)
+        response.raise_for_status()
+
+    logger.info("✅ Transcription response received (streamed)")
+    return response.json()
 
 
 async def download_whatsapp_media(media_id: str) -> str:
     """
-    Download media file from WhatsApp.
-    
+    Download media file from WhatsApp into the spool directory.
+
+    The body is written chunk by chunk and capped at VOICE_MAX_BYTES.
+
     Args:
         media_id: WhatsApp media ID
-        
+
     Returns:
         Path to the downloaded temporary file
     """
-    whatsapp_token = os.getenv("WHATSAPP_TOKEN")
-    
-    if not whatsapp_token:
-        raise ValueError("WHATSAPP_TOKEN not configured")
-    
-    headers = {"Authorization": f"Bearer {whatsapp_token}"}
-    
+    headers = _auth_headers()
+
     logger.info(f"📥 Starting download for media ID: {media_id}")
-    
-    async with httpx.AsyncClient() as client:
-        # Step 1: Get media URL
-        media_url_response = await client.get(
-            f"{WHATSAPP_API_URL}/{media_id}",
-            headers=headers
-        )
-        media_url_response.raise_for_status()
-        media_url = media_url_response.json().get("url")
-        
-        logger.info(f"✅ Media URL retrieved: {media_url}")
-        
-        # Step 2: Download media file
-        logger.info("⬇️ Downloading media file...")
-        media_response = await client.get(media_url, headers=headers)
-        media_response.raise_for_status()
-        
-        content = media_response.content
-        logger.info(f"✅ Downloaded {len(content)} bytes")
-        
-        # Step 3: Save to temporary file
-        temp_dir = Path(__file__).parent.parent / "temp"
-        temp_dir.mkdir(exist_ok=True)
-        
-        temp_file_path = temp_dir / f"{media_id}.ogg"
-        
-        async with aiofiles.open(temp_file_path, "wb") as f:
-            await f.write(content)
-        
-        logger.info(f"✅ Media saved to: {temp_file_path}")
-        
-        return str(temp_file_path)
-
-
-async def transcribe_audio(audio_file_path: str, use_simple_transcribe: bool = False) -> dict:
+
+    info = await _get_media_info(media_id, headers)
+
+    VOICE_SPOOL_DIR.mkdir(parents=True, exist_ok=True)
+    temp_file_path = VOICE_SPOOL_DIR / f"{media_id}-{uuid.uuid4().hex[:8]}.ogg"
+
+    logger.info("⬇️ Downloading media file...")
+    received = 0
+    try:
+        async with http_clients.get("graph").stream("GET", info["url"], headers=headers) as download:
+            download.raise_for_status()
+            async with aiofiles.open(temp_file_path, "wb") as f:
+                async for chunk in _capped(download.aiter_bytes(CHUNK_SIZE), media_id):
+                    await f.write(chunk)
+                    received += len(chunk)
+    except BaseException:
+        temp_file_path.unlink(missing_ok=True)
+        raise
+
+    logger.info(f"✅ Media saved to: {temp_file_path} ({received} bytes)")
+
+    return str(temp_file_path)
+
+
+async def transcribe_audio(audio_file_path: str, use_simple_transcribe: bool = False, keep_file: bool = False) -> dict:
     """
     Transcribe audio file using STT endpoint.
-    
+
     Args:
         audio_file_path: Path to the audio file
         use_simple_transcribe: If True, use /transcribe endpoint, else /voice-chat
-        
+        keep_file: If True, leave the file in place when the upload fails (for a retry)
+
     Returns:
         Transcription result from the STT service
     """
-    model_endpoint = os.getenv("MODEL_ENDPOINT", "http://host.docker.internal:8000/chat")
-    stt_endpoint = os.getenv("STT_ENDPOINT", model_endpoint.replace("/chat", "/voice-chat"))
-    
-    if use_simple_transcribe:
-        endpoint = stt_endpoint.replace("/voice-chat", "/transcribe")
-    else:
-        endpoint = stt_endpoint
-    
+    endpoint = _stt_url(use_simple_transcribe)
+
     logger.info(f"📤 Sending audio file to: {endpoint}")
     logger.info(f"📁 File path: {audio_file_path}")
     logger.info(f"⚙️ Mode: {'Simple transcribe' if use_simple_transcribe else 'Full voice-chat'}")
-    
+
     # Check if file exists
     if not os.path.exists(audio_file_path):
         raise FileNotFoundError(f"Audio file not found: {audio_file_path}")
-    
+
     file_size = os.path.getsize(audio_file_path)
     logger.info(f"📊 File size: {file_size} bytes")
-    
-    if file_size == 0:
-        raise ValueError("Audio file is empty (0 bytes)")
-    
+
+    succeeded = False
     try:
-        async with httpx.AsyncClient(timeout=600.0) as client:
-            with open(audio_file_path, "rb") as f:
-                files = {"audio": (os.path.basename(audio_file_path), f, "audio/ogg")}
-                
-                logger.info("🚀 Sending request to STT endpoint...")
-                response = await client.post(endpoint, files=files)
-                response.raise_for_status()
-        
+        if file_size == 0:
+            raise ValueError("Audio file is empty (0 bytes)")
+
+        with open(audio_file_path, "rb") as f:
+            files = {"audio": (os.path.basename(audio_file_path), f, "audio/ogg")}
+
+            logger.info("🚀 Sending request to STT endpoint...")
+            response = await http_clients.get("stt").post(endpoint, files=files)
+            response.raise_for_status()
+
         logger.info("✅ Transcription response received")
-        
-        # Clean up temp file on success
-        logger.info("🗑️ Cleaning up temp file...")
-        os.remove(audio_file_path)
-        
+        succeeded = True
         return response.json()
-        
+
     except Exception as e:
         logger.error(f"❌ Error transcribing audio: {e}")
-        logger.warning(f"⚠️ Keeping audio file for inspection: {audio_file_path}")
         raise
+
+    finally:
+        if succeeded or not keep_file:
+            logger.info("🗑️ Cleaning up temp file...")
+            Path(audio_file_path).unlink(missing_ok=True)
+
+
+def sweep_spool_dir(max_age: float = VOICE_SPOOL_MAX_AGE) -> int:
+    """Delete spool files older than max_age seconds; returns how many were removed."""
+    if not VOICE_SPOOL_DIR.is_dir():
+        return 0
+
+    cutoff = time.time() - max_age
+    removed = 0
+    for path in VOICE_SPOOL_DIR.iterdir():
+        try:
+            if path.is_file() and path.stat().st_mtime < cutoff:
+                path.unlink()
+                removed += 1
+        except FileNotFoundError:
+            continue
+
+    if removed:
+        logger.info(f"🧹 Removed {removed} stale voice spool files")
+    return removed
+
+
+async def run_spool_janitor(interval: float = VOICE_JANITOR_INTERVAL) -> None:
+    """Periodically sweep the spool directory until cancelled."""
+    while True:
+        try:
+            await asyncio.to_thread(sweep_spool_dir)
+        except Exception as e:
+            logger.error(f"Spool janitor failed: {e}")
+        await asyncio.sleep(interval)
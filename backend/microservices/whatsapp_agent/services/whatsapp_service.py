@@ -7,10 +7,12 @@ import os
 import logging
 import httpx
 
+from .http_service import http_clients
+
 logger = logging.getLogger(__name__)
 
 # WhatsApp API configuration
-WHATSAPP_API_URL = "https://graph.facebook.com/v21.0"
+WHATSAPP_API_URL = os.getenv("WHATSAPP_API_URL", "https://graph.facebook.com/v21.0")
 
 
 async def send_whatsapp_message(to: str, message: str) -> dict:
@@ -46,12 +48,11 @@ async def send_whatsapp_message(to: str, message: str) -> dict:
     }
     
     try:
-        async with httpx.AsyncClient() as client:
-            response = await client.post(url, json=payload, headers=headers)
-            response.raise_for_status()
-            data = response.json()
-            logger.info(f"Message sent successfully: {data}")
-            return data
+        response = await http_clients.get("graph").post(url, json=payload, headers=headers)
+        response.raise_for_status()
+        data = response.json()
+        logger.info(f"Message sent successfully: {data}")
+        return data
     except httpx.HTTPError as e:
         logger.error(f"Error sending message: {e}")
         raise